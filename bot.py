@@ -3,17 +3,34 @@
 """
 import asyncio
 import logging
+import multiprocessing
 from datetime import datetime
+from typing import Optional, Tuple
 
+from aiohttp import web
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 from config import settings
+from database.cache_bus import cache_bus
 from database.database import init_db
+from database.fsm_storage import SQLiteStorage
 from handlers import user_handlers, admin_handlers, tournament_handlers
+from middlewares.api_metrics import ApiMetricsMiddleware
+from middlewares.callback_dedup import CallbackDedupMiddleware
+from middlewares.concurrency_limit import ConcurrencyLimitMiddleware
 from middlewares.hold_cleanup import HoldCleanupMiddleware
 from middlewares.keyboard_refresh import KeyboardRefreshMiddleware
+from middlewares.send_limit import SendLimitMiddleware
+from middlewares.throttling import ThrottlingMiddleware
+from middlewares.user_lock import UserLockMiddleware
+from utils.metrics import metrics_handler
+from utils.notifier import notifier
 from utils.scheduler import start_scheduler
+from utils.sharding import ShardPool
+from utils.token_bucket import SharedTokenBucket, TokenBucket
 
 # Настройка логирования
 logging.basicConfig(
@@ -23,40 +40,279 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main():
-    """Основная функция запуска бота"""
-    logger.info("Запуск бота...")
+def create_bot(send_bucket: Optional[TokenBucket] = None) -> Bot:
+    """
+    Создание бота (с поддержкой собственного Bot API сервера).
+
+    send_bucket — лимит отправки сообщений; при нескольких процессах
+    один SharedTokenBucket на всех.
+    """
+    session = None
+    if settings.TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL))
+    bot = Bot(token=settings.BOT_TOKEN, session=session)
     
-    # Инициализация БД
-    init_db()
-    logger.info("База данных инициализирована")
+    # Метрики вызовов Bot API (задержки, ошибки, RetryAfter)
+    bot.session.middleware(ApiMetricsMiddleware())
     
-    # Создание бота и диспетчера
-    bot = Bot(token=settings.BOT_TOKEN)
-    await bot.delete_webhook(drop_pending_updates=False)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    # Общий лимит отправки: ответы хендлеров и уведомления outbox
+    if send_bucket is None:
+        send_bucket = TokenBucket(settings.BOT_SEND_RATE, settings.BOT_SEND_RATE)
+    bot.session.middleware(SendLimitMiddleware(send_bucket))
     
+    return bot
+
+
+def create_dispatcher(shard: Optional[Tuple[int, int]] = None) -> Dispatcher:
+    """Создание диспетчера с middleware и роутерами"""
+    # Состояния FSM хранятся в SQLite и переживают перезапуск
+    storage = SQLiteStorage(flush_interval=settings.FSM_FLUSH_SECONDS, shard=shard)
+    dp = Dispatcher(storage=storage)
+
+    # Апдейты одного пользователя обрабатываются по очереди (нет гонок FSM)
+    dp.update.outer_middleware(UserLockMiddleware())
+
+    # Ограничение числа одновременно обрабатываемых апдейтов
+    dp.update.outer_middleware(ConcurrencyLimitMiddleware(settings.MAX_CONCURRENT_UPDATES))
+
+    # Повторные нажатия кнопок отбрасываются до любой работы с БД
+    dp.callback_query.outer_middleware(CallbackDedupMiddleware(
+        ttl=settings.CALLBACK_DEDUP_TTL_SECONDS,
+        max_keys=settings.CALLBACK_DEDUP_MAX_KEYS
+    ))
+
+    # Ограничение частоты запросов (до очистки holds — отказ без обращения к БД)
+    if settings.THROTTLE_ENABLED:
+        throttling = ThrottlingMiddleware(settings.THROTTLE_LIMITS)
+        dp.message.middleware(throttling)
+        dp.callback_query.middleware(throttling)
+
     # Подключение middleware для очистки holds
     dp.message.middleware(HoldCleanupMiddleware())
     dp.callback_query.middleware(HoldCleanupMiddleware())
 
-    # Подключение middleware для обновления клавиатуры после рестарта
-    dp.message.middleware(KeyboardRefreshMiddleware())
-    
+    # Подключение middleware для обновления клавиатуры после деплоя
+    dp.message.middleware(KeyboardRefreshMiddleware(
+        epoch=settings.KEYBOARD_EPOCH,
+        cache_size=settings.KEYBOARD_EPOCH_CACHE_SIZE
+    ))
+
     # Регистрация роутеров
     dp.include_router(user_handlers.router)
     dp.include_router(admin_handlers.router)
     dp.include_router(tournament_handlers.router)
+
+    return dp
+
+
+def create_webhook_app(bot: Bot, dp: Dispatcher) -> web.Application:
+    """Создание aiohttp-приложения, принимающего апдейты от Telegram"""
+    app = web.Application()
+
+    # Апдейты с неверным X-Telegram-Bot-Api-Secret-Token отклоняются с 401
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.WEBHOOK_SECRET
+    ).register(app, path=settings.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    return app
+
+
+def create_sharded_webhook_app(pool: ShardPool) -> web.Application:
+    """aiohttp-приложение, раздающее апдейты процессам-воркерам"""
+    async def receive_update(request: web.Request) -> web.Response:
+        if request.headers.get('X-Telegram-Bot-Api-Secret-Token') != settings.WEBHOOK_SECRET:
+            return web.Response(status=401, text="Unauthorized")
+        pool.dispatch(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(settings.WEBHOOK_PATH, receive_update)
+    return app
+
+
+async def start_metrics_server() -> web.AppRunner:
+    """
+    Отдельный HTTP-сервер /metrics на METRICS_HOST:METRICS_PORT — не на
+    публичном порту webhook, куда приходят запросы из интернета
+    """
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=settings.METRICS_HOST, port=settings.METRICS_PORT).start()
+    logger.info(f"Метрики доступны на {settings.METRICS_HOST}:{settings.METRICS_PORT}/metrics")
+    return runner
+
+
+async def run_polling(bot: Bot, dp: Dispatcher):
+    """Получение апдейтов через long polling"""
+    await bot.delete_webhook(drop_pending_updates=False)
+
+    metrics_runner = await start_metrics_server() if settings.METRICS_PORT else None
+    try:
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+
+async def run_sharded_polling(bot: Bot, dp: Dispatcher, pool: ShardPool):
+    """Long polling в приёмнике: апдейты раздаются процессам-воркерам"""
+    await bot.delete_webhook(drop_pending_updates=False)
+    allowed_updates = dp.resolve_used_update_types()
+
+    metrics_runner = await start_metrics_server() if settings.METRICS_PORT else None
+    offset = None
+    try:
+        while True:
+            try:
+                updates = await bot.get_updates(
+                    offset=offset, timeout=30, allowed_updates=allowed_updates,
+                    request_timeout=40
+                )
+            except Exception as e:
+                logger.error(f"Ошибка получения апдейтов: {e}")
+                await asyncio.sleep(5)
+                continue
+
+            for update in updates:
+                pool.dispatch(update.model_dump(mode='json', by_alias=True, exclude_none=True))
+                offset = update.update_id + 1
+    finally:
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, pool: Optional[ShardPool] = None):
+    """Получение апдейтов через webhook (при pool — с раздачей воркерам)"""
+    await bot.set_webhook(
+        url=settings.WEBHOOK_URL.rstrip('/') + settings.WEBHOOK_PATH,
+        secret_token=settings.WEBHOOK_SECRET,
+        max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=False
+    )
+
+    app = create_sharded_webhook_app(pool) if pool else create_webhook_app(bot, dp)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.WEBHOOK_HOST, port=settings.WEBHOOK_PORT)
+    await site.start()
+    logger.info(
+        f"Webhook слушает {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}{settings.WEBHOOK_PATH}"
+    )
+
+    metrics_runner = await start_metrics_server() if settings.METRICS_PORT else None
+    try:
+        await asyncio.Event().wait()
+    finally:
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await runner.cleanup()
+
+
+async def run_worker(index: int, count: int, queue: multiprocessing.Queue, ready=None,
+                     outbox_wakeups=None, send_bucket: Optional[SharedTokenBucket] = None):
+    """Процесс-воркер: обработка апдейтов своей доли пользователей"""
+    bot = create_bot(send_bucket)
+    dp = create_dispatcher(shard=(index, count))
+
+    # Уведомления доставляет приёмник — будим его после записи в outbox
+    if outbox_wakeups is not None:
+        notifier.set_remote(outbox_wakeups)
+
+    # Кэши могут измениться в других процессах
+    cache_bus.start(settings.CACHE_BUS_POLL_SECONDS)
+    
+    # Свои брошенные сессии FSM; общие задачи выполняет приёмник
+    scheduler = await start_scheduler(dp.storage, maintenance=False)
+
+    loop = asyncio.get_running_loop()
+    tasks = set()
+
+    async def process(update: dict):
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка обработки апдейта {update.get('update_id')}: {e}", exc_info=True)
+
+    logger.info(f"Воркер {index + 1}/{count} запущен")
+    if ready is not None:
+        ready.set()
+    try:
+        while True:
+            update = await loop.run_in_executor(None, queue.get)
+            if update is None:
+                break
+            task = asyncio.create_task(process(update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        scheduler.shutdown()
+        await cache_bus.close()
+        await dp.storage.close()
+        await bot.session.close()
+        logger.info(f"Воркер {index + 1}/{count} остановлен")
+
+
+def worker_process(index: int, count: int, queue: multiprocessing.Queue, ready=None,
+                   outbox_wakeups=None, send_bucket: Optional[SharedTokenBucket] = None):
+    """Точка входа дочернего процесса"""
+    try:
+        asyncio.run(run_worker(index, count, queue, ready, outbox_wakeups, send_bucket))
+    except KeyboardInterrupt:
+        pass
+
+
+async def main():
+    """Основная функция запуска бота"""
+    logger.info("Запуск бота...")
+
+    # Инициализация БД
+    init_db()
+    logger.info("База данных инициализирована")
+
+    # При WORKERS > 1 этот процесс только принимает апдейты и раздаёт их
+    # воркерам по user_id; уведомления и обслуживание БД остаются здесь.
+    # Воркеры будят доставку через outbox_wakeups и делят с приёмником
+    # лимит отправки send_bucket
+    pool = outbox_wakeups = send_bucket = None
+    if settings.WORKERS > 1:
+        context = multiprocessing.get_context('spawn')
+        outbox_wakeups = context.Event()
+        send_bucket = SharedTokenBucket(settings.BOT_SEND_RATE, settings.BOT_SEND_RATE, context)
+        pool = ShardPool(settings.WORKERS, worker_process, args=(outbox_wakeups, send_bucket))
     
-    # Запуск планировщика очистки holds
-    scheduler = await start_scheduler()
+    # Создание бота и диспетчера
+    bot = create_bot(send_bucket)
+    dp = create_dispatcher()
+
+    # Запуск воркера доставки уведомлений из outbox
+    notifier.start(bot, wakeups=outbox_wakeups)
     
+    # Запуск планировщика очистки holds и брошенных сессий FSM
+    scheduler = await start_scheduler(None if pool else dp.storage)
+
     try:
+        if pool:
+            pool.start()
         logger.info("Бот успешно запущен")
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if settings.USE_WEBHOOK:
+            await run_webhook(bot, dp, pool)
+        elif pool:
+            await run_sharded_polling(bot, dp, pool)
+        else:
+            await run_polling(bot, dp)
     finally:
+        if pool:
+            pool.stop()
         scheduler.shutdown()
+        await notifier.close()
+        await dp.storage.close()
         await bot.session.close()
         logger.info("Бот остановлен")
 
@@ -3,7 +3,7 @@
 """
 import os
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Tuple
 from datetime import time
 
 
@@ -14,19 +14,88 @@ class Settings:
     BOT_TOKEN: str = os.getenv('BOT_TOKEN', '')
     ADMIN_IDS: List[int] = None
     SUPPORT_ADMIN_IDS: List[int] = None
+    TELEGRAM_API_URL: str = os.getenv('TELEGRAM_API_URL', '')  # свой Bot API сервер (пусто = api.telegram.org)
+    
+    # Режим получения обновлений: polling (по умолчанию) или webhook
+    USE_WEBHOOK: bool = os.getenv('USE_WEBHOOK', '0').lower() in ('1', 'true', 'yes')
+    WEBHOOK_URL: str = os.getenv('WEBHOOK_URL', '')          # публичный адрес, например https://bot.example.com
+    WEBHOOK_PATH: str = os.getenv('WEBHOOK_PATH', '/webhook')
+    WEBHOOK_SECRET: str = os.getenv('WEBHOOK_SECRET', '')    # X-Telegram-Bot-Api-Secret-Token
+    WEBHOOK_HOST: str = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT: int = int(os.getenv('WEBHOOK_PORT', '8080'))
+    WEBHOOK_MAX_CONNECTIONS: int = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+    MAX_CONCURRENT_UPDATES: int = int(os.getenv('MAX_CONCURRENT_UPDATES', '50'))
+    METRICS_PORT: int = int(os.getenv('METRICS_PORT', '0'))  # отдельный порт для /metrics (0 = выкл.)
+    METRICS_HOST: str = os.getenv('METRICS_HOST', '127.0.0.1')  # не публиковать вместе с webhook
+    
+    # Несколько процессов-воркеров: приёмник апдейтов раздаёт их по user_id
+    WORKERS: int = int(os.getenv('WORKERS', '1'))
+    CACHE_BUS_POLL_SECONDS: float = 1  # как часто воркеры проверяют инвалидацию кэшей
+    
+    # Подавление повторных нажатий одной и той же кнопки
+    CALLBACK_DEDUP_TTL_SECONDS: float = float(os.getenv('CALLBACK_DEDUP_TTL_SECONDS', '3'))
+    CALLBACK_DEDUP_MAX_KEYS: int = int(os.getenv('CALLBACK_DEDUP_MAX_KEYS', '10000'))
+    
+    # Ограничение частоты запросов по группам хендлеров:
+    # (запросов/с на пользователя, запас, запросов/с на всех, запас).
+    # Переопределяется переменными THROTTLE_<ГРУППА>, например THROTTLE_BOOKING=1,5,30,60
+    THROTTLE_ENABLED: bool = os.getenv('THROTTLE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    THROTTLE_LIMITS: Dict[str, Tuple[float, float, float, float]] = None
+    
+    # Лимиты рассылки уведомлений (Telegram: ~30 сообщений/с на бота, ~1/с в чат)
+    NOTIFY_GLOBAL_RATE: float = float(os.getenv('NOTIFY_GLOBAL_RATE', '25'))
+    NOTIFY_CHAT_RATE: float = float(os.getenv('NOTIFY_CHAT_RATE', '1'))
+    # Общий лимит всех отправок бота (ответы и уведомления, во всех процессах)
+    BOT_SEND_RATE: float = float(os.getenv('BOT_SEND_RATE', '30'))
+    
+    # Очередь уведомлений (outbox)
+    OUTBOX_BATCH_SIZE: int = 30
+    OUTBOX_POLL_SECONDS: float = 5
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_MAX_BACKOFF_SECONDS: int = 300
+    OUTBOX_RETENTION_DAYS: int = 7
+    
+    # Выгрузки /export: строк за одно чтение из БД и сколько файла держать в
+    # памяти до переноса во временный файл на диске
+    EXPORT_BATCH_SIZE: int = 500
+    EXPORT_SPOOL_MAX_BYTES: int = 1024 * 1024
+    
+    # Поиск /find: результатов на странице
+    FIND_PAGE_SIZE: int = 10
+    
+    # Регулярные брони: как часто создаются занятия на MAX_BOOKING_DAYS вперёд
+    # и сколько серий обрабатывается за одну транзакцию
+    SERIES_EXPAND_MINUTES: int = 15
+    SERIES_EXPAND_BATCH_SIZE: int = 200
+    
+    # Сводки для администраторов: несрочные события копятся DIGEST_WINDOW_SECONDS
+    # и приходят одним сообщением
+    DIGEST_ENABLED: bool = os.getenv('DIGEST_ENABLED', '0').lower() in ('1', 'true', 'yes')
+    DIGEST_WINDOW_SECONDS: int = int(os.getenv('DIGEST_WINDOW_SECONDS', '120'))
     
     # База данных
     DB_PATH: str = os.getenv('DB_PATH', 'data/billiard_bot.db')
+    FSM_FLUSH_SECONDS: float = 2  # задержка пакетной записи состояний FSM
+    TOURNAMENT_COUNTS_RECONCILE_SECONDS: int = 60  # сверка счётчиков мест на турнирах с БД
+    
+    # Версия главной клавиатуры: увеличьте при деплое, меняющем кнопки, —
+    # пользователи с более старой версией получат новую клавиатуру
+    KEYBOARD_EPOCH: int = int(os.getenv('KEYBOARD_EPOCH', '1'))
+    KEYBOARD_EPOCH_CACHE_SIZE: int = 10000
     
     # Бизнес-правила
-    TABLES_COUNT: int = 3
+    DEFAULT_VENUE_NAME: str = os.getenv('DEFAULT_VENUE_NAME', 'Бильярдный клуб')
     BOOKING_STEP_MINUTES: int = 60
     MAX_BOOKING_DAYS: int = 7
     MIN_BOOKING_HOURS: int = 1
     MAX_BOOKING_HOURS: int = 4
     HOLD_TIMEOUT_MINUTES: int = 10
+    FSM_SESSION_TTL_MINUTES: int = HOLD_TIMEOUT_MINUTES  # брошенные мастера удаляются вместе с holds
+    TOURNAMENT_VENUE_ID: int = int(os.getenv('TOURNAMENT_VENUE_ID', '1'))  # заведение, где играются турниры
+    TOURNAMENT_MATCH_MINUTES: int = 60  # время стола на один матч турнирной сетки
     
-    # Режим работы (часы)
+    # Режим работы (часы) — для заведения, создаваемого при первом запуске;
+    # дальше расписание каждого заведения хранится в таблице venues
     WEEKDAY_OPEN: time = time(14, 0)   # Пн-Чт
     WEEKDAY_CLOSE: time = time(2, 0)   # следующего дня
     FRIDAY_OPEN: time = time(14, 0)    # Пт
@@ -41,6 +110,15 @@ class Settings:
         if not self.BOT_TOKEN:
             raise ValueError("BOT_TOKEN не установлен")
         
+        if self.WORKERS < 1:
+            raise ValueError("WORKERS должно быть не меньше 1")
+        
+        if self.USE_WEBHOOK:
+            if not self.WEBHOOK_URL:
+                raise ValueError("WEBHOOK_URL не установлен (USE_WEBHOOK=1)")
+            if not self.WEBHOOK_SECRET:
+                raise ValueError("WEBHOOK_SECRET не установлен (USE_WEBHOOK=1)")
+        
         # Парсинг ADMIN_IDS из переменной окружения
         if self.ADMIN_IDS is None:
             admin_ids_str = os.getenv('ADMIN_IDS', '')
@@ -56,9 +134,26 @@ class Settings:
                 self.SUPPORT_ADMIN_IDS = [int(id.strip()) for id in support_admin_ids_str.split(',')]
             else:
                 self.SUPPORT_ADMIN_IDS = []
+        
+        # Лимиты частоты запросов
+        if self.THROTTLE_LIMITS is None:
+            self.THROTTLE_LIMITS = {
+                'default': (2, 10, 50, 100),
+                'booking': (1, 5, 30, 60),
+                'admin': (3, 10, 20, 40),
+                'tournament': (1, 5, 20, 40),
+                'support': (0.2, 3, 5, 20),
+            }
+            for group in self.THROTTLE_LIMITS:
+                override = os.getenv(f'THROTTLE_{group.upper()}', '')
+                if override:
+                    values = tuple(float(value.strip()) for value in override.split(','))
+                    if len(values) != 4:
+                        raise ValueError(f"THROTTLE_{group.upper()}: ожидается 4 числа через запятую")
+                    self.THROTTLE_LIMITS[group] = values
     
     def is_admin(self, user_id: int) -> bool:
-        """Проверка, является ли пользователь администратором"""
+        """Проверка, является ли пользователь администратором всех заведений"""
         return user_id in self.ADMIN_IDS
 
 
@@ -0,0 +1,86 @@
+"""
+Канал инвалидации кэшей между процессами бота
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+from database.database import get_db
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBus:
+    """
+    Инвалидация кэшей по темам ("tables", ...).
+
+    publish(topic) сразу сбрасывает кэши своего процесса и увеличивает
+    версию темы в таблице cache_versions — если вызвать его внутри
+    transaction(), версия изменится тем же коммитом, что и данные. Другие
+    процессы опрашивают таблицу (start()) и сбрасывают кэши тем, чья
+    версия изменилась. В однопроцессном режиме опрос не нужен.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[], None]]] = {}
+        self._versions: Dict[str, int] = {}
+        self._poller: Optional[asyncio.Task] = None
+
+    def subscribe(self, topic: str, handler: Callable[[], None]):
+        """Регистрация функции сброса кэша для темы"""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def _invalidate(self, topic: str):
+        for handler in self._handlers.get(topic, ()):
+            handler()
+
+    def publish(self, topic: str):
+        """Данные темы изменились — сбросить кэши во всех процессах"""
+        self._invalidate(topic)
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO cache_versions (topic, version) VALUES (?, 1)
+                ON CONFLICT(topic) DO UPDATE SET version = version + 1
+            """, (topic,))
+
+    def _read_versions(self) -> Dict[str, int]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT topic, version FROM cache_versions")
+            return {row['topic']: row['version'] for row in cursor.fetchall()}
+
+    def poll(self):
+        """Сброс кэшей тем, изменённых другими процессами"""
+        versions = self._read_versions()
+        for topic, version in versions.items():
+            if self._versions.get(topic) != version:
+                self._invalidate(topic)
+        self._versions = versions
+
+    def start(self, poll_seconds: float):
+        """Запуск фонового опроса версий"""
+        if self._poller is None:
+            self._versions = self._read_versions()
+            self._poller = asyncio.create_task(self._run(poll_seconds))
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+
+    async def _run(self, poll_seconds: float):
+        while True:
+            await asyncio.sleep(poll_seconds)
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Ошибка опроса версий кэшей: {e}", exc_info=True)
+
+
+# Глобальный экземпляр
+cache_bus = CacheBus()
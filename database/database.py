@@ -3,9 +3,49 @@
 """
 import sqlite3
 import os
-from contextlib import contextmanager
-from typing import Generator
+from datetime import datetime
+from pathlib import Path
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Generator, Optional
 from config import settings
+from database.models import Tournament, TournamentDivision
+
+
+# Подключение текущей транзакции (см. transaction())
+_transaction_conn: ContextVar[Optional[sqlite3.Connection]] = ContextVar(
+    '_transaction_conn', default=None
+)
+
+# Транзакция хранилища бронирований, если оно не в этой БД
+# (см. database.storage.set_backend) — входит в каждую transaction()
+backend_transaction: Optional[Callable[[bool], AbstractContextManager]] = None
+
+# Столы, создаваемые в пустой БД
+DEFAULT_TABLE_NAMES = ("Леопардовый пул", "Русский (Зеленый)", "Леопард Квартира")
+
+# Турнир 05.07, который раньше был задан в коде, — тоже создаётся в пустой БД
+LEGACY_TOURNAMENT = Tournament(
+    id=None,
+    title="Турнир 05.07",
+    starts_at=datetime(2026, 7, 5, 15, 0),
+    event_key="2026-07-05-15-00",
+    divisions=[
+        TournamentDivision(None, 0, 'russian', 'Турнир по русскому 8чел', 8),
+        TournamentDivision(None, 0, 'pool', 'Турнир по пулу 16 чел', 16),
+    ]
+)
+
+# Символы, которые убираются из телефона в поисковом индексе (остаются цифры)
+SEARCH_PHONE_STRIP = " -()+."
+
+
+def _search_phone_sql(column: str) -> str:
+    """SQL-выражение: телефон из column без SEARCH_PHONE_STRIP"""
+    expression = column
+    for char in SEARCH_PHONE_STRIP:
+        expression = f"replace({expression}, '{char}', '')"
+    return expression
 
 
 def get_connection() -> sqlite3.Connection:
@@ -15,9 +55,30 @@ def get_connection() -> sqlite3.Connection:
     return conn
 
 
+def get_read_connection() -> sqlite3.Connection:
+    """
+    Подключение только для чтения (mode=ro, query_only) — для отчётов.
+
+    БД работает в режиме WAL (см. init_db()), поэтому такие выборки читают
+    согласованный снимок и не блокируют запись броней, даже если долгие.
+    """
+    uri = f"{Path(settings.DB_PATH).resolve().as_uri()}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
 @contextmanager
 def get_db() -> Generator[sqlite3.Connection, None, None]:
     """Контекстный менеджер для работы с БД"""
+    # Внутри transaction() все репозитории работают через одно подключение,
+    # фиксация происходит при выходе из transaction()
+    current = _transaction_conn.get()
+    if current is not None:
+        yield current
+        return
+    
     conn = get_connection()
     try:
         yield conn
@@ -29,6 +90,82 @@ def get_db() -> Generator[sqlite3.Connection, None, None]:
         conn.close()
 
 
+@contextmanager
+def get_read_db() -> Generator[sqlite3.Connection, None, None]:
+    """Контекстный менеджер для отчётных выборок (см. get_read_connection())"""
+    # Внутри transaction() читаем через её подключение, чтобы видеть
+    # собственные ещё не зафиксированные изменения
+    current = _transaction_conn.get()
+    if current is not None:
+        yield current
+        return
+    
+    conn = get_read_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def read_snapshot() -> Generator[None, None, None]:
+    """
+    Несколько выборок из одного согласованного снимка БД без блокировки записи.
+
+    Внутри все репозитории читают через одно подключение только для чтения
+    с открытой транзакцией (WAL): изменения других подключений, сделанные
+    после первой выборки, не видны, а запись броней не ждёт. Внутри
+    transaction() — просто её часть.
+    """
+    if _transaction_conn.get() is not None:
+        yield
+        return
+    
+    conn = get_read_connection()
+    conn.execute("BEGIN")
+    token = _transaction_conn.set(conn)
+    try:
+        yield
+    finally:
+        _transaction_conn.reset(token)
+        conn.rollback()
+        conn.close()
+
+
+@contextmanager
+def transaction(immediate: bool = False) -> Generator[sqlite3.Connection, None, None]:
+    """
+    Объединение нескольких вызовов репозиториев в одну транзакцию.
+
+    immediate=True начинает транзакцию с BEGIN IMMEDIATE — блокировка записи
+    берётся сразу, поэтому проверка свободного слота и его занятие не могут
+    перемешаться с такой же транзакцией в другом процессе бота. Внутри
+    такой транзакции нельзя делать await.
+
+    Пример:
+        with transaction(immediate=True):
+            if BookingRepository.check_availability(...):
+                booking_id = BookingRepository.create_booking(booking)
+                OutboxRepository.enqueue(settings.ADMIN_IDS, text)
+    """
+    if _transaction_conn.get() is not None:
+        # Вложенная транзакция — просто часть внешней
+        with get_db() as conn:
+            yield conn
+        return
+    
+    with get_db() as conn:
+        if immediate:
+            conn.execute("BEGIN IMMEDIATE")
+        token = _transaction_conn.set(conn)
+        try:
+            backend = backend_transaction(immediate) if backend_transaction else nullcontext()
+            with backend:
+                yield conn
+        finally:
+            _transaction_conn.reset(token)
+
+
 def init_db():
     """Инициализация базы данных"""
     # Создание директории для БД, если не существует
@@ -39,10 +176,33 @@ def init_db():
     with get_db() as conn:
         cursor = conn.cursor()
         
+        # WAL: отчёты читают через отдельное подключение только для чтения
+        # и не мешают записи броней (режим сохраняется в файле БД)
+        cursor.execute("PRAGMA journal_mode = WAL")
+        
+        # Заведения: у каждого свои столы, расписание (HH:MM) и администраторы
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS venues (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                weekday_open TEXT NOT NULL,
+                weekday_close TEXT NOT NULL,
+                friday_open TEXT NOT NULL,
+                friday_close TEXT NOT NULL,
+                weekend_open TEXT NOT NULL,
+                weekend_close TEXT NOT NULL,
+                sunday_open TEXT NOT NULL,
+                sunday_close TEXT NOT NULL,
+                admin_ids TEXT NOT NULL DEFAULT '',
+                is_active INTEGER DEFAULT 1
+            )
+        """)
+        
         # Таблица столов
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS tables (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                venue_id INTEGER NOT NULL DEFAULT 1,
                 name TEXT NOT NULL,
                 is_active INTEGER DEFAULT 1
             )
@@ -60,15 +220,11 @@ def init_db():
                 phone TEXT NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 status TEXT DEFAULT 'active',
+                venue_id INTEGER NOT NULL DEFAULT 1,
+                series_id INTEGER REFERENCES booking_series (id),
                 FOREIGN KEY (table_id) REFERENCES tables (id)
             )
         """)
-        
-        # Индексы для быстрого поиска
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_bookings_time 
-            ON bookings(start_time, end_time, status)
-        """)
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_bookings_user 
             ON bookings(user_id, status)
@@ -83,7 +239,8 @@ def init_db():
                 start_time TIMESTAMP NOT NULL,
                 end_time TIMESTAMP NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP NOT NULL
+                expires_at TIMESTAMP NOT NULL,
+                venue_id INTEGER NOT NULL DEFAULT 1
             )
         """)
         
@@ -92,6 +249,94 @@ def init_db():
             ON holds(expires_at)
         """)
         
+        # Привязка к заведению данных, созданных до появления заведений
+        for table_name in ('tables', 'bookings', 'holds'):
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            if 'venue_id' not in [row['name'] for row in cursor.fetchall()]:
+                cursor.execute(f"""
+                    ALTER TABLE {table_name}
+                    ADD COLUMN venue_id INTEGER NOT NULL DEFAULT 1
+                """)
+        
+        # Все запросы к столам, броням и holds идут в пределах заведения,
+        # поэтому индексы начинаются с venue_id
+        cursor.execute("DROP INDEX IF EXISTS idx_bookings_time")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_bookings_venue_time 
+            ON bookings(venue_id, start_time, end_time, status)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_bookings_venue_table_time 
+            ON bookings(venue_id, table_id, start_time)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_holds_venue_table_time 
+            ON holds(venue_id, table_id, start_time)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tables_venue 
+            ON tables(venue_id, is_active)
+        """)
+        
+        # Регулярные брони: занятия — обычные брони с series_id, создаются
+        # фоновой задачей, next_start — начало следующего ещё не созданного
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS booking_series (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                username TEXT,
+                venue_id INTEGER NOT NULL,
+                table_id INTEGER NOT NULL REFERENCES tables (id),
+                start_time TIMESTAMP NOT NULL,
+                end_time TIMESTAMP NOT NULL,
+                interval_weeks INTEGER NOT NULL DEFAULT 1,
+                next_start TIMESTAMP NOT NULL,
+                phone TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                status TEXT DEFAULT 'active'
+            )
+        """)
+        cursor.execute("PRAGMA table_info(bookings)")
+        if 'series_id' not in [row['name'] for row in cursor.fetchall()]:
+            cursor.execute("""
+                ALTER TABLE bookings
+                ADD COLUMN series_id INTEGER REFERENCES booking_series (id)
+            """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_booking_series_due 
+            ON booking_series(status, next_start)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_booking_series_user 
+            ON booking_series(user_id, status)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_bookings_series 
+            ON bookings(series_id, start_time) WHERE series_id IS NOT NULL
+        """)
+        
+        # Турниры и их дисциплины (у каждой свой лимит мест)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tournaments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                starts_at TIMESTAMP NOT NULL,
+                event_key TEXT NOT NULL,
+                blocks_bookings INTEGER DEFAULT 1,
+                is_active INTEGER DEFAULT 1
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tournament_divisions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tournament_id INTEGER NOT NULL REFERENCES tournaments(id),
+                code TEXT NOT NULL,
+                name TEXT NOT NULL,
+                max_participants INTEGER NOT NULL,
+                UNIQUE (tournament_id, code)
+            )
+        """)
+        
         # Таблица регистраций на турнир
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS tournament_registrations (
@@ -103,7 +348,8 @@ def init_db():
                 tournament_type TEXT DEFAULT 'legacy',
                 tournament_event TEXT DEFAULT 'legacy',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'active'
+                status TEXT DEFAULT 'active',
+                tournament_id INTEGER REFERENCES tournaments(id)
             )
         """)
 
@@ -119,6 +365,37 @@ def init_db():
                 ALTER TABLE tournament_registrations
                 ADD COLUMN tournament_event TEXT DEFAULT 'legacy'
             """)
+        if 'tournament_id' not in tournament_columns:
+            cursor.execute("""
+                ALTER TABLE tournament_registrations
+                ADD COLUMN tournament_id INTEGER REFERENCES tournaments(id)
+            """)
+        
+        # Турнир, который раньше был задан в коде
+        cursor.execute("SELECT COUNT(*) as count FROM tournaments")
+        if cursor.fetchone()['count'] == 0:
+            cursor.execute("""
+                INSERT INTO tournaments (title, starts_at, event_key)
+                VALUES (?, ?, ?)
+            """, (LEGACY_TOURNAMENT.title, LEGACY_TOURNAMENT.starts_at, LEGACY_TOURNAMENT.event_key))
+            tournament_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO tournament_divisions (tournament_id, code, name, max_participants)
+                VALUES (?, ?, ?, ?)
+            """, [
+                (tournament_id, division.code, division.name, division.max_participants)
+                for division in LEGACY_TOURNAMENT.divisions
+            ])
+        
+        # Привязка старых регистраций к турнирам по tournament_event
+        cursor.execute("""
+            UPDATE tournament_registrations
+            SET tournament_id = (
+                SELECT id FROM tournaments
+                WHERE tournaments.event_key = tournament_registrations.tournament_event
+            )
+            WHERE tournament_id IS NULL
+        """)
         
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_tournament_status 
@@ -128,26 +405,218 @@ def init_db():
             CREATE INDEX IF NOT EXISTS idx_tournament_type_status 
             ON tournament_registrations(tournament_type, status)
         """)
+        cursor.execute("DROP INDEX IF EXISTS idx_tournament_event_type_status")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tournament_id_type_status 
+            ON tournament_registrations(tournament_id, tournament_type, status)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tournament_user 
+            ON tournament_registrations(user_id, tournament_id)
+        """)
+
+        # Лист ожидания: позиция уникальна в дисциплине (индекс даёт MAX за
+        # O(log n)), первый ожидающий и место в очереди — по частичному
+        # индексу только ожидающих записей
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tournament_waitlist (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tournament_id INTEGER NOT NULL REFERENCES tournaments(id),
+                tournament_type TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                username TEXT,
+                full_name TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL,
+                status TEXT DEFAULT 'waiting',
+                registration_id INTEGER REFERENCES tournament_registrations(id),
+                UNIQUE (tournament_id, tournament_type, position)
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_waitlist_waiting
+            ON tournament_waitlist(tournament_id, tournament_type, position)
+            WHERE status = 'waiting'
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_waitlist_user
+            ON tournament_waitlist(user_id, tournament_id)
+        """)
+
+        # Турнирная сетка: матч на позиции (круг, номер) в дисциплине, со
+        # столом, временем и блокировкой стола под него
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tournament_matches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tournament_id INTEGER NOT NULL REFERENCES tournaments(id),
+                tournament_type TEXT NOT NULL,
+                round INTEGER NOT NULL,
+                number INTEGER NOT NULL,
+                player1_id INTEGER REFERENCES tournament_registrations(id),
+                player2_id INTEGER REFERENCES tournament_registrations(id),
+                status TEXT NOT NULL,
+                table_id INTEGER REFERENCES tables(id),
+                start_time TIMESTAMP,
+                end_time TIMESTAMP,
+                booking_id INTEGER REFERENCES bookings(id),
+                UNIQUE (tournament_id, tournament_type, round, number)
+            )
+        """)
+
+        # Занятость столов по рабочим дням и часам — обновляется вместе с
+        # бронями (см. OccupancyRepository), отчёты читают только её
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_occupancy (
+                work_day DATE NOT NULL,
+                venue_id INTEGER NOT NULL,
+                table_id INTEGER NOT NULL,
+                hour INTEGER NOT NULL,
+                booked_minutes INTEGER NOT NULL DEFAULT 0,
+                blocked_minutes INTEGER NOT NULL DEFAULT 0,
+                bookings INTEGER NOT NULL DEFAULT 0,
+                cancellations INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (work_day, venue_id, table_id, hour)
+            ) WITHOUT ROWID
+        """)
+
+        # Поиск для /find: FTS5 с триграммами (подстроки телефона, username
+        # и имени), rowid совпадает с ID брони или регистрации. Индексы
+        # обновляются триггерами, при первом создании заполняются из таблиц
+        search_indexes = {
+            'bookings_search': ('bookings', ('username',)),
+            'registrations_search': ('tournament_registrations', ('username', 'full_name')),
+        }
+        for index_name, (table_name, text_columns) in search_indexes.items():
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (index_name,)
+            )
+            is_new = cursor.fetchone() is None
+            columns = ", ".join(('phone',) + text_columns)
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {index_name}
+                USING fts5({columns}, tokenize = 'trigram')
+            """)
+
+            def values(row: str) -> str:
+                return ", ".join(
+                    [_search_phone_sql(f"{row}.phone")]
+                    + [f"coalesce({row}.{column}, '')" for column in text_columns]
+                )
+
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {index_name}_insert AFTER INSERT ON {table_name}
+                BEGIN
+                    INSERT INTO {index_name} (rowid, {columns}) VALUES (new.id, {values('new')});
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {index_name}_update
+                AFTER UPDATE OF {columns} ON {table_name}
+                BEGIN
+                    DELETE FROM {index_name} WHERE rowid = old.id;
+                    INSERT INTO {index_name} (rowid, {columns}) VALUES (new.id, {values('new')});
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {index_name}_delete AFTER DELETE ON {table_name}
+                BEGIN
+                    DELETE FROM {index_name} WHERE rowid = old.id;
+                END
+            """)
+            if is_new:
+                cursor.execute(f"""
+                    INSERT INTO {index_name} (rowid, {columns})
+                    SELECT id, {values(table_name)} FROM {table_name}
+                """)
+
+        # Очередь исходящих уведомлений (outbox)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient_id INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                status TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at TIMESTAMP NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                sent_at TIMESTAMP,
+                last_error TEXT,
+                digest INTEGER DEFAULT 0
+            )
+        """)
+        
+        cursor.execute("PRAGMA table_info(outbox)")
+        outbox_columns = [row['name'] for row in cursor.fetchall()]
+        if 'digest' not in outbox_columns:
+            cursor.execute("""
+                ALTER TABLE outbox
+                ADD COLUMN digest INTEGER DEFAULT 0
+            """)
+        
+        cursor.execute("DROP INDEX IF EXISTS idx_outbox_pending")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_outbox_pending_lane 
+            ON outbox(status, recipient_id, digest, id)
+        """)
+        
+        # Состояния FSM (мастера бронирования, турнира и т.д.)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fsm_sessions (
+                key TEXT PRIMARY KEY,
+                user_id INTEGER,
+                state TEXT,
+                data TEXT NOT NULL DEFAULT '{}',
+                updated_at TIMESTAMP NOT NULL
+            )
+        """)
+        
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_tournament_event_type_status 
-            ON tournament_registrations(tournament_event, tournament_type, status)
+            CREATE INDEX IF NOT EXISTS idx_fsm_sessions_updated 
+            ON fsm_sessions(updated_at)
         """)
         
+        # Версия Reply-клавиатуры, которую видел пользователь
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS keyboard_epochs (
+                user_id INTEGER PRIMARY KEY,
+                epoch INTEGER NOT NULL
+            )
+        """)
+        
+        # Версии кэшей для инвалидации между процессами (см. cache_bus)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cache_versions (
+                topic TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        
+        # Заведение по умолчанию — с расписанием из настроек
+        cursor.execute("SELECT COUNT(*) as count FROM venues")
+        if cursor.fetchone()['count'] == 0:
+            hours = [
+                value.strftime("%H:%M") for value in (
+                    settings.WEEKDAY_OPEN, settings.WEEKDAY_CLOSE,
+                    settings.FRIDAY_OPEN, settings.FRIDAY_CLOSE,
+                    settings.WEEKEND_OPEN, settings.WEEKEND_CLOSE,
+                    settings.SUNDAY_OPEN, settings.SUNDAY_CLOSE,
+                )
+            ]
+            cursor.execute("""
+                INSERT INTO venues (
+                    id, name, weekday_open, weekday_close, friday_open, friday_close,
+                    weekend_open, weekend_close, sunday_open, sunday_close
+                ) VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (settings.DEFAULT_VENUE_NAME, *hours))
+        
         # Проверка наличия столов
         cursor.execute("SELECT COUNT(*) as count FROM tables")
         if cursor.fetchone()['count'] == 0:
-            # Добавление столов по умолчанию
-            cursor.execute(
-                "INSERT INTO tables (name) VALUES (?)",
-                ("Леопардовый пул",)
-            )
-            cursor.execute(
-                "INSERT INTO tables (name) VALUES (?)",
-                ("Русский (Зеленый)",)
-            )
-            cursor.execute(
-                "INSERT INTO tables (name) VALUES (?)",
-                ("Леопард Квартира",)
+            # Добавление столов по умолчанию (в заведение по умолчанию)
+            cursor.executemany(
+                "INSERT INTO tables (venue_id, name) VALUES (1, ?)",
+                [(name,) for name in DEFAULT_TABLE_NAMES]
             )
         
         conn.commit()
@@ -0,0 +1,219 @@
+"""
+Хранилище состояний FSM в SQLite с write-back кэшем
+"""
+import asyncio
+import json
+import logging
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from database.database import transaction
+from database.repository import FSMRepository, HoldRepository
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(value: Any) -> Any:
+    """Сериализация значений, которых нет в JSON (даты в данных мастеров)"""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    raise TypeError(f"Значение типа {type(value).__name__} нельзя сохранить в FSM")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    if '__date__' in obj:
+        return date.fromisoformat(obj['__date__'])
+    return obj
+
+
+def dump_data(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=_encode, ensure_ascii=False)
+
+
+def load_data(raw: str) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_decode)
+
+
+@dataclass
+class _Session:
+    """Закэшированная сессия FSM"""
+    user_id: Optional[int]
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    dirty: bool = False
+    touched_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def is_empty(self) -> bool:
+        return self.state is None and not self.data
+
+    def size(self) -> int:
+        """Примерный объём занимаемой памяти, байт"""
+        return (
+            sys.getsizeof(self) + sys.getsizeof(self.state) + sys.getsizeof(self.data)
+            + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in self.data.items())
+        )
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-хранилище в таблице fsm_sessions.
+
+    Все чтения идут из кэша в памяти (в БД — только при первом обращении к
+    сессии), изменения помечают сессию «грязной» и сбрасываются в БД пачкой
+    через flush_interval секунд после первого изменения. Поэтому шаги
+    мастера бронирования с несколькими update_data/set_state подряд
+    превращаются в одну-две записи. Пустые сессии (после state.clear())
+    удаляются из таблицы.
+
+    При остановке бота нужно вызвать close() — он сбрасывает несохранённые
+    изменения. При аварийном завершении теряются только изменения за
+    последние flush_interval секунд.
+
+    Брошенные сессии удаляет evict_idle() (периодическая задача планировщика).
+    """
+
+    def __init__(self, flush_interval: float = 2.0, key_builder: Optional[KeyBuilder] = None,
+                 shard: Optional[Tuple[int, int]] = None):
+        self.flush_interval = flush_interval
+        # (номер, всего) — при нескольких процессах-воркерах чистим в таблице
+        # только сессии своих пользователей, чужие могут быть в кэше соседа
+        self.shard = shard
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self._sessions: Dict[str, _Session] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _session(self, key: StorageKey) -> _Session:
+        """Сессия из кэша (при промахе — загрузка из БД)"""
+        db_key = self.key_builder.build(key)
+        session = self._sessions.get(db_key)
+        if session is None:
+            session = _Session(user_id=key.user_id)
+            stored = FSMRepository.get_session(db_key)
+            if stored is not None:
+                session.state, raw_data = stored
+                session.data = load_data(raw_data)
+            self._sessions[db_key] = session
+        session.touched_at = time.monotonic()
+        return session
+
+    def _mark_dirty(self, session: _Session):
+        session.dirty = True
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        try:
+            await asyncio.sleep(self.flush_interval)
+        finally:
+            self._flush_task = None
+        self.flush()
+
+    def flush(self) -> int:
+        """Запись всех изменённых сессий в БД; возвращает их количество"""
+        dirty = {key: session for key, session in self._sessions.items() if session.dirty}
+        if not dirty:
+            return 0
+
+        now = datetime.now()
+        rows, deleted_keys = [], []
+        for key, session in dirty.items():
+            if session.is_empty:
+                deleted_keys.append(key)
+            else:
+                rows.append((key, session.user_id, session.state, dump_data(session.data), now))
+
+        try:
+            FSMRepository.save_sessions(rows, deleted_keys)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения состояний FSM: {e}", exc_info=True)
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._delayed_flush())
+            return 0
+
+        for session in dirty.values():
+            session.dirty = False
+        return len(dirty)
+
+    def _owns(self, user_id: Optional[int]) -> bool:
+        if self.shard is None:
+            return True
+        index, count = self.shard
+        return (user_id or 0) % count == index
+
+    def evict_idle(self, ttl_seconds: float) -> Tuple[int, int]:
+        """
+        Удаление сессий, к которым не обращались дольше ttl_seconds, вместе
+        с holds их пользователей — и из кэша, и из таблицы (там могут лежать
+        сессии, брошенные до перезапуска).
+
+        Возвращает (число удалённых сессий с состоянием или данными,
+        примерный объём освобождённой памяти кэша в байтах).
+        """
+        self.flush()
+
+        now = time.monotonic()
+        idle_keys = [
+            key for key, session in self._sessions.items()
+            if now - session.touched_at > ttl_seconds and not session.dirty
+        ]
+
+        removed_keys, user_ids, freed = set(), set(), 0
+        for key in idle_keys:
+            session = self._sessions.pop(key)
+            freed += sys.getsizeof(key) + session.size()
+            if not session.is_empty:
+                removed_keys.add(key)
+                if session.user_id is not None:
+                    user_ids.add(session.user_id)
+
+        # В таблице — сессии, давно не менявшиеся и не используемые сейчас
+        older_than = datetime.now() - timedelta(seconds=ttl_seconds)
+        for key, user_id in FSMRepository.get_idle_sessions(older_than):
+            if key in self._sessions or not self._owns(user_id):
+                continue
+            removed_keys.add(key)
+            if user_id is not None:
+                user_ids.add(user_id)
+
+        if removed_keys:
+            with transaction():
+                FSMRepository.delete_sessions(list(removed_keys))
+                HoldRepository.delete_users_holds(user_ids)
+
+        return len(removed_keys), freed
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        session = self._session(key)
+        new_state = state.state if isinstance(state, State) else state
+        if session.state != new_state:
+            session.state = new_state
+            self._mark_dirty(session)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return self._session(key).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        session = self._session(key)
+        if session.data != data:
+            session.data = data.copy()
+            self._mark_dirty(session)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return self._session(key).data.copy()
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.flush()
@@ -0,0 +1,747 @@
+"""
+Хранилище бронирований в памяти — для нагрузочных тестов и замеров без диска
+"""
+import sqlite3
+from bisect import bisect_left, insort
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from config import settings
+from database.database import DEFAULT_TABLE_NAMES, LEGACY_TOURNAMENT, SEARCH_PHONE_STRIP
+from database.models import (
+    DEFAULT_VENUE_ID, Venue, Table, Booking, Hold, Tournament, TournamentDivision,
+    TournamentRegistration, WaitlistEntry, DivisionOverview, Occupancy, OccupancySummary,
+    SearchQuery, TournamentMatch, BlockConflict, BookingSeries
+)
+
+# Элемент индекса по времени: (start_time, id) — список отсортирован
+_TimeIndex = List[Tuple[datetime, int]]
+
+
+def _remove(index: _TimeIndex, start_time: datetime, item_id: int):
+    """Удаление элемента из отсортированного индекса"""
+    position = bisect_left(index, (start_time, item_id))
+    if position < len(index) and index[position] == (start_time, item_id):
+        del index[position]
+
+
+def _overlapping(index: _TimeIndex, start_time: datetime, end_time: datetime,
+                 max_span: timedelta) -> Iterator[int]:
+    """
+    ID элементов индекса, которые могут пересекаться с [start_time, end_time):
+    начало раньше end_time и не раньше start_time - max_span (самый длинный
+    интервал в индексе), остальное проверяет вызывающий
+    """
+    lo = bisect_left(index, (start_time - max_span,))
+    hi = bisect_left(index, (end_time,))
+    for position in range(lo, hi):
+        yield index[position][1]
+
+
+class MemoryBackend:
+    """
+    Хранилище в словарях и отсортированных списках (см. StorageBackend).
+
+    Брони и holds проиндексированы по заведению и по (заведение, стол)
+    списками (start_time, id): поиск пересечений — бинарный поиск по началу
+    интервала, ограниченный самым длинным интервалом в хранилище. Транзакции
+    ведут журнал отмены и откатывают изменения при исключении.
+
+    Данные живут в одном процессе и не переживают перезапуск; обращения
+    должны идти из одного потока (цикла событий бота).
+    """
+
+    def __init__(self, seed: bool = True):
+        self._next_ids: Dict[str, int] = defaultdict(lambda: 1)
+        self._undo: Optional[List[Callable[[], None]]] = None
+
+        self._venues: Dict[int, Venue] = {}
+        self._tables: Dict[int, Dict[int, Table]] = defaultdict(dict)
+
+        self._bookings: Dict[int, Booking] = {}
+        self._bookings_by_start: _TimeIndex = []
+        self._bookings_by_venue: Dict[int, _TimeIndex] = defaultdict(list)
+        self._bookings_by_table: Dict[Tuple[int, int], _TimeIndex] = defaultdict(list)
+        self._bookings_by_user: Dict[int, Set[int]] = defaultdict(set)
+        self._max_booking_span = timedelta(0)
+
+        # Регулярные брони и ID их занятий
+        self._series: Dict[int, BookingSeries] = {}
+        self._bookings_by_series: Dict[int, Set[int]] = defaultdict(set)
+
+        self._holds: Dict[int, Hold] = {}
+        self._holds_by_venue: Dict[int, _TimeIndex] = defaultdict(list)
+        self._holds_by_table: Dict[Tuple[int, int], _TimeIndex] = defaultdict(list)
+        self._holds_by_user: Dict[int, Set[int]] = defaultdict(set)
+        self._max_hold_span = timedelta(0)
+
+        self._tournaments: Dict[int, Tournament] = {}
+        self._divisions: Dict[int, Dict[int, TournamentDivision]] = defaultdict(dict)
+
+        self._registrations: Dict[int, TournamentRegistration] = {}
+        self._registrations_by_tournament: Dict[Optional[int], List[int]] = defaultdict(list)
+        self._registrations_by_user: Dict[int, List[int]] = defaultdict(list)
+        self._active_registrations: Dict[Tuple[Optional[int], str], int] = defaultdict(int)
+
+        # Лист ожидания: по дисциплине — отсортированный список (position, id)
+        # ожидающих записей, занятые позиции и последняя выданная позиция
+        self._waitlist: Dict[int, WaitlistEntry] = {}
+        self._waiting: Dict[Tuple[int, str], List[Tuple[int, int]]] = defaultdict(list)
+        self._waitlist_positions: Dict[Tuple[int, str], Set[int]] = defaultdict(set)
+        self._last_positions: Dict[Tuple[int, str], int] = defaultdict(int)
+        self._waitlist_by_user: Dict[int, List[int]] = defaultdict(list)
+
+        # Турнирная сетка: матч по (турнир, дисциплина, круг, номер)
+        self._matches: Dict[Tuple[int, str, int, int], TournamentMatch] = {}
+
+        # Агрегат занятости по (рабочий день, заведение, стол, час)
+        self._occupancy: Dict[Tuple[date, int, int, int], Occupancy] = {}
+
+        if seed:
+            # То же, что init_db() создаёт в пустой БД
+            self.create_venue(Venue(
+                id=DEFAULT_VENUE_ID,
+                name=settings.DEFAULT_VENUE_NAME,
+                weekday_open=settings.WEEKDAY_OPEN, weekday_close=settings.WEEKDAY_CLOSE,
+                friday_open=settings.FRIDAY_OPEN, friday_close=settings.FRIDAY_CLOSE,
+                weekend_open=settings.WEEKEND_OPEN, weekend_close=settings.WEEKEND_CLOSE,
+                sunday_open=settings.SUNDAY_OPEN, sunday_close=settings.SUNDAY_CLOSE,
+            ))
+            self.create_tables(DEFAULT_VENUE_ID, list(DEFAULT_TABLE_NAMES))
+            self.create_tournament(LEGACY_TOURNAMENT)
+
+    # === Транзакции ===
+
+    @contextmanager
+    def transaction(self, immediate: bool = False) -> Iterator[None]:
+        if self._undo is not None:
+            # Вложенная транзакция — просто часть внешней
+            yield
+            return
+
+        self._undo = []
+        try:
+            yield
+        except BaseException:
+            for undo in reversed(self._undo):
+                undo()
+            raise
+        finally:
+            self._undo = None
+
+    def _on_rollback(self, undo: Callable[[], None]):
+        if self._undo is not None:
+            self._undo.append(undo)
+
+    def _new_id(self, kind: str) -> int:
+        # Как и sqlite_sequence, счётчик откатывается вместе с транзакцией
+        new_id = self._next_ids[kind]
+        self._next_ids[kind] = new_id + 1
+        self._on_rollback(lambda: self._next_ids.__setitem__(kind, new_id))
+        return new_id
+
+    # === Заведения и столы ===
+
+    def get_venues(self) -> List[Venue]:
+        return [replace(venue, admin_ids=list(venue.admin_ids))
+                for _, venue in sorted(self._venues.items())]
+
+    def create_venue(self, venue: Venue) -> int:
+        venue_id = self._new_id('venues')
+        self._venues[venue_id] = replace(venue, id=venue_id, admin_ids=list(venue.admin_ids))
+        self._on_rollback(lambda: self._venues.pop(venue_id))
+        return venue_id
+
+    def get_tables(self, venue_id: int) -> List[Table]:
+        return [replace(table) for _, table in sorted(self._tables[venue_id].items())]
+
+    def create_tables(self, venue_id: int, names: List[str]) -> int:
+        for name in names:
+            table_id = self._new_id('tables')
+            self._tables[venue_id][table_id] = Table(id=table_id, name=name, venue_id=venue_id)
+            self._on_rollback(lambda table_id=table_id: self._tables[venue_id].pop(table_id))
+        return len(names)
+
+    # === Бронирования ===
+
+    def _index_booking(self, booking: Booking):
+        key = (booking.start_time, booking.id)
+        insort(self._bookings_by_start, key)
+        insort(self._bookings_by_venue[booking.venue_id], key)
+        insort(self._bookings_by_table[(booking.venue_id, booking.table_id)], key)
+        self._bookings_by_user[booking.user_id].add(booking.id)
+        if booking.series_id is not None:
+            self._bookings_by_series[booking.series_id].add(booking.id)
+        self._max_booking_span = max(self._max_booking_span, booking.end_time - booking.start_time)
+
+    def _unindex_booking(self, booking: Booking):
+        _remove(self._bookings_by_start, booking.start_time, booking.id)
+        _remove(self._bookings_by_venue[booking.venue_id], booking.start_time, booking.id)
+        _remove(self._bookings_by_table[(booking.venue_id, booking.table_id)],
+                booking.start_time, booking.id)
+        self._bookings_by_user[booking.user_id].discard(booking.id)
+        if booking.series_id is not None:
+            self._bookings_by_series[booking.series_id].discard(booking.id)
+
+    def create_booking(self, booking: Booking) -> int:
+        booking = replace(booking, id=self._new_id('bookings'))
+        self._bookings[booking.id] = booking
+        self._index_booking(booking)
+
+        def undo():
+            self._unindex_booking(booking)
+            del self._bookings[booking.id]
+        self._on_rollback(undo)
+        return booking.id
+
+    def create_bookings(self, bookings: List[Booking]) -> List[int]:
+        return [self.create_booking(booking) for booking in bookings]
+
+    def get_booking(self, booking_id: int) -> Optional[Booking]:
+        booking = self._bookings.get(booking_id)
+        return replace(booking) if booking else None
+
+    def get_bookings_by_ids(self, booking_ids: List[int]) -> List[Booking]:
+        return [
+            replace(self._bookings[booking_id]) for booking_id in sorted(set(booking_ids))
+            if booking_id in self._bookings
+        ]
+
+    def get_user_bookings(self, user_id: int, ends_after: datetime) -> List[Booking]:
+        bookings = [
+            self._bookings[booking_id] for booking_id in self._bookings_by_user.get(user_id, ())
+        ]
+        return [
+            replace(booking) for booking in sorted(bookings, key=lambda b: (b.start_time, b.id))
+            if booking.status == 'active' and booking.end_time > ends_after
+        ]
+
+    def get_bookings(self, venue_ids: Optional[List[int]], start_from: datetime,
+                     start_to: datetime, active_only: bool) -> List[Booking]:
+        indexes = (
+            [self._bookings_by_start] if venue_ids is None
+            else [self._bookings_by_venue[venue_id] for venue_id in set(venue_ids)]
+        )
+        result = []
+        for index in indexes:
+            lo = bisect_left(index, (start_from,))
+            hi = bisect_left(index, (start_to,))
+            for position in range(lo, hi):
+                booking = self._bookings[index[position][1]]
+                if not active_only or booking.status == 'active':
+                    result.append(replace(booking))
+
+        # ORDER BY start_time, status DESC, id (сортировки устойчивые)
+        result.sort(key=lambda b: b.id)
+        result.sort(key=lambda b: b.status, reverse=True)
+        result.sort(key=lambda b: b.start_time)
+        return result
+
+    def cancel_booking(self, booking_id: int) -> bool:
+        booking = self._bookings.get(booking_id)
+        if booking is None or booking.status != 'active':
+            return False
+        booking.status = 'cancelled'
+        self._on_rollback(lambda: setattr(booking, 'status', 'active'))
+        return True
+
+    def cancel_bookings(self, booking_ids: Iterable[int]) -> int:
+        return sum(self.cancel_booking(booking_id) for booking_id in booking_ids)
+
+    def update_booking_end(self, booking_id: int, end_time: datetime) -> bool:
+        booking = self._bookings.get(booking_id)
+        if booking is None or booking.status != 'active':
+            return False
+        old_end_time = booking.end_time
+        booking.end_time = end_time
+        self._max_booking_span = max(self._max_booking_span, end_time - booking.start_time)
+        self._on_rollback(lambda: setattr(booking, 'end_time', old_end_time))
+        return True
+
+    def has_booking_conflict(self, venue_id: int, table_id: Optional[int],
+                             start_time: datetime, end_time: datetime) -> bool:
+        index = (
+            self._bookings_by_venue.get(venue_id, []) if table_id is None
+            else self._bookings_by_table.get((venue_id, table_id), [])
+        )
+        for booking_id in _overlapping(index, start_time, end_time, self._max_booking_span):
+            booking = self._bookings[booking_id]
+            if booking.status == 'active' and booking.end_time > start_time:
+                return True
+        return False
+
+    def find_block_conflicts(self, venue_id: int, slots: List[Tuple[int, datetime, datetime]],
+                             now: datetime) -> List[BlockConflict]:
+        conflicts = []
+        for table_id, start_time, end_time in slots:
+            index = self._bookings_by_table.get((venue_id, table_id), [])
+            booking_ids = [
+                booking_id
+                for booking_id in _overlapping(index, start_time, end_time, self._max_booking_span)
+                if self._bookings[booking_id].status == 'active'
+                and self._bookings[booking_id].end_time > start_time
+            ]
+            if booking_ids:
+                conflicts.append(BlockConflict(table_id, start_time, end_time, booking_id=min(booking_ids)))
+            elif self.has_hold_conflict(venue_id, table_id, start_time, end_time, now, None):
+                conflicts.append(BlockConflict(table_id, start_time, end_time))
+        return conflicts
+
+    # === Регулярные брони ===
+
+    def create_series(self, series: BookingSeries) -> int:
+        series = replace(series, id=self._new_id('booking_series'))
+        self._series[series.id] = series
+        self._on_rollback(lambda: self._series.pop(series.id))
+        return series.id
+
+    def get_series(self, series_id: int) -> Optional[BookingSeries]:
+        series = self._series.get(series_id)
+        return replace(series) if series else None
+
+    def get_user_series(self, user_id: int) -> List[BookingSeries]:
+        return [
+            replace(series) for _, series in sorted(self._series.items())
+            if series.user_id == user_id and series.status == 'active'
+        ]
+
+    def get_due_series(self, before: datetime, after_id: int, limit: int) -> List[BookingSeries]:
+        due = [
+            replace(series) for _, series in sorted(self._series.items())
+            if series.id > after_id and series.status == 'active' and series.next_start < before
+        ]
+        return due[:limit]
+
+    def set_series_next_start(self, updates: List[Tuple[int, datetime]]) -> int:
+        updated = 0
+        for series_id, next_start in updates:
+            series = self._series.get(series_id)
+            if series is None:
+                continue
+            old_next_start = series.next_start
+            series.next_start = next_start
+            self._on_rollback(
+                lambda series=series, value=old_next_start: setattr(series, 'next_start', value)
+            )
+            updated += 1
+        return updated
+
+    def cancel_series(self, series_id: int) -> bool:
+        series = self._series.get(series_id)
+        if series is None or series.status != 'active':
+            return False
+        series.status = 'cancelled'
+        self._on_rollback(lambda: setattr(series, 'status', 'active'))
+        return True
+
+    def get_series_bookings(self, series_id: int, start_from: datetime) -> List[Booking]:
+        bookings = [
+            self._bookings[booking_id] for booking_id in self._bookings_by_series.get(series_id, ())
+        ]
+        return [
+            replace(booking) for booking in sorted(bookings, key=lambda b: (b.start_time, b.id))
+            if booking.status == 'active' and booking.start_time >= start_from
+        ]
+
+    # === Временные удержания ===
+
+    def create_hold(self, hold: Hold) -> int:
+        hold = replace(hold, id=self._new_id('holds'))
+        self._holds[hold.id] = hold
+        self._index_hold(hold)
+
+        def undo():
+            self._unindex_hold(hold)
+            del self._holds[hold.id]
+        self._on_rollback(undo)
+        return hold.id
+
+    def _index_hold(self, hold: Hold):
+        key = (hold.start_time, hold.id)
+        insort(self._holds_by_venue[hold.venue_id], key)
+        insort(self._holds_by_table[(hold.venue_id, hold.table_id)], key)
+        self._holds_by_user[hold.user_id].add(hold.id)
+        self._max_hold_span = max(self._max_hold_span, hold.end_time - hold.start_time)
+
+    def _unindex_hold(self, hold: Hold):
+        _remove(self._holds_by_venue[hold.venue_id], hold.start_time, hold.id)
+        _remove(self._holds_by_table[(hold.venue_id, hold.table_id)], hold.start_time, hold.id)
+        self._holds_by_user[hold.user_id].discard(hold.id)
+
+    def _delete_hold_ids(self, hold_ids: Iterable[int]) -> int:
+        deleted = [self._holds.pop(hold_id) for hold_id in list(hold_ids)]
+        for hold in deleted:
+            self._unindex_hold(hold)
+
+        def undo():
+            for hold in deleted:
+                self._holds[hold.id] = hold
+                self._index_hold(hold)
+        self._on_rollback(undo)
+        return len(deleted)
+
+    def delete_holds(self, user_ids: Iterable[int]) -> int:
+        return self._delete_hold_ids([
+            hold_id for user_id in set(user_ids)
+            for hold_id in self._holds_by_user.get(user_id, ())
+        ])
+
+    def delete_expired_holds(self, now: datetime) -> int:
+        return self._delete_hold_ids([
+            hold.id for hold in self._holds.values() if hold.expires_at < now
+        ])
+
+    def has_hold_conflict(self, venue_id: int, table_id: Optional[int], start_time: datetime,
+                          end_time: datetime, now: datetime,
+                          exclude_user: Optional[int]) -> bool:
+        index = (
+            self._holds_by_venue.get(venue_id, []) if table_id is None
+            else self._holds_by_table.get((venue_id, table_id), [])
+        )
+        for hold_id in _overlapping(index, start_time, end_time, self._max_hold_span):
+            hold = self._holds[hold_id]
+            if (hold.end_time > start_time and hold.expires_at > now
+                    and not (exclude_user and hold.user_id == exclude_user)):
+                return True
+        return False
+
+    # === Турниры ===
+
+    def get_tournaments(self) -> List[Tournament]:
+        tournaments = sorted(self._tournaments.values(), key=lambda t: (t.starts_at, t.id))
+        return [
+            replace(tournament, divisions=[
+                replace(division) for _, division in sorted(self._divisions[tournament.id].items())
+            ])
+            for tournament in tournaments
+        ]
+
+    def create_tournament(self, tournament: Tournament) -> int:
+        tournament_id = self._new_id('tournaments')
+        self._tournaments[tournament_id] = replace(tournament, id=tournament_id, divisions=[])
+        self._on_rollback(lambda: self._tournaments.pop(tournament_id))
+        for division in tournament.divisions:
+            self.create_division(replace(division, tournament_id=tournament_id))
+        return tournament_id
+
+    def create_division(self, division: TournamentDivision) -> int:
+        if any(other.code == division.code
+               for other in self._divisions[division.tournament_id].values()):
+            # Как UNIQUE (tournament_id, code) в SQLite
+            raise sqlite3.IntegrityError(
+                "UNIQUE constraint failed: tournament_divisions.tournament_id, tournament_divisions.code"
+            )
+        division_id = self._new_id('divisions')
+        self._divisions[division.tournament_id][division_id] = replace(division, id=division_id)
+        self._on_rollback(lambda: self._divisions[division.tournament_id].pop(division_id))
+        return division_id
+
+    def set_tournament_active(self, tournament_id: int, is_active: bool) -> bool:
+        tournament = self._tournaments.get(tournament_id)
+        if tournament is None:
+            return False
+        old_is_active = tournament.is_active
+        tournament.is_active = is_active
+        self._on_rollback(lambda: setattr(tournament, 'is_active', old_is_active))
+        return True
+
+    # === Регистрации на турнир ===
+
+    def create_registration(self, registration: TournamentRegistration) -> int:
+        registration = replace(registration, id=self._new_id('registrations'))
+        self._registrations[registration.id] = registration
+        self._registrations_by_tournament[registration.tournament_id].append(registration.id)
+        self._registrations_by_user[registration.user_id].append(registration.id)
+        counter = (registration.tournament_id, registration.tournament_type)
+        if registration.status == 'active':
+            self._active_registrations[counter] += 1
+
+        def undo():
+            del self._registrations[registration.id]
+            self._registrations_by_tournament[registration.tournament_id].remove(registration.id)
+            self._registrations_by_user[registration.user_id].remove(registration.id)
+            if registration.status == 'active':
+                self._active_registrations[counter] -= 1
+        self._on_rollback(undo)
+        return registration.id
+
+    def count_active_registrations(self, tournament_id: int, tournament_type: Optional[str]) -> int:
+        if tournament_type:
+            return self._active_registrations.get((tournament_id, tournament_type), 0)
+        return sum(
+            count for (counter_tournament, _), count in self._active_registrations.items()
+            if counter_tournament == tournament_id
+        )
+
+    def get_registrations(self, tournament_id: int, tournament_type: Optional[str],
+                          active_only: bool) -> List[TournamentRegistration]:
+        registrations = [
+            self._registrations[registration_id]
+            for registration_id in self._registrations_by_tournament.get(tournament_id, ())
+        ]
+        registrations = [
+            registration for registration in registrations
+            if (not active_only or registration.status == 'active')
+            and (not tournament_type or registration.tournament_type == tournament_type)
+        ]
+        if tournament_type:
+            registrations.sort(key=lambda r: (r.created_at, r.id))
+        else:
+            registrations.sort(key=lambda r: (r.tournament_type, r.created_at, r.id))
+        return [replace(registration) for registration in registrations]
+
+    def get_user_registration(self, user_id: int, tournament_id: int,
+                              tournament_type: Optional[str]) -> Optional[TournamentRegistration]:
+        candidates = [
+            self._registrations[registration_id]
+            for registration_id in self._registrations_by_user.get(user_id, ())
+        ]
+        candidates = [
+            registration for registration in candidates
+            if registration.status == 'active' and registration.tournament_id == tournament_id
+            and (not tournament_type or registration.tournament_type == tournament_type)
+        ]
+        if not candidates:
+            return None
+        return replace(min(candidates, key=lambda r: (r.created_at, r.id)))
+
+    def get_registration(self, registration_id: int) -> Optional[TournamentRegistration]:
+        registration = self._registrations.get(registration_id)
+        return replace(registration) if registration else None
+
+    def cancel_registration(self, registration_id: int) -> bool:
+        registration = self._registrations.get(registration_id)
+        if registration is None or registration.status != 'active':
+            return False
+        counter = (registration.tournament_id, registration.tournament_type)
+        registration.status = 'cancelled'
+        self._active_registrations[counter] -= 1
+
+        def undo():
+            registration.status = 'active'
+            self._active_registrations[counter] += 1
+        self._on_rollback(undo)
+        return True
+
+    # === Лист ожидания ===
+
+    def create_waitlist_entry(self, entry: WaitlistEntry) -> int:
+        key = (entry.tournament_id, entry.tournament_type)
+        if entry.position in self._waitlist_positions[key]:
+            raise sqlite3.IntegrityError(
+                "UNIQUE constraint failed: tournament_waitlist.tournament_id, "
+                "tournament_waitlist.tournament_type, tournament_waitlist.position"
+            )
+        entry = replace(entry, id=self._new_id('waitlist'))
+        previous_last = self._last_positions[key]
+        self._waitlist[entry.id] = entry
+        self._waitlist_positions[key].add(entry.position)
+        self._last_positions[key] = max(previous_last, entry.position)
+        self._waitlist_by_user[entry.user_id].append(entry.id)
+        if entry.status == 'waiting':
+            insort(self._waiting[key], (entry.position, entry.id))
+
+        def undo():
+            del self._waitlist[entry.id]
+            self._waitlist_positions[key].discard(entry.position)
+            self._last_positions[key] = previous_last
+            self._waitlist_by_user[entry.user_id].remove(entry.id)
+            if entry.status == 'waiting':
+                _remove(self._waiting[key], entry.position, entry.id)
+        self._on_rollback(undo)
+        return entry.id
+
+    def get_last_waitlist_position(self, tournament_id: int, tournament_type: str) -> int:
+        return self._last_positions.get((tournament_id, tournament_type), 0)
+
+    def get_next_waitlist_entry(self, tournament_id: int,
+                                tournament_type: str) -> Optional[WaitlistEntry]:
+        waiting = self._waiting.get((tournament_id, tournament_type))
+        return replace(self._waitlist[waiting[0][1]]) if waiting else None
+
+    def _waiting_lists(self, tournament_id: int,
+                       tournament_type: Optional[str]) -> List[List[Tuple[int, int]]]:
+        """Очереди дисциплин турнира (одной или всех — по коду дисциплины)"""
+        if tournament_type:
+            return [self._waiting.get((tournament_id, tournament_type), [])]
+        return [
+            waiting for (key_tournament, _), waiting in sorted(self._waiting.items())
+            if key_tournament == tournament_id
+        ]
+
+    def count_waitlist(self, tournament_id: int, tournament_type: Optional[str],
+                       before_position: Optional[int]) -> int:
+        return sum(
+            len(waiting) if before_position is None else bisect_left(waiting, (before_position,))
+            for waiting in self._waiting_lists(tournament_id, tournament_type)
+        )
+
+    def get_waitlist(self, tournament_id: int,
+                     tournament_type: Optional[str]) -> List[WaitlistEntry]:
+        return [
+            replace(self._waitlist[entry_id])
+            for waiting in self._waiting_lists(tournament_id, tournament_type)
+            for _, entry_id in waiting
+        ]
+
+    def get_user_waitlist_entry(self, user_id: int, tournament_id: int,
+                                tournament_type: Optional[str]) -> Optional[WaitlistEntry]:
+        for entry_id in sorted(self._waitlist_by_user.get(user_id, ())):
+            entry = self._waitlist[entry_id]
+            if (entry.status == 'waiting' and entry.tournament_id == tournament_id
+                    and (not tournament_type or entry.tournament_type == tournament_type)):
+                return replace(entry)
+        return None
+
+    def set_waitlist_status(self, entry_id: int, status: str,
+                            registration_id: Optional[int] = None) -> bool:
+        entry = self._waitlist.get(entry_id)
+        if entry is None or entry.status != 'waiting':
+            return False
+        key = (entry.tournament_id, entry.tournament_type)
+        _remove(self._waiting[key], entry.position, entry.id)
+        entry.status, entry.registration_id = status, registration_id
+
+        def undo():
+            entry.status, entry.registration_id = 'waiting', None
+            insort(self._waiting[key], (entry.position, entry.id))
+        self._on_rollback(undo)
+        return True
+
+    # === Сводка для админ-панели ===
+
+    def get_tournament_overview(self, tournament_ids: List[int]) -> List[DivisionOverview]:
+        overviews: Dict[Tuple[int, str], DivisionOverview] = {}
+
+        def overview(tournament_id: int, tournament_type: str) -> DivisionOverview:
+            key = (tournament_id, tournament_type)
+            if key not in overviews:
+                overviews[key] = DivisionOverview(tournament_id, tournament_type)
+            return overviews[key]
+
+        for tournament_id in set(tournament_ids):
+            for registration in self.get_registrations(tournament_id, None, active_only=False):
+                counts = overview(tournament_id, registration.tournament_type).counts
+                counts[registration.status] = counts.get(registration.status, 0) + 1
+                if registration.status == 'active':
+                    overview(tournament_id, registration.tournament_type).registrations.append(registration)
+            for entry in self.get_waitlist(tournament_id, None):
+                overview(tournament_id, entry.tournament_type).waitlist.append(entry)
+        return [overviews[key] for key in sorted(overviews)]
+
+    # === Выгрузки ===
+
+    def iter_bookings(self, venue_ids: Optional[List[int]], start_from: datetime,
+                      start_to: datetime, table_id: Optional[int], status: Optional[str],
+                      batch_size: int) -> Iterator[Booking]:
+        for booking in self.get_bookings(venue_ids, start_from, start_to, active_only=False):
+            if (table_id is None or booking.table_id == table_id) and (status is None or booking.status == status):
+                yield booking
+
+    def iter_registrations(self, tournament_id: int, tournament_type: Optional[str],
+                           status: Optional[str], batch_size: int) -> Iterator[TournamentRegistration]:
+        for registration in self.get_registrations(tournament_id, tournament_type, active_only=False):
+            if status is None or registration.status == status:
+                yield registration
+
+    # === Поиск ===
+
+    def search(self, query: SearchQuery, venue_ids: Optional[List[int]],
+               include_registrations: bool, limit: int,
+               offset: int) -> List[Union[Booking, TournamentRegistration]]:
+        text = query.text.lower()
+
+        def matches(phone: str, *values: Optional[str]) -> bool:
+            if text and any(text in (value or "").lower() for value in values):
+                return True
+            digits = "".join(char for char in phone if char not in SEARCH_PHONE_STRIP)
+            return bool(query.phone_suffix) and digits.endswith(query.phone_suffix)
+
+        hits = []
+        for booking in self._bookings.values():
+            if venue_ids is not None and booking.venue_id not in venue_ids:
+                continue
+            if booking.id == query.booking_id or matches(booking.phone, booking.username):
+                hits.append((booking.start_time, 'booking', booking.id, booking))
+        if include_registrations:
+            for registration in self._registrations.values():
+                if matches(registration.phone, registration.username, registration.full_name):
+                    hits.append((registration.created_at, 'registration', registration.id, registration))
+
+        # ORDER BY at DESC, kind, id DESC
+        hits.sort(key=lambda hit: -hit[2])
+        hits.sort(key=lambda hit: hit[1])
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return [replace(hit[3]) for hit in hits[offset:offset + limit]]
+
+    # === Агрегат занятости ===
+
+    def add_occupancy(self, rows: List[Occupancy]) -> None:
+        for row in rows:
+            key = (row.work_day, row.venue_id, row.table_id, row.hour)
+            previous = self._occupancy.get(key)
+            current = replace(previous) if previous else Occupancy(*key)
+            current.booked_minutes += row.booked_minutes
+            current.blocked_minutes += row.blocked_minutes
+            current.bookings += row.bookings
+            current.cancellations += row.cancellations
+            self._occupancy[key] = current
+
+            def undo(key=key, previous=previous):
+                if previous is None:
+                    del self._occupancy[key]
+                else:
+                    self._occupancy[key] = previous
+            self._on_rollback(undo)
+
+    def clear_occupancy(self) -> int:
+        previous = self._occupancy
+        self._occupancy = {}
+
+        def undo():
+            self._occupancy = previous
+        self._on_rollback(undo)
+        return len(previous)
+
+    def get_occupancy(self) -> List[Occupancy]:
+        return [replace(row) for key, row in sorted(self._occupancy.items())]
+
+    def get_occupancy_summary(self, venue_ids: Optional[List[int]], day_from: date,
+                              day_to: date) -> List[OccupancySummary]:
+        totals: Dict[Tuple[int, int, int, int], List[int]] = defaultdict(lambda: [0, 0, 0, 0])
+        for (work_day, venue_id, table_id, hour), row in self._occupancy.items():
+            if not day_from <= work_day <= day_to or (venue_ids is not None and venue_id not in venue_ids):
+                continue
+            total = totals[(venue_id, table_id, work_day.weekday(), hour)]
+            total[0] += row.booked_minutes
+            total[1] += row.blocked_minutes
+            total[2] += row.bookings
+            total[3] += row.cancellations
+        return [OccupancySummary(*key, *total) for key, total in sorted(totals.items()) if any(total)]
+
+    # === Турнирная сетка ===
+
+    def get_matches(self, tournament_id: int, tournament_type: str) -> List[TournamentMatch]:
+        return [
+            replace(match) for key, match in sorted(self._matches.items())
+            if key[:2] == (tournament_id, tournament_type)
+        ]
+
+    def save_matches(self, matches: List[TournamentMatch]) -> int:
+        for match in matches:
+            key = (match.tournament_id, match.tournament_type, match.round, match.number)
+            previous = self._matches.get(key)
+            # Как INSERT … ON CONFLICT в SQLite: номер расходуется и при обновлении
+            match_id = self._new_id('matches')
+            self._matches[key] = replace(match, id=previous.id if previous else match_id)
+
+            def undo(key=key, previous=previous):
+                if previous is None:
+                    del self._matches[key]
+                else:
+                    self._matches[key] = previous
+            self._on_rollback(undo)
+        return len(matches)
@@ -1,9 +1,39 @@
 """
 Модели данных для работы с БД
 """
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from typing import Dict, List, Optional, Tuple
+
+# Заведение, к которому относятся данные, созданные до появления заведений
+DEFAULT_VENUE_ID = 1
+
+
+@dataclass
+class Venue:
+    """Модель заведения (клуба) со своими столами, расписанием и админами"""
+    id: int
+    name: str
+    weekday_open: time   # Пн-Чт
+    weekday_close: time
+    friday_open: time    # Пт
+    friday_close: time
+    weekend_open: time   # Сб
+    weekend_close: time
+    sunday_open: time    # Вс
+    sunday_close: time
+    admin_ids: List[int] = field(default_factory=list)
+    is_active: bool = True
+    
+    def working_hours(self, weekday: int) -> Tuple[time, time]:
+        """Часы работы (открытие, закрытие) для дня недели (0=Пн)"""
+        if weekday == 4:
+            return self.friday_open, self.friday_close
+        if weekday == 5:
+            return self.weekend_open, self.weekend_close
+        if weekday == 6:
+            return self.sunday_open, self.sunday_close
+        return self.weekday_open, self.weekday_close
 
 
 @dataclass
@@ -12,6 +42,7 @@ class Table:
     id: int
     name: str
     is_active: bool = True
+    venue_id: int = DEFAULT_VENUE_ID
 
 
 @dataclass
@@ -26,6 +57,8 @@ class Booking:
     phone: str
     created_at: datetime
     status: str = 'active'  # active, cancelled
+    venue_id: int = DEFAULT_VENUE_ID
+    series_id: Optional[int] = None  # занятие регулярной брони
     
     @property
     def duration_hours(self) -> int:
@@ -34,6 +67,32 @@ class Booking:
         return int(delta.total_seconds() / 3600)
 
 
+@dataclass
+class BookingSeries:
+    """
+    Регулярная бронь: стол в то же время каждые interval_weeks недель.
+    Занятия создаются обычными бронями не дальше MAX_BOOKING_DAYS вперёд
+    """
+    id: Optional[int]
+    user_id: int
+    username: Optional[str]
+    table_id: int
+    start_time: datetime  # первое занятие
+    end_time: datetime
+    phone: str
+    created_at: datetime
+    next_start: datetime  # начало следующего ещё не созданного занятия
+    interval_weeks: int = 1
+    status: str = 'active'  # active, cancelled
+    venue_id: int = DEFAULT_VENUE_ID
+    
+    @property
+    def duration_hours(self) -> int:
+        """Длительность занятия в часах"""
+        delta = self.end_time - self.start_time
+        return int(delta.total_seconds() / 3600)
+
+
 @dataclass
 class Hold:
     """Модель временного удержания слота"""
@@ -44,6 +103,39 @@ class Hold:
     end_time: datetime
     created_at: datetime
     expires_at: datetime
+    venue_id: int = DEFAULT_VENUE_ID
+
+
+@dataclass
+class TournamentDivision:
+    """Модель дисциплины турнира (русский, пул, ...) со своим лимитом мест"""
+    id: Optional[int]
+    tournament_id: int
+    code: str  # tournament_type регистраций: russian, pool, ...
+    name: str
+    max_participants: int
+
+
+@dataclass
+class Tournament:
+    """Модель турнира"""
+    id: Optional[int]
+    title: str  # текст кнопки главного меню, например "Турнир 05.07"
+    starts_at: datetime
+    event_key: str = ''  # tournament_event регистраций
+    blocks_bookings: bool = True  # в день турнира столы не бронируются
+    is_active: bool = True
+    divisions: List[TournamentDivision] = field(default_factory=list)
+    
+    @property
+    def date_text(self) -> str:
+        return self.starts_at.strftime("%d.%m %H:%M")
+    
+    def get_division(self, code: str) -> Optional[TournamentDivision]:
+        for division in self.divisions:
+            if division.code == code:
+                return division
+        return None
 
 
 @dataclass
@@ -58,3 +150,113 @@ class TournamentRegistration:
     tournament_type: str = 'legacy'  # russian, pool, legacy
     tournament_event: str = 'legacy'
     status: str = 'active'  # active, cancelled
+    tournament_id: Optional[int] = None
+
+
+@dataclass
+class WaitlistEntry:
+    """Модель записи в лист ожидания дисциплины турнира"""
+    id: Optional[int]
+    tournament_id: int
+    tournament_type: str
+    position: int  # порядковый номер в очереди дисциплины (растёт, не переиспользуется)
+    user_id: int
+    username: Optional[str]
+    full_name: str
+    phone: str
+    created_at: datetime
+    status: str = 'waiting'  # waiting, promoted, cancelled
+    registration_id: Optional[int] = None  # регистрация, в которую переведён
+
+
+@dataclass
+class DivisionOverview:
+    """Сводка дисциплины турнира для списка участников в админ-панели"""
+    tournament_id: int
+    tournament_type: str
+    counts: Dict[str, int] = field(default_factory=dict)  # статус регистрации -> количество
+    registrations: List[TournamentRegistration] = field(default_factory=list)  # активные, по времени
+    waitlist: List[WaitlistEntry] = field(default_factory=list)  # ожидающие, по позиции
+
+
+@dataclass
+class Occupancy:
+    """Занятость стола за час рабочего дня (строка daily_occupancy или приращение к ней)"""
+    work_day: date
+    venue_id: int
+    table_id: int
+    hour: int  # час начала, 0–23 (после полуночи — ещё предыдущий рабочий день)
+    booked_minutes: int = 0   # занято бронями клиентов
+    blocked_minutes: int = 0  # занято блокировками администратора
+    bookings: int = 0         # броней клиентов, начинающихся в этот час
+    cancellations: int = 0    # из них отменено
+
+
+@dataclass
+class OccupancySummary:
+    """Занятость стола по дню недели и часу, суммированная за период"""
+    venue_id: int
+    table_id: int
+    weekday: int  # 0 — понедельник
+    hour: int
+    booked_minutes: int
+    blocked_minutes: int
+    bookings: int
+    cancellations: int
+
+
+@dataclass
+class SearchQuery:
+    """
+    Запрос поиска броней и регистраций (/find). Условия объединяются через
+    ИЛИ; пустые не участвуют
+    """
+    text: str = ""          # подстрока username или имени участника, от 3 символов
+    phone_suffix: str = ""  # последние цифры телефона, от 4 цифр
+    booking_id: Optional[int] = None
+
+
+@dataclass
+class BlockConflict:
+    """Слот пакетной блокировки, занятый бронью или удержанием"""
+    table_id: int
+    start_time: datetime
+    end_time: datetime
+    booking_id: Optional[int] = None  # пересекающаяся бронь (меньший ID); None — только удержание
+
+
+@dataclass
+class TournamentMatch:
+    """Модель матча турнирной сетки (олимпийская система)"""
+    id: Optional[int]
+    tournament_id: int
+    tournament_type: str
+    round: int   # 1 — первый круг, последний — финал
+    number: int  # номер матча в круге, с 0
+    player1_id: Optional[int] = None  # ID регистрации (известны только в первом круге)
+    player2_id: Optional[int] = None
+    status: str = 'empty'  # scheduled — играется за столом, bye — проход без игры, empty — нет игроков
+    table_id: Optional[int] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    booking_id: Optional[int] = None  # блокировка стола под матч
+
+    @property
+    def label(self) -> str:
+        """Номер матча для сетки: "1.3" — третий матч первого круга"""
+        return f"{self.round}.{self.number + 1}"
+
+
+@dataclass
+class OutboxMessage:
+    """Модель исходящего уведомления в очереди outbox"""
+    id: Optional[int]
+    recipient_id: int
+    text: str
+    created_at: datetime
+    next_attempt_at: datetime
+    attempts: int = 0
+    status: str = 'pending'  # pending, sent, failed
+    sent_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    digest: bool = False  # можно объединить в сводку
@@ -1,10 +1,17 @@
 """
 Репозиторий для работы с данными
 """
-from datetime import datetime, timedelta
-from typing import List, Optional
-from database.database import get_db
-from database.models import Table, Booking, Hold
+from dataclasses import replace
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from database.cache_bus import cache_bus
+from database.database import get_db, read_snapshot, transaction
+from database.models import (
+    Venue, Table, Booking, BookingSeries, Hold, Tournament, TournamentDivision,
+    TournamentRegistration, WaitlistEntry, DivisionOverview, Occupancy, OccupancySummary,
+    SearchQuery, TournamentMatch, OutboxMessage, BlockConflict
+)
+from database.storage import get_backend
 from config import settings
 
 
@@ -13,194 +20,393 @@ class BookingRepository:
     
     @staticmethod
     def create_booking(booking: Booking) -> int:
-        """Создание нового бронирования"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO bookings 
-                (user_id, username, table_id, start_time, end_time, phone, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                booking.user_id,
-                booking.username,
-                booking.table_id,
-                booking.start_time,
-                booking.end_time,
-                booking.phone,
-                booking.created_at
-            ))
-            return cursor.lastrowid
+        """Создание нового бронирования (вместе с агрегатом занятости)"""
+        with transaction():
+            booking_id = get_backend().create_booking(booking)
+            OccupancyRepository.add([booking])
+            return booking_id
     
     @staticmethod
     def get_user_bookings(user_id: int) -> List[Booking]:
         """Получение будущих бронирований пользователя"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM bookings 
-                WHERE user_id = ? AND status = 'active' AND end_time > ?
-                ORDER BY start_time
-            """, (user_id, datetime.now()))
-            
-            rows = cursor.fetchall()
-            return [BookingRepository._row_to_booking(row) for row in rows]
+        return get_backend().get_user_bookings(user_id, datetime.now())
     
     @staticmethod
-    def get_today_bookings() -> List[Booking]:
-        """Получение броней на сегодня"""
+    def get_today_bookings(venue_ids: Optional[Iterable[int]] = None) -> List[Booking]:
+        """Получение броней на сегодня (venue_ids — только в этих заведениях)"""
         today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         today_end = today_start + timedelta(days=1)
         
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM bookings 
-                WHERE status = 'active' 
-                AND start_time >= ? AND start_time < ?
-                ORDER BY start_time
-            """, (today_start, today_end))
-            
-            rows = cursor.fetchall()
-            return [BookingRepository._row_to_booking(row) for row in rows]
+        return get_backend().get_bookings(
+            list(venue_ids) if venue_ids is not None else None,
+            today_start, today_end, active_only=True
+        )
     
     @staticmethod
-    def get_bookings_by_date(date: datetime) -> List[Booking]:
-        """Получение всех броней на конкретную дату (включая отмененные)"""
+    def get_bookings_by_date(date: datetime,
+                             venue_ids: Optional[Iterable[int]] = None) -> List[Booking]:
+        """
+        Получение всех броней на конкретную дату (включая отмененные),
+        venue_ids — только в этих заведениях
+        """
         date_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
         date_end = date_start + timedelta(days=1)
         
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM bookings 
-                WHERE start_time >= ? AND start_time < ?
-                ORDER BY start_time, status DESC
-            """, (date_start, date_end))
-            
-            rows = cursor.fetchall()
-            return [BookingRepository._row_to_booking(row) for row in rows]
+        return get_backend().get_bookings(
+            list(venue_ids) if venue_ids is not None else None,
+            date_start, date_end, active_only=False
+        )
     
     @staticmethod
     def cancel_booking(booking_id: int) -> bool:
-        """Отмена бронирования"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE bookings SET status = 'cancelled' 
-                WHERE id = ? AND status = 'active'
-            """, (booking_id,))
-            return cursor.rowcount > 0
+        """Отмена бронирования (вместе с агрегатом занятости)"""
+        backend = get_backend()
+        with transaction():
+            booking = backend.get_booking(booking_id)
+            if booking is None or not backend.cancel_booking(booking_id):
+                return False
+            OccupancyRepository.add([booking], sign=-1)
+            return True
     
     @staticmethod
     def update_booking_duration(booking_id: int, new_duration_hours: int) -> bool:
         """Обновление длительности бронирования"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            
-            # Получаем текущее бронирование
-            cursor.execute("SELECT start_time FROM bookings WHERE id = ?", (booking_id,))
-            row = cursor.fetchone()
-            if not row:
+        backend = get_backend()
+        with transaction():
+            booking = backend.get_booking(booking_id)
+            if not booking:
                 return False
             
-            start_time = datetime.fromisoformat(row['start_time'])
-            new_end_time = start_time + timedelta(hours=new_duration_hours)
-            
-            # Обновляем
-            cursor.execute("""
-                UPDATE bookings SET end_time = ? 
-                WHERE id = ? AND status = 'active'
-            """, (new_end_time, booking_id))
-            
-            return cursor.rowcount > 0
+            new_end_time = booking.start_time + timedelta(hours=new_duration_hours)
+            if not backend.update_booking_end(booking_id, new_end_time):
+                return False
+            OccupancyRepository.change_end(booking, new_end_time)
+            return True
     
     @staticmethod
     def create_blocked_booking(table_id: int, start_time: datetime, 
-                               end_time: datetime, admin_username: str) -> int:
+                               end_time: datetime, admin_username: str,
+                               venue_id: int) -> int:
         """Создание блокировки слота администратором"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO bookings 
-                (user_id, username, table_id, start_time, end_time, phone, created_at, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                0,  # user_id = 0 для блокировок админа
-                f"ADMIN_BLOCK_{admin_username}",
-                table_id,
-                start_time,
-                end_time,
-                "Заблокировано администратором",
-                datetime.now(),
-                'active'
-            ))
-            return cursor.lastrowid
+        return BookingRepository.create_booking(Booking(
+            id=None,
+            user_id=0,  # user_id = 0 для блокировок админа
+            username=f"ADMIN_BLOCK_{admin_username}",
+            table_id=table_id,
+            start_time=start_time,
+            end_time=end_time,
+            phone="Заблокировано администратором",
+            created_at=datetime.now(),
+            status='active',
+            venue_id=venue_id
+        ))
+    
+    @staticmethod
+    def create_blocked_bookings(blocks: Iterable[Tuple[int, datetime, datetime]],
+                                admin_username: str, venue_id: int,
+                                note: str = "Заблокировано администратором") -> List[int]:
+        """
+        Блокировка нескольких слотов (стол, начало, конец) одним запросом.
+        
+        Свободность слотов проверяет вызывающий — в той же транзакции с
+        BEGIN IMMEDIATE. Возвращает ID блокировок в порядке blocks.
+        """
+        now = datetime.now()
+        blocked = [
+            Booking(
+                id=None,
+                user_id=0,  # user_id = 0 для блокировок админа
+                username=f"ADMIN_BLOCK_{admin_username}",
+                table_id=table_id,
+                start_time=start_time,
+                end_time=end_time,
+                phone=note,
+                created_at=now,
+                status='active',
+                venue_id=venue_id
+            )
+            for table_id, start_time, end_time in blocks
+        ]
+        with transaction():
+            booking_ids = get_backend().create_bookings(blocked)
+            OccupancyRepository.add(blocked)
+            return booking_ids
+    
+    @staticmethod
+    def create_bulk_blocks(table_ids: Iterable[int], start_time: datetime, end_time: datetime,
+                           admin_username: str, venue_id: int,
+                           weeks: int = 1) -> Tuple[List[int], List[BlockConflict]]:
+        """
+        Блокировка столов table_ids на [start_time, end_time) — один раз или
+        каждую неделю, weeks недель подряд.
+        
+        Пересечения всех слотов с бронями и удержаниями ищутся одним
+        запросом, свободные слоты блокируются одним executemany — в одной
+        транзакции с BEGIN IMMEDIATE. Занятые слоты пропускаются.
+        Возвращает ID блокировок и пропущенные слоты.
+        """
+        slots = [
+            (table_id, start_time + timedelta(weeks=week), end_time + timedelta(weeks=week))
+            for week in range(weeks) for table_id in dict.fromkeys(table_ids)
+        ]
+        with transaction(immediate=True):
+            conflicts = BookingRepository.find_conflicts(slots, venue_id)
+            busy = {(conflict.table_id, conflict.start_time) for conflict in conflicts}
+            booking_ids = BookingRepository.create_blocked_bookings(
+                [slot for slot in slots if slot[:2] not in busy], admin_username, venue_id=venue_id
+            )
+        return booking_ids, conflicts
+    
+    @staticmethod
+    def find_conflicts(slots: List[Tuple[int, datetime, datetime]],
+                       venue_id: int) -> List[BlockConflict]:
+        """
+        Слоты (стол, начало, конец), занятые активными бронями или чужими
+        действующими holds, — одним запросом, в порядке slots
+        """
+        return get_backend().find_block_conflicts(venue_id, slots, datetime.now())
+    
+    @staticmethod
+    def cancel_bookings(booking_ids: Iterable[int]) -> int:
+        """Отмена нескольких бронирований одним запросом (вместе с агрегатом занятости)"""
+        backend = get_backend()
+        booking_ids = list(dict.fromkeys(booking_ids))
+        with transaction():
+            bookings = backend.get_bookings_by_ids(booking_ids)
+            active = [booking for booking in bookings if booking.status == 'active']
+            cancelled = backend.cancel_bookings([booking.id for booking in active])
+            OccupancyRepository.add(active, sign=-1)
+            return cancelled
+    
+    @staticmethod
+    def iter_bookings(start_from: datetime, start_to: datetime,
+                      venue_ids: Optional[Iterable[int]] = None, table_id: Optional[int] = None,
+                      status: Optional[str] = None) -> Iterator[Booking]:
+        """
+        Брони, начинающиеся в [start_from, start_to), для выгрузки — читаются
+        из БД пачками по EXPORT_BATCH_SIZE, а не списком целиком
+        """
+        return get_backend().iter_bookings(
+            list(venue_ids) if venue_ids is not None else None,
+            start_from, start_to, table_id, status, settings.EXPORT_BATCH_SIZE
+        )
+    
+    @staticmethod
+    def get_active_bookings_between(start_from: datetime, start_to: datetime,
+                                    venue_id: int) -> List[Booking]:
+        """Активные брони заведения, начинающиеся в [start_from, start_to)"""
+        return get_backend().get_bookings([venue_id], start_from, start_to, active_only=True)
     
     @staticmethod
     def get_booking_by_id(booking_id: int) -> Optional[Booking]:
         """Получение бронирования по ID"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM bookings WHERE id = ?", (booking_id,))
-            row = cursor.fetchone()
-            return BookingRepository._row_to_booking(row) if row else None
+        return get_backend().get_booking(booking_id)
     
     @staticmethod
     def check_availability(table_id: Optional[int], start_time: datetime, 
-                          end_time: datetime, exclude_user: Optional[int] = None) -> bool:
-        """Проверка доступности слота"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            
-            # Проверка бронирований
-            query = """
-                SELECT COUNT(*) as count FROM bookings 
-                WHERE status = 'active'
-                AND start_time < ? AND end_time > ?
-            """
-            params = [end_time, start_time]
-            
-            if table_id is not None:
-                query += " AND table_id = ?"
-                params.append(table_id)
-            
-            cursor.execute(query, params)
-            if cursor.fetchone()['count'] > 0:
-                return False
-            
-            # Проверка holds (исключая текущего пользователя)
-            query = """
-                SELECT COUNT(*) as count FROM holds 
-                WHERE expires_at > ? 
-                AND start_time < ? AND end_time > ?
-            """
-            params = [datetime.now(), end_time, start_time]
-            
-            if exclude_user:
-                query += " AND user_id != ?"
-                params.append(exclude_user)
-            
-            if table_id is not None:
-                query += " AND table_id = ?"
-                params.append(table_id)
-            
-            cursor.execute(query, params)
-            return cursor.fetchone()['count'] == 0
+                          end_time: datetime, venue_id: int,
+                          exclude_user: Optional[int] = None) -> bool:
+        """Проверка доступности слота (table_id=None — любой стол заведения)"""
+        backend = get_backend()
+        
+        # Проверка бронирований
+        if backend.has_booking_conflict(venue_id, table_id, start_time, end_time):
+            return False
+        
+        # Проверка holds (исключая текущего пользователя)
+        return not backend.has_hold_conflict(
+            venue_id, table_id, start_time, end_time, datetime.now(), exclude_user
+        )
+
+
+class OccupancyRepository:
+    """
+    Агрегат daily_occupancy: занятые минуты, брони и отмены по столам,
+    рабочим дням и часам.
+
+    BookingRepository обновляет его в той же транзакции, что и сами брони,
+    поэтому отчёты о загрузке читают только агрегат, а не таблицу bookings.
+    """
     
     @staticmethod
-    def _row_to_booking(row) -> Booking:
-        """Преобразование строки БД в объект Booking"""
-        return Booking(
-            id=row['id'],
-            user_id=row['user_id'],
-            username=row['username'],
-            table_id=row['table_id'],
-            start_time=datetime.fromisoformat(row['start_time']),
-            end_time=datetime.fromisoformat(row['end_time']),
-            phone=row['phone'],
-            created_at=datetime.fromisoformat(row['created_at']),
-            status=row['status']
-        )
+    def split(booking: Booking, sign: int = 1) -> List[Occupancy]:
+        """
+        Занятость брони по часам рабочего дня: sign=1 — бронь создана,
+        sign=-1 — отменена. Блокировки администратора (user_id = 0) идут в
+        blocked_minutes и не считаются бронями клиентов.
+        """
+        # utils.time_utils сам импортирует этот модуль
+        from utils.time_utils import get_work_day_for_time
+        
+        venue = VenueRepository.get_venue(booking.venue_id)
+        is_block = booking.user_id == 0
+        rows = []
+        hour_start = booking.start_time.replace(minute=0, second=0, microsecond=0)
+        while hour_start < booking.end_time:
+            hour_end = hour_start + timedelta(hours=1)
+            minutes = int(
+                (min(hour_end, booking.end_time) - max(hour_start, booking.start_time)).total_seconds() // 60
+            )
+            row = Occupancy(
+                work_day=get_work_day_for_time(hour_start, venue).date(),
+                venue_id=booking.venue_id,
+                table_id=booking.table_id,
+                hour=hour_start.hour
+            )
+            if is_block:
+                row.blocked_minutes = sign * minutes
+            else:
+                row.booked_minutes = sign * minutes
+            rows.append(row)
+            hour_start = hour_end
+        
+        # Бронь и её отмена считаются в часе начала
+        if rows and not is_block:
+            if sign > 0:
+                rows[0].bookings = 1
+            else:
+                rows[0].cancellations = 1
+        return rows
+    
+    @staticmethod
+    def add(bookings: Iterable[Booking], sign: int = 1):
+        """Учёт созданных (sign=1) или отменённых (sign=-1) броней"""
+        rows = [row for booking in bookings for row in OccupancyRepository.split(booking, sign)]
+        if rows:
+            get_backend().add_occupancy(rows)
+    
+    @staticmethod
+    def change_end(booking: Booking, new_end_time: datetime):
+        """Учёт изменения длительности брони"""
+        old_rows = OccupancyRepository.split(booking)
+        new_rows = OccupancyRepository.split(replace(booking, end_time=new_end_time))
+        for row in old_rows:
+            row.booked_minutes, row.blocked_minutes = -row.booked_minutes, -row.blocked_minutes
+            row.bookings = 0
+        for row in new_rows:
+            row.bookings = 0
+        get_backend().add_occupancy(old_rows + new_rows)
+    
+    @staticmethod
+    def _accumulate(totals: Dict[Tuple[date, int, int, int], Occupancy],
+                    rows: Iterable[Occupancy], sign: int = 1):
+        """Сложение строк агрегата с totals по (work_day, venue_id, table_id, hour)"""
+        for row in rows:
+            key = (row.work_day, row.venue_id, row.table_id, row.hour)
+            total = totals.setdefault(key, Occupancy(*key))
+            total.booked_minutes += sign * row.booked_minutes
+            total.blocked_minutes += sign * row.blocked_minutes
+            total.bookings += sign * row.bookings
+            total.cancellations += sign * row.cancellations
+    
+    @staticmethod
+    def rebuild() -> Tuple[int, int]:
+        """
+        Пересчёт агрегата по всем броням (для существующей базы и после
+        ручных правок). Возвращает (броней учтено, строк агрегата).
+        
+        Брони читаются пачками из снимка БД, без блокировки записи; из того
+        же снимка читается текущий агрегат. Затем короткая транзакция с
+        BEGIN IMMEDIATE добавляет к пересчёту приращения, которые брони,
+        созданные и изменённые после снимка, успели внести в агрегат, и
+        заменяет его.
+        """
+        backend = get_backend()
+        totals: Dict[Tuple[date, int, int, int], Occupancy] = {}
+        count = 0
+        with read_snapshot():
+            before = backend.get_occupancy()
+            for booking in backend.iter_bookings(None, datetime.min, datetime.max, None, None,
+                                                 settings.EXPORT_BATCH_SIZE):
+                if booking.status == 'active':
+                    rows = OccupancyRepository.split(booking)
+                elif booking.user_id != 0:
+                    # Отменённая бронь клиента: бронь и отмена в часе начала, без занятых минут
+                    rows = OccupancyRepository.split(booking)[:1]
+                    for row in rows:
+                        row.booked_minutes, row.cancellations = 0, 1
+                else:
+                    rows = []
+                OccupancyRepository._accumulate(totals, rows)
+                count += 1
+        
+        with transaction(immediate=True):
+            OccupancyRepository._accumulate(totals, before, sign=-1)
+            OccupancyRepository._accumulate(totals, backend.get_occupancy())
+            rows = [
+                row for row in totals.values()
+                if row.booked_minutes or row.blocked_minutes or row.bookings or row.cancellations
+            ]
+            backend.clear_occupancy()
+            backend.add_occupancy(rows)
+        return count, len(rows)
+    
+    @staticmethod
+    def get_summary(venue_ids: Iterable[int], day_from: date, day_to: date) -> List[OccupancySummary]:
+        """Занятость по столам, дням недели и часам за рабочие дни [day_from, day_to]"""
+        return get_backend().get_occupancy_summary(list(venue_ids), day_from, day_to)
+
+
+class BookingSeriesRepository:
+    """
+    Репозиторий регулярных броней. Занятия серии — обычные брони с
+    series_id: их создаёт фоновая задача (utils/series.py), поэтому проверки
+    доступности правило повторения не вычисляют
+    """
+    
+    @staticmethod
+    def create_series(series: BookingSeries) -> int:
+        """Создание серии (первое занятие создаёт вызывающий)"""
+        return get_backend().create_series(series)
+    
+    @staticmethod
+    def get_series(series_id: int) -> Optional[BookingSeries]:
+        """Получение серии по ID"""
+        return get_backend().get_series(series_id)
+    
+    @staticmethod
+    def get_user_series(user_id: int) -> List[BookingSeries]:
+        """Активные серии пользователя"""
+        return get_backend().get_user_series(user_id)
+    
+    @staticmethod
+    def get_due_series(before: datetime, after_id: int = 0) -> List[BookingSeries]:
+        """
+        Активные серии, следующее занятие которых начинается раньше before,
+        — по ID после after_id, не больше SERIES_EXPAND_BATCH_SIZE
+        """
+        return get_backend().get_due_series(before, after_id, settings.SERIES_EXPAND_BATCH_SIZE)
+    
+    @staticmethod
+    def create_occurrences(bookings: List[Booking],
+                           next_starts: List[Tuple[int, datetime]]) -> List[int]:
+        """
+        Создание занятий серий одним executemany (вместе с агрегатом
+        занятости) и сдвиг next_start серий — пары (ID серии, next_start).
+        
+        Свободность слотов проверяет вызывающий — в той же транзакции с
+        BEGIN IMMEDIATE. Возвращает ID броней в порядке bookings.
+        """
+        backend = get_backend()
+        with transaction():
+            booking_ids = backend.create_bookings(bookings)
+            OccupancyRepository.add(bookings)
+            backend.set_series_next_start(next_starts)
+            return booking_ids
+    
+    @staticmethod
+    def cancel_series(series_id: int) -> Optional[List[Booking]]:
+        """
+        Отмена серии вместе с её будущими занятиями. Возвращает отменённые
+        занятия или None, если серия не найдена или уже отменена
+        """
+        backend = get_backend()
+        with transaction():
+            if not backend.cancel_series(series_id):
+                return None
+            bookings = backend.get_series_bookings(series_id, datetime.now())
+            BookingRepository.cancel_bookings([booking.id for booking in bookings])
+            return bookings
 
 
 class HoldRepository:
@@ -209,240 +415,738 @@ class HoldRepository:
     @staticmethod
     def create_hold(hold: Hold) -> int:
         """Создание нового hold"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO holds 
-                (user_id, table_id, start_time, end_time, created_at, expires_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                hold.user_id,
-                hold.table_id,
-                hold.start_time,
-                hold.end_time,
-                hold.created_at,
-                hold.expires_at
-            ))
-            return cursor.lastrowid
+        return get_backend().create_hold(hold)
     
     @staticmethod
     def delete_user_holds(user_id: int):
         """Удаление всех holds пользователя"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM holds WHERE user_id = ?", (user_id,))
+        get_backend().delete_holds([user_id])
+    
+    @staticmethod
+    def delete_users_holds(user_ids: Iterable[int]) -> int:
+        """Удаление holds нескольких пользователей"""
+        return get_backend().delete_holds(user_ids)
     
     @staticmethod
     def cleanup_expired():
         """Удаление истёкших holds"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM holds WHERE expires_at < ?", (datetime.now(),))
-            return cursor.rowcount
+        return get_backend().delete_expired_holds(datetime.now())
+
+
+class VenueRepository:
+    """Репозиторий заведений"""
+    
+    # Кэш всех заведений по ID; сбрасывается через cache_bus (тема "venues")
+    _cache: Optional[Dict[int, Venue]] = None
+    
+    # Колонки расписания (совпадают с полями Venue)
+    HOURS_FIELDS = (
+        'weekday_open', 'weekday_close', 'friday_open', 'friday_close',
+        'weekend_open', 'weekend_close', 'sunday_open', 'sunday_close',
+    )
+    
+    @staticmethod
+    def _venues() -> Dict[int, Venue]:
+        if VenueRepository._cache is None:
+            VenueRepository._cache = {venue.id: venue for venue in get_backend().get_venues()}
+        return VenueRepository._cache
+    
+    @staticmethod
+    def invalidate_cache():
+        """Сброс кэша заведений (в этом процессе)"""
+        VenueRepository._cache = None
+    
+    @staticmethod
+    def get_all_venues() -> List[Venue]:
+        """Получение всех работающих заведений"""
+        return [venue for venue in VenueRepository._venues().values() if venue.is_active]
+    
+    @staticmethod
+    def get_venue(venue_id: int) -> Optional[Venue]:
+        """Получение заведения по ID"""
+        return VenueRepository._venues().get(venue_id)
+    
+    @staticmethod
+    def get_admin_venue_ids(user_id: int) -> List[int]:
+        """ID заведений, которыми управляет пользователь (глобальные админы — всеми)"""
+        venues = VenueRepository._venues().values()
+        if settings.is_admin(user_id):
+            return [venue.id for venue in venues]
+        return [venue.id for venue in venues if user_id in venue.admin_ids]
+    
+    @staticmethod
+    def is_admin(user_id: int) -> bool:
+        """Администратор хотя бы одного заведения"""
+        return bool(VenueRepository.get_admin_venue_ids(user_id))
+    
+    @staticmethod
+    def get_admin_ids(venue_id: int) -> List[int]:
+        """Получатели уведомлений заведения: глобальные админы и админы заведения"""
+        venue = VenueRepository.get_venue(venue_id)
+        venue_admins = venue.admin_ids if venue else []
+        return list(dict.fromkeys([*settings.ADMIN_IDS, *venue_admins]))
+    
+    @staticmethod
+    def create_venue(name: str, hours: Dict[str, time], admin_ids: Iterable[int] = ()) -> int:
+        """
+        Создание заведения.
+        
+        hours — часы работы по ключам weekday_open, weekday_close, friday_open, ...
+        (как поля Venue).
+        """
+        venue_id = get_backend().create_venue(Venue(
+            id=None,
+            name=name,
+            **{key: hours[key] for key in VenueRepository.HOURS_FIELDS},
+            admin_ids=list(admin_ids)
+        ))
+        cache_bus.publish('venues')
+        return venue_id
+
+
+cache_bus.subscribe('venues', VenueRepository.invalidate_cache)
 
 
 class TableRepository:
     """Репозиторий для работы со столами"""
     
+    # Кэш столов, разделённый по заведениям: {venue_id: {table_id: Table}}.
+    # Каждое заведение загружается отдельно при первом обращении, так что
+    # чтение столов одного заведения не вытесняет и не перечитывает столы
+    # других. Сбрасывается через cache_bus (тема "tables")
+    _cache: Dict[int, Dict[int, Table]] = {}
+    
     @staticmethod
-    def get_all_tables() -> List[Table]:
-        """Получение всех столов"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM tables WHERE is_active = 1")
-            rows = cursor.fetchall()
-            return [Table(
-                id=row['id'],
-                name=row['name'],
-                is_active=bool(row['is_active'])
-            ) for row in rows]
+    def _tables(venue_id: int) -> Dict[int, Table]:
+        tables = TableRepository._cache.get(venue_id)
+        if tables is None:
+            tables = TableRepository._cache[venue_id] = {
+                table.id: table for table in get_backend().get_tables(venue_id)
+            }
+        return tables
     
     @staticmethod
-    def get_table_by_id(table_id: int) -> Optional[Table]:
-        """Получение стола по ID"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM tables WHERE id = ?", (table_id,))
-            row = cursor.fetchone()
-            if row:
-                return Table(
-                    id=row['id'],
-                    name=row['name'],
-                    is_active=bool(row['is_active'])
-                )
-            return None
+    def invalidate_cache():
+        """Сброс кэша столов (в этом процессе)"""
+        TableRepository._cache = {}
+    
+    @staticmethod
+    def get_all_tables(venue_id: int) -> List[Table]:
+        """Получение всех столов заведения"""
+        return [table for table in TableRepository._tables(venue_id).values() if table.is_active]
+    
+    @staticmethod
+    def get_table_by_id(table_id: int, venue_id: int) -> Optional[Table]:
+        """Получение стола заведения по ID"""
+        return TableRepository._tables(venue_id).get(table_id)
+    
+    @staticmethod
+    def create_tables(venue_id: int, names: Iterable[str]) -> int:
+        """Добавление столов в заведение"""
+        created = get_backend().create_tables(venue_id, list(names))
+        cache_bus.publish('tables')
+        return created
+
+
+cache_bus.subscribe('tables', TableRepository.invalidate_cache)
 
 
 class TournamentRepository:
-    """Репозиторий для работы с регистрациями на турнир"""
-    
-    TOURNAMENT_DATE = datetime(2026, 7, 5, 15, 0)  # Дата и время турниров
-    TOURNAMENT_EVENT = TOURNAMENT_DATE.strftime("%Y-%m-%d-%H-%M")
-    TOURNAMENT_DATE_TEXT = "05.07 15:00"
-    MAX_PARTICIPANTS = 16  # Максимум участников
-    MAX_PARTICIPANTS_BY_TYPE = {
-        'russian': 8,
-        'pool': 16,
-    }
-    TOURNAMENT_TYPES = {
-        'russian': 'Турнир по русскому 8чел',
-        'pool': 'Турнир по пулу 16 чел',
-    }
-    
-    @staticmethod
-    def get_tournament_name(tournament_type: str) -> str:
-        """Получение названия турнира"""
-        return TournamentRepository.TOURNAMENT_TYPES.get(tournament_type, 'Турнир')
-
-    @staticmethod
-    def get_max_participants(tournament_type: Optional[str] = None) -> int:
-        """Получение лимита участников для турнира"""
-        if tournament_type:
-            return TournamentRepository.MAX_PARTICIPANTS_BY_TYPE.get(
-                tournament_type,
-                TournamentRepository.MAX_PARTICIPANTS
+    """Репозиторий турниров и регистраций на них"""
+    
+    # Кэш всех турниров по ID (с дисциплинами); сбрасывается через cache_bus
+    # (тема "tournaments") — в том числе при правках турниров админами
+    _cache: Optional[Dict[int, Tournament]] = None
+    
+    # Активные регистрации по (турнир, тип турнира; None — все типы).
+    # Загружаются по первому обращению и меняются при регистрации и отмене,
+    # так что проверка мест не обращается к БД. Регистрации из других
+    # процессов учитываются при периодической сверке (reconcile_counts);
+    # лимит всё равно соблюдается — его проверяет register_if_capacity по БД
+    _counts: Dict[Tuple[int, Optional[str]], int] = {}
+    
+    @staticmethod
+    def _tournaments() -> Dict[int, Tournament]:
+        if TournamentRepository._cache is None:
+            TournamentRepository._cache = {
+                tournament.id: tournament for tournament in get_backend().get_tournaments()
+            }
+        return TournamentRepository._cache
+    
+    @staticmethod
+    def invalidate_cache():
+        """Сброс кэша турниров (в этом процессе)"""
+        TournamentRepository._cache = None
+    
+    @staticmethod
+    def get_tournament(tournament_id: int) -> Optional[Tournament]:
+        """Получение турнира по ID"""
+        return TournamentRepository._tournaments().get(tournament_id)
+    
+    @staticmethod
+    def get_active_tournaments() -> List[Tournament]:
+        """Незакрытые турниры (в том числе прошедшие) — для администраторов"""
+        return [t for t in TournamentRepository._tournaments().values() if t.is_active]
+    
+    @staticmethod
+    def get_upcoming_tournaments() -> List[Tournament]:
+        """Турниры, на которые открыта регистрация (ещё не начались)"""
+        return [
+            tournament for tournament in TournamentRepository._tournaments().values()
+            if TournamentRepository.is_registration_open(tournament.id)
+        ]
+    
+    @staticmethod
+    def is_registration_open(tournament_id: int) -> bool:
+        """Турнир не закрыт и ещё не начался"""
+        tournament = TournamentRepository.get_tournament(tournament_id)
+        return bool(tournament and tournament.is_active and tournament.starts_at > datetime.now())
+    
+    @staticmethod
+    def find_by_title(title: str) -> Optional[Tournament]:
+        """
+        Турнир по названию (тексту кнопки главного меню): незакрытый, а если
+        такого нет — последний закрытый (кнопка могла остаться в старом меню)
+        """
+        matches = [tournament for tournament in TournamentRepository._tournaments().values()
+                   if tournament.title == title]
+        return max(matches, key=lambda t: (t.is_active, t.starts_at, t.id), default=None)
+    
+    @staticmethod
+    def get_blocked_dates() -> Set[date]:
+        """Даты турниров, в которые столы не бронируются (сегодня и позже)"""
+        today = datetime.now().date()
+        return {
+            tournament.starts_at.date() for tournament in TournamentRepository.get_active_tournaments()
+            if tournament.blocks_bookings and tournament.starts_at.date() >= today
+        }
+    
+    @staticmethod
+    def create_tournament(title: str, starts_at: datetime, blocks_bookings: bool = True) -> int:
+        """Создание турнира (дисциплины добавляются через add_division)"""
+        tournament_id = get_backend().create_tournament(Tournament(
+            id=None,
+            title=title,
+            starts_at=starts_at,
+            event_key=starts_at.strftime("%Y-%m-%d-%H-%M"),
+            blocks_bookings=blocks_bookings
+        ))
+        cache_bus.publish('tournaments')
+        return tournament_id
+    
+    @staticmethod
+    def add_division(tournament_id: int, code: str, name: str, max_participants: int) -> int:
+        """Добавление дисциплины в турнир"""
+        division_id = get_backend().create_division(TournamentDivision(
+            id=None,
+            tournament_id=tournament_id,
+            code=code,
+            name=name,
+            max_participants=max_participants
+        ))
+        cache_bus.publish('tournaments')
+        return division_id
+    
+    @staticmethod
+    def close_tournament(tournament_id: int) -> bool:
+        """Закрытие турнира: пропадает из меню и списков, даты снова бронируются"""
+        closed = get_backend().set_tournament_active(tournament_id, False)
+        if closed:
+            cache_bus.publish('tournaments')
+        return closed
+    
+    @staticmethod
+    def get_tournament_name(tournament_id: int, tournament_type: str) -> str:
+        """Получение названия дисциплины турнира"""
+        tournament = TournamentRepository.get_tournament(tournament_id)
+        division = tournament.get_division(tournament_type) if tournament else None
+        return division.name if division else 'Турнир'
+
+    @staticmethod
+    def get_max_participants(tournament_id: int, tournament_type: Optional[str] = None) -> int:
+        """Получение лимита участников дисциплины (без типа — всего турнира)"""
+        tournament = TournamentRepository.get_tournament(tournament_id)
+        if tournament is None:
+            return 0
+        return sum(
+            division.max_participants for division in tournament.divisions
+            if not tournament_type or division.code == tournament_type
+        )
+    
+    @staticmethod
+    def create_registration(registration: TournamentRegistration) -> int:
+        """Создание новой регистрации на турнир (без проверки мест, см. register_if_capacity)"""
+        registration_id = get_backend().create_registration(registration)
+        if registration.status == 'active':
+            TournamentRepository._adjust_count(
+                registration.tournament_id, registration.tournament_type, 1
+            )
+        return registration_id
+    
+    @staticmethod
+    def register_if_capacity(registration: TournamentRegistration) -> Optional[int]:
+        """
+        Регистрация, если в дисциплине турнира есть свободные места.
+        
+        Подсчёт участников по БД и вставка идут одной транзакцией с
+        BEGIN IMMEDIATE, так что одновременные регистрации не превысят лимит.
+        Возвращает ID регистрации или None, если мест нет.
+        """
+        backend = get_backend()
+        tournament_id, tournament_type = registration.tournament_id, registration.tournament_type
+        max_participants = TournamentRepository.get_max_participants(tournament_id, tournament_type)
+        
+        with transaction(immediate=True):
+            count = backend.count_active_registrations(tournament_id, tournament_type)
+            registration_id = None
+            if count < max_participants:
+                registration_id = backend.create_registration(registration)
+                count += 1
+        
+        TournamentRepository._set_count(tournament_id, tournament_type, count)
+        return registration_id
+    
+    @staticmethod
+    def get_active_registrations_count(tournament_id: int, tournament_type: Optional[str] = None) -> int:
+        """Получение количества активных регистраций (из счётчика в памяти)"""
+        key = (tournament_id, tournament_type)
+        count = TournamentRepository._counts.get(key)
+        if count is None:
+            count = TournamentRepository._counts[key] = get_backend().count_active_registrations(*key)
+        return count
+    
+    @staticmethod
+    def _set_count(tournament_id: int, tournament_type: Optional[str], count: int):
+        """Точное значение счётчика дисциплины (общий счётчик турнира сдвигается на разницу)"""
+        old_count = TournamentRepository._counts.get((tournament_id, tournament_type))
+        TournamentRepository._counts[(tournament_id, tournament_type)] = count
+        if old_count is None:
+            TournamentRepository._counts.pop((tournament_id, None), None)
+        else:
+            TournamentRepository._adjust_count(tournament_id, None, count - old_count)
+    
+    @staticmethod
+    def _adjust_count(tournament_id: int, tournament_type: Optional[str], delta: int):
+        """Сдвиг загруженных счётчиков дисциплины и турнира"""
+        keys = {(tournament_id, tournament_type), (tournament_id, None)}
+        for key in keys:
+            if key in TournamentRepository._counts:
+                TournamentRepository._counts[key] += delta
+    
+    @staticmethod
+    def reconcile_counts() -> int:
+        """Сверка счётчиков с БД; возвращает число исправленных"""
+        backend = get_backend()
+        fixed = 0
+        for key, count in list(TournamentRepository._counts.items()):
+            actual = backend.count_active_registrations(*key)
+            if actual != count:
+                TournamentRepository._counts[key] = actual
+                fixed += 1
+        return fixed
+    
+    @staticmethod
+    def get_all_registrations(tournament_id: int,
+                              tournament_type: Optional[str] = None) -> List[TournamentRegistration]:
+        """Получение всех регистраций"""
+        return get_backend().get_registrations(tournament_id, tournament_type, active_only=False)
+    
+    @staticmethod
+    def get_active_registrations(tournament_id: int,
+                                 tournament_type: Optional[str] = None) -> List[TournamentRegistration]:
+        """Получение активных регистраций"""
+        return get_backend().get_registrations(tournament_id, tournament_type, active_only=True)
+    
+    @staticmethod
+    def iter_registrations(tournament_id: int, tournament_type: Optional[str] = None,
+                           status: Optional[str] = None) -> Iterator[TournamentRegistration]:
+        """Регистрации для выгрузки — читаются из БД пачками по EXPORT_BATCH_SIZE"""
+        return get_backend().iter_registrations(
+            tournament_id, tournament_type, status, settings.EXPORT_BATCH_SIZE
+        )
+    
+    @staticmethod
+    def get_overview(tournament_ids: List[int]) -> Dict[Tuple[int, str], DivisionOverview]:
+        """
+        Сводка по дисциплинам турниров одним запросом: количество регистраций
+        по статусам, активные участники и лист ожидания.
+        Ключ — (ID турнира, код дисциплины); дисциплин без записей в нём нет.
+        """
+        return {
+            (overview.tournament_id, overview.tournament_type): overview
+            for overview in get_backend().get_tournament_overview(tournament_ids)
+        }
+    
+    @staticmethod
+    def get_user_registration(user_id: int, tournament_id: int,
+                              tournament_type: Optional[str] = None) -> Optional[TournamentRegistration]:
+        """Получение регистрации пользователя"""
+        return get_backend().get_user_registration(user_id, tournament_id, tournament_type)
+
+    @staticmethod
+    def get_registration_by_id(registration_id: int) -> Optional[TournamentRegistration]:
+        """Получение регистрации по ID"""
+        return get_backend().get_registration(registration_id)
+
+    @staticmethod
+    def cancel_registration(registration_id: int) -> bool:
+        """Отмена регистрации"""
+        backend = get_backend()
+        with transaction():
+            registration = backend.get_registration(registration_id)
+            cancelled = registration is not None and backend.cancel_registration(registration_id)
+        if cancelled:
+            TournamentRepository._adjust_count(
+                registration.tournament_id, registration.tournament_type, -1
             )
-        return TournamentRepository.MAX_PARTICIPANTS
+        return cancelled
     
     @staticmethod
-    def create_registration(registration: 'TournamentRegistration') -> int:
-        """Создание новой регистрации на турнир"""
+    def is_slots_available(tournament_id: int, tournament_type: Optional[str] = None) -> bool:
+        """Проверка наличия свободных мест"""
+        count = TournamentRepository.get_active_registrations_count(tournament_id, tournament_type)
+        return count < TournamentRepository.get_max_participants(tournament_id, tournament_type)
+
+
+cache_bus.subscribe('tournaments', TournamentRepository.invalidate_cache)
+
+
+class WaitlistRepository:
+    """
+    Репозиторий листа ожидания дисциплин турнира.
+    
+    У каждой записи — позиция в очереди дисциплины (уникальная, растёт и не
+    переиспользуется). Первый ожидающий и место в очереди ищутся по индексу
+    ожидающих записей, без просмотра регистраций.
+    """
+    
+    @staticmethod
+    def join(entry: WaitlistEntry) -> int:
+        """Постановка в конец листа ожидания дисциплины (позиция выдаётся здесь)"""
+        backend = get_backend()
+        with transaction(immediate=True):
+            entry.position = backend.get_last_waitlist_position(
+                entry.tournament_id, entry.tournament_type
+            ) + 1
+            entry.id = backend.create_waitlist_entry(entry)
+        return entry.id
+    
+    @staticmethod
+    def get_user_entry(user_id: int, tournament_id: int,
+                       tournament_type: Optional[str] = None) -> Optional[WaitlistEntry]:
+        """Запись пользователя, ожидающая в листе дисциплины (или любой дисциплины турнира)"""
+        return get_backend().get_user_waitlist_entry(user_id, tournament_id, tournament_type)
+    
+    @staticmethod
+    def get_place(entry: WaitlistEntry) -> int:
+        """Место записи в очереди (1 — следующий на освободившееся место)"""
+        return get_backend().count_waitlist(
+            entry.tournament_id, entry.tournament_type, entry.position
+        ) + 1
+    
+    @staticmethod
+    def count(tournament_id: int, tournament_type: Optional[str] = None) -> int:
+        """Количество ожидающих в дисциплине (без типа — во всём турнире)"""
+        return get_backend().count_waitlist(tournament_id, tournament_type, None)
+    
+    @staticmethod
+    def get_waitlist(tournament_id: int, tournament_type: Optional[str] = None) -> List[WaitlistEntry]:
+        """Ожидающие в порядке очереди"""
+        return get_backend().get_waitlist(tournament_id, tournament_type)
+    
+    @staticmethod
+    def leave(entry_id: int) -> bool:
+        """Выход из листа ожидания"""
+        return get_backend().set_waitlist_status(entry_id, 'cancelled')
+    
+    @staticmethod
+    def promote_next(tournament_id: int, tournament_type: str) -> List[TournamentRegistration]:
+        """
+        Перевод первых в очереди на свободные места дисциплины.
+        
+        Вызывается в транзакции отмены регистрации: место не успеет занять
+        никто из новых участников, а при откате отмены откатится и перевод.
+        Каждый перевод — поиск первого ожидающего по индексу, O(log n).
+        Возвращает созданные регистрации.
+        """
+        backend = get_backend()
+        tournament = TournamentRepository.get_tournament(tournament_id)
+        max_participants = TournamentRepository.get_max_participants(tournament_id, tournament_type)
+        promoted: List[TournamentRegistration] = []
+        
+        with transaction(immediate=True):
+            count = backend.count_active_registrations(tournament_id, tournament_type)
+            while count < max_participants:
+                entry = backend.get_next_waitlist_entry(tournament_id, tournament_type)
+                if entry is None:
+                    break
+                registration = TournamentRegistration(
+                    id=None,
+                    user_id=entry.user_id,
+                    username=entry.username,
+                    full_name=entry.full_name,
+                    phone=entry.phone,
+                    created_at=datetime.now(),
+                    tournament_type=tournament_type,
+                    tournament_event=tournament.event_key if tournament else 'legacy',
+                    tournament_id=tournament_id
+                )
+                registration.id = backend.create_registration(registration)
+                backend.set_waitlist_status(entry.id, 'promoted', registration.id)
+                promoted.append(registration)
+                count += 1
+        
+        TournamentRepository._set_count(tournament_id, tournament_type, count)
+        return promoted
+
+
+class BracketRepository:
+    """Репозиторий матчей турнирной сетки (расстановку считает utils.bracket)"""
+    
+    @staticmethod
+    def get_matches(tournament_id: int, tournament_type: str) -> List[TournamentMatch]:
+        """Матчи сетки дисциплины по кругам"""
+        return get_backend().get_matches(tournament_id, tournament_type)
+    
+    @staticmethod
+    def save_matches(matches: List[TournamentMatch]) -> int:
+        """Сохранение матчей одним запросом (замена по позиции круг/номер)"""
+        return get_backend().save_matches(matches)
+
+
+class SearchRepository:
+    """Репозиторий поиска броней и регистраций для /find (запрос разбирает utils.search)"""
+    
+    @staticmethod
+    def find(query: SearchQuery, venue_ids: Iterable[int], include_registrations: bool,
+             page: int = 0) -> Tuple[List[Union[Booking, TournamentRegistration]], bool]:
+        """Страница результатов (с 0) по FIND_PAGE_SIZE и есть ли следующая"""
+        size = settings.FIND_PAGE_SIZE
+        hits = get_backend().search(query, list(venue_ids), include_registrations, size + 1, page * size)
+        return hits[:size], len(hits) > size
+
+
+class OutboxRepository:
+    """Репозиторий очереди исходящих уведомлений"""
+    
+    @staticmethod
+    def enqueue(recipient_ids: Iterable[int], text: str, exclude: Optional[int] = None,
+                delay_seconds: float = 0, digest: bool = False) -> int:
+        """
+        Постановка уведомления в очередь для каждого получателя.
+        
+        digest=True — сообщение может быть объединено с другими такими же
+        в сводку; delay_seconds откладывает первую попытку отправки.
+        """
+        now = datetime.now()
+        next_attempt_at = now + timedelta(seconds=delay_seconds)
+        rows = [
+            (recipient_id, text, int(digest), next_attempt_at, now)
+            for recipient_id in recipient_ids
+            if recipient_id != exclude
+        ]
+        if not rows:
+            return 0
+        
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO tournament_registrations 
-                (user_id, username, full_name, phone, tournament_type, tournament_event, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                registration.user_id,
-                registration.username,
-                registration.full_name,
-                registration.phone,
-                registration.tournament_type,
-                getattr(registration, 'tournament_event', TournamentRepository.TOURNAMENT_EVENT),
-                registration.created_at
-            ))
-            return cursor.lastrowid
-    
-    @staticmethod
-    def get_active_registrations_count(tournament_type: Optional[str] = None) -> int:
-        """Получение количества активных регистраций"""
+            cursor.executemany("""
+                INSERT INTO outbox (recipient_id, text, digest, next_attempt_at, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            return len(rows)
+    
+    @staticmethod
+    def enqueue_batch(messages: Iterable[Tuple[int, str]]) -> int:
+        """Постановка в очередь разных сообщений разным получателям одним запросом"""
+        now = datetime.now()
+        rows = [(recipient_id, text, 0, now, now) for recipient_id, text in messages]
+        if not rows:
+            return 0
+        
         with get_db() as conn:
             cursor = conn.cursor()
-            if tournament_type:
-                cursor.execute("""
-                    SELECT COUNT(*) as count FROM tournament_registrations 
-                    WHERE status = 'active' AND tournament_type = ? AND tournament_event = ?
-                """, (tournament_type, TournamentRepository.TOURNAMENT_EVENT))
-            else:
-                cursor.execute("""
-                    SELECT COUNT(*) as count FROM tournament_registrations 
-                    WHERE status = 'active' AND tournament_event = ?
-                """, (TournamentRepository.TOURNAMENT_EVENT,))
-            return cursor.fetchone()['count']
+            cursor.executemany("""
+                INSERT INTO outbox (recipient_id, text, digest, next_attempt_at, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            return len(rows)
     
     @staticmethod
-    def get_all_registrations(tournament_type: Optional[str] = None) -> List['TournamentRegistration']:
-        """Получение всех регистраций"""
+    def get_due_messages(limit: int) -> List[OutboxMessage]:
+        """
+        Получение сообщений, готовых к отправке.
+        
+        Для каждого получателя берётся только самое раннее неотправленное
+        сообщение — так сохраняется порядок доставки внутри одного чата.
+        Обычные сообщения и сообщения для сводки идут независимыми очередями,
+        чтобы срочные уведомления не ждали окончания окна сводки.
+        """
         with get_db() as conn:
             cursor = conn.cursor()
-            if tournament_type:
-                cursor.execute("""
-                    SELECT * FROM tournament_registrations 
-                    WHERE tournament_type = ? AND tournament_event = ?
-                    ORDER BY created_at
-                """, (tournament_type, TournamentRepository.TOURNAMENT_EVENT))
-            else:
-                cursor.execute("""
-                    SELECT * FROM tournament_registrations 
-                    WHERE tournament_event = ?
-                    ORDER BY tournament_type, created_at
-                """, (TournamentRepository.TOURNAMENT_EVENT,))
+            cursor.execute("""
+                SELECT o.* FROM outbox o
+                JOIN (
+                    SELECT recipient_id, digest, MIN(id) AS id FROM outbox
+                    WHERE status = 'pending'
+                    GROUP BY recipient_id, digest
+                ) head ON head.id = o.id
+                WHERE o.next_attempt_at <= ?
+                ORDER BY o.id
+                LIMIT ?
+            """, (datetime.now(), limit))
             rows = cursor.fetchall()
-            return [TournamentRepository._row_to_registration(row) for row in rows]
+            return [OutboxRepository._row_to_message(row) for row in rows]
     
     @staticmethod
-    def get_active_registrations(tournament_type: Optional[str] = None) -> List['TournamentRegistration']:
-        """Получение активных регистраций"""
+    def get_pending_digest(recipient_id: int) -> List[OutboxMessage]:
+        """Все накопленные сообщения для сводки получателю"""
         with get_db() as conn:
             cursor = conn.cursor()
-            if tournament_type:
-                cursor.execute("""
-                    SELECT * FROM tournament_registrations 
-                    WHERE status = 'active' AND tournament_type = ? AND tournament_event = ?
-                    ORDER BY created_at
-                """, (tournament_type, TournamentRepository.TOURNAMENT_EVENT))
-            else:
-                cursor.execute("""
-                    SELECT * FROM tournament_registrations 
-                    WHERE status = 'active' AND tournament_event = ?
-                    ORDER BY tournament_type, created_at
-                """, (TournamentRepository.TOURNAMENT_EVENT,))
+            cursor.execute("""
+                SELECT * FROM outbox
+                WHERE status = 'pending' AND recipient_id = ? AND digest = 1
+                ORDER BY id
+            """, (recipient_id,))
             rows = cursor.fetchall()
-            return [TournamentRepository._row_to_registration(row) for row in rows]
+            return [OutboxRepository._row_to_message(row) for row in rows]
     
     @staticmethod
-    def get_user_registration(user_id: int, tournament_type: Optional[str] = None) -> Optional['TournamentRegistration']:
-        """Получение регистрации пользователя"""
+    def mark_sent(message_ids: List[int]):
+        """Отметка об успешной доставке"""
         with get_db() as conn:
             cursor = conn.cursor()
-            if tournament_type:
-                cursor.execute("""
-                    SELECT * FROM tournament_registrations 
-                    WHERE user_id = ? AND tournament_type = ? AND status = 'active' AND tournament_event = ?
-                """, (user_id, tournament_type, TournamentRepository.TOURNAMENT_EVENT))
-            else:
-                cursor.execute("""
-                    SELECT * FROM tournament_registrations 
-                    WHERE user_id = ? AND status = 'active' AND tournament_event = ?
-                    ORDER BY created_at
-                """, (user_id, TournamentRepository.TOURNAMENT_EVENT))
-            row = cursor.fetchone()
-            return TournamentRepository._row_to_registration(row) if row else None
-
+            cursor.executemany("""
+                UPDATE outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1, last_error = NULL
+                WHERE id = ?
+            """, [(datetime.now(), message_id) for message_id in message_ids])
+    
     @staticmethod
-    def get_registration_by_id(registration_id: int) -> Optional['TournamentRegistration']:
-        """Получение регистрации по ID"""
+    def mark_retry(message_ids: List[int], error: str, next_attempt_at: datetime):
+        """Отложить повторную попытку доставки"""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM tournament_registrations 
-                WHERE id = ? AND tournament_event = ?
-            """, (registration_id, TournamentRepository.TOURNAMENT_EVENT))
-            row = cursor.fetchone()
-            return TournamentRepository._row_to_registration(row) if row else None
-
+            cursor.executemany("""
+                UPDATE outbox SET attempts = attempts + 1, last_error = ?, next_attempt_at = ?
+                WHERE id = ?
+            """, [(error, next_attempt_at, message_id) for message_id in message_ids])
+    
     @staticmethod
-    def cancel_registration(registration_id: int) -> bool:
-        """Отмена регистрации"""
+    def mark_failed(message_ids: List[int], error: str):
+        """Окончательная ошибка доставки"""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE tournament_registrations SET status = 'cancelled' 
-                WHERE id = ? AND status = 'active' AND tournament_event = ?
-            """, (registration_id, TournamentRepository.TOURNAMENT_EVENT))
-            return cursor.rowcount > 0
+            cursor.executemany("""
+                UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ?
+                WHERE id = ?
+            """, [(error, message_id) for message_id in message_ids])
     
     @staticmethod
-    def is_slots_available(tournament_type: Optional[str] = None) -> bool:
-        """Проверка наличия свободных мест"""
-        count = TournamentRepository.get_active_registrations_count(tournament_type)
-        return count < TournamentRepository.get_max_participants(tournament_type)
+    def cleanup_sent(older_than: datetime) -> int:
+        """Удаление доставленных сообщений старше указанной даты"""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?
+            """, (older_than,))
+            return cursor.rowcount
     
     @staticmethod
-    def _row_to_registration(row) -> 'TournamentRegistration':
-        """Преобразование строки БД в объект TournamentRegistration"""
-        from database.models import TournamentRegistration
-        row_keys = row.keys()
-        return TournamentRegistration(
+    def _row_to_message(row) -> OutboxMessage:
+        """Преобразование строки БД в объект OutboxMessage"""
+        return OutboxMessage(
             id=row['id'],
-            user_id=row['user_id'],
-            username=row['username'],
-            full_name=row['full_name'],
-            phone=row['phone'],
+            recipient_id=row['recipient_id'],
+            text=row['text'],
             created_at=datetime.fromisoformat(row['created_at']),
-            tournament_type=row['tournament_type'],
-            tournament_event=row['tournament_event'] if 'tournament_event' in row_keys else 'legacy',
-            status=row['status']
+            next_attempt_at=datetime.fromisoformat(row['next_attempt_at']),
+            attempts=row['attempts'],
+            status=row['status'],
+            sent_at=datetime.fromisoformat(row['sent_at']) if row['sent_at'] else None,
+            last_error=row['last_error'],
+            digest=bool(row['digest'])
         )
 
+
+class KeyboardEpochRepository:
+    """Репозиторий версий клавиатуры пользователей"""
+    
+    @staticmethod
+    def get_epoch(user_id: int) -> Optional[int]:
+        """Версия клавиатуры, которую последней получил пользователь"""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT epoch FROM keyboard_epochs WHERE user_id = ?", (user_id,))
+            row = cursor.fetchone()
+            return row['epoch'] if row else None
+    
+    @staticmethod
+    def set_epoch(user_id: int, epoch: int):
+        """Сохранение версии клавиатуры пользователя"""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO keyboard_epochs (user_id, epoch) VALUES (?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET epoch = excluded.epoch
+            """, (user_id, epoch))
+
+
+class FSMRepository:
+    """Репозиторий состояний FSM"""
+    
+    @staticmethod
+    def get_session(key: str) -> Optional[Tuple[Optional[str], str]]:
+        """Состояние и данные (JSON) сессии или None, если её нет"""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT state, data FROM fsm_sessions WHERE key = ?", (key,))
+            row = cursor.fetchone()
+            return (row['state'], row['data']) if row else None
+    
+    @staticmethod
+    def save_sessions(rows: List[Tuple[str, Optional[int], Optional[str], str, datetime]],
+                      deleted_keys: List[str]):
+        """
+        Запись пачки изменённых сессий одной транзакцией.
+        
+        rows — (key, user_id, state, data JSON, updated_at);
+        deleted_keys — сессии, которые больше не хранят ни состояния, ни данных.
+        """
+        with get_db() as conn:
+            cursor = conn.cursor()
+            if rows:
+                cursor.executemany("""
+                    INSERT INTO fsm_sessions (key, user_id, state, data, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        state = excluded.state,
+                        data = excluded.data,
+                        updated_at = excluded.updated_at
+                """, rows)
+            if deleted_keys:
+                cursor.executemany(
+                    "DELETE FROM fsm_sessions WHERE key = ?",
+                    [(key,) for key in deleted_keys]
+                )
+    
+    @staticmethod
+    def get_idle_sessions(older_than: datetime) -> List[Tuple[str, Optional[int]]]:
+        """Ключи и user_id сессий, которые не менялись с указанного момента"""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT key, user_id FROM fsm_sessions WHERE updated_at < ?",
+                (older_than,)
+            )
+            return [(row['key'], row['user_id']) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def delete_sessions(keys: List[str]) -> int:
+        """Удаление сессий по ключам"""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "DELETE FROM fsm_sessions WHERE key = ?",
+                [(key,) for key in keys]
+            )
+            return cursor.rowcount
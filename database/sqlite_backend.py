@@ -0,0 +1,1028 @@
+"""
+Хранилище бронирований в SQLite (основное)
+"""
+import json
+from datetime import date, datetime, time
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from database.database import get_db, get_read_db, transaction
+from database.models import (
+    Venue, Table, Booking, Hold, Tournament, TournamentDivision, TournamentRegistration,
+    WaitlistEntry, DivisionOverview, Occupancy, OccupancySummary, SearchQuery, TournamentMatch,
+    BlockConflict, BookingSeries
+)
+
+# Колонки расписания заведения (совпадают с полями Venue)
+HOURS_FIELDS = (
+    'weekday_open', 'weekday_close', 'friday_open', 'friday_close',
+    'weekend_open', 'weekend_close', 'sunday_open', 'sunday_close',
+)
+
+
+def _in_list(column: str, values: Optional[List[int]], params: list) -> str:
+    """Условие "column IN (...) AND " (пустая строка, если values = None)"""
+    if values is None:
+        return ""
+    params.extend(values)
+    return f"{column} IN ({', '.join('?' * len(values)) or 'NULL'}) AND "
+
+
+class SQLiteBackend:
+    """
+    Хранилище в файле settings.DB_PATH (см. StorageBackend).
+
+    Выборки для отчётов и админских списков (get_bookings, get_registrations,
+    get_waitlist, get_tournament_overview, get_occupancy_summary, search) идут через
+    подключение только для чтения (get_read_db()), остальное — через основное.
+    """
+
+    transaction = staticmethod(transaction)
+
+    # === Заведения и столы ===
+
+    def get_venues(self) -> List[Venue]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM venues ORDER BY id")
+            return [self._row_to_venue(row) for row in cursor.fetchall()]
+
+    def create_venue(self, venue: Venue) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                INSERT INTO venues (name, {', '.join(HOURS_FIELDS)}, admin_ids, is_active)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                venue.name,
+                *(getattr(venue, key).strftime("%H:%M") for key in HOURS_FIELDS),
+                ",".join(str(admin_id) for admin_id in venue.admin_ids),
+                int(venue.is_active)
+            ))
+            return cursor.lastrowid
+
+    def get_tables(self, venue_id: int) -> List[Table]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM tables WHERE venue_id = ? ORDER BY id", (venue_id,))
+            return [Table(
+                id=row['id'],
+                name=row['name'],
+                is_active=bool(row['is_active']),
+                venue_id=row['venue_id']
+            ) for row in cursor.fetchall()]
+
+    def create_tables(self, venue_id: int, names: List[str]) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT INTO tables (venue_id, name) VALUES (?, ?)",
+                [(venue_id, name) for name in names]
+            )
+            return len(names)
+
+    # === Бронирования ===
+
+    def create_booking(self, booking: Booking) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO bookings
+                (venue_id, user_id, username, table_id, start_time, end_time, phone, created_at,
+                 status, series_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                booking.venue_id,
+                booking.user_id,
+                booking.username,
+                booking.table_id,
+                booking.start_time,
+                booking.end_time,
+                booking.phone,
+                booking.created_at,
+                booking.status,
+                booking.series_id
+            ))
+            return cursor.lastrowid
+
+    def create_bookings(self, bookings: List[Booking]) -> List[int]:
+        if not bookings:
+            return []
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO bookings
+                (venue_id, user_id, username, table_id, start_time, end_time, phone, created_at,
+                 status, series_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (booking.venue_id, booking.user_id, booking.username, booking.table_id,
+                 booking.start_time, booking.end_time, booking.phone, booking.created_at,
+                 booking.status, booking.series_id)
+                for booking in bookings
+            ])
+            # Строки вставлены одним запросом под блокировкой записи —
+            # ID (AUTOINCREMENT) идут подряд и заканчиваются последним
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            return list(range(last_id - len(bookings) + 1, last_id + 1))
+
+    def get_booking(self, booking_id: int) -> Optional[Booking]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM bookings WHERE id = ?", (booking_id,))
+            row = cursor.fetchone()
+            return self._row_to_booking(row) if row else None
+
+    def get_bookings_by_ids(self, booking_ids: List[int]) -> List[Booking]:
+        params = []
+        id_filter = _in_list('id', booking_ids, params)
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM bookings WHERE {id_filter}1 ORDER BY id", params)
+            return [self._row_to_booking(row) for row in cursor.fetchall()]
+
+    def get_user_bookings(self, user_id: int, ends_after: datetime) -> List[Booking]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM bookings
+                WHERE user_id = ? AND status = 'active' AND end_time > ?
+                ORDER BY start_time, id
+            """, (user_id, ends_after))
+            return [self._row_to_booking(row) for row in cursor.fetchall()]
+
+    def get_bookings(self, venue_ids: Optional[List[int]], start_from: datetime,
+                     start_to: datetime, active_only: bool) -> List[Booking]:
+        params = []
+        venue_filter = _in_list('venue_id', venue_ids, params)
+        params.extend([start_from, start_to])
+        status_filter = "AND status = 'active'" if active_only else ""
+
+        with get_read_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT * FROM bookings
+                WHERE {venue_filter}start_time >= ? AND start_time < ?
+                {status_filter}
+                ORDER BY start_time, status DESC, id
+            """, params)
+            return [self._row_to_booking(row) for row in cursor.fetchall()]
+
+    def cancel_booking(self, booking_id: int) -> bool:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE bookings SET status = 'cancelled'
+                WHERE id = ? AND status = 'active'
+            """, (booking_id,))
+            return cursor.rowcount > 0
+
+    def cancel_bookings(self, booking_ids: Iterable[int]) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                UPDATE bookings SET status = 'cancelled'
+                WHERE id = ? AND status = 'active'
+            """, [(booking_id,) for booking_id in booking_ids])
+            return max(cursor.rowcount, 0)
+
+    def update_booking_end(self, booking_id: int, end_time: datetime) -> bool:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE bookings SET end_time = ?
+                WHERE id = ? AND status = 'active'
+            """, (end_time, booking_id))
+            return cursor.rowcount > 0
+
+    def has_booking_conflict(self, venue_id: int, table_id: Optional[int],
+                             start_time: datetime, end_time: datetime) -> bool:
+        query = """
+            SELECT 1 FROM bookings
+            WHERE venue_id = ? AND status = 'active'
+            AND start_time < ? AND end_time > ?
+        """
+        params = [venue_id, end_time, start_time]
+        if table_id is not None:
+            query += " AND table_id = ?"
+            params.append(table_id)
+
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query + " LIMIT 1", params)
+            return cursor.fetchone() is not None
+
+    def find_block_conflicts(self, venue_id: int, slots: List[Tuple[int, datetime, datetime]],
+                             now: datetime) -> List[BlockConflict]:
+        if not slots:
+            return []
+        # Слоты передаются одним JSON-параметром (json_each), так что запрос
+        # один при любом числе слотов и не упирается в лимит параметров
+        slots_json = json.dumps([
+            [table_id, str(start_time), str(end_time)] for table_id, start_time, end_time in slots
+        ])
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                WITH slots AS (
+                    SELECT key AS position,
+                           json_extract(value, '$[0]') AS table_id,
+                           json_extract(value, '$[1]') AS start_time,
+                           json_extract(value, '$[2]') AS end_time
+                    FROM json_each(?)
+                ),
+                conflicts AS (
+                    SELECT slots.position, bookings.id AS booking_id
+                    FROM slots JOIN bookings
+                    ON bookings.venue_id = ? AND bookings.table_id = slots.table_id
+                    AND bookings.status = 'active'
+                    AND bookings.start_time < slots.end_time AND bookings.end_time > slots.start_time
+                    UNION ALL
+                    SELECT slots.position, NULL
+                    FROM slots JOIN holds
+                    ON holds.venue_id = ? AND holds.table_id = slots.table_id AND holds.expires_at > ?
+                    AND holds.start_time < slots.end_time AND holds.end_time > slots.start_time
+                )
+                SELECT slots.position, MIN(conflicts.booking_id) AS booking_id
+                FROM conflicts JOIN slots ON slots.position = conflicts.position
+                GROUP BY slots.position
+                ORDER BY slots.position
+            """, (slots_json, venue_id, venue_id, now))
+            return [
+                BlockConflict(*slots[row['position']], booking_id=row['booking_id'])
+                for row in cursor.fetchall()
+            ]
+
+    # === Регулярные брони ===
+
+    def create_series(self, series: BookingSeries) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO booking_series
+                (user_id, username, venue_id, table_id, start_time, end_time, interval_weeks,
+                 next_start, phone, created_at, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                series.user_id, series.username, series.venue_id, series.table_id,
+                series.start_time, series.end_time, series.interval_weeks,
+                series.next_start, series.phone, series.created_at, series.status
+            ))
+            return cursor.lastrowid
+
+    def get_series(self, series_id: int) -> Optional[BookingSeries]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM booking_series WHERE id = ?", (series_id,))
+            row = cursor.fetchone()
+            return self._row_to_series(row) if row else None
+
+    def get_user_series(self, user_id: int) -> List[BookingSeries]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM booking_series
+                WHERE user_id = ? AND status = 'active'
+                ORDER BY id
+            """, (user_id,))
+            return [self._row_to_series(row) for row in cursor.fetchall()]
+
+    def get_due_series(self, before: datetime, after_id: int, limit: int) -> List[BookingSeries]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM booking_series
+                WHERE status = 'active' AND next_start < ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (before, after_id, limit))
+            return [self._row_to_series(row) for row in cursor.fetchall()]
+
+    def set_series_next_start(self, updates: List[Tuple[int, datetime]]) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "UPDATE booking_series SET next_start = ? WHERE id = ?",
+                [(next_start, series_id) for series_id, next_start in updates]
+            )
+            return max(cursor.rowcount, 0)
+
+    def cancel_series(self, series_id: int) -> bool:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE booking_series SET status = 'cancelled'
+                WHERE id = ? AND status = 'active'
+            """, (series_id,))
+            return cursor.rowcount > 0
+
+    def get_series_bookings(self, series_id: int, start_from: datetime) -> List[Booking]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM bookings
+                WHERE series_id = ? AND start_time >= ? AND status = 'active'
+                ORDER BY start_time, id
+            """, (series_id, start_from))
+            return [self._row_to_booking(row) for row in cursor.fetchall()]
+
+    # === Временные удержания ===
+
+    def create_hold(self, hold: Hold) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO holds
+                (venue_id, user_id, table_id, start_time, end_time, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (
+                hold.venue_id,
+                hold.user_id,
+                hold.table_id,
+                hold.start_time,
+                hold.end_time,
+                hold.created_at,
+                hold.expires_at
+            ))
+            return cursor.lastrowid
+
+    def delete_holds(self, user_ids: Iterable[int]) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "DELETE FROM holds WHERE user_id = ?",
+                [(user_id,) for user_id in set(user_ids)]
+            )
+            return max(cursor.rowcount, 0)
+
+    def delete_expired_holds(self, now: datetime) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM holds WHERE expires_at < ?", (now,))
+            return cursor.rowcount
+
+    def has_hold_conflict(self, venue_id: int, table_id: Optional[int], start_time: datetime,
+                          end_time: datetime, now: datetime,
+                          exclude_user: Optional[int]) -> bool:
+        query = """
+            SELECT 1 FROM holds
+            WHERE venue_id = ? AND expires_at > ?
+            AND start_time < ? AND end_time > ?
+        """
+        params = [venue_id, now, end_time, start_time]
+        if exclude_user:
+            query += " AND user_id != ?"
+            params.append(exclude_user)
+        if table_id is not None:
+            query += " AND table_id = ?"
+            params.append(table_id)
+
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query + " LIMIT 1", params)
+            return cursor.fetchone() is not None
+
+    # === Турниры ===
+
+    def get_tournaments(self) -> List[Tournament]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM tournaments ORDER BY starts_at, id")
+            tournaments = {row['id']: self._row_to_tournament(row) for row in cursor.fetchall()}
+            cursor.execute("SELECT * FROM tournament_divisions ORDER BY id")
+            for row in cursor.fetchall():
+                tournament = tournaments.get(row['tournament_id'])
+                if tournament is not None:
+                    tournament.divisions.append(self._row_to_division(row))
+            return list(tournaments.values())
+
+    def create_tournament(self, tournament: Tournament) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO tournaments (title, starts_at, event_key, blocks_bookings, is_active)
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                tournament.title,
+                tournament.starts_at,
+                tournament.event_key,
+                int(tournament.blocks_bookings),
+                int(tournament.is_active)
+            ))
+            tournament_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO tournament_divisions (tournament_id, code, name, max_participants)
+                VALUES (?, ?, ?, ?)
+            """, [
+                (tournament_id, division.code, division.name, division.max_participants)
+                for division in tournament.divisions
+            ])
+            return tournament_id
+
+    def create_division(self, division: TournamentDivision) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO tournament_divisions (tournament_id, code, name, max_participants)
+                VALUES (?, ?, ?, ?)
+            """, (division.tournament_id, division.code, division.name, division.max_participants))
+            return cursor.lastrowid
+
+    def set_tournament_active(self, tournament_id: int, is_active: bool) -> bool:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE tournaments SET is_active = ? WHERE id = ?",
+                (int(is_active), tournament_id)
+            )
+            return cursor.rowcount > 0
+
+    # === Регистрации на турнир ===
+
+    def create_registration(self, registration: TournamentRegistration) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO tournament_registrations
+                (tournament_id, user_id, username, full_name, phone, tournament_type,
+                 tournament_event, created_at, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                registration.tournament_id,
+                registration.user_id,
+                registration.username,
+                registration.full_name,
+                registration.phone,
+                registration.tournament_type,
+                registration.tournament_event,
+                registration.created_at,
+                registration.status
+            ))
+            return cursor.lastrowid
+
+    def count_active_registrations(self, tournament_id: int, tournament_type: Optional[str]) -> int:
+        query = """
+            SELECT COUNT(*) as count FROM tournament_registrations
+            WHERE tournament_id = ? AND status = 'active'
+        """
+        params = [tournament_id]
+        if tournament_type:
+            query += " AND tournament_type = ?"
+            params.append(tournament_type)
+
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchone()['count']
+
+    def get_registrations(self, tournament_id: int, tournament_type: Optional[str],
+                          active_only: bool) -> List[TournamentRegistration]:
+        query = "SELECT * FROM tournament_registrations WHERE tournament_id = ?"
+        params = [tournament_id]
+        if active_only:
+            query += " AND status = 'active'"
+        if tournament_type:
+            query += " AND tournament_type = ? ORDER BY created_at, id"
+            params.append(tournament_type)
+        else:
+            query += " ORDER BY tournament_type, created_at, id"
+
+        with get_read_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return [self._row_to_registration(row) for row in cursor.fetchall()]
+
+    def get_user_registration(self, user_id: int, tournament_id: int,
+                              tournament_type: Optional[str]) -> Optional[TournamentRegistration]:
+        query = """
+            SELECT * FROM tournament_registrations
+            WHERE user_id = ? AND status = 'active' AND tournament_id = ?
+        """
+        params = [user_id, tournament_id]
+        if tournament_type:
+            query += " AND tournament_type = ?"
+            params.append(tournament_type)
+
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query + " ORDER BY created_at, id LIMIT 1", params)
+            row = cursor.fetchone()
+            return self._row_to_registration(row) if row else None
+
+    def get_registration(self, registration_id: int) -> Optional[TournamentRegistration]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM tournament_registrations WHERE id = ?", (registration_id,))
+            row = cursor.fetchone()
+            return self._row_to_registration(row) if row else None
+
+    def cancel_registration(self, registration_id: int) -> bool:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE tournament_registrations SET status = 'cancelled'
+                WHERE id = ? AND status = 'active'
+            """, (registration_id,))
+            return cursor.rowcount > 0
+
+    # === Лист ожидания ===
+
+    def create_waitlist_entry(self, entry: WaitlistEntry) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO tournament_waitlist
+                (tournament_id, tournament_type, position, user_id, username, full_name,
+                 phone, created_at, status, registration_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                entry.tournament_id,
+                entry.tournament_type,
+                entry.position,
+                entry.user_id,
+                entry.username,
+                entry.full_name,
+                entry.phone,
+                entry.created_at,
+                entry.status,
+                entry.registration_id
+            ))
+            return cursor.lastrowid
+
+    def get_last_waitlist_position(self, tournament_id: int, tournament_type: str) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT MAX(position) AS position FROM tournament_waitlist
+                WHERE tournament_id = ? AND tournament_type = ?
+            """, (tournament_id, tournament_type))
+            return cursor.fetchone()['position'] or 0
+
+    def get_next_waitlist_entry(self, tournament_id: int,
+                                tournament_type: str) -> Optional[WaitlistEntry]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM tournament_waitlist
+                WHERE tournament_id = ? AND tournament_type = ? AND status = 'waiting'
+                ORDER BY position
+                LIMIT 1
+            """, (tournament_id, tournament_type))
+            row = cursor.fetchone()
+            return self._row_to_waitlist_entry(row) if row else None
+
+    def count_waitlist(self, tournament_id: int, tournament_type: Optional[str],
+                       before_position: Optional[int]) -> int:
+        query = """
+            SELECT COUNT(*) AS count FROM tournament_waitlist
+            WHERE tournament_id = ? AND status = 'waiting'
+        """
+        params = [tournament_id]
+        if tournament_type:
+            query += " AND tournament_type = ?"
+            params.append(tournament_type)
+        if before_position is not None:
+            query += " AND position < ?"
+            params.append(before_position)
+
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchone()['count']
+
+    def get_waitlist(self, tournament_id: int,
+                     tournament_type: Optional[str]) -> List[WaitlistEntry]:
+        query = "SELECT * FROM tournament_waitlist WHERE tournament_id = ? AND status = 'waiting'"
+        params = [tournament_id]
+        if tournament_type:
+            query += " AND tournament_type = ? ORDER BY position"
+            params.append(tournament_type)
+        else:
+            query += " ORDER BY tournament_type, position"
+
+        with get_read_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return [self._row_to_waitlist_entry(row) for row in cursor.fetchall()]
+
+    def get_user_waitlist_entry(self, user_id: int, tournament_id: int,
+                                tournament_type: Optional[str]) -> Optional[WaitlistEntry]:
+        query = """
+            SELECT * FROM tournament_waitlist
+            WHERE user_id = ? AND tournament_id = ? AND status = 'waiting'
+        """
+        params = [user_id, tournament_id]
+        if tournament_type:
+            query += " AND tournament_type = ?"
+            params.append(tournament_type)
+
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query + " ORDER BY id LIMIT 1", params)
+            row = cursor.fetchone()
+            return self._row_to_waitlist_entry(row) if row else None
+
+    def set_waitlist_status(self, entry_id: int, status: str,
+                            registration_id: Optional[int] = None) -> bool:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE tournament_waitlist SET status = ?, registration_id = ?
+                WHERE id = ? AND status = 'waiting'
+            """, (status, registration_id, entry_id))
+            return cursor.rowcount > 0
+
+    # === Сводка для админ-панели ===
+
+    def get_tournament_overview(self, tournament_ids: List[int]) -> List[DivisionOverview]:
+        # Один запрос на все дисциплины: счётчики по статусам (part 0), активные
+        # регистрации (1) и ожидающие (2), уже упорядоченные для вывода
+        filters = []
+        params: list = []
+        for _ in range(3):
+            filters.append(_in_list("tournament_id", tournament_ids, params))
+        query = f"""
+            SELECT 0 AS part, tournament_id, tournament_type, status, COUNT(*) AS total,
+                   NULL AS id, NULL AS user_id, NULL AS username, NULL AS full_name,
+                   NULL AS phone, NULL AS created_at, NULL AS tournament_event,
+                   NULL AS position, NULL AS registration_id
+            FROM tournament_registrations
+            WHERE {filters[0]}1
+            GROUP BY tournament_id, tournament_type, status
+            UNION ALL
+            SELECT 1, tournament_id, tournament_type, status, NULL,
+                   id, user_id, username, full_name, phone, created_at, tournament_event,
+                   NULL, NULL
+            FROM tournament_registrations
+            WHERE {filters[1]}status = 'active'
+            UNION ALL
+            SELECT 2, tournament_id, tournament_type, status, NULL,
+                   id, user_id, username, full_name, phone, created_at, NULL,
+                   position, registration_id
+            FROM tournament_waitlist
+            WHERE {filters[2]}status = 'waiting'
+            ORDER BY tournament_id, tournament_type, part, position, created_at, id
+        """
+
+        overviews: List[DivisionOverview] = []
+        with get_read_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            for row in cursor:
+                overview = overviews[-1] if overviews else None
+                if (overview is None or overview.tournament_id != row['tournament_id']
+                        or overview.tournament_type != row['tournament_type']):
+                    overview = DivisionOverview(row['tournament_id'], row['tournament_type'])
+                    overviews.append(overview)
+                if row['part'] == 0:
+                    overview.counts[row['status']] = row['total']
+                elif row['part'] == 1:
+                    overview.registrations.append(self._row_to_registration(row))
+                else:
+                    overview.waitlist.append(self._row_to_waitlist_entry(row))
+        return overviews
+
+    # === Выгрузки ===
+
+    def iter_bookings(self, venue_ids: Optional[List[int]], start_from: datetime,
+                      start_to: datetime, table_id: Optional[int], status: Optional[str],
+                      batch_size: int) -> Iterator[Booking]:
+        params = []
+        venue_filter = _in_list('venue_id', venue_ids, params)
+        params.extend([start_from, start_to])
+        query = f"SELECT * FROM bookings WHERE {venue_filter}start_time >= ? AND start_time < ?"
+        if table_id is not None:
+            query += " AND table_id = ?"
+            params.append(table_id)
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY start_time, status DESC, id"
+
+        with get_read_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._row_to_booking(row)
+
+    def iter_registrations(self, tournament_id: int, tournament_type: Optional[str],
+                           status: Optional[str], batch_size: int) -> Iterator[TournamentRegistration]:
+        query = "SELECT * FROM tournament_registrations WHERE tournament_id = ?"
+        params = [tournament_id]
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        if tournament_type:
+            query += " AND tournament_type = ? ORDER BY created_at, id"
+            params.append(tournament_type)
+        else:
+            query += " ORDER BY tournament_type, created_at, id"
+
+        with get_read_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._row_to_registration(row)
+
+    # === Поиск ===
+
+    def search(self, query: SearchQuery, venue_ids: Optional[List[int]],
+               include_registrations: bool, limit: int,
+               offset: int) -> List[Union[Booking, TournamentRegistration]]:
+        # Каждое условие — свой подзапрос (kind, id, at): подстроки ищутся по
+        # триграммам FTS5, ID брони — по первичному ключу. UNION убирает
+        # записи, подошедшие по нескольким условиям. CROSS JOIN закрепляет
+        # порядок: сначала индекс FTS5, потом строки по rowid (иначе SQLite
+        # идёт по индексу заведения и выполняет MATCH для каждой брони)
+        parts = []
+        params: list = []
+        sources = [('booking', 'bookings', 'bookings_search', 'start_time', 'username')]
+        if include_registrations:
+            sources.append((
+                'registration', 'tournament_registrations', 'registrations_search',
+                'created_at', '{username full_name}'
+            ))
+        # Фразы FTS5 — в кавычках, кавычки внутри удваиваются
+        conditions = []
+        if query.text:
+            conditions.append(('text', '"' + query.text.replace('"', '""') + '"'))
+        if query.phone_suffix:
+            conditions.append(('phone', '"' + query.phone_suffix + '"'))
+        for kind, table_name, index_name, at, text_columns in sources:
+            for condition, phrase in conditions:
+                venue_filter = (
+                    _in_list(f"{table_name}.venue_id", venue_ids, params) if kind == 'booking' else ""
+                )
+                part = f"""
+                    SELECT '{kind}' AS kind, {table_name}.id, {table_name}.{at} AS at
+                    FROM {index_name} CROSS JOIN {table_name} ON {table_name}.id = {index_name}.rowid
+                    WHERE {venue_filter}{index_name} MATCH ?
+                """
+                if condition == 'text':
+                    params.append(f"{text_columns} : {phrase}")
+                else:
+                    # Триграммы находят подстроку, а нужен именно конец номера
+                    part += f" AND {index_name}.phone LIKE ?"
+                    params.extend([f"phone : {phrase}", f"%{query.phone_suffix}"])
+                parts.append(part)
+        if query.booking_id is not None:
+            parts.append(f"""
+                SELECT 'booking' AS kind, id, start_time AS at FROM bookings
+                WHERE {_in_list("venue_id", venue_ids, params)}id = ?
+            """)
+            params.append(query.booking_id)
+        if not parts:
+            return []
+        params.extend([limit, offset])
+
+        with get_read_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT kind, id FROM ({" UNION ".join(parts)})
+                ORDER BY at DESC, kind, id DESC
+                LIMIT ? OFFSET ?
+            """, params)
+            hits = [(row['kind'], row['id']) for row in cursor.fetchall()]
+            found = {}
+            for kind, table_name, row_to_object in (
+                ('booking', 'bookings', self._row_to_booking),
+                ('registration', 'tournament_registrations', self._row_to_registration),
+            ):
+                ids = [hit_id for hit_kind, hit_id in hits if hit_kind == kind]
+                if ids:
+                    cursor.execute(
+                        f"SELECT * FROM {table_name} WHERE id IN ({', '.join('?' * len(ids))})", ids
+                    )
+                    for row in cursor.fetchall():
+                        found[(kind, row['id'])] = row_to_object(row)
+        return [found[hit] for hit in hits]
+
+    # === Агрегат занятости ===
+
+    def add_occupancy(self, rows: List[Occupancy]) -> None:
+        with get_db() as conn:
+            conn.executemany("""
+                INSERT INTO daily_occupancy (
+                    work_day, venue_id, table_id, hour,
+                    booked_minutes, blocked_minutes, bookings, cancellations
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (work_day, venue_id, table_id, hour) DO UPDATE SET
+                    booked_minutes = booked_minutes + excluded.booked_minutes,
+                    blocked_minutes = blocked_minutes + excluded.blocked_minutes,
+                    bookings = bookings + excluded.bookings,
+                    cancellations = cancellations + excluded.cancellations
+            """, [
+                (row.work_day.isoformat(), row.venue_id, row.table_id, row.hour,
+                 row.booked_minutes, row.blocked_minutes, row.bookings, row.cancellations)
+                for row in rows
+            ])
+
+    def clear_occupancy(self) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM daily_occupancy")
+            return cursor.rowcount
+
+    def get_occupancy(self) -> List[Occupancy]:
+        with get_read_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT work_day, venue_id, table_id, hour,
+                       booked_minutes, blocked_minutes, bookings, cancellations
+                FROM daily_occupancy
+                ORDER BY work_day, venue_id, table_id, hour
+            """)
+            return [
+                Occupancy(date.fromisoformat(row['work_day']), *tuple(row)[1:])
+                for row in cursor.fetchall()
+            ]
+
+    def get_occupancy_summary(self, venue_ids: Optional[List[int]], day_from: date,
+                              day_to: date) -> List[OccupancySummary]:
+        params = []
+        venue_filter = _in_list('venue_id', venue_ids, params)
+        params.extend([day_from.isoformat(), day_to.isoformat()])
+
+        with get_read_db() as conn:
+            cursor = conn.cursor()
+            # strftime('%w'): 0 — воскресенье; приводим к 0 — понедельник
+            cursor.execute(f"""
+                SELECT venue_id, table_id,
+                       (CAST(strftime('%w', work_day) AS INTEGER) + 6) % 7 AS weekday, hour,
+                       SUM(booked_minutes) AS booked_minutes,
+                       SUM(blocked_minutes) AS blocked_minutes,
+                       SUM(bookings) AS bookings,
+                       SUM(cancellations) AS cancellations
+                FROM daily_occupancy
+                WHERE {venue_filter}work_day >= ? AND work_day <= ?
+                GROUP BY venue_id, table_id, weekday, hour
+                HAVING SUM(booked_minutes) != 0 OR SUM(blocked_minutes) != 0
+                    OR SUM(bookings) != 0 OR SUM(cancellations) != 0
+                ORDER BY venue_id, table_id, weekday, hour
+            """, params)
+            return [OccupancySummary(**dict(row)) for row in cursor.fetchall()]
+
+    # === Турнирная сетка ===
+
+    def get_matches(self, tournament_id: int, tournament_type: str) -> List[TournamentMatch]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM tournament_matches
+                WHERE tournament_id = ? AND tournament_type = ?
+                ORDER BY round, number
+            """, (tournament_id, tournament_type))
+            return [self._row_to_match(row) for row in cursor.fetchall()]
+
+    def save_matches(self, matches: List[TournamentMatch]) -> int:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO tournament_matches
+                (tournament_id, tournament_type, round, number, player1_id, player2_id,
+                 status, table_id, start_time, end_time, booking_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (tournament_id, tournament_type, round, number) DO UPDATE SET
+                    player1_id = excluded.player1_id,
+                    player2_id = excluded.player2_id,
+                    status = excluded.status,
+                    table_id = excluded.table_id,
+                    start_time = excluded.start_time,
+                    end_time = excluded.end_time,
+                    booking_id = excluded.booking_id
+            """, [
+                (match.tournament_id, match.tournament_type, match.round, match.number,
+                 match.player1_id, match.player2_id, match.status, match.table_id,
+                 match.start_time, match.end_time, match.booking_id)
+                for match in matches
+            ])
+            return len(matches)
+
+    # === Преобразование строк ===
+
+    @staticmethod
+    def _row_to_venue(row) -> Venue:
+        """Преобразование строки БД в объект Venue"""
+        return Venue(
+            id=row['id'],
+            name=row['name'],
+            **{key: time.fromisoformat(row[key]) for key in HOURS_FIELDS},
+            admin_ids=[int(admin_id) for admin_id in row['admin_ids'].split(',') if admin_id.strip()],
+            is_active=bool(row['is_active'])
+        )
+
+    @staticmethod
+    def _row_to_booking(row) -> Booking:
+        """Преобразование строки БД в объект Booking"""
+        return Booking(
+            id=row['id'],
+            user_id=row['user_id'],
+            username=row['username'],
+            table_id=row['table_id'],
+            start_time=datetime.fromisoformat(row['start_time']),
+            end_time=datetime.fromisoformat(row['end_time']),
+            phone=row['phone'],
+            created_at=datetime.fromisoformat(row['created_at']),
+            status=row['status'],
+            venue_id=row['venue_id'],
+            series_id=row['series_id']
+        )
+
+    @staticmethod
+    def _row_to_series(row) -> BookingSeries:
+        """Преобразование строки БД в объект BookingSeries"""
+        return BookingSeries(
+            id=row['id'],
+            user_id=row['user_id'],
+            username=row['username'],
+            table_id=row['table_id'],
+            start_time=datetime.fromisoformat(row['start_time']),
+            end_time=datetime.fromisoformat(row['end_time']),
+            phone=row['phone'],
+            created_at=datetime.fromisoformat(row['created_at']),
+            next_start=datetime.fromisoformat(row['next_start']),
+            interval_weeks=row['interval_weeks'],
+            status=row['status'],
+            venue_id=row['venue_id']
+        )
+
+    @staticmethod
+    def _row_to_registration(row) -> TournamentRegistration:
+        """Преобразование строки БД в объект TournamentRegistration"""
+        return TournamentRegistration(
+            id=row['id'],
+            user_id=row['user_id'],
+            username=row['username'],
+            full_name=row['full_name'],
+            phone=row['phone'],
+            created_at=datetime.fromisoformat(row['created_at']),
+            tournament_type=row['tournament_type'],
+            tournament_event=row['tournament_event'],
+            status=row['status'],
+            tournament_id=row['tournament_id']
+        )
+
+    @staticmethod
+    def _row_to_waitlist_entry(row) -> WaitlistEntry:
+        """Преобразование строки БД в объект WaitlistEntry"""
+        return WaitlistEntry(
+            id=row['id'],
+            tournament_id=row['tournament_id'],
+            tournament_type=row['tournament_type'],
+            position=row['position'],
+            user_id=row['user_id'],
+            username=row['username'],
+            full_name=row['full_name'],
+            phone=row['phone'],
+            created_at=datetime.fromisoformat(row['created_at']),
+            status=row['status'],
+            registration_id=row['registration_id']
+        )
+
+    @staticmethod
+    def _row_to_match(row) -> TournamentMatch:
+        """Преобразование строки БД в объект TournamentMatch"""
+        return TournamentMatch(
+            id=row['id'],
+            tournament_id=row['tournament_id'],
+            tournament_type=row['tournament_type'],
+            round=row['round'],
+            number=row['number'],
+            player1_id=row['player1_id'],
+            player2_id=row['player2_id'],
+            status=row['status'],
+            table_id=row['table_id'],
+            start_time=datetime.fromisoformat(row['start_time']) if row['start_time'] else None,
+            end_time=datetime.fromisoformat(row['end_time']) if row['end_time'] else None,
+            booking_id=row['booking_id']
+        )
+
+    @staticmethod
+    def _row_to_tournament(row) -> Tournament:
+        """Преобразование строки БД в объект Tournament (без дисциплин)"""
+        return Tournament(
+            id=row['id'],
+            title=row['title'],
+            starts_at=datetime.fromisoformat(row['starts_at']),
+            event_key=row['event_key'],
+            blocks_bookings=bool(row['blocks_bookings']),
+            is_active=bool(row['is_active'])
+        )
+
+    @staticmethod
+    def _row_to_division(row) -> TournamentDivision:
+        """Преобразование строки БД в объект TournamentDivision"""
+        return TournamentDivision(
+            id=row['id'],
+            tournament_id=row['tournament_id'],
+            code=row['code'],
+            name=row['name'],
+            max_participants=row['max_participants']
+        )
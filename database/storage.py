@@ -0,0 +1,174 @@
+"""
+Интерфейс хранилища бронирований, столов, заведений и регистраций на турнир
+"""
+from contextlib import AbstractContextManager
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Optional, Protocol, Tuple, Union
+
+from database import database
+from database.models import (
+    Venue, Table, Booking, Hold, Tournament, TournamentDivision, TournamentRegistration,
+    WaitlistEntry, DivisionOverview, Occupancy, OccupancySummary, SearchQuery, TournamentMatch,
+    BlockConflict, BookingSeries
+)
+
+
+class StorageBackend(Protocol):
+    """
+    Хранилище, на котором работают BookingRepository, HoldRepository,
+    TableRepository, VenueRepository и TournamentRepository.
+
+    Реализации: SQLiteBackend (по умолчанию) и MemoryBackend (словари и
+    отсортированные списки в памяти — для нагрузочных тестов и замеров без
+    диска). Их поведение должно совпадать — это проверяет
+    storage_conformance.py.
+
+    Порядок выборок: брони — по start_time, затем status DESC, затем id;
+    регулярные брони — по id;
+    турниры — по starts_at, затем id, дисциплины — по id;
+    регистрации — по created_at (без типа турнира — сначала по типу), затем id;
+    лист ожидания — по position (без типа турнира — сначала по типу);
+    сводки дисциплин — по tournament_id, затем типу (только дисциплины с
+    регистрациями или ожидающими);
+    матчи сетки — по round, затем number;
+    сводка занятости — по venue_id, table_id, weekday, hour (без нулевых строк);
+    результаты поиска — по времени (начало брони, время регистрации) от
+    новых к старым, затем брони раньше регистраций, затем id по убыванию.
+    Позицию новой записи в листе ожидания выбирает вызывающий (внутри
+    транзакции); повтор позиции в дисциплине — sqlite3.IntegrityError.
+    """
+
+    def transaction(self, immediate: bool = False) -> AbstractContextManager:
+        """Вызовы внутри выполняются атомарно (откатываются при исключении)"""
+
+    # Заведения и столы
+    def get_venues(self) -> List[Venue]: ...
+    def create_venue(self, venue: Venue) -> int: ...
+    def get_tables(self, venue_id: int) -> List[Table]: ...
+    def create_tables(self, venue_id: int, names: List[str]) -> int: ...
+
+    # Бронирования
+    def create_booking(self, booking: Booking) -> int: ...
+    def create_bookings(self, bookings: List[Booking]) -> List[int]: ...
+    def get_booking(self, booking_id: int) -> Optional[Booking]: ...
+    def get_bookings_by_ids(self, booking_ids: List[int]) -> List[Booking]: ...
+    def get_user_bookings(self, user_id: int, ends_after: datetime) -> List[Booking]: ...
+    def get_bookings(self, venue_ids: Optional[List[int]], start_from: datetime,
+                     start_to: datetime, active_only: bool) -> List[Booking]: ...
+    def cancel_booking(self, booking_id: int) -> bool: ...
+    def cancel_bookings(self, booking_ids: Iterable[int]) -> int: ...
+    def update_booking_end(self, booking_id: int, end_time: datetime) -> bool: ...
+    def has_booking_conflict(self, venue_id: int, table_id: Optional[int],
+                             start_time: datetime, end_time: datetime) -> bool: ...
+
+    # Слоты (стол, начало, конец), пересекающиеся с активными бронями или
+    # неистёкшими удержаниями, — одной выборкой, в порядке slots
+    def find_block_conflicts(self, venue_id: int, slots: List[Tuple[int, datetime, datetime]],
+                             now: datetime) -> List[BlockConflict]: ...
+
+    # Регулярные брони: get_due_series — активные серии с next_start < before
+    # и id > after_id (постранично), get_series_bookings — активные занятия
+    # серии, начинающиеся не раньше start_from; set_series_next_start
+    # принимает пары (ID серии, next_start)
+    def create_series(self, series: BookingSeries) -> int: ...
+    def get_series(self, series_id: int) -> Optional[BookingSeries]: ...
+    def get_user_series(self, user_id: int) -> List[BookingSeries]: ...
+    def get_due_series(self, before: datetime, after_id: int, limit: int) -> List[BookingSeries]: ...
+    def set_series_next_start(self, updates: List[Tuple[int, datetime]]) -> int: ...
+    def cancel_series(self, series_id: int) -> bool: ...
+    def get_series_bookings(self, series_id: int, start_from: datetime) -> List[Booking]: ...
+
+    # Временные удержания
+    def create_hold(self, hold: Hold) -> int: ...
+    def delete_holds(self, user_ids: Iterable[int]) -> int: ...
+    def delete_expired_holds(self, now: datetime) -> int: ...
+    def has_hold_conflict(self, venue_id: int, table_id: Optional[int], start_time: datetime,
+                          end_time: datetime, now: datetime,
+                          exclude_user: Optional[int]) -> bool: ...
+
+    # Турниры
+    def get_tournaments(self) -> List[Tournament]: ...
+    def create_tournament(self, tournament: Tournament) -> int: ...
+    def create_division(self, division: TournamentDivision) -> int: ...
+    def set_tournament_active(self, tournament_id: int, is_active: bool) -> bool: ...
+
+    # Регистрации на турнир
+    def create_registration(self, registration: TournamentRegistration) -> int: ...
+    def count_active_registrations(self, tournament_id: int, tournament_type: Optional[str]) -> int: ...
+    def get_registrations(self, tournament_id: int, tournament_type: Optional[str],
+                          active_only: bool) -> List[TournamentRegistration]: ...
+    def get_user_registration(self, user_id: int, tournament_id: int,
+                              tournament_type: Optional[str]) -> Optional[TournamentRegistration]: ...
+    def get_registration(self, registration_id: int) -> Optional[TournamentRegistration]: ...
+    def cancel_registration(self, registration_id: int) -> bool: ...
+
+    # Лист ожидания (выборки — только ожидающие записи)
+    def create_waitlist_entry(self, entry: WaitlistEntry) -> int: ...
+    def get_last_waitlist_position(self, tournament_id: int, tournament_type: str) -> int: ...
+    def get_next_waitlist_entry(self, tournament_id: int,
+                                tournament_type: str) -> Optional[WaitlistEntry]: ...
+    def count_waitlist(self, tournament_id: int, tournament_type: Optional[str],
+                       before_position: Optional[int]) -> int: ...
+    def get_waitlist(self, tournament_id: int,
+                     tournament_type: Optional[str]) -> List[WaitlistEntry]: ...
+    def get_user_waitlist_entry(self, user_id: int, tournament_id: int,
+                                tournament_type: Optional[str]) -> Optional[WaitlistEntry]: ...
+    def set_waitlist_status(self, entry_id: int, status: str,
+                            registration_id: Optional[int] = None) -> bool: ...
+
+    # Сводка для админ-панели: счётчики по статусам, активные и ожидающие одной выборкой
+    def get_tournament_overview(self, tournament_ids: List[int]) -> List[DivisionOverview]: ...
+
+    # Выгрузки: потоковое чтение пачками по batch_size строк (порядок — как у
+    # get_bookings и get_registrations; status=None — любой статус)
+    def iter_bookings(self, venue_ids: Optional[List[int]], start_from: datetime,
+                      start_to: datetime, table_id: Optional[int], status: Optional[str],
+                      batch_size: int) -> Iterator[Booking]: ...
+    def iter_registrations(self, tournament_id: int, tournament_type: Optional[str],
+                           status: Optional[str], batch_size: int) -> Iterator[TournamentRegistration]: ...
+
+    # Поиск (/find): брони заведений venue_ids (None — всех) и, если
+    # include_registrations, регистрации на турниры, подходящие под query
+    def search(self, query: SearchQuery, venue_ids: Optional[List[int]],
+               include_registrations: bool, limit: int,
+               offset: int) -> List[Union[Booking, TournamentRegistration]]: ...
+
+    # Агрегат занятости: add_occupancy прибавляет значения к строкам с тем же
+    # (work_day, venue_id, table_id, hour), создавая недостающие
+    def add_occupancy(self, rows: List[Occupancy]) -> None: ...
+    def clear_occupancy(self) -> int: ...
+    def get_occupancy(self) -> List[Occupancy]: ...
+    def get_occupancy_summary(self, venue_ids: Optional[List[int]], day_from: date,
+                              day_to: date) -> List[OccupancySummary]: ...
+
+    # Турнирная сетка (save_matches — вставка или замена по позиции матча)
+    def get_matches(self, tournament_id: int, tournament_type: str) -> List[TournamentMatch]: ...
+    def save_matches(self, matches: List[TournamentMatch]) -> int: ...
+
+
+_backend: Optional[StorageBackend] = None
+
+
+def get_backend() -> StorageBackend:
+    """Текущее хранилище (при первом обращении — SQLite)"""
+    global _backend
+    if _backend is None:
+        from database.sqlite_backend import SQLiteBackend
+        _backend = SQLiteBackend()
+    return _backend
+
+
+def set_backend(backend: StorageBackend):
+    """
+    Замена хранилища (до запуска бота).
+
+    Транзакция хранилища становится частью transaction(), так что код
+    хендлеров не меняется. Outbox, FSM и остальные служебные таблицы
+    по-прежнему в SQLite.
+    """
+    global _backend
+    _backend = backend
+    if backend.transaction is database.transaction:
+        database.backend_transaction = None
+    else:
+        database.backend_transaction = backend.transaction
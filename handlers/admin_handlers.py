@@ -1,38 +1,97 @@
 """
 Обработчики команд администраторов
 """
+import asyncio
 import logging
+import re
+import sqlite3
 from datetime import datetime, timedelta
-from aiogram import Router, F
+from typing import Dict, Iterator, List, Optional, Tuple
+from aiogram import Router, F, flags
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
 from config import settings
-from database.repository import BookingRepository, TableRepository, TournamentRepository
+from database.database import transaction
+from database.models import DEFAULT_VENUE_ID, BlockConflict, Booking, DivisionOverview, Tournament
+from database.repository import (
+    BookingRepository, OccupancyRepository, SearchRepository, TableRepository, TournamentRepository,
+    VenueRepository
+)
+from handlers.tournament_handlers import promote_from_waitlist
 from keyboards.keyboards import (
     get_admin_keyboard, get_main_menu_keyboard,
     get_admin_dates_keyboard, get_admin_bookings_keyboard,
     get_admin_booking_detail_keyboard, get_admin_edit_duration_keyboard,
-    get_admin_block_dates_keyboard, get_admin_block_times_keyboard,
-    get_admin_block_duration_keyboard, get_admin_block_tables_keyboard
+    get_admin_block_venues_keyboard, get_admin_block_dates_keyboard, get_admin_block_times_keyboard,
+    get_admin_block_duration_keyboard, get_admin_block_tables_keyboard, get_admin_block_repeat_keyboard,
+    get_admin_find_keyboard, BLOCK_REPEAT_WEEKS
 )
 from utils.time_utils import (
-    format_datetime, format_date, get_available_dates, 
-    get_available_times, is_valid_booking_time
+    format_datetime, format_date, format_time, get_available_dates,
+    get_available_times, get_closing_time, is_valid_booking_time
 )
+from middlewares.api_metrics import api_latency, api_errors, api_retry_after, api_in_flight
+from middlewares.callback_dedup import callback_duplicates
+from middlewares.throttling import throttled_updates
+from middlewares.user_lock import user_lock_wait, user_lock_contended
 from states.booking_states import AdminBlockStates
+from utils.bracket import generate_bracket, render_bracket
+from utils.occupancy import build_occupancy_report
+from utils.search import parse_search_query, render_search_results
+from utils.export import DOCUMENT_LIMIT_BYTES, Export, SpooledInputFile, export_bookings, export_registrations
+from utils.notifier import notifier
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+EXPORT_USAGE = (
+    "⚠️ Использование:\n"
+    "/export bookings ДД.ММ.ГГГГ [ДД.ММ.ГГГГ] [table=<ID стола>] [status=active|cancelled]\n"
+    "/export tournament <ID турнира> [<код>] [status=active|cancelled]\n\n"
+    "Пример: /export bookings 01.12.2026 31.12.2026 status=active"
+)
+
+# Сколько пропущенных слотов пакетной блокировки перечислять в ответе
+BLOCK_CONFLICTS_SHOWN = 20
+
+FIND_USAGE = (
+    "⚠️ Использование: /find <запрос>\n\n"
+    "• #123 или 123 — бронь по ID\n"
+    "• 4567, +7 999 123-45-67 — по последним цифрам телефона (от 4)\n"
+    "• @username или часть имени — от 3 символов"
+)
+
+TOURNAMENT_COMMANDS_HELP = (
+    "🛠 Управление турнирами:\n"
+    "/tournament_add ДД.ММ.ГГГГ ЧЧ:ММ <название>\n"
+    "/tournament_division <ID турнира> <код> <мест> <название>\n"
+    "/tournament_close <ID турнира>\n"
+    "/bracket <ID турнира> <код> — сетка и столы под матчи"
+)
+
 
 def is_admin(user_id: int) -> bool:
-    """Проверка прав администратора"""
-    return settings.is_admin(user_id)
+    """Проверка прав администратора (всех заведений или хотя бы одного)"""
+    return VenueRepository.is_admin(user_id)
+
+
+def can_manage(user_id: int, booking: Booking) -> bool:
+    """Бронь относится к заведению, которым управляет администратор"""
+    return booking.venue_id in VenueRepository.get_admin_venue_ids(user_id)
+
+
+def venue_label(venue_id: int, indent: str = "") -> str:
+    """Строка с заведением для сообщений (только если заведений несколько)"""
+    if len(VenueRepository.get_all_venues()) < 2:
+        return ""
+    venue = VenueRepository.get_venue(venue_id)
+    return f"{indent}🏢 {venue.name if venue else venue_id}\n"
 
 
 @router.message(F.text == "⚙️ Админ-панель")
+@flags.throttling("admin")
 async def admin_panel(message: Message):
     """Открытие админ-панели"""
     if not is_admin(message.from_user.id):
@@ -46,6 +105,7 @@ async def admin_panel(message: Message):
 
 
 @router.callback_query(F.data == "admin_bookings")
+@flags.throttling("admin")
 async def admin_view_bookings(callback: CallbackQuery):
     """Просмотр броней по датам"""
     if not is_admin(callback.from_user.id):
@@ -65,6 +125,7 @@ async def admin_view_bookings(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("admin_date:"))
+@flags.throttling("admin")
 async def admin_show_date_bookings(callback: CallbackQuery):
     """Показать брони на выбранную дату"""
     if not is_admin(callback.from_user.id):
@@ -74,7 +135,9 @@ async def admin_show_date_bookings(callback: CallbackQuery):
     date_str = callback.data.split(":")[1]
     selected_date = datetime.strptime(date_str, "%Y-%m-%d")
     
-    bookings = BookingRepository.get_bookings_by_date(selected_date)
+    bookings = BookingRepository.get_bookings_by_date(
+        selected_date, VenueRepository.get_admin_venue_ids(callback.from_user.id)
+    )
     
     if not bookings:
         await callback.message.edit_text(
@@ -93,6 +156,7 @@ async def admin_show_date_bookings(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("admin_booking:"))
+@flags.throttling("admin")
 async def admin_show_booking_detail(callback: CallbackQuery):
     """Показать детали бронирования админу"""
     if not is_admin(callback.from_user.id):
@@ -105,11 +169,11 @@ async def admin_show_booking_detail(callback: CallbackQuery):
     
     booking = BookingRepository.get_booking_by_id(booking_id)
     
-    if not booking:
+    if not booking or not can_manage(callback.from_user.id, booking):
         await callback.answer("❌ Бронирование не найдено", show_alert=True)
         return
     
-    table = TableRepository.get_table_by_id(booking.table_id)
+    table = TableRepository.get_table_by_id(booking.table_id, booking.venue_id)
     table_name = table.name if table else f"Стол #{booking.table_id}"
     
     status_emoji = "✅" if booking.status == "active" else "❌"
@@ -118,6 +182,7 @@ async def admin_show_booking_detail(callback: CallbackQuery):
     text = (
         f"📋 Бронирование #{booking.id}\n\n"
         f"{status_emoji} Статус: {status_text}\n"
+        f"{venue_label(booking.venue_id)}"
         f"📅 Дата и время: {format_datetime(booking.start_time)}\n"
         f"⏱ Длительность: {booking.duration_hours} ч\n"
         f"🕐 Окончание: {format_datetime(booking.end_time)}\n"
@@ -136,6 +201,7 @@ async def admin_show_booking_detail(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("admin_cancel:"))
+@flags.throttling("admin")
 async def admin_cancel_booking(callback: CallbackQuery):
     """Отмена бронирования администратором через callback"""
     if not is_admin(callback.from_user.id):
@@ -148,7 +214,7 @@ async def admin_cancel_booking(callback: CallbackQuery):
     
     booking = BookingRepository.get_booking_by_id(booking_id)
     
-    if not booking:
+    if not booking or not can_manage(callback.from_user.id, booking):
         await callback.answer("❌ Бронирование не найдено", show_alert=True)
         return
     
@@ -156,40 +222,35 @@ async def admin_cancel_booking(callback: CallbackQuery):
         await callback.answer("⚠️ Бронирование уже отменено", show_alert=True)
         return
     
-    # Отмена брони
-    if BookingRepository.cancel_booking(booking_id):
-        table = TableRepository.get_table_by_id(booking.table_id)
-        table_name = table.name if table else f"Стол #{booking.table_id}"
-        
-        # Уведомление пользователя
-        try:
-            await callback.bot.send_message(
-                booking.user_id,
-                f"❌ Ваше бронирование #{booking_id} было отменено администратором\n\n"
-                f"📅 {format_datetime(booking.start_time)}\n"
-                f"⏱ {booking.duration_hours} ч\n"
-                f"🎱 {table_name}\n\n"
-                f"По вопросам обращайтесь к администрации."
+    table = TableRepository.get_table_by_id(booking.table_id, booking.venue_id)
+    table_name = table.name if table else f"Стол #{booking.table_id}"
+    
+    user_text = (
+        f"❌ Ваше бронирование #{booking_id} было отменено администратором\n\n"
+        f"📅 {format_datetime(booking.start_time)}\n"
+        f"⏱ {booking.duration_hours} ч\n"
+        f"🎱 {table_name}\n\n"
+        f"По вопросам обращайтесь к администрации."
+    )
+    admin_text = (
+        f"ℹ️ Администратор @{callback.from_user.username or 'без username'} "
+        f"отменил бронирование #{booking_id}\n\n"
+        f"📅 {format_datetime(booking.start_time)}\n"
+        f"🎱 {table_name}\n"
+        f"👤 Пользователь: @{booking.username or 'без username'}"
+    )
+    
+    # Отмена брони и уведомления — одной транзакцией
+    with transaction():
+        cancelled = BookingRepository.cancel_booking(booking_id)
+        if cancelled:
+            if booking.user_id:
+                notifier.notify([booking.user_id], user_text)
+            notifier.notify_admins(
+                admin_text, exclude=callback.from_user.id, venue_id=booking.venue_id
             )
-        except Exception as e:
-            logger.error(f"Не удалось уведомить пользователя {booking.user_id}: {e}")
-        
-        # Уведомление других администраторов
-        admin_text = (
-            f"ℹ️ Администратор @{callback.from_user.username or 'без username'} "
-            f"отменил бронирование #{booking_id}\n\n"
-            f"📅 {format_datetime(booking.start_time)}\n"
-            f"🎱 {table_name}\n"
-            f"👤 Пользователь: @{booking.username or 'без username'}"
-        )
-        
-        for admin_id in settings.ADMIN_IDS:
-            if admin_id != callback.from_user.id:
-                try:
-                    await callback.bot.send_message(admin_id, admin_text)
-                except Exception as e:
-                    logger.error(f"Не удалось уведомить админа {admin_id}: {e}")
-        
+    
+    if cancelled:
         await callback.answer("✅ Бронирование отменено", show_alert=True)
         
         # Обновление сообщения
@@ -199,6 +260,7 @@ async def admin_cancel_booking(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("admin_back_to_date:"))
+@flags.throttling("admin")
 async def admin_back_to_date(callback: CallbackQuery):
     """Вернуться к списку броней на дату"""
     if not is_admin(callback.from_user.id):
@@ -208,7 +270,9 @@ async def admin_back_to_date(callback: CallbackQuery):
     date_str = callback.data.split(":")[1]
     selected_date = datetime.strptime(date_str, "%Y-%m-%d")
     
-    bookings = BookingRepository.get_bookings_by_date(selected_date)
+    bookings = BookingRepository.get_bookings_by_date(
+        selected_date, VenueRepository.get_admin_venue_ids(callback.from_user.id)
+    )
     
     await callback.message.edit_text(
         f"📋 Бронирования на {format_date(selected_date)}:\n\n"
@@ -219,6 +283,7 @@ async def admin_back_to_date(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "admin_back_to_dates")
+@flags.throttling("admin")
 async def admin_back_to_dates(callback: CallbackQuery):
     """Вернуться к выбору дат"""
     if not is_admin(callback.from_user.id):
@@ -237,6 +302,7 @@ async def admin_back_to_dates(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "admin_back_to_panel")
+@flags.throttling("admin")
 async def admin_back_to_panel(callback: CallbackQuery, state: FSMContext):
     """Вернуться в админ-панель"""
     if not is_admin(callback.from_user.id):
@@ -255,6 +321,7 @@ async def admin_back_to_panel(callback: CallbackQuery, state: FSMContext):
 # === РЕДАКТИРОВАНИЕ ДЛИТЕЛЬНОСТИ ===
 
 @router.callback_query(F.data.startswith("admin_edit:"))
+@flags.throttling("admin")
 async def admin_edit_booking(callback: CallbackQuery):
     """Начало редактирования длительности брони"""
     if not is_admin(callback.from_user.id):
@@ -267,7 +334,7 @@ async def admin_edit_booking(callback: CallbackQuery):
     
     booking = BookingRepository.get_booking_by_id(booking_id)
     
-    if not booking or booking.status != 'active':
+    if not booking or booking.status != 'active' or not can_manage(callback.from_user.id, booking):
         await callback.answer("❌ Бронирование не найдено или отменено", show_alert=True)
         return
     
@@ -282,6 +349,7 @@ async def admin_edit_booking(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("admin_set_duration:"))
+@flags.throttling("admin")
 async def admin_set_duration(callback: CallbackQuery):
     """Установка новой длительности"""
     if not is_admin(callback.from_user.id):
@@ -295,12 +363,13 @@ async def admin_set_duration(callback: CallbackQuery):
     
     booking = BookingRepository.get_booking_by_id(booking_id)
     
-    if not booking:
+    if not booking or not can_manage(callback.from_user.id, booking):
         await callback.answer("❌ Бронирование не найдено", show_alert=True)
         return
     
     # Проверка, что новая длительность не выходит за часы работы
-    if not is_valid_booking_time(booking.start_time, new_duration):
+    venue = VenueRepository.get_venue(booking.venue_id)
+    if not is_valid_booking_time(booking.start_time, new_duration, venue):
         await callback.answer(
             "⚠️ Новая длительность выходит за часы работы клуба",
             show_alert=True
@@ -310,18 +379,40 @@ async def admin_set_duration(callback: CallbackQuery):
     # Проверка конфликтов с другими бронированиями
     new_end_time = booking.start_time + timedelta(hours=new_duration)
     
-    # Проверяем конфликты (исключая текущую бронь)
-    with_conflict = False
-    all_bookings = BookingRepository.get_bookings_by_date(booking.start_time)
+    table = TableRepository.get_table_by_id(booking.table_id, booking.venue_id)
+    table_name = table.name if table else f"Стол #{booking.table_id}"
+    
+    user_text = (
+        f"ℹ️ Длительность вашего бронирования #{booking_id} была изменена администратором\n\n"
+        f"📅 {format_datetime(booking.start_time)}\n"
+        f"⏱ Старая длительность: {booking.duration_hours} ч\n"
+        f"⏱ Новая длительность: {new_duration} ч\n"
+        f"🎱 {table_name}"
+    )
     
-    for other_booking in all_bookings:
-        if (other_booking.id != booking_id and 
-            other_booking.status == 'active' and
-            other_booking.table_id == booking.table_id and
-            other_booking.start_time < new_end_time and 
-            other_booking.end_time > booking.start_time):
-            with_conflict = True
-            break
+    # Проверка конфликтов (исключая текущую бронь) и обновление — одной
+    # транзакцией, с блокировкой записи с самого начала
+    with_conflict = False
+    updated = False
+    with transaction(immediate=True):
+        all_bookings = BookingRepository.get_bookings_by_date(
+            booking.start_time, [booking.venue_id]
+        )
+        
+        for other_booking in all_bookings:
+            if (other_booking.id != booking_id and 
+                other_booking.status == 'active' and
+                other_booking.table_id == booking.table_id and
+                other_booking.start_time < new_end_time and 
+                other_booking.end_time > booking.start_time):
+                with_conflict = True
+                break
+        
+        if not with_conflict:
+            updated = BookingRepository.update_booking_duration(booking_id, new_duration)
+            if updated and booking.user_id:
+                # Уведомление пользователя
+                notifier.notify([booking.user_id], user_text)
     
     if with_conflict:
         await callback.answer(
@@ -330,24 +421,7 @@ async def admin_set_duration(callback: CallbackQuery):
         )
         return
     
-    # Обновляем длительность
-    if BookingRepository.update_booking_duration(booking_id, new_duration):
-        table = TableRepository.get_table_by_id(booking.table_id)
-        table_name = table.name if table else f"Стол #{booking.table_id}"
-        
-        # Уведомление пользователя
-        try:
-            await callback.bot.send_message(
-                booking.user_id,
-                f"ℹ️ Длительность вашего бронирования #{booking_id} была изменена администратором\n\n"
-                f"📅 {format_datetime(booking.start_time)}\n"
-                f"⏱ Старая длительность: {booking.duration_hours} ч\n"
-                f"⏱ Новая длительность: {new_duration} ч\n"
-                f"🎱 {table_name}"
-            )
-        except Exception as e:
-            logger.error(f"Не удалось уведомить пользователя {booking.user_id}: {e}")
-        
+    if updated:
         await callback.answer("✅ Длительность успешно изменена", show_alert=True)
         
         # Возвращаемся к деталям брони
@@ -359,6 +433,7 @@ async def admin_set_duration(callback: CallbackQuery):
         text = (
             f"📋 Бронирование #{updated_booking.id}\n\n"
             f"{status_emoji} Статус: {status_text}\n"
+            f"{venue_label(updated_booking.venue_id)}"
             f"📅 Дата и время: {format_datetime(updated_booking.start_time)}\n"
             f"⏱ Длительность: {updated_booking.duration_hours} ч\n"
             f"🕐 Окончание: {format_datetime(updated_booking.end_time)}\n"
@@ -380,6 +455,7 @@ async def admin_set_duration(callback: CallbackQuery):
 # === БЛОКИРОВКА БРОНЕЙ ===
 
 @router.callback_query(F.data == "admin_block_booking")
+@flags.throttling("admin")
 async def admin_start_block(callback: CallbackQuery, state: FSMContext):
     """Начало процесса блокировки"""
     if not is_admin(callback.from_user.id):
@@ -387,6 +463,21 @@ async def admin_start_block(callback: CallbackQuery, state: FSMContext):
         return
     
     await state.clear()
+    
+    venue_ids = VenueRepository.get_admin_venue_ids(callback.from_user.id)
+    venues = [venue for venue in VenueRepository.get_all_venues() if venue.id in venue_ids]
+    if len(venues) > 1:
+        await callback.message.edit_text(
+            "🔒 Блокировка времени для бронирования\n\n"
+            "Выберите заведение:",
+            reply_markup=get_admin_block_venues_keyboard(venues)
+        )
+        await state.set_state(AdminBlockStates.choosing_venue)
+        await callback.answer()
+        return
+    
+    if venues:
+        await state.update_data(venue_id=venues[0].id)
     dates = get_available_dates()
     
     await callback.message.edit_text(
@@ -398,7 +489,30 @@ async def admin_start_block(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
+@router.callback_query(F.data.startswith("admin_block_venue:"), AdminBlockStates.choosing_venue)
+@flags.throttling("admin")
+async def admin_block_process_venue(callback: CallbackQuery, state: FSMContext):
+    """Обработка выбора заведения для блокировки"""
+    venue_id = int(callback.data.split(":")[1])
+    if venue_id not in VenueRepository.get_admin_venue_ids(callback.from_user.id):
+        await callback.answer("⚠️ У вас нет доступа", show_alert=True)
+        return
+    
+    await state.update_data(venue_id=venue_id)
+    venue = VenueRepository.get_venue(venue_id)
+    
+    await callback.message.edit_text(
+        f"🔒 Блокировка времени для бронирования\n"
+        f"🏢 {venue.name}\n\n"
+        f"Выберите дату:",
+        reply_markup=get_admin_block_dates_keyboard(get_available_dates())
+    )
+    await state.set_state(AdminBlockStates.choosing_date)
+    await callback.answer()
+
+
 @router.callback_query(F.data.startswith("admin_block_date:"), AdminBlockStates.choosing_date)
+@flags.throttling("admin")
 async def admin_block_process_date(callback: CallbackQuery, state: FSMContext):
     """Обработка выбора даты для блокировки"""
     if not is_admin(callback.from_user.id):
@@ -409,8 +523,11 @@ async def admin_block_process_date(callback: CallbackQuery, state: FSMContext):
     selected_date = datetime.strptime(date_str, "%Y-%m-%d")
     
     await state.update_data(selected_date=selected_date)
+    data = await state.get_data()
     
-    times = get_available_times(selected_date)
+    times = get_available_times(
+        selected_date, VenueRepository.get_venue(data.get('venue_id', DEFAULT_VENUE_ID))
+    )
     
     if not times:
         await callback.answer("На эту дату нет доступных слотов", show_alert=True)
@@ -425,6 +542,7 @@ async def admin_block_process_date(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("admin_block_time:"), AdminBlockStates.choosing_time)
+@flags.throttling("admin")
 async def admin_block_process_time(callback: CallbackQuery, state: FSMContext):
     """Обработка выбора времени для блокировки"""
     if not is_admin(callback.from_user.id):
@@ -445,100 +563,188 @@ async def admin_block_process_time(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("admin_block_duration:"), AdminBlockStates.choosing_duration)
+@flags.throttling("admin")
 async def admin_block_process_duration(callback: CallbackQuery, state: FSMContext):
-    """Обработка выбора длительности блокировки"""
+    """Обработка выбора длительности блокировки (в часах или до закрытия)"""
     if not is_admin(callback.from_user.id):
         await callback.answer("⚠️ У вас нет доступа", show_alert=True)
         return
     
-    duration = int(callback.data.split(":")[1])
+    value = callback.data.split(":")[1]
     data = await state.get_data()
     
     start_time = data['selected_time']
-    end_time = start_time + timedelta(hours=duration)
-    
-    # Проверка, что блокировка не выходит за часы работы
-    if not is_valid_booking_time(start_time, duration):
-        await callback.answer(
-            "⚠️ Блокировка выходит за часы работы клуба",
-            show_alert=True
-        )
-        return
-    
-    await state.update_data(duration=duration, end_time=end_time)
+    venue_id = data.get('venue_id', DEFAULT_VENUE_ID)
+    venue = VenueRepository.get_venue(venue_id)
     
-    tables = TableRepository.get_all_tables()
+    if value == "close":
+        end_time = get_closing_time(start_time, venue)
+    else:
+        duration = int(value)
+        end_time = start_time + timedelta(hours=duration)
+        # Проверка, что блокировка не выходит за часы работы
+        if not is_valid_booking_time(start_time, duration, venue):
+            await callback.answer(
+                "⚠️ Блокировка выходит за часы работы клуба",
+                show_alert=True
+            )
+            return
     
-    await callback.message.edit_text(
-        "🎱 Выберите стол для блокировки:",
-        reply_markup=get_admin_block_tables_keyboard(tables)
-    )
+    await state.update_data(end_time=end_time, table_ids=[])
+    await show_block_tables(callback.message, venue_id, [])
     await state.set_state(AdminBlockStates.choosing_table)
     await callback.answer()
 
 
+async def show_block_tables(message: Message, venue_id: int, selected: List[int]):
+    """Шаг выбора столов для блокировки"""
+    await message.edit_text(
+        "🎱 Выберите столы для блокировки (можно несколько):",
+        reply_markup=get_admin_block_tables_keyboard(TableRepository.get_all_tables(venue_id), selected)
+    )
+
+
 @router.callback_query(F.data.startswith("admin_block_table:"), AdminBlockStates.choosing_table)
-async def admin_block_process_table(callback: CallbackQuery, state: FSMContext):
-    """Обработка выбора стола и создание блокировки"""
+@flags.throttling("admin")
+async def admin_block_toggle_table(callback: CallbackQuery, state: FSMContext):
+    """Выбор стола для блокировки или снятие выбора (all — все столы)"""
     if not is_admin(callback.from_user.id):
         await callback.answer("⚠️ У вас нет доступа", show_alert=True)
         return
     
-    table_id = int(callback.data.split(":")[1])
+    value = callback.data.split(":")[1]
     data = await state.get_data()
+    venue_id = data.get('venue_id', DEFAULT_VENUE_ID)
+    tables = TableRepository.get_all_tables(venue_id)
+    selected = data.get('table_ids', [])
     
-    start_time = data['selected_time']
-    end_time = data['end_time']
+    if value == "all":
+        selected = [] if len(selected) == len(tables) else [table.id for table in tables]
+    else:
+        table_id = int(value)
+        if table_id not in {table.id for table in tables}:
+            await callback.answer("❌ Стол не найден", show_alert=True)
+            return
+        if table_id in selected:
+            selected = [selected_id for selected_id in selected if selected_id != table_id]
+        else:
+            selected = selected + [table_id]
     
-    # Проверка доступности
-    is_available = BookingRepository.check_availability(
-        table_id, start_time, end_time
+    await state.update_data(table_ids=selected)
+    await callback.message.edit_reply_markup(
+        reply_markup=get_admin_block_tables_keyboard(tables, selected)
     )
+    await callback.answer()
+
+
+@router.callback_query(F.data == "admin_block_tables_done", AdminBlockStates.choosing_table)
+@flags.throttling("admin")
+async def admin_block_tables_done(callback: CallbackQuery, state: FSMContext):
+    """Столы выбраны — выбор повтора"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⚠️ У вас нет доступа", show_alert=True)
+        return
     
-    if not is_available:
-        await callback.answer(
-            "⚠️ Выбранное время уже занято на этом столе",
-            show_alert=True
-        )
+    data = await state.get_data()
+    if not data.get('table_ids'):
+        await callback.answer("⚠️ Выберите хотя бы один стол", show_alert=True)
         return
     
-    # Создание блокировки
-    booking_id = BookingRepository.create_blocked_booking(
-        table_id,
-        start_time,
-        end_time,
-        callback.from_user.username or str(callback.from_user.id)
+    await callback.message.edit_text(
+        f"🔁 Блокировка {format_datetime(data['selected_time'])}–{format_time(data['end_time'])}, "
+        f"столов: {len(data['table_ids'])}\n\n"
+        f"Повторять каждую неделю?",
+        reply_markup=get_admin_block_repeat_keyboard()
     )
+    await state.set_state(AdminBlockStates.choosing_repeat)
+    await callback.answer()
+
+
+def block_summary(start_time: datetime, end_time: datetime, weeks: int, table_names: List[str],
+                  venue_id: int) -> str:
+    """Описание пакетной блокировки: время, повтор и столы"""
+    repeat = f"\n🔁 Каждую неделю, {weeks} нед." if weeks > 1 else ""
+    return (
+        f"{venue_label(venue_id)}"
+        f"📅 {format_datetime(start_time)}–{format_time(end_time)}{repeat}\n"
+        f"🎱 {', '.join(table_names)}"
+    )
+
+
+def block_conflict_lines(conflicts: List[BlockConflict], table_names: Dict[int, str]) -> List[str]:
+    """Строки о пропущенных занятых слотах (не больше BLOCK_CONFLICTS_SHOWN)"""
+    lines = []
+    for conflict in conflicts[:BLOCK_CONFLICTS_SHOWN]:
+        reason = f"бронь #{conflict.booking_id}" if conflict.booking_id else "клиент оформляет бронь"
+        lines.append(
+            f"• {format_datetime(conflict.start_time)} "
+            f"{table_names.get(conflict.table_id, f'Стол #{conflict.table_id}')} — {reason}"
+        )
+    if len(conflicts) > BLOCK_CONFLICTS_SHOWN:
+        lines.append(f"… и ещё {len(conflicts) - BLOCK_CONFLICTS_SHOWN}")
+    return lines
+
+
+@router.callback_query(F.data.startswith("admin_block_repeat:"), AdminBlockStates.choosing_repeat)
+@flags.throttling("admin")
+async def admin_block_process_repeat(callback: CallbackQuery, state: FSMContext):
+    """Обработка выбора повтора и создание блокировок"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⚠️ У вас нет доступа", show_alert=True)
+        return
     
-    table = TableRepository.get_table_by_id(table_id)
-    table_name = table.name if table else f"Стол #{table_id}"
+    weeks = int(callback.data.split(":")[1])
+    if weeks not in BLOCK_REPEAT_WEEKS:
+        await callback.answer("❌ Неверный повтор", show_alert=True)
+        return
+    data = await state.get_data()
     
-    await callback.message.edit_text(
-        f"✅ Время успешно заблокировано!\n\n"
-        f"📋 Блокировка #{booking_id}\n"
-        f"📅 {format_datetime(start_time)}\n"
-        f"⏱ Длительность: {data['duration']} ч\n"
-        f"🎱 Стол: {table_name}\n\n"
-        f"Это время недоступно для обычных бронирований."
+    start_time = data['selected_time']
+    end_time = data['end_time']
+    venue_id = data.get('venue_id', DEFAULT_VENUE_ID)
+    table_names = {table.id: table.name for table in TableRepository.get_all_tables(venue_id)}
+    table_ids = [table_id for table_id in data.get('table_ids', []) if table_id in table_names]
+    if not table_ids:
+        await callback.answer("❌ Стол не найден", show_alert=True)
+        return
+    summary = block_summary(
+        start_time, end_time, weeks, [table_names[table_id] for table_id in table_ids], venue_id
     )
     
-    # Уведомление других админов
-    admin_text = (
-        f"🔒 Администратор @{callback.from_user.username or 'без username'} "
-        f"заблокировал время\n\n"
-        f"📋 Блокировка #{booking_id}\n"
-        f"📅 {format_datetime(start_time)}\n"
-        f"⏱ {data['duration']} ч\n"
-        f"🎱 {table_name}"
-    )
+    # Проверка всех слотов, создание блокировок и уведомление других
+    # админов — одной транзакцией, с блокировкой записи с самого начала
+    with transaction(immediate=True):
+        booking_ids, conflicts = BookingRepository.create_bulk_blocks(
+            table_ids,
+            start_time,
+            end_time,
+            callback.from_user.username or str(callback.from_user.id),
+            weeks=weeks,
+            venue_id=venue_id
+        )
+        if booking_ids:
+            admin_text = (
+                f"🔒 Администратор @{callback.from_user.username or 'без username'} "
+                f"заблокировал время\n\n"
+                f"📋 Блокировок: {len(booking_ids)}\n"
+                f"{summary}"
+            )
+            notifier.notify_admins(admin_text, exclude=callback.from_user.id, venue_id=venue_id)
     
-    for admin_id in settings.ADMIN_IDS:
-        if admin_id != callback.from_user.id:
-            try:
-                await callback.bot.send_message(admin_id, admin_text)
-            except Exception as e:
-                logger.error(f"Не удалось уведомить админа {admin_id}: {e}")
+    total = len(table_ids) * weeks
+    if booking_ids:
+        text = f"✅ Заблокировано слотов: {len(booking_ids)} из {total}\n\n{summary}"
+    else:
+        text = f"⚠️ Ничего не заблокировано — все слоты заняты\n\n{summary}"
+    if conflicts:
+        text += (
+            f"\n\n⚠️ Пропущено занятых слотов: {len(conflicts)}\n"
+            + "\n".join(block_conflict_lines(conflicts, table_names))
+        )
+    if booking_ids:
+        text += "\n\nЭто время недоступно для обычных бронирований."
     
+    await callback.message.edit_text(text)
     await callback.message.answer(
         "⚙️ Админ-панель",
         reply_markup=get_admin_keyboard()
@@ -551,6 +757,7 @@ async def admin_block_process_table(callback: CallbackQuery, state: FSMContext):
 # Навигация для блокировки
 
 @router.callback_query(F.data == "admin_block_back_to_time")
+@flags.throttling("admin")
 async def admin_block_back_to_time(callback: CallbackQuery, state: FSMContext):
     """Возврат к выбору времени"""
     if not is_admin(callback.from_user.id):
@@ -558,7 +765,9 @@ async def admin_block_back_to_time(callback: CallbackQuery, state: FSMContext):
         return
     
     data = await state.get_data()
-    times = get_available_times(data['selected_date'])
+    times = get_available_times(
+        data['selected_date'], VenueRepository.get_venue(data.get('venue_id', DEFAULT_VENUE_ID))
+    )
     
     await callback.message.edit_text(
         "🕐 Выберите время начала блокировки:",
@@ -568,7 +777,24 @@ async def admin_block_back_to_time(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
+@router.callback_query(F.data == "admin_block_back_to_tables")
+@flags.throttling("admin")
+async def admin_block_back_to_tables(callback: CallbackQuery, state: FSMContext):
+    """Возврат к выбору столов"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⚠️ У вас нет доступа", show_alert=True)
+        return
+    
+    data = await state.get_data()
+    await show_block_tables(
+        callback.message, data.get('venue_id', DEFAULT_VENUE_ID), data.get('table_ids', [])
+    )
+    await state.set_state(AdminBlockStates.choosing_table)
+    await callback.answer()
+
+
 @router.callback_query(F.data == "admin_block_back_to_duration")
+@flags.throttling("admin")
 async def admin_block_back_to_duration(callback: CallbackQuery, state: FSMContext):
     """Возврат к выбору длительности"""
     if not is_admin(callback.from_user.id):
@@ -583,81 +809,93 @@ async def admin_block_back_to_duration(callback: CallbackQuery, state: FSMContex
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_tournament")
-async def admin_view_tournament(callback: CallbackQuery):
-    """Просмотр участников турнира"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("⚠️ У вас нет доступа", show_alert=True)
-        return
-    
-    sections = []
-    has_registrations = False
-    
-    for tournament_type, tournament_name in TournamentRepository.TOURNAMENT_TYPES.items():
-        registrations = TournamentRepository.get_all_registrations(tournament_type)
-        active_registrations = [r for r in registrations if r.status == 'active']
-        cancelled_registrations = [r for r in registrations if r.status == 'cancelled']
-        
-        if registrations:
-            has_registrations = True
+def tournament_overview_lines(tournaments: List[Tournament],
+                              overviews: Dict[Tuple[int, str], DivisionOverview]) -> Iterator[str]:
+    """Строки списка участников по дисциплинам (каждая — с переводом строки)"""
+    for tournament, division in ((t, d) for t in tournaments for d in t.divisions):
+        overview = overviews.get((tournament.id, division.code))
+        if overview is None:
+            overview = DivisionOverview(tournament.id, division.code)
         
-        max_participants = TournamentRepository.get_max_participants(tournament_type)
-        section = f"🏆 {tournament_name}\n"
-        section += f"📅 {TournamentRepository.TOURNAMENT_DATE_TEXT}\n"
-        section += f"✅ Активных: {len(active_registrations)}/{max_participants}\n"
-        section += f"❌ Отменённых: {len(cancelled_registrations)}\n\n"
+        yield f"🏆 {division.name}\n"
+        yield f"📅 {tournament.title}, {tournament.date_text} (турнир #{tournament.id})\n"
+        yield f"✅ Активных: {overview.counts.get('active', 0)}/{division.max_participants}\n"
+        yield f"❌ Отменённых: {overview.counts.get('cancelled', 0)}\n\n"
         
-        if active_registrations:
-            section += "📋 Активные регистрации:\n\n"
-            for i, reg in enumerate(active_registrations, 1):
-                section += (
+        if overview.registrations:
+            yield "📋 Активные регистрации:\n\n"
+            for i, reg in enumerate(overview.registrations, 1):
+                yield (
                     f"{i}. {reg.full_name}\n"
                     f"   📱 {reg.phone}\n"
                     f"   💬 @{reg.username or 'без username'}\n"
                     f"   📋 ID: {reg.id}\n\n"
                 )
         else:
-            section += "Пока нет активных регистраций\n\n"
+            yield "Пока нет активных регистраций\n\n"
         
-        sections.append(section)
+        if overview.waitlist:
+            yield f"📝 Лист ожидания ({len(overview.waitlist)}):\n\n"
+            for i, entry in enumerate(overview.waitlist, 1):
+                yield (
+                    f"{i}. {entry.full_name}\n"
+                    f"   📱 {entry.phone}\n"
+                    f"   💬 @{entry.username or 'без username'}\n\n"
+                )
+        yield "\n"
+
+
+def tournament_overview_parts(tournaments: List[Tournament],
+                              overviews: Dict[Tuple[int, str], DivisionOverview],
+                              limit: int = 4000) -> Iterator[str]:
+    """Список участников сообщениями не длиннее limit — без сборки всего текста"""
+    part = "🏆 Участники турниров\n\n"
+    for line in tournament_overview_lines(tournaments, overviews):
+        if len(part) + len(line) > limit:
+            yield part
+            part = ""
+        part += line
+    if part.strip():
+        yield part
+
+
+@router.callback_query(F.data == "admin_tournament")
+@flags.throttling("admin")
+async def admin_view_tournament(callback: CallbackQuery):
+    """Просмотр участников турнира"""
+    # Турниры общие для всех заведений — ими управляют только глобальные админы
+    if not settings.is_admin(callback.from_user.id):
+        await callback.answer("⚠️ У вас нет доступа", show_alert=True)
+        return
     
-    if not has_registrations:
+    tournaments = TournamentRepository.get_active_tournaments()
+    overviews = TournamentRepository.get_overview([tournament.id for tournament in tournaments])
+    
+    if not any((t.id, d.code) in overviews for t in tournaments for d in t.divisions):
+        tournament_lines = "".join(
+            f"📅 #{tournament.id} {tournament.title}, {tournament.date_text}\n"
+            for tournament in tournaments
+        )
         await callback.message.edit_text(
             f"🏆 Участники турниров\n"
-            f"📅 {TournamentRepository.TOURNAMENT_DATE_TEXT}\n\n"
-            "Пока нет регистраций",
+            f"{tournament_lines or 'Нет открытых турниров'}\n\n"
+            "Пока нет регистраций\n\n"
+            f"{TOURNAMENT_COMMANDS_HELP}",
             reply_markup=get_admin_keyboard()
         )
         await callback.answer()
         return
     
-    text = "🏆 Участники турниров\n\n" + "\n".join(sections)
-    
-    # Разбиение длинных сообщений
-    if len(text) > 4000:
-        parts = []
-        current_part = "🏆 Участники турниров\n\n"
-        
-        for section in sections:
-            if len(current_part) + len(section) > 4000:
-                parts.append(current_part)
-                current_part = section
-            else:
-                current_part += section + "\n"
-        
-        if current_part:
-            parts.append(current_part)
-        
-        await callback.message.edit_text(parts[0])
-        for part in parts[1:]:
-            await callback.message.answer(part)
-    else:
-        await callback.message.edit_text(text)
+    parts = tournament_overview_parts(tournaments, overviews)
+    await callback.message.edit_text(next(parts))
+    for part in parts:
+        await callback.message.answer(part)
     
     await callback.message.answer(
         "💡 Для отмены регистрации используйте:\n"
         "/cancel_tournament <ID>\n\n"
-        "Например: /cancel_tournament 5",
+        "Например: /cancel_tournament 5\n\n"
+        f"{TOURNAMENT_COMMANDS_HELP}",
         reply_markup=get_admin_keyboard()
     )
     
@@ -665,9 +903,10 @@ async def admin_view_tournament(callback: CallbackQuery):
 
 
 @router.message(Command("cancel_tournament"))
+@flags.throttling("admin")
 async def cmd_cancel_tournament(message: Message):
     """Команда /cancel_tournament <id> - отмена регистрации на турнир"""
-    if not is_admin(message.from_user.id):
+    if not settings.is_admin(message.from_user.id):
         await message.answer("⚠️ У вас нет доступа к этой команде")
         return
     
@@ -695,74 +934,437 @@ async def cmd_cancel_tournament(message: Message):
         await message.answer(f"⚠️ Регистрация #{registration_id} уже отменена")
         return
 
-    tournament_name = TournamentRepository.get_tournament_name(registration.tournament_type)
+    tournament = TournamentRepository.get_tournament(registration.tournament_id)
+    tournament_date_text = tournament.date_text if tournament else "—"
+    tournament_name = TournamentRepository.get_tournament_name(
+        registration.tournament_id, registration.tournament_type
+    )
+    
+    user_text = (
+        f"❌ Ваша регистрация на {tournament_name} была отменена администратором\n\n"
+        f"📅 {tournament_date_text}\n"
+        f"📋 Регистрация #{registration_id}\n"
+        f"👤 {registration.full_name}\n\n"
+        f"По вопросам обращайтесь к администрации."
+    )
+    admin_text = (
+        f"ℹ️ Администратор @{message.from_user.username or 'без username'} "
+        f"отменил регистрацию на турнир #{registration_id}\n\n"
+        f"🏆 {tournament_name}\n"
+        f"👤 {registration.full_name}\n"
+        f"💬 @{registration.username or 'без username'}"
+    )
     
-    if TournamentRepository.cancel_registration(registration_id):
+    # Отмена регистрации, перевод из листа ожидания и уведомления — одной транзакцией
+    promoted = []
+    with transaction(immediate=True):
+        cancelled = TournamentRepository.cancel_registration(registration_id)
+        if cancelled:
+            notifier.notify([registration.user_id], user_text)
+            notifier.notify_admins(admin_text, exclude=message.from_user.id)
+            promoted = promote_from_waitlist(registration.tournament_id, registration.tournament_type)
+    
+    if cancelled:
+        promoted_text = "".join(
+            f"\n🔄 Из листа ожидания: #{promoted_registration.id} {promoted_registration.full_name}"
+            for promoted_registration in promoted
+        )
         await message.answer(
             f"✅ Регистрация #{registration_id} успешно отменена\n\n"
             f"🏆 {tournament_name}\n"
-            f"📅 {TournamentRepository.TOURNAMENT_DATE_TEXT}\n"
+            f"📅 {tournament_date_text}\n"
             f"👤 {registration.full_name}\n"
             f"📱 {registration.phone}\n"
             f"💬 @{registration.username or 'без username'}"
+            f"{promoted_text}"
         )
-        
-        # Уведомление пользователя
-        try:
-            await message.bot.send_message(
-                registration.user_id,
-                f"❌ Ваша регистрация на {tournament_name} была отменена администратором\n\n"
-                f"📅 {TournamentRepository.TOURNAMENT_DATE_TEXT}\n"
-                f"📋 Регистрация #{registration_id}\n"
-                f"👤 {registration.full_name}\n\n"
-                f"По вопросам обращайтесь к администрации."
+    else:
+        await message.answer(f"⚠️ Не удалось отменить регистрацию #{registration_id}")
+
+
+@router.message(Command("tournament_add"))
+@flags.throttling("admin")
+async def cmd_tournament_add(message: Message):
+    """Команда /tournament_add ДД.ММ.ГГГГ ЧЧ:ММ <название> - новый турнир"""
+    if not settings.is_admin(message.from_user.id):
+        await message.answer("⚠️ У вас нет доступа к этой команде")
+        return
+    
+    parts = message.text.split(maxsplit=3)
+    try:
+        starts_at = datetime.strptime(f"{parts[1]} {parts[2]}", "%d.%m.%Y %H:%M")
+        title = parts[3].strip()
+    except (IndexError, ValueError):
+        await message.answer(
+            "⚠️ Использование: /tournament_add ДД.ММ.ГГГГ ЧЧ:ММ <название>\n\n"
+            "Пример: /tournament_add 12.12.2026 15:00 Турнир 12.12"
+        )
+        return
+    
+    if starts_at <= datetime.now():
+        await message.answer("⚠️ Дата турнира уже прошла")
+        return
+    existing = TournamentRepository.find_by_title(title)
+    if existing and existing.is_active:
+        await message.answer(f"⚠️ Турнир «{title}» уже есть — выберите другое название")
+        return
+    
+    tournament_id = TournamentRepository.create_tournament(title, starts_at)
+    await message.answer(
+        f"✅ Турнир #{tournament_id} создан\n\n"
+        f"🏆 {title}\n"
+        f"📅 {starts_at.strftime('%d.%m.%Y %H:%M')} (бронирование столов в этот день закрыто)\n\n"
+        f"Добавьте дисциплины — после этого откроется регистрация:\n"
+        f"/tournament_division {tournament_id} russian 8 Турнир по русскому 8чел"
+    )
+
+
+@router.message(Command("tournament_division"))
+@flags.throttling("admin")
+async def cmd_tournament_division(message: Message):
+    """Команда /tournament_division <ID> <код> <мест> <название> - дисциплина турнира"""
+    if not settings.is_admin(message.from_user.id):
+        await message.answer("⚠️ У вас нет доступа к этой команде")
+        return
+    
+    parts = message.text.split(maxsplit=4)
+    try:
+        tournament_id, code = int(parts[1]), parts[2].lower()
+        max_participants, name = int(parts[3]), parts[4].strip()
+    except (IndexError, ValueError):
+        await message.answer(
+            "⚠️ Использование: /tournament_division <ID турнира> <код> <мест> <название>\n\n"
+            "Пример: /tournament_division 2 pool 16 Турнир по пулу 16 чел"
+        )
+        return
+    
+    if not re.fullmatch(r"[a-z0-9_]{1,16}", code):
+        await message.answer("⚠️ Код — до 16 латинских букв, цифр или _")
+        return
+    if max_participants < 2:
+        await message.answer("⚠️ Мест должно быть не меньше 2")
+        return
+    if TournamentRepository.get_tournament(tournament_id) is None:
+        await message.answer(f"⚠️ Турнир #{tournament_id} не найден")
+        return
+    
+    try:
+        TournamentRepository.add_division(tournament_id, code, name, max_participants)
+    except sqlite3.IntegrityError:
+        await message.answer(f"⚠️ В турнире #{tournament_id} уже есть дисциплина {code}")
+        return
+    
+    await message.answer(
+        f"✅ Дисциплина добавлена в турнир #{tournament_id}\n\n"
+        f"🏆 {name} ({code})\n"
+        f"👥 Мест: {max_participants}"
+    )
+
+
+@router.message(Command("tournament_close"))
+@flags.throttling("admin")
+async def cmd_tournament_close(message: Message):
+    """Команда /tournament_close <ID> - закрытие турнира"""
+    if not settings.is_admin(message.from_user.id):
+        await message.answer("⚠️ У вас нет доступа к этой команде")
+        return
+    
+    parts = message.text.split()
+    if len(parts) < 2 or not parts[1].isdigit():
+        await message.answer("⚠️ Использование: /tournament_close <ID турнира>")
+        return
+    
+    tournament_id = int(parts[1])
+    tournament = TournamentRepository.get_tournament(tournament_id)
+    if tournament is None or not TournamentRepository.close_tournament(tournament_id):
+        await message.answer(f"⚠️ Турнир #{tournament_id} не найден")
+        return
+    
+    await message.answer(
+        f"✅ Турнир #{tournament_id} «{tournament.title}» закрыт: регистрация на него "
+        f"остановлена, дата снова доступна для бронирования"
+    )
+
+
+@router.message(Command("bracket"))
+@flags.throttling("admin")
+async def cmd_bracket(message: Message):
+    """Команда /bracket <ID> <код> - сетка дисциплины и блокировка столов под матчи"""
+    if not settings.is_admin(message.from_user.id):
+        await message.answer("⚠️ У вас нет доступа к этой команде")
+        return
+    
+    parts = message.text.split()
+    if len(parts) < 3 or not parts[1].isdigit():
+        await message.answer(
+            "⚠️ Использование: /bracket <ID турнира> <код>\n\n"
+            "Повторный вызов пересчитывает сетку после отмен и переносит только затронутые матчи"
+        )
+        return
+    
+    tournament_id, code = int(parts[1]), parts[2].lower()
+    tournament = TournamentRepository.get_tournament(tournament_id)
+    division = tournament.get_division(code) if tournament else None
+    if division is None:
+        await message.answer(f"⚠️ Дисциплина {code} в турнире #{tournament_id} не найдена")
+        return
+    
+    registrations = TournamentRepository.get_active_registrations(tournament_id, code)
+    if len(registrations) < 2:
+        await message.answer("⚠️ Для сетки нужно хотя бы 2 активных участника")
+        return
+    
+    update = generate_bracket(
+        tournament, division, message.from_user.username or str(message.from_user.id)
+    )
+    player_names = {registration.id: registration.full_name for registration in registrations}
+    table_names = {
+        table.id: table.name for table in TableRepository.get_all_tables(settings.TOURNAMENT_VENUE_ID)
+    }
+    
+    text = (
+        f"🏆 Сетка: {division.name}\n"
+        f"📅 {tournament.title}, {tournament.date_text} (турнир #{tournament.id})\n"
+        f"👥 Участников: {len(registrations)}\n\n"
+        f"🔒 Новых блокировок: {update.created}\n"
+        f"🔓 Снято блокировок: {update.released}\n"
+        f"📌 Без изменений: {update.kept}\n"
+    )
+    if update.unscheduled:
+        text += f"⚠️ Без стола: {', '.join(match.label for match in update.unscheduled)}\n"
+    
+    # Разбиение длинных сеток по строкам
+    for line in render_bracket(update.matches, player_names, table_names):
+        if len(text) + len(line) > 4000:
+            await message.answer(text)
+            text = ""
+        text += line + "\n"
+    await message.answer(text)
+
+
+def parse_export_options(tokens: List[str]) -> Optional[Dict[str, str]]:
+    """Параметры вида key=value из /export (None — если параметр неизвестен или неверен)"""
+    options = {}
+    for token in tokens:
+        key, _, value = token.partition("=")
+        if key not in ("table", "status") or not value:
+            return None
+        if key == "table" and not value.isdigit():
+            return None
+        if key == "status" and value not in ("active", "cancelled"):
+            return None
+        options[key] = value
+    return options
+
+
+async def send_export(message: Message, export: Export):
+    """Отправка выгрузки документом (временный файл закрывается в любом случае)"""
+    try:
+        if export.rows == 0:
+            await message.answer("📭 Нет данных для выгрузки")
+        elif export.size > DOCUMENT_LIMIT_BYTES:
+            await message.answer("⚠️ Выгрузка больше 50 МБ — сузьте период или добавьте фильтр")
+        else:
+            await message.answer_document(
+                SpooledInputFile(export.file, export.filename),
+                caption=f"📤 Строк: {export.rows}"
             )
-        except Exception as e:
-            logger.error(f"Не удалось уведомить пользователя {registration.user_id}: {e}")
+    finally:
+        export.file.close()
+
+
+@router.message(Command("export"))
+@flags.throttling("admin")
+async def cmd_export(message: Message):
+    """Команда /export bookings|tournament ... - выгрузка в CSV"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⚠️ У вас нет доступа к этой команде")
+        return
+    
+    parts = message.text.split()
+    kind = parts[1].lower() if len(parts) > 1 else ""
+    
+    if kind == "bookings":
+        try:
+            start_from = datetime.strptime(parts[2], "%d.%m.%Y")
+            has_end = len(parts) > 3 and "=" not in parts[3]
+            last_day = datetime.strptime(parts[3], "%d.%m.%Y") if has_end else start_from
+        except (IndexError, ValueError):
+            await message.answer(EXPORT_USAGE)
+            return
+        options = parse_export_options(parts[4 if has_end else 3:])
+        if options is None or last_day < start_from:
+            await message.answer(EXPORT_USAGE)
+            return
         
-        # Уведомление других администраторов
-        admin_text = (
-            f"ℹ️ Администратор @{message.from_user.username or 'без username'} "
-            f"отменил регистрацию на турнир #{registration_id}\n\n"
-            f"🏆 {tournament_name}\n"
-            f"👤 {registration.full_name}\n"
-            f"💬 @{registration.username or 'без username'}"
+        # Администратор заведения выгружает только свои заведения
+        venue_ids = VenueRepository.get_admin_venue_ids(message.from_user.id)
+        venue_names = {venue.id: venue.name for venue in VenueRepository.get_all_venues()}
+        table_names = {
+            table.id: table.name
+            for venue_id in venue_ids for table in TableRepository.get_all_tables(venue_id)
+        }
+        export = await export_bookings(
+            start_from, last_day + timedelta(days=1), venue_ids, venue_names, table_names,
+            table_id=int(options["table"]) if "table" in options else None,
+            status=options.get("status")
         )
+        await send_export(message, export)
+        return
+    
+    if kind == "tournament":
+        # Турниры общие для всех заведений — их выгружают только глобальные админы
+        if not settings.is_admin(message.from_user.id):
+            await message.answer("⚠️ У вас нет доступа к этой команде")
+            return
+        if len(parts) < 3 or not parts[2].isdigit():
+            await message.answer(EXPORT_USAGE)
+            return
+        tournament = TournamentRepository.get_tournament(int(parts[2]))
+        if tournament is None:
+            await message.answer(f"⚠️ Турнир #{parts[2]} не найден")
+            return
+        has_code = len(parts) > 3 and "=" not in parts[3]
+        code = parts[3].lower() if has_code else None
+        options = parse_export_options(parts[4 if has_code else 3:])
+        if options is None:
+            await message.answer(EXPORT_USAGE)
+            return
+        if code and tournament.get_division(code) is None:
+            await message.answer(f"⚠️ Дисциплина {code} в турнире #{tournament.id} не найдена")
+            return
         
-        for admin_id in settings.ADMIN_IDS:
-            if admin_id != message.from_user.id:
-                try:
-                    await message.bot.send_message(admin_id, admin_text)
-                except Exception as e:
-                    logger.error(f"Не удалось уведомить админа {admin_id}: {e}")
+        export = await export_registrations(
+            tournament.id, {division.code: division.name for division in tournament.divisions},
+            tournament_type=code, status=options.get("status")
+        )
+        await send_export(message, export)
+        return
+    
+    await message.answer(EXPORT_USAGE)
+
+
+@router.message(Command("occupancy"))
+@flags.throttling("admin")
+async def cmd_occupancy(message: Message):
+    """Команда /occupancy [дней] - загрузка столов по дням недели и часам"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⚠️ У вас нет доступа к этой команде")
+        return
+    
+    parts = message.text.split()
+    if len(parts) > 1 and not (parts[1].isdigit() and 1 <= int(parts[1]) <= 3660):
+        await message.answer(
+            "⚠️ Использование: /occupancy [дней]\n\n"
+            "Загрузка за последние N полных дней (по умолчанию 90, до 3660)"
+        )
+        return
+    
+    days = int(parts[1]) if len(parts) > 1 else 90
+    day_to = datetime.now().date() - timedelta(days=1)
+    day_from = day_to - timedelta(days=days - 1)
+    for venue_id in VenueRepository.get_admin_venue_ids(message.from_user.id):
+        await message.answer(build_occupancy_report(VenueRepository.get_venue(venue_id), day_from, day_to))
+
+
+@router.message(Command("occupancy_rebuild"))
+@flags.throttling("admin")
+async def cmd_occupancy_rebuild(message: Message):
+    """Команда /occupancy_rebuild - пересчёт агрегата загрузки по всем броням"""
+    if not settings.is_admin(message.from_user.id):
+        await message.answer("⚠️ У вас нет доступа к этой команде")
+        return
+    
+    await message.answer("⏳ Пересчитываю загрузку по всем броням…")
+    # Пересчёт читает всю таблицу броней — выполняем вне цикла событий
+    bookings, rows = await asyncio.to_thread(OccupancyRepository.rebuild)
+    logger.info(f"Агрегат загрузки пересчитан: броней {bookings}, строк {rows}")
+    await message.answer(f"✅ Загрузка пересчитана: учтено броней {bookings}, строк агрегата {rows}")
+
+
+async def show_find_results(message: Message, admin_id: int, raw_query: str, page: int,
+                            edit: bool = False):
+    """
+    Страница результатов /find: брони заведений администратора и (для
+    глобальных администраторов) регистрации на турниры
+    """
+    hits, has_next = SearchRepository.find(
+        parse_search_query(raw_query),
+        VenueRepository.get_admin_venue_ids(admin_id),
+        include_registrations=settings.is_admin(admin_id),
+        page=page
+    )
+    text = render_search_results(raw_query, hits, page)
+    keyboard = get_admin_find_keyboard(
+        [hit for hit in hits if isinstance(hit, Booking)], raw_query, page, has_next
+    )
+    if edit:
+        await message.edit_text(text, reply_markup=keyboard)
     else:
-        await message.answer(f"⚠️ Не удалось отменить регистрацию #{registration_id}")
+        await message.answer(text, reply_markup=keyboard)
+
+
+@router.message(Command("find"))
+@flags.throttling("admin")
+async def cmd_find(message: Message):
+    """Команда /find <запрос> - поиск броней и регистраций"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⚠️ У вас нет доступа к этой команде")
+        return
+    
+    raw_query = message.text.partition(" ")[2].strip()
+    # Запрос едет в callback_data кнопок листания (до 64 байт)
+    if (parse_search_query(raw_query) is None
+            or len(f"admin_find:999:{raw_query}".encode()) > 64):
+        await message.answer(FIND_USAGE)
+        return
+    
+    await show_find_results(message, message.from_user.id, raw_query, 0)
+
+
+@router.callback_query(F.data.startswith("admin_find:"))
+@flags.throttling("admin")
+async def admin_find_page(callback: CallbackQuery):
+    """Листание результатов /find"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⚠️ У вас нет доступа", show_alert=True)
+        return
+    
+    _, page, raw_query = callback.data.split(":", 2)
+    if parse_search_query(raw_query) is None:
+        await callback.answer("❌ Неверный запрос", show_alert=True)
+        return
+    
+    await show_find_results(callback.message, callback.from_user.id, raw_query, int(page), edit=True)
+    await callback.answer()
 
 
 @router.message(Command("today"))
+@flags.throttling("admin")
 async def cmd_today(message: Message):
     """Команда /today - список броней на сегодня"""
     if not is_admin(message.from_user.id):
         await message.answer("⚠️ У вас нет доступа к этой команде")
         return
     
-    await show_today_bookings(message)
+    await show_today_bookings(message, message.from_user.id)
 
 
 @router.callback_query(F.data == "admin_today")
+@flags.throttling("admin")
 async def callback_today(callback: CallbackQuery):
     """Callback для броней на сегодня"""
     if not is_admin(callback.from_user.id):
         await callback.answer("⚠️ У вас нет доступа", show_alert=True)
         return
     
-    await show_today_bookings(callback.message)
+    await show_today_bookings(callback.message, callback.from_user.id)
     await callback.answer()
 
 
-async def show_today_bookings(message: Message):
-    """Показать брони на сегодня"""
-    bookings = BookingRepository.get_today_bookings()
+async def show_today_bookings(message: Message, admin_id: int):
+    """Показать брони на сегодня в заведениях администратора"""
+    bookings = BookingRepository.get_today_bookings(VenueRepository.get_admin_venue_ids(admin_id))
     
     if not bookings:
         await message.answer("📋 На сегодня нет бронирований")
@@ -771,11 +1373,12 @@ async def show_today_bookings(message: Message):
     text = "📋 Бронирования на сегодня:\n\n"
     
     for booking in bookings:
-        table = TableRepository.get_table_by_id(booking.table_id)
+        table = TableRepository.get_table_by_id(booking.table_id, booking.venue_id)
         table_name = table.name if table else f"Стол #{booking.table_id}"
         
         text += (
             f"🔹 Бронь #{booking.id}\n"
+            f"{venue_label(booking.venue_id, indent='   ')}"
             f"   🕐 {format_datetime(booking.start_time)}\n"
             f"   ⏱ {booking.duration_hours} ч\n"
             f"   🎱 {table_name}\n"
@@ -791,11 +1394,12 @@ async def show_today_bookings(message: Message):
         current_part = "📋 Бронирования на сегодня:\n\n"
         
         for booking in bookings:
-            table = TableRepository.get_table_by_id(booking.table_id)
+            table = TableRepository.get_table_by_id(booking.table_id, booking.venue_id)
             table_name = table.name if table else f"Стол #{booking.table_id}"
             
             booking_text = (
                 f"🔹 Бронь #{booking.id}\n"
+                f"{venue_label(booking.venue_id, indent='   ')}"
                 f"   🕐 {format_datetime(booking.start_time)}\n"
                 f"   ⏱ {booking.duration_hours} ч\n"
                 f"   🎱 {table_name}\n"
@@ -819,6 +1423,7 @@ async def show_today_bookings(message: Message):
 
 
 @router.message(Command("cancel"))
+@flags.throttling("admin")
 async def cmd_cancel(message: Message):
     """Команда /cancel <id> - отмена брони администратором"""
     if not is_admin(message.from_user.id):
@@ -843,7 +1448,7 @@ async def cmd_cancel(message: Message):
     # Получение информации о брони
     booking = BookingRepository.get_booking_by_id(booking_id)
     
-    if not booking:
+    if not booking or not can_manage(message.from_user.id, booking):
         await message.answer(f"⚠️ Бронирование #{booking_id} не найдено")
         return
     
@@ -851,11 +1456,34 @@ async def cmd_cancel(message: Message):
         await message.answer(f"⚠️ Бронирование #{booking_id} уже отменено")
         return
     
-    # Отмена брони
-    if BookingRepository.cancel_booking(booking_id):
-        table = TableRepository.get_table_by_id(booking.table_id)
-        table_name = table.name if table else f"Стол #{booking.table_id}"
-        
+    table = TableRepository.get_table_by_id(booking.table_id, booking.venue_id)
+    table_name = table.name if table else f"Стол #{booking.table_id}"
+    
+    user_text = (
+        f"❌ Ваше бронирование #{booking_id} было отменено администратором\n\n"
+        f"📅 {format_datetime(booking.start_time)}\n"
+        f"⏱ {booking.duration_hours} ч\n"
+        f"🎱 {table_name}\n\n"
+        f"По вопросам обращайтесь к администрации."
+    )
+    admin_text = (
+        f"ℹ️ Администратор @{message.from_user.username or 'без username'} "
+        f"отменил бронирование #{booking_id}\n\n"
+        f"📅 {format_datetime(booking.start_time)}\n"
+        f"👤 Пользователь: @{booking.username or 'без username'}"
+    )
+    
+    # Отмена брони и уведомления — одной транзакцией
+    with transaction():
+        cancelled = BookingRepository.cancel_booking(booking_id)
+        if cancelled:
+            if booking.user_id:
+                notifier.notify([booking.user_id], user_text)
+            notifier.notify_admins(
+                admin_text, exclude=message.from_user.id, venue_id=booking.venue_id
+            )
+    
+    if cancelled:
         await message.answer(
             f"✅ Бронирование #{booking_id} успешно отменено\n\n"
             f"📅 {format_datetime(booking.start_time)}\n"
@@ -863,33 +1491,60 @@ async def cmd_cancel(message: Message):
             f"🎱 {table_name}\n"
             f"👤 @{booking.username or 'без username'}"
         )
-        
-        # Уведомление пользователя
-        try:
-            await message.bot.send_message(
-                booking.user_id,
-                f"❌ Ваше бронирование #{booking_id} было отменено администратором\n\n"
-                f"📅 {format_datetime(booking.start_time)}\n"
-                f"⏱ {booking.duration_hours} ч\n"
-                f"🎱 {table_name}\n\n"
-                f"По вопросам обращайтесь к администрации."
-            )
-        except Exception as e:
-            logger.error(f"Не удалось уведомить пользователя {booking.user_id}: {e}")
-        
-        # Уведомление других администраторов
-        admin_text = (
-            f"ℹ️ Администратор @{message.from_user.username or 'без username'} "
-            f"отменил бронирование #{booking_id}\n\n"
-            f"📅 {format_datetime(booking.start_time)}\n"
-            f"👤 Пользователь: @{booking.username or 'без username'}"
-        )
-        
-        for admin_id in settings.ADMIN_IDS:
-            if admin_id != message.from_user.id:
-                try:
-                    await message.bot.send_message(admin_id, admin_text)
-                except Exception as e:
-                    logger.error(f"Не удалось уведомить админа {admin_id}: {e}")
     else:
         await message.answer(f"⚠️ Не удалось отменить бронирование #{booking_id}")
+
+
+@router.message(Command("stats"))
+@flags.throttling("admin")
+async def cmd_stats(message: Message):
+    """Команда /stats - статистика вызовов Bot API"""
+    if not settings.is_admin(message.from_user.id):
+        await message.answer("⚠️ У вас нет доступа к этой команде")
+        return
+    
+    label_sets = api_latency.label_sets()
+    if not label_sets:
+        await message.answer("📈 Вызовов Bot API пока не было")
+        return
+    
+    text = "📈 Вызовы Bot API\n\n"
+    for labels in sorted(label_sets, key=lambda l: -api_latency.count(**l)):
+        method = labels['method']
+        count = api_latency.count(method=method)
+        avg_ms = api_latency.total(method=method) / count * 1000
+        p95 = api_latency.quantile(0.95, method=method)
+        p95_text = f"≤{p95 * 1000:.0f} мс" if p95 != float('inf') else ">10 с"
+        errors = sum(
+            value for key, value in api_errors.values.items() if key[0] == method
+        )
+        text += (
+            f"🔹 {method}\n"
+            f"   вызовов: {count}, сред.: {avg_ms:.0f} мс, p95: {p95_text}\n"
+            f"   ошибок: {errors:.0f}, 429: {api_retry_after.get(method=method):.0f}, "
+            f"в процессе: {api_in_flight.get(method=method):.0f}\n\n"
+        )
+    
+    text += f"🔁 Подавлено повторных нажатий: {callback_duplicates.get():.0f}\n"
+    if throttled_updates.values:
+        throttled = ", ".join(
+            f"{group}/{scope}: {value:.0f}"
+            for (group, scope), value in sorted(throttled_updates.values.items())
+        )
+        text += f"🚦 Отклонено ограничением частоты: {throttled}\n"
+    if user_lock_wait.count():
+        p95 = user_lock_wait.quantile(0.95)
+        p95_text = f"≤{p95 * 1000:.0f} мс" if p95 != float('inf') else ">5 с"
+        text += (
+            f"🔒 Ожидали очереди пользователя: {user_lock_contended.get():.0f} "
+            f"из {user_lock_wait.count()}, p95 ожидания: {p95_text}\n"
+        )
+    text += "\n"
+    if settings.WORKERS > 1:
+        # Метрики не агрегируются между процессами
+        text += (
+            f"ℹ️ Данные только процесса-воркера, обработавшего команду "
+            f"(воркеров: {settings.WORKERS}); /metrics отдаёт процесс-приёмник\n"
+        )
+    text += "Экспорт для Prometheus: GET /metrics"
+    await message.answer(text)
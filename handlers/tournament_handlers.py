@@ -3,56 +3,127 @@
 """
 import logging
 from datetime import datetime
+from typing import List, Optional, Tuple
 
-from aiogram import Router, F
+from aiogram import Router, F, flags
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
-from config import settings
-from database.repository import TournamentRepository
-from database.models import TournamentRegistration
+from database.database import transaction
+from database.repository import TournamentRepository, VenueRepository, WaitlistRepository
+from database.models import Tournament, TournamentDivision, TournamentRegistration, WaitlistEntry
 from keyboards.keyboards import (
-    get_main_menu_keyboard, get_phone_keyboard,
+    get_main_menu_keyboard, get_phone_keyboard, get_tournament_button_text,
     get_tournament_confirmation_keyboard, get_tournament_registered_keyboard,
-    get_tournament_type_keyboard,
+    get_tournament_type_keyboard, get_tournament_waitlisted_keyboard,
     get_cancel_keyboard
 )
 from states.booking_states import TournamentStates
+from utils.notifier import notifier
 
 logger = logging.getLogger(__name__)
 router = Router()
 
-TOURNAMENT_MENU_BUTTONS = {"🏆 Турнир 05.07", "Турнир 05.07"}
+def tournament_from_button(text: Optional[str]) -> Optional[Tournament]:
+    """Турнир по тексту кнопки главного меню ("🏆 Турнир 05.07" или "Турнир 05.07")"""
+    if not text:
+        return None
+    title = text.removeprefix("🏆").strip()
+    tournament = TournamentRepository.find_by_title(title)
+    if tournament and text in (get_tournament_button_text(tournament), tournament.title):
+        return tournament
+    return None
 
 
-@router.message(F.text.in_(TOURNAMENT_MENU_BUTTONS))
+def get_open_division(data: dict) -> Tuple[Optional[Tournament], Optional[TournamentDivision]]:
+    """Турнир и дисциплина из данных FSM (None, если регистрация на них закрыта)"""
+    tournament = TournamentRepository.get_tournament(data.get('tournament_id'))
+    if tournament is None or not TournamentRepository.is_registration_open(tournament.id):
+        return None, None
+    division = tournament.get_division(data.get('tournament_type'))
+    return (tournament, division) if division else (None, None)
+
+
+def promote_from_waitlist(tournament_id: int, tournament_type: str) -> List[TournamentRegistration]:
+    """
+    Перевод из листа ожидания на освободившиеся места дисциплины.
+    
+    Вызывается внутри транзакции отмены регистрации; уведомления
+    переведённым уходят в outbox одной пачкой тем же коммитом.
+    """
+    promoted = WaitlistRepository.promote_next(tournament_id, tournament_type)
+    if not promoted:
+        return promoted
+    
+    tournament = TournamentRepository.get_tournament(tournament_id)
+    tournament_name = TournamentRepository.get_tournament_name(tournament_id, tournament_type)
+    notifier.notify_many([
+        (
+            registration.user_id,
+            f"🎉 Освободилось место — вы в списке участников!\n\n"
+            f"🏆 Турнир: {tournament_name}\n"
+            f"📅 Дата и время: {tournament.date_text}\n"
+            f"📋 Номер регистрации: #{registration.id}\n"
+            f"👤 Имя: {registration.full_name}\n\n"
+            f"Если не сможете прийти, отмените регистрацию через кнопку "
+            f"{get_tournament_button_text(tournament)} в меню"
+        )
+        for registration in promoted
+    ])
+    notifier.notify_admins(
+        f"🔄 Из листа ожидания на {tournament_name} ({tournament.date_text}):\n\n" +
+        "\n".join(
+            f"#{registration.id} {registration.full_name} ({registration.phone})"
+            for registration in promoted
+        )
+    )
+    return promoted
+
+
+@router.message(F.text.func(tournament_from_button))
+@flags.throttling("tournament")
 async def show_tournament_selection(message: Message, state: FSMContext):
-    """Выбор турнира для регистрации"""
+    """Выбор дисциплины турнира для регистрации"""
     await state.clear()
     
+    tournament = tournament_from_button(message.text)
+    if not TournamentRepository.is_registration_open(tournament.id):
+        await message.answer(
+            f"❌ Регистрация на {tournament.title} закрыта",
+            reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(message.from_user.id))
+        )
+        return
+    
     await message.answer(
-        f"🏆 Турнир 05.07\n\n"
-        f"📅 Дата и время: {TournamentRepository.TOURNAMENT_DATE_TEXT}\n\n"
+        f"🏆 {tournament.title}\n\n"
+        f"📅 Дата и время: {tournament.date_text}\n\n"
         f"Выберите дисциплину:",
-        reply_markup=get_tournament_type_keyboard()
+        reply_markup=get_tournament_type_keyboard(tournament)
     )
 
 
 @router.callback_query(F.data.startswith("tournament_select:"))
+@flags.throttling("tournament")
 async def start_tournament_registration(callback: CallbackQuery, state: FSMContext):
     """Начало регистрации на выбранный турнир"""
     await state.clear()
     
-    tournament_type = callback.data.split(":", 1)[1]
-    if tournament_type not in TournamentRepository.TOURNAMENT_TYPES:
-        await callback.answer("Турнир не найден", show_alert=True)
+    parts = callback.data.split(":")
+    tournament, division = None, None
+    if len(parts) == 3 and parts[1].isdigit():
+        tournament, division = get_open_division(
+            {'tournament_id': int(parts[1]), 'tournament_type': parts[2]}
+        )
+    if division is None:
+        await callback.answer("Турнир не найден или регистрация закрыта", show_alert=True)
         return
     
     await send_tournament_registration_start(
         callback.message,
         state,
         callback.from_user.id,
-        tournament_type
+        tournament,
+        division
     )
     await callback.answer()
 
@@ -61,53 +132,72 @@ async def send_tournament_registration_start(
     message: Message,
     state: FSMContext,
     user_id: int,
-    tournament_type: str
+    tournament: Tournament,
+    division: TournamentDivision
 ):
-    """Отправка первого шага регистрации на выбранный турнир"""
-    tournament_name = TournamentRepository.get_tournament_name(tournament_type)
+    """Отправка первого шага регистрации на выбранную дисциплину турнира"""
+    tournament_type = division.code
+    tournament_name = division.name
     
     # Проверка, не зарегистрирован ли уже
-    existing = TournamentRepository.get_user_registration(user_id, tournament_type)
+    existing = TournamentRepository.get_user_registration(user_id, tournament.id, tournament_type)
     if existing:
         await message.answer(
             f"✅ Вы уже зарегистрированы на {tournament_name}!\n\n"
-            f"📅 Дата и время: {TournamentRepository.TOURNAMENT_DATE_TEXT}\n"
+            f"📅 Дата и время: {tournament.date_text}\n"
             f"👤 Имя: {existing.full_name}\n"
             f"📱 Телефон: {existing.phone}\n"
             f"📝 Регистрация #{existing.id}\n\n"
             f"Если хотите отменить регистрацию, нажмите кнопку ниже:",
-            reply_markup=get_tournament_registered_keyboard(tournament_type)
+            reply_markup=get_tournament_registered_keyboard(tournament.id, tournament_type)
         )
         return
     
-    # Проверка наличия свободных мест
-    if not TournamentRepository.is_slots_available(tournament_type):
-        active_count = TournamentRepository.get_active_registrations_count(tournament_type)
-        max_participants = TournamentRepository.get_max_participants(tournament_type)
+    entry = WaitlistRepository.get_user_entry(user_id, tournament.id, tournament_type)
+    if entry:
         await message.answer(
-            f"❌ К сожалению, все места на {tournament_name} заняты!\n\n"
-            f"Зарегистрировано: {active_count}/{max_participants}",
-            reply_markup=get_main_menu_keyboard(settings.is_admin(user_id))
+            f"📝 Вы в листе ожидания на {tournament_name}\n\n"
+            f"📅 Дата и время: {tournament.date_text}\n"
+            f"👤 Имя: {entry.full_name}\n"
+            f"📊 Место в очереди: {WaitlistRepository.get_place(entry)}\n\n"
+            f"Когда освободится место, вы автоматически станете участником "
+            f"и получите уведомление.",
+            reply_markup=get_tournament_waitlisted_keyboard(tournament.id, tournament_type)
         )
         return
     
-    # Информация о турнире
-    active_count = TournamentRepository.get_active_registrations_count(tournament_type)
-    max_participants = TournamentRepository.get_max_participants(tournament_type)
-    remaining = max_participants - active_count
-    
-    await message.answer(
-        f"🏆 Регистрация на {tournament_name}\n\n"
-        f"📅 Дата и время: {TournamentRepository.TOURNAMENT_DATE_TEXT}\n"
-        f"👥 Свободных мест: {remaining}/{max_participants}\n\n"
-        f"Для регистрации введите ваше полное имя:",
-        reply_markup=get_cancel_keyboard()
-    )
-    await state.update_data(tournament_type=tournament_type)
+    # Проверка наличия свободных мест (по счётчику в памяти)
+    active_count = TournamentRepository.get_active_registrations_count(tournament.id, tournament_type)
+    max_participants = division.max_participants
+    if active_count >= max_participants:
+        # Мест нет — предлагаем лист ожидания (та же анкета)
+        await message.answer(
+            f"❌ К сожалению, все места на {tournament_name} заняты!\n\n"
+            f"📅 Дата и время: {tournament.date_text}\n"
+            f"👥 Зарегистрировано: {active_count}/{max_participants}\n"
+            f"📝 В листе ожидания: {WaitlistRepository.count(tournament.id, tournament_type)}\n\n"
+            f"Можно встать в лист ожидания: если кто-то отменит регистрацию, место "
+            f"автоматически перейдёт первому в очереди, и бот пришлёт уведомление.\n\n"
+            f"Чтобы встать в очередь, введите ваше полное имя:",
+            reply_markup=get_cancel_keyboard()
+        )
+    else:
+        # Информация о турнире
+        remaining = max_participants - active_count
+        
+        await message.answer(
+            f"🏆 Регистрация на {tournament_name}\n\n"
+            f"📅 Дата и время: {tournament.date_text}\n"
+            f"👥 Свободных мест: {remaining}/{max_participants}\n\n"
+            f"Для регистрации введите ваше полное имя:",
+            reply_markup=get_cancel_keyboard()
+        )
+    await state.update_data(tournament_id=tournament.id, tournament_type=tournament_type)
     await state.set_state(TournamentStates.entering_name)
 
 
 @router.message(TournamentStates.entering_name, F.text)
+@flags.throttling("tournament")
 async def process_tournament_name(message: Message, state: FSMContext):
     """Обработка ввода имени"""
     full_name = message.text.strip()
@@ -127,6 +217,7 @@ async def process_tournament_name(message: Message, state: FSMContext):
 
 
 @router.message(TournamentStates.entering_phone, F.contact)
+@flags.throttling("tournament")
 async def process_tournament_contact(message: Message, state: FSMContext):
     """Обработка контакта"""
     phone = message.contact.phone_number
@@ -134,6 +225,7 @@ async def process_tournament_contact(message: Message, state: FSMContext):
 
 
 @router.message(TournamentStates.entering_phone, F.text)
+@flags.throttling("tournament")
 async def process_tournament_phone_text(message: Message, state: FSMContext):
     """Обработка текстового ввода телефона"""
     phone = message.text.strip()
@@ -148,39 +240,42 @@ async def process_tournament_phone_text(message: Message, state: FSMContext):
 async def process_tournament_phone(message: Message, state: FSMContext, phone: str):
     """Общая обработка номера телефона для турнира"""
     data = await state.get_data()
-    tournament_type = data.get('tournament_type')
-    if tournament_type not in TournamentRepository.TOURNAMENT_TYPES:
+    tournament, division = get_open_division(data)
+    if division is None:
         await message.answer(
             "❌ Не удалось определить турнир. Пожалуйста, выберите турнир заново.",
-            reply_markup=get_main_menu_keyboard(settings.is_admin(message.from_user.id))
+            reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(message.from_user.id))
         )
         await state.clear()
         return
 
-    tournament_name = TournamentRepository.get_tournament_name(tournament_type)
-    
-    # Финальная проверка наличия мест
-    if not TournamentRepository.is_slots_available(tournament_type):
-        await message.answer(
-            f"❌ К сожалению, пока вы заполняли форму, все места на {tournament_name} были заняты!",
-            reply_markup=get_main_menu_keyboard(settings.is_admin(message.from_user.id))
-        )
-        await state.clear()
-        return
+    tournament_name = division.name
     
     await state.update_data(phone=phone)
     
-    active_count = TournamentRepository.get_active_registrations_count(tournament_type)
-    
-    confirmation_text = (
-        f"✅ Подтверждение регистрации\n\n"
-        f"🏆 Турнир: {tournament_name}\n"
-        f"📅 Дата и время: {TournamentRepository.TOURNAMENT_DATE_TEXT}\n"
-        f"👤 Имя: {data['full_name']}\n"
-        f"📱 Телефон: {phone}\n\n"
-        f"📊 Вы будете участником #{active_count + 1}\n\n"
-        f"Подтвердите регистрацию:"
-    )
+    # Проверка наличия мест (окончательная — при подтверждении)
+    active_count = TournamentRepository.get_active_registrations_count(tournament.id, division.code)
+    if active_count >= division.max_participants:
+        waiting = WaitlistRepository.count(tournament.id, division.code)
+        confirmation_text = (
+            f"📝 Подтверждение записи в лист ожидания\n\n"
+            f"🏆 Турнир: {tournament_name}\n"
+            f"📅 Дата и время: {tournament.date_text}\n"
+            f"👤 Имя: {data['full_name']}\n"
+            f"📱 Телефон: {phone}\n\n"
+            f"📊 Все места заняты, вы будете #{waiting + 1} в очереди\n\n"
+            f"Подтвердите запись:"
+        )
+    else:
+        confirmation_text = (
+            f"✅ Подтверждение регистрации\n\n"
+            f"🏆 Турнир: {tournament_name}\n"
+            f"📅 Дата и время: {tournament.date_text}\n"
+            f"👤 Имя: {data['full_name']}\n"
+            f"📱 Телефон: {phone}\n\n"
+            f"📊 Вы будете участником #{active_count + 1}\n\n"
+            f"Подтвердите регистрацию:"
+        )
     
     await message.answer(
         confirmation_text,
@@ -190,30 +285,23 @@ async def process_tournament_phone(message: Message, state: FSMContext, phone: s
 
 
 @router.callback_query(F.data == "tournament_confirm", TournamentStates.confirming)
+@flags.throttling("tournament")
 async def confirm_tournament_registration(callback: CallbackQuery, state: FSMContext):
     """Подтверждение регистрации на турнир"""
     data = await state.get_data()
-    tournament_type = data.get('tournament_type')
-    if tournament_type not in TournamentRepository.TOURNAMENT_TYPES:
+    tournament, division = get_open_division(data)
+    if division is None:
         await callback.message.edit_text("❌ Не удалось определить турнир. Пожалуйста, выберите турнир заново.")
         await callback.message.answer(
             "Выберите действие:",
-            reply_markup=get_main_menu_keyboard(settings.is_admin(callback.from_user.id))
+            reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(callback.from_user.id))
         )
         await callback.answer()
         await state.clear()
         return
 
-    tournament_name = TournamentRepository.get_tournament_name(tournament_type)
-    
-    # Финальная проверка наличия мест
-    if not TournamentRepository.is_slots_available(tournament_type):
-        await callback.message.edit_text(
-            f"❌ К сожалению, все места на {tournament_name} уже заняты!"
-        )
-        await callback.answer()
-        await state.clear()
-        return
+    tournament_type = division.code
+    tournament_name = division.name
     
     # Создание регистрации
     registration = TournamentRegistration(
@@ -224,34 +312,83 @@ async def confirm_tournament_registration(callback: CallbackQuery, state: FSMCon
         phone=data['phone'],
         created_at=datetime.now(),
         tournament_type=tournament_type,
-        tournament_event=TournamentRepository.TOURNAMENT_EVENT
+        tournament_event=tournament.event_key,
+        tournament_id=tournament.id
     )
     
-    registration_id = TournamentRepository.create_registration(registration)
-    active_count = TournamentRepository.get_active_registrations_count(tournament_type)
-    max_participants = TournamentRepository.get_max_participants(tournament_type)
+    max_participants = division.max_participants
     
-    # Уведомление администраторов
-    admin_text = (
-        f"🏆 Новая регистрация на турнир #{registration_id}\n\n"
-        f"🎱 {tournament_name}\n"
-        f"📅 {TournamentRepository.TOURNAMENT_DATE_TEXT}\n"
-        f"👤 {data['full_name']}\n"
-        f"📱 {data['phone']}\n"
-        f"💬 @{callback.from_user.username or 'без username'}\n\n"
-        f"📊 Всего зарегистрировано: {active_count}/{max_participants}"
-    )
+    # Регистрация при наличии мест (иначе — запись в лист ожидания) и
+    # уведомление администраторов — одной транзакцией, с блокировкой записи
+    # с самого начала
+    entry = None
+    with transaction(immediate=True):
+        registration_id = TournamentRepository.register_if_capacity(registration)
+        if registration_id is None:
+            entry = WaitlistRepository.get_user_entry(
+                callback.from_user.id, tournament.id, tournament_type
+            )
+            is_new_entry = entry is None
+            if is_new_entry:
+                entry = WaitlistEntry(
+                    id=None,
+                    tournament_id=tournament.id,
+                    tournament_type=tournament_type,
+                    position=0,
+                    user_id=callback.from_user.id,
+                    username=callback.from_user.username,
+                    full_name=data['full_name'],
+                    phone=data['phone'],
+                    created_at=datetime.now()
+                )
+                WaitlistRepository.join(entry)
+            place = WaitlistRepository.get_place(entry)
+            if is_new_entry:
+                notifier.notify_admins(
+                    f"📝 Запись в лист ожидания на {tournament_name}\n\n"
+                    f"📅 {tournament.date_text}\n"
+                    f"👤 {data['full_name']}\n"
+                    f"📱 {data['phone']}\n"
+                    f"💬 @{callback.from_user.username or 'без username'}\n\n"
+                    f"📊 Место в очереди: {place}"
+                )
+        else:
+            active_count = TournamentRepository.get_active_registrations_count(
+                tournament.id, tournament_type
+            )
+            
+            admin_text = (
+                f"🏆 Новая регистрация на турнир #{registration_id}\n\n"
+                f"🎱 {tournament_name}\n"
+                f"📅 {tournament.date_text}\n"
+                f"👤 {data['full_name']}\n"
+                f"📱 {data['phone']}\n"
+                f"💬 @{callback.from_user.username or 'без username'}\n\n"
+                f"📊 Всего зарегистрировано: {active_count}/{max_participants}"
+            )
+            notifier.notify_admins(admin_text)
     
-    for admin_id in settings.ADMIN_IDS:
-        try:
-            await callback.bot.send_message(admin_id, admin_text)
-        except Exception as e:
-            logger.error(f"Не удалось отправить уведомление админу {admin_id}: {e}")
+    if registration_id is None:
+        await callback.message.edit_text(
+            f"📝 Вы в листе ожидания на {tournament_name}\n\n"
+            f"📅 Дата и время: {tournament.date_text}\n"
+            f"👤 Имя: {entry.full_name}\n"
+            f"📊 Место в очереди: {place}\n\n"
+            f"Все места сейчас заняты. Если кто-то отменит регистрацию, вы "
+            f"автоматически станете участником и получите уведомление."
+        )
+        await callback.message.answer(
+            "Выберите действие:",
+            reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(callback.from_user.id))
+        )
+        await callback.answer()
+        await state.clear()
+        return
     
     await callback.message.edit_text(
         f"✅ Регистрация успешно завершена!\n\n"
         f"🏆 Турнир: {tournament_name}\n"
-        f"📅 Дата и время: {TournamentRepository.TOURNAMENT_DATE_TEXT}\n"
+        f"📅 Дата и время: {tournament.date_text}\n"
         f"📋 Номер регистрации: #{registration_id}\n"
         f"👤 Имя: {data['full_name']}\n"
         f"📱 Телефон: {data['phone']}\n\n"
@@ -261,7 +398,7 @@ async def confirm_tournament_registration(callback: CallbackQuery, state: FSMCon
     
     await callback.message.answer(
         "Выберите действие:",
-        reply_markup=get_main_menu_keyboard(settings.is_admin(callback.from_user.id))
+        reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(callback.from_user.id))
     )
     
     await state.clear()
@@ -269,6 +406,7 @@ async def confirm_tournament_registration(callback: CallbackQuery, state: FSMCon
 
 
 @router.callback_query(F.data == "tournament_cancel")
+@flags.throttling("tournament")
 async def cancel_tournament_registration_process(callback: CallbackQuery, state: FSMContext):
     """Отмена процесса регистрации"""
     await state.clear()
@@ -276,45 +414,75 @@ async def cancel_tournament_registration_process(callback: CallbackQuery, state:
     await callback.message.edit_text("❌ Регистрация отменена")
     await callback.message.answer(
         "Выберите действие:",
-        reply_markup=get_main_menu_keyboard(settings.is_admin(callback.from_user.id))
+        reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(callback.from_user.id))
     )
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("tournament_user_cancel"))
+@flags.throttling("tournament")
 async def cancel_user_tournament_registration(callback: CallbackQuery):
     """Отмена регистрации пользователем"""
     parts = callback.data.split(":")
-    tournament_type = parts[1] if len(parts) > 1 else None
-    registration = TournamentRepository.get_user_registration(callback.from_user.id, tournament_type)
+    registration = None
+    if len(parts) == 3 and parts[1].isdigit():
+        registration = TournamentRepository.get_user_registration(
+            callback.from_user.id, int(parts[1]), parts[2]
+        )
     
     if not registration:
         await callback.answer("Регистрация не найдена", show_alert=True)
         return
 
-    tournament_name = TournamentRepository.get_tournament_name(registration.tournament_type)
+    tournament_name = TournamentRepository.get_tournament_name(
+        registration.tournament_id, registration.tournament_type
+    )
     
-    if TournamentRepository.cancel_registration(registration.id):
-        # Уведомление администраторов
-        admin_text = (
-            f"❌ Отмена регистрации на турнир #{registration.id}\n\n"
-            f"🎱 {tournament_name}\n"
-            f"👤 {registration.full_name}\n"
-            f"💬 @{callback.from_user.username or 'без username'}\n"
-            f"Причина: отменено пользователем"
-        )
-        
-        for admin_id in settings.ADMIN_IDS:
-            try:
-                await callback.bot.send_message(admin_id, admin_text)
-            except Exception as e:
-                logger.error(f"Не удалось уведомить админа {admin_id}: {e}")
-        
+    admin_text = (
+        f"❌ Отмена регистрации на турнир #{registration.id}\n\n"
+        f"🎱 {tournament_name}\n"
+        f"👤 {registration.full_name}\n"
+        f"💬 @{callback.from_user.username or 'без username'}\n"
+        f"Причина: отменено пользователем"
+    )
+    
+    # Отмена и перевод первого из листа ожидания на освободившееся место —
+    # одной транзакцией
+    with transaction(immediate=True):
+        cancelled = TournamentRepository.cancel_registration(registration.id)
+        if cancelled:
+            # Уведомление администраторов
+            notifier.notify_admins(admin_text)
+            promote_from_waitlist(registration.tournament_id, registration.tournament_type)
+    
+    if cancelled:
         await callback.message.edit_text(f"✅ Регистрация на {tournament_name} успешно отменена")
         await callback.message.answer(
             "Выберите действие:",
-            reply_markup=get_main_menu_keyboard(settings.is_admin(callback.from_user.id))
+            reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(callback.from_user.id))
         )
         await callback.answer()
     else:
         await callback.answer("Не удалось отменить регистрацию", show_alert=True)
+
+
+@router.callback_query(F.data.startswith("tournament_waitlist_leave:"))
+@flags.throttling("tournament")
+async def leave_tournament_waitlist(callback: CallbackQuery):
+    """Выход из листа ожидания"""
+    parts = callback.data.split(":")
+    entry = None
+    if len(parts) == 3 and parts[1].isdigit():
+        entry = WaitlistRepository.get_user_entry(callback.from_user.id, int(parts[1]), parts[2])
+    
+    if not entry or not WaitlistRepository.leave(entry.id):
+        await callback.answer("Запись в листе ожидания не найдена", show_alert=True)
+        return
+    
+    tournament_name = TournamentRepository.get_tournament_name(entry.tournament_id, entry.tournament_type)
+    await callback.message.edit_text(f"✅ Вы покинули лист ожидания на {tournament_name}")
+    await callback.message.answer(
+        "Выберите действие:",
+        reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(callback.from_user.id))
+    )
+    await callback.answer()
@@ -4,36 +4,47 @@
 import logging
 from datetime import datetime, timedelta
 
-from aiogram import Router, F
+from aiogram import Router, F, flags
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove
 from aiogram.fsm.context import FSMContext
 
 from config import settings
-from database.repository import BookingRepository, HoldRepository, TableRepository
-from database.models import Booking, Hold
+from database.database import transaction
+from database.repository import (
+    BookingRepository, BookingSeriesRepository, HoldRepository, TableRepository, VenueRepository
+)
+from database.models import DEFAULT_VENUE_ID, Booking, BookingSeries, Hold, Venue
 from states.booking_states import BookingStates, SupportStates
 from keyboards.keyboards import (
-    get_main_menu_keyboard, get_dates_keyboard, get_times_keyboard,
+    get_main_menu_keyboard, get_venues_keyboard, get_dates_keyboard, get_times_keyboard,
     get_duration_keyboard, get_tables_keyboard, get_phone_keyboard,
     get_confirmation_keyboard, get_bookings_keyboard, get_booking_actions_keyboard,
-    get_cancel_keyboard
+    get_series_actions_keyboard, get_cancel_keyboard
 )
+from utils.notifier import notifier
+from utils.series import describe_series
 from utils.time_utils import (
     get_available_dates, get_available_times, is_valid_booking_time,
-    format_datetime, format_time
+    get_working_hours, format_datetime, format_time
 )
 
 logger = logging.getLogger(__name__)
 router = Router()
 
 
+def get_selected_venue(data: dict) -> Venue:
+    """Заведение, выбранное в мастере бронирования"""
+    venue = VenueRepository.get_venue(data.get('venue_id', DEFAULT_VENUE_ID))
+    return venue or VenueRepository.get_venue(DEFAULT_VENUE_ID)
+
+
 @router.message(Command("start"))
 async def cmd_start(message: Message, state: FSMContext):
     """Обработка команды /start"""
     await state.clear()
     
-    is_admin = settings.is_admin(message.from_user.id)
+    is_admin = VenueRepository.is_admin(message.from_user.id)
     
     await message.answer(
         f"👋 Добро пожаловать в бот бронирования бильярдных столов!\n\n"
@@ -47,10 +58,23 @@ async def cmd_start(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "📅 Забронировать стол")
+@flags.throttling("booking")
 async def start_booking(message: Message, state: FSMContext):
     """Начало процесса бронирования"""
     await state.clear()
     
+    venues = VenueRepository.get_all_venues()
+    if len(venues) > 1:
+        await message.answer(
+            "🏢 Выберите заведение:",
+            reply_markup=get_venues_keyboard(venues)
+        )
+        await state.set_state(BookingStates.choosing_venue)
+        return
+    
+    if venues:
+        await state.update_data(venue_id=venues[0].id)
+    
     dates = get_available_dates()
     await message.answer(
         "📅 Выберите дату:",
@@ -59,15 +83,39 @@ async def start_booking(message: Message, state: FSMContext):
     await state.set_state(BookingStates.choosing_date)
 
 
+@router.callback_query(F.data.startswith("venue:"), BookingStates.choosing_venue)
+@flags.throttling("booking")
+async def process_venue(callback: CallbackQuery, state: FSMContext):
+    """Обработка выбора заведения"""
+    venue_id = int(callback.data.split(":")[1])
+    venue = VenueRepository.get_venue(venue_id)
+    
+    if not venue or not venue.is_active:
+        await callback.answer("Заведение недоступно", show_alert=True)
+        return
+    
+    await state.update_data(venue_id=venue_id)
+    
+    dates = get_available_dates()
+    await callback.message.edit_text(
+        f"🏢 {venue.name}\n\n📅 Выберите дату:",
+        reply_markup=get_dates_keyboard(dates)
+    )
+    await state.set_state(BookingStates.choosing_date)
+    await callback.answer()
+
+
 @router.callback_query(F.data.startswith("date:"), BookingStates.choosing_date)
+@flags.throttling("booking")
 async def process_date(callback: CallbackQuery, state: FSMContext):
     """Обработка выбора даты"""
     date_str = callback.data.split(":")[1]
     selected_date = datetime.strptime(date_str, "%Y-%m-%d")
     
     await state.update_data(selected_date=selected_date)
+    data = await state.get_data()
     
-    times = get_available_times(selected_date)
+    times = get_available_times(selected_date, get_selected_venue(data))
     
     logger.info(f"Доступные слоты для {selected_date.date()}: {len(times)} шт.")
     if times:
@@ -86,6 +134,7 @@ async def process_date(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("time:"), BookingStates.choosing_time)
+@flags.throttling("booking")
 async def process_time(callback: CallbackQuery, state: FSMContext):
     """Обработка выбора времени"""
     time_str = callback.data.split(":", 1)[1]
@@ -102,6 +151,7 @@ async def process_time(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("duration:"), BookingStates.choosing_duration)
+@flags.throttling("booking")
 async def process_duration(callback: CallbackQuery, state: FSMContext):
     """Обработка выбора длительности"""
     duration = int(callback.data.split(":")[1])
@@ -109,13 +159,14 @@ async def process_duration(callback: CallbackQuery, state: FSMContext):
     
     start_time = data['selected_time']
     end_time = start_time + timedelta(hours=duration)
+    venue = get_selected_venue(data)
     
     # Логирование для отладки
     logger.info(f"Проверка бронирования: start={start_time}, end={end_time}, duration={duration}h")
     
     # Проверка, что бронирование не выходит за часы работы
-    if not is_valid_booking_time(start_time, duration):
-        open_time, close_time = get_working_hours(start_time)
+    if not is_valid_booking_time(start_time, duration, venue):
+        open_time, close_time = get_working_hours(start_time, venue)
         
         # Формируем понятное сообщение о времени работы
         if close_time.hour < open_time.hour:
@@ -136,7 +187,7 @@ async def process_duration(callback: CallbackQuery, state: FSMContext):
     
     await state.update_data(duration=duration, end_time=end_time)
     
-    tables = TableRepository.get_all_tables()
+    tables = TableRepository.get_all_tables(venue.id)
     
     await callback.message.edit_text(
         f"🎱 Выберите стол:",
@@ -147,6 +198,7 @@ async def process_duration(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("table:"), BookingStates.choosing_table)
+@flags.throttling("booking")
 async def process_table(callback: CallbackQuery, state: FSMContext):
     """Обработка выбора стола"""
     table_str = callback.data.split(":")[1]
@@ -155,17 +207,10 @@ async def process_table(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     start_time = data['selected_time']
     end_time = data['end_time']
+    venue_id = get_selected_venue(data).id
     
-    # Проверка доступности
-    is_available = BookingRepository.check_availability(
-        table_id, start_time, end_time, exclude_user=callback.from_user.id
-    )
-    
-    if not is_available:
-        await callback.answer(
-            "⚠️ К сожалению, выбранный стол уже занят на это время. Выберите другой.",
-            show_alert=True
-        )
+    if TableRepository.get_table_by_id(table_id, venue_id) is None:
+        await callback.answer("Стол не найден", show_alert=True)
         return
     
     # Создание временного hold
@@ -176,12 +221,27 @@ async def process_table(callback: CallbackQuery, state: FSMContext):
         start_time=start_time,
         end_time=end_time,
         created_at=datetime.now(),
-        expires_at=datetime.now() + timedelta(minutes=settings.HOLD_TIMEOUT_MINUTES)
+        expires_at=datetime.now() + timedelta(minutes=settings.HOLD_TIMEOUT_MINUTES),
+        venue_id=venue_id
     )
     
-    # Удаляем старые holds пользователя и создаём новый
-    HoldRepository.delete_user_holds(callback.from_user.id)
-    HoldRepository.create_hold(hold)
+    # Проверка доступности и замена holds пользователя — атомарно
+    # и для других процессов бота
+    with transaction(immediate=True):
+        is_available = BookingRepository.check_availability(
+            table_id, start_time, end_time, exclude_user=callback.from_user.id,
+            venue_id=venue_id
+        )
+        if is_available:
+            HoldRepository.delete_user_holds(callback.from_user.id)
+            HoldRepository.create_hold(hold)
+    
+    if not is_available:
+        await callback.answer(
+            "⚠️ К сожалению, выбранный стол уже занят на это время. Выберите другой.",
+            show_alert=True
+        )
+        return
     
     await state.update_data(table_id=table_id)
     
@@ -200,6 +260,7 @@ async def process_table(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(BookingStates.entering_phone, F.contact)
+@flags.throttling("booking")
 async def process_contact(message: Message, state: FSMContext):
     """Обработка контакта"""
     phone = message.contact.phone_number
@@ -207,6 +268,7 @@ async def process_contact(message: Message, state: FSMContext):
 
 
 @router.message(BookingStates.entering_phone, F.text)
+@flags.throttling("booking")
 async def process_phone_text(message: Message, state: FSMContext):
     """Обработка текстового ввода телефона"""
     phone = message.text.strip()
@@ -223,28 +285,30 @@ async def process_phone_number(message: Message, state: FSMContext, phone: str):
     """Общая обработка номера телефона"""
     await state.update_data(phone=phone)
     data = await state.get_data()
+    venue = get_selected_venue(data)
     
     # Проверка, что hold ещё не истёк
     is_available = BookingRepository.check_availability(
         data['table_id'], data['selected_time'], data['end_time'],
-        exclude_user=message.from_user.id
+        exclude_user=message.from_user.id, venue_id=venue.id
     )
     
     if not is_available:
         await message.answer(
             "⚠️ К сожалению, время истекло и стол был занят другим пользователем.\n"
             "Начните бронирование заново.",
-            reply_markup=get_main_menu_keyboard(settings.is_admin(message.from_user.id))
+            reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(message.from_user.id))
         )
         await state.clear()
         return
     
     # Формирование подтверждения
-    table = TableRepository.get_table_by_id(data['table_id'])
+    table = TableRepository.get_table_by_id(data['table_id'], venue.id)
     table_name = table.name if table else "Неизвестный стол"
     
     confirmation_text = (
         f"✅ Подтверждение бронирования:\n\n"
+        f"🏢 Заведение: {venue.name}\n"
         f"📅 Дата: {format_datetime(data['selected_time'])}\n"
         f"⏱ Длительность: {data['duration']} ч\n"
         f"🎱 Стол: {table_name}\n"
@@ -259,25 +323,15 @@ async def process_phone_number(message: Message, state: FSMContext, phone: str):
     await state.set_state(BookingStates.confirming)
 
 
-@router.callback_query(F.data == "confirm_booking", BookingStates.confirming)
+@router.callback_query(
+    F.data.in_({"confirm_booking", "confirm_booking_weekly"}), BookingStates.confirming
+)
+@flags.throttling("booking")
 async def confirm_booking(callback: CallbackQuery, state: FSMContext):
-    """Подтверждение и создание бронирования"""
+    """Подтверждение и создание бронирования (или регулярной брони с первым занятием)"""
     data = await state.get_data()
-    
-    # Финальная проверка доступности
-    is_available = BookingRepository.check_availability(
-        data['table_id'], data['selected_time'], data['end_time'],
-        exclude_user=callback.from_user.id
-    )
-    
-    if not is_available:
-        await callback.message.edit_text(
-            "⚠️ К сожалению, стол уже занят. Попробуйте забронировать другое время."
-        )
-        await callback.answer()
-        await state.clear()
-        HoldRepository.delete_user_holds(callback.from_user.id)
-        return
+    venue = get_selected_venue(data)
+    weekly = callback.data == "confirm_booking_weekly"
     
     # Создание бронирования
     booking = Booking(
@@ -288,45 +342,80 @@ async def confirm_booking(callback: CallbackQuery, state: FSMContext):
         start_time=data['selected_time'],
         end_time=data['end_time'],
         phone=data['phone'],
-        created_at=datetime.now()
+        created_at=datetime.now(),
+        venue_id=venue.id
     )
     
-    booking_id = BookingRepository.create_booking(booking)
-    
-    # Удаление hold
-    HoldRepository.delete_user_holds(callback.from_user.id)
-    
-    # Уведомление администраторов
-    table = TableRepository.get_table_by_id(data['table_id'])
+    table = TableRepository.get_table_by_id(data['table_id'], venue.id)
     table_name = table.name if table else "Неизвестный стол"
     
-    admin_text = (
-        f"📌 Новое бронирование #{booking_id}\n\n"
-        f"👤 @{callback.from_user.username or 'без username'}\n"
-        f"📅 {format_datetime(data['selected_time'])}\n"
-        f"⏱ {data['duration']} ч\n"
-        f"🎱 {table_name}\n"
-        f"📱 {data['phone']}"
-    )
+    # Финальная проверка доступности, бронь, снятие hold и уведомление
+    # администраторов — одной транзакцией, с блокировкой записи с самого начала
+    booking_id = None
+    with transaction(immediate=True):
+        if BookingRepository.check_availability(
+            data['table_id'], data['selected_time'], data['end_time'],
+            exclude_user=callback.from_user.id, venue_id=venue.id
+        ):
+            series = None
+            if weekly:
+                # Следующие занятия создаст фоновая задача (utils/series.py)
+                series = BookingSeries(
+                    id=None,
+                    user_id=booking.user_id,
+                    username=booking.username,
+                    table_id=booking.table_id,
+                    start_time=booking.start_time,
+                    end_time=booking.end_time,
+                    phone=booking.phone,
+                    created_at=booking.created_at,
+                    next_start=booking.start_time + timedelta(weeks=1),
+                    venue_id=venue.id
+                )
+                series.id = booking.series_id = BookingSeriesRepository.create_series(series)
+            booking_id = BookingRepository.create_booking(booking)
+            
+            admin_text = (
+                f"📌 Новое бронирование #{booking_id}\n\n"
+                f"🏢 {venue.name}\n"
+                f"👤 @{callback.from_user.username or 'без username'}\n"
+                f"📅 {format_datetime(data['selected_time'])}\n"
+                f"⏱ {data['duration']} ч\n"
+                f"🎱 {table_name}\n"
+                f"📱 {data['phone']}"
+            )
+            if series is not None:
+                admin_text += f"\n🔁 Регулярная бронь: {describe_series(series)}"
+            notifier.notify_admins(admin_text, venue_id=venue.id)
+        HoldRepository.delete_user_holds(callback.from_user.id)
     
-    for admin_id in settings.ADMIN_IDS:
-        try:
-            await callback.bot.send_message(admin_id, admin_text)
-        except Exception as e:
-            logger.error(f"Не удалось отправить уведомление админу {admin_id}: {e}")
+    if booking_id is None:
+        await callback.message.edit_text(
+            "⚠️ К сожалению, стол уже занят. Попробуйте забронировать другое время."
+        )
+        await callback.answer()
+        await state.clear()
+        return
     
-    await callback.message.edit_text(
+    text = (
         f"✅ Бронирование успешно создано!\n\n"
         f"📋 Номер брони: #{booking_id}\n"
+        f"🏢 {venue.name}\n"
         f"📅 {format_datetime(data['selected_time'])}\n"
         f"⏱ Длительность: {data['duration']} ч\n"
         f"🎱 Стол: {table_name}\n\n"
-        f"Ждём вас! 🎱"
     )
+    if weekly:
+        text += (
+            f"🔁 Бронь повторяется каждую неделю: следующие занятия появляются "
+            f"в «📋 Мои бронирования» за {settings.MAX_BOOKING_DAYS} дней. "
+            f"Если стол в какой-то день занят, мы предупредим.\n\n"
+        )
+    await callback.message.edit_text(text + "Ждём вас! 🎱")
     
     await callback.message.answer(
         "Выберите действие:",
-        reply_markup=get_main_menu_keyboard(settings.is_admin(callback.from_user.id))
+        reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(callback.from_user.id))
     )
     
     await state.clear()
@@ -334,24 +423,27 @@ async def confirm_booking(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(F.text == "📋 Мои бронирования")
+@flags.throttling("booking")
 async def my_bookings(message: Message):
     """Просмотр бронирований пользователя"""
     bookings = BookingRepository.get_user_bookings(message.from_user.id)
+    series = BookingSeriesRepository.get_user_series(message.from_user.id)
     
-    if not bookings:
+    if not bookings and not series:
         await message.answer(
             "У вас пока нет активных бронирований.",
-            reply_markup=get_main_menu_keyboard(settings.is_admin(message.from_user.id))
+            reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(message.from_user.id))
         )
         return
     
     await message.answer(
         "📋 Ваши бронирования:",
-        reply_markup=get_bookings_keyboard(bookings)
+        reply_markup=get_bookings_keyboard(bookings, series)
     )
 
 
 @router.callback_query(F.data.startswith("show_booking:"))
+@flags.throttling("booking")
 async def show_booking_details(callback: CallbackQuery):
     """Показать детали бронирования"""
     booking_id = int(callback.data.split(":")[1])
@@ -361,11 +453,13 @@ async def show_booking_details(callback: CallbackQuery):
         await callback.answer("Бронирование не найдено", show_alert=True)
         return
     
-    table = TableRepository.get_table_by_id(booking.table_id)
+    table = TableRepository.get_table_by_id(booking.table_id, booking.venue_id)
     table_name = table.name if table else "Неизвестный стол"
+    venue = VenueRepository.get_venue(booking.venue_id)
     
     text = (
         f"📋 Бронирование #{booking.id}\n\n"
+        f"🏢 Заведение: {venue.name if venue else booking.venue_id}\n"
         f"📅 Дата и время: {format_datetime(booking.start_time)}\n"
         f"⏱ Длительность: {booking.duration_hours} ч\n"
         f"🎱 Стол: {table_name}\n"
@@ -380,6 +474,7 @@ async def show_booking_details(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("cancel_booking:"))
+@flags.throttling("booking")
 async def cancel_booking(callback: CallbackQuery):
     """Отмена бронирования пользователем"""
     booking_id = int(callback.data.split(":")[1])
@@ -389,28 +484,95 @@ async def cancel_booking(callback: CallbackQuery):
         await callback.answer("Бронирование не найдено", show_alert=True)
         return
     
-    if BookingRepository.cancel_booking(booking_id):
-        # Уведомление администраторов
-        admin_text = (
-            f"❌ Бронирование #{booking_id} отменено пользователем\n\n"
-            f"👤 @{callback.from_user.username or 'без username'}\n"
-            f"📅 {format_datetime(booking.start_time)}"
-        )
-        
-        for admin_id in settings.ADMIN_IDS:
-            try:
-                await callback.bot.send_message(admin_id, admin_text)
-            except Exception as e:
-                logger.error(f"Не удалось отправить уведомление админу {admin_id}: {e}")
-        
+    admin_text = (
+        f"❌ Бронирование #{booking_id} отменено пользователем\n\n"
+        f"👤 @{callback.from_user.username or 'без username'}\n"
+        f"📅 {format_datetime(booking.start_time)}"
+    )
+    
+    with transaction():
+        cancelled = BookingRepository.cancel_booking(booking_id)
+        if cancelled:
+            # Уведомление администраторов
+            notifier.notify_admins(admin_text, venue_id=booking.venue_id)
+    
+    if cancelled:
         await callback.message.edit_text("✅ Бронирование успешно отменено")
         await callback.answer()
     else:
         await callback.answer("Не удалось отменить бронирование", show_alert=True)
 
 
+@router.callback_query(F.data.startswith("show_series:"))
+@flags.throttling("booking")
+async def show_series_details(callback: CallbackQuery):
+    """Показать регулярную бронь"""
+    series_id = int(callback.data.split(":")[1])
+    series = BookingSeriesRepository.get_series(series_id)
+    
+    if not series or series.user_id != callback.from_user.id or series.status != 'active':
+        await callback.answer("Регулярная бронь не найдена", show_alert=True)
+        return
+    
+    table = TableRepository.get_table_by_id(series.table_id, series.venue_id)
+    table_name = table.name if table else "Неизвестный стол"
+    venue = VenueRepository.get_venue(series.venue_id)
+    
+    text = (
+        f"🔁 Регулярная бронь\n\n"
+        f"🏢 Заведение: {venue.name if venue else series.venue_id}\n"
+        f"📅 {describe_series(series)}\n"
+        f"🎱 Стол: {table_name}\n"
+        f"📱 Телефон: {series.phone}\n\n"
+        f"Занятия появляются в списке броней за {settings.MAX_BOOKING_DAYS} дней. "
+        f"Отмена регулярной брони отменяет и её будущие занятия."
+    )
+    
+    await callback.message.edit_text(
+        text,
+        reply_markup=get_series_actions_keyboard(series.id)
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("cancel_series:"))
+@flags.throttling("booking")
+async def cancel_series(callback: CallbackQuery):
+    """Отмена регулярной брони пользователем вместе с будущими занятиями"""
+    series_id = int(callback.data.split(":")[1])
+    series = BookingSeriesRepository.get_series(series_id)
+    
+    if not series or series.user_id != callback.from_user.id:
+        await callback.answer("Регулярная бронь не найдена", show_alert=True)
+        return
+    
+    with transaction():
+        cancelled = BookingSeriesRepository.cancel_series(series_id)
+        if cancelled is not None:
+            admin_text = (
+                f"❌ Регулярная бронь отменена пользователем\n\n"
+                f"👤 @{callback.from_user.username or 'без username'}\n"
+                f"📅 {describe_series(series)}"
+            )
+            if cancelled:
+                admin_text += "\n🗑 Отменены брони: " + ", ".join(
+                    f"#{booking.id}" for booking in cancelled
+                )
+            notifier.notify_admins(admin_text, venue_id=series.venue_id)
+    
+    if cancelled is not None:
+        await callback.message.edit_text(
+            f"✅ Регулярная бронь отменена\n"
+            f"Отменено будущих занятий: {len(cancelled)}"
+        )
+        await callback.answer()
+    else:
+        await callback.answer("Не удалось отменить регулярную бронь", show_alert=True)
+
+
 # Навигация назад
 @router.callback_query(F.data == "back_to_date")
+@flags.throttling("booking")
 async def back_to_date(callback: CallbackQuery, state: FSMContext):
     """Возврат к выбору даты"""
     dates = get_available_dates()
@@ -423,10 +585,11 @@ async def back_to_date(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "back_to_time")
+@flags.throttling("booking")
 async def back_to_time(callback: CallbackQuery, state: FSMContext):
     """Возврат к выбору времени"""
     data = await state.get_data()
-    times = get_available_times(data['selected_date'])
+    times = get_available_times(data['selected_date'], get_selected_venue(data))
     
     await callback.message.edit_text(
         "🕐 Выберите время начала:",
@@ -437,6 +600,7 @@ async def back_to_time(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "back_to_duration")
+@flags.throttling("booking")
 async def back_to_duration(callback: CallbackQuery, state: FSMContext):
     """Возврат к выбору длительности"""
     await callback.message.edit_text(
@@ -448,9 +612,11 @@ async def back_to_duration(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "back_to_table")
+@flags.throttling("booking")
 async def back_to_table(callback: CallbackQuery, state: FSMContext):
     """Возврат к выбору стола"""
-    tables = TableRepository.get_all_tables()
+    data = await state.get_data()
+    tables = TableRepository.get_all_tables(get_selected_venue(data).id)
     await callback.message.edit_text(
         "🎱 Выберите стол:",
         reply_markup=get_tables_keyboard(tables)
@@ -460,18 +626,20 @@ async def back_to_table(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "my_bookings")
+@flags.throttling("booking")
 async def callback_my_bookings(callback: CallbackQuery):
     """Возврат к списку бронирований"""
     bookings = BookingRepository.get_user_bookings(callback.from_user.id)
+    series = BookingSeriesRepository.get_user_series(callback.from_user.id)
     
-    if not bookings:
+    if not bookings and not series:
         await callback.message.edit_text("У вас пока нет активных бронирований.")
         await callback.answer()
         return
     
     await callback.message.edit_text(
         "📋 Ваши бронирования:",
-        reply_markup=get_bookings_keyboard(bookings)
+        reply_markup=get_bookings_keyboard(bookings, series)
     )
     await callback.answer()
 
@@ -484,7 +652,7 @@ async def callback_main_menu(callback: CallbackQuery, state: FSMContext):
     
     await callback.message.answer(
         "🏠 Главное меню",
-        reply_markup=get_main_menu_keyboard(settings.is_admin(callback.from_user.id))
+        reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(callback.from_user.id))
     )
     await callback.answer()
 
@@ -498,12 +666,13 @@ async def cancel_booking_process(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text("❌ Бронирование отменено")
     await callback.message.answer(
         "Выберите действие:",
-        reply_markup=get_main_menu_keyboard(settings.is_admin(callback.from_user.id))
+        reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(callback.from_user.id))
     )
     await callback.answer()
 
 
 @router.message(F.text == "🆘 Поддержка")
+@flags.throttling("support")
 async def support_start(message: Message, state: FSMContext):
     """Начало обращения в поддержку"""
     await state.clear()
@@ -516,6 +685,7 @@ async def support_start(message: Message, state: FSMContext):
 
 
 @router.message(SupportStates.waiting_for_message, F.text)
+@flags.throttling("support")
 async def support_send_message(message: Message, state: FSMContext):
     """Отправка сообщения поддержки администратору"""
     await state.clear()
@@ -531,14 +701,9 @@ async def support_send_message(message: Message, state: FSMContext):
         f"💬 {message.text}"
     )
 
-    if settings.SUPPORT_ADMIN_IDS:
-        for admin_id in settings.SUPPORT_ADMIN_IDS:
-            try:
-                await message.bot.send_message(admin_id, admin_text)
-            except Exception as e:
-                logger.error(f"Не удалось отправить сообщение поддержки админу {admin_id}: {e}")
+    notifier.notify_support(admin_text)
 
     await message.answer(
         "✅ Ваше сообщение отправлено. Мы скоро свяжемся с вами.",
-        reply_markup=get_main_menu_keyboard(settings.is_admin(user.id))
+        reply_markup=get_main_menu_keyboard(VenueRepository.is_admin(user.id))
     )
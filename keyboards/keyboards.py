@@ -2,21 +2,33 @@
 Клавиатуры для Telegram бота
 """
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from database.models import Table, Booking
+from database.models import Venue, Table, Booking, BookingSeries, Tournament
+from database.repository import TournamentRepository
+from utils.series import describe_series
 from utils.time_utils import format_date, format_time
 from config import settings
 
+# Варианты повтора блокировки администратором: недель подряд (1 — один раз)
+BLOCK_REPEAT_WEEKS = (1, 4, 8, 12, 26)
+
+
+def get_tournament_button_text(tournament: Tournament) -> str:
+    """Текст кнопки турнира в главном меню"""
+    return f"🏆 {tournament.title}"
+
 
 def get_main_menu_keyboard(is_admin: bool = False) -> ReplyKeyboardMarkup:
     """Главное меню"""
     buttons = [
         [KeyboardButton(text="📅 Забронировать стол")],
-        [KeyboardButton(text="🏆 Турнир 05.07")],
+        # Кнопки турниров с открытой регистрацией (из кэша турниров)
+        *([KeyboardButton(text=get_tournament_button_text(tournament))]
+          for tournament in TournamentRepository.get_upcoming_tournaments()),
         [KeyboardButton(text="📋 Мои бронирования")],
         [KeyboardButton(text="🆘 Поддержка")],
     ]
@@ -27,6 +39,19 @@ def get_main_menu_keyboard(is_admin: bool = False) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
 
+def get_venues_keyboard(venues: List[Venue]) -> InlineKeyboardMarkup:
+    """Клавиатура выбора заведения"""
+    builder = InlineKeyboardBuilder()
+    
+    for venue in venues:
+        builder.button(text=venue.name, callback_data=f"venue:{venue.id}")
+    
+    builder.button(text="❌ Отмена", callback_data="cancel")
+    builder.adjust(1)
+    
+    return builder.as_markup()
+
+
 def get_dates_keyboard(dates: List[datetime]) -> InlineKeyboardMarkup:
     """Клавиатура выбора даты"""
     builder = InlineKeyboardBuilder()
@@ -107,6 +132,7 @@ def get_confirmation_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
     builder.button(text="✅ Подтвердить", callback_data="confirm_booking")
+    builder.button(text="🔁 Подтвердить и повторять каждую неделю", callback_data="confirm_booking_weekly")
     builder.button(text="◀️ Изменить", callback_data="back_to_table")
     builder.button(text="❌ Отмена", callback_data="cancel")
     builder.adjust(1)
@@ -114,14 +140,19 @@ def get_confirmation_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_bookings_keyboard(bookings: List[Booking]) -> InlineKeyboardMarkup:
-    """Клавиатура списка бронирований пользователя"""
+def get_bookings_keyboard(bookings: List[Booking],
+                          series: Sequence[BookingSeries] = ()) -> InlineKeyboardMarkup:
+    """Клавиатура списка бронирований и регулярных броней пользователя"""
     builder = InlineKeyboardBuilder()
     
     for booking in bookings:
-        text = f"🗓 {format_date(booking.start_time)} {format_time(booking.start_time)}"
+        icon = "🔁" if booking.series_id is not None else "🗓"
+        text = f"{icon} {format_date(booking.start_time)} {format_time(booking.start_time)}"
         builder.button(text=text, callback_data=f"show_booking:{booking.id}")
     
+    for item in series:
+        builder.button(text=f"♾ {describe_series(item)}", callback_data=f"show_series:{item.id}")
+    
     builder.button(text="🏠 Главное меню", callback_data="main_menu")
     builder.adjust(1)
     
@@ -139,6 +170,17 @@ def get_booking_actions_keyboard(booking_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def get_series_actions_keyboard(series_id: int) -> InlineKeyboardMarkup:
+    """Клавиатура действий с регулярной бронью"""
+    builder = InlineKeyboardBuilder()
+    
+    builder.button(text="🗑 Отменить регулярную бронь", callback_data=f"cancel_series:{series_id}")
+    builder.button(text="◀️ Назад", callback_data="my_bookings")
+    builder.adjust(1)
+    
+    return builder.as_markup()
+
+
 def get_admin_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура админ-панели"""
     builder = InlineKeyboardBuilder()
@@ -244,6 +286,47 @@ def get_admin_edit_duration_keyboard(booking_id: int, current_duration: int, dat
     return builder.as_markup()
 
 
+def get_admin_find_keyboard(bookings: List[Booking], raw_query: str, page: int,
+                            has_next: bool) -> InlineKeyboardMarkup:
+    """Клавиатура результатов /find: брони и листание страниц"""
+    builder = InlineKeyboardBuilder()
+    
+    for booking in bookings:
+        status_emoji = "✅" if booking.status == "active" else "❌"
+        builder.button(
+            text=f"{status_emoji} Бронь #{booking.id} · {format_date(booking.start_time)} {format_time(booking.start_time)}",
+            callback_data=f"admin_booking:{booking.id}"
+        )
+    
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(
+            text="◀️ Назад", callback_data=f"admin_find:{page - 1}:{raw_query}"
+        ))
+    if has_next:
+        navigation.append(InlineKeyboardButton(
+            text="Дальше ▶️", callback_data=f"admin_find:{page + 1}:{raw_query}"
+        ))
+    builder.adjust(1)
+    if navigation:
+        builder.row(*navigation)
+    
+    return builder.as_markup()
+
+
+def get_admin_block_venues_keyboard(venues: List[Venue]) -> InlineKeyboardMarkup:
+    """Клавиатура выбора заведения для блокировки"""
+    builder = InlineKeyboardBuilder()
+    
+    for venue in venues:
+        builder.button(text=venue.name, callback_data=f"admin_block_venue:{venue.id}")
+    
+    builder.button(text="◀️ Назад в админ-панель", callback_data="admin_back_to_panel")
+    builder.adjust(1)
+    
+    return builder.as_markup()
+
+
 def get_admin_block_dates_keyboard(dates: List[datetime]) -> InlineKeyboardMarkup:
     """Клавиатура выбора даты для блокировки"""
     builder = InlineKeyboardBuilder()
@@ -288,6 +371,7 @@ def get_admin_block_duration_keyboard() -> InlineKeyboardMarkup:
         else:
             text = f"{hours} часов"
         builder.button(text=text, callback_data=f"admin_block_duration:{hours}")
+    builder.button(text="🌙 До закрытия", callback_data="admin_block_duration:close")
     
     builder.button(text="◀️ Назад", callback_data="admin_block_back_to_time")
     builder.adjust(2)
@@ -295,16 +379,38 @@ def get_admin_block_duration_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_admin_block_tables_keyboard(tables: List[Table]) -> InlineKeyboardMarkup:
-    """Клавиатура выбора стола для блокировки"""
+def get_admin_block_tables_keyboard(tables: List[Table], selected: List[int]) -> InlineKeyboardMarkup:
+    """Клавиатура выбора столов для блокировки (несколько, повторное нажатие снимает выбор)"""
     builder = InlineKeyboardBuilder()
     
     for table in tables:
-        builder.button(text=table.name, callback_data=f"admin_block_table:{table.id}")
+        mark = "☑️" if table.id in selected else "⬜"
+        builder.button(text=f"{mark} {table.name}", callback_data=f"admin_block_table:{table.id}")
     
-    builder.button(text="◀️ Назад", callback_data="admin_block_back_to_duration")
     builder.adjust(2)
     
+    all_selected = bool(tables) and len(selected) == len(tables)
+    builder.row(InlineKeyboardButton(
+        text="⬜ Снять все" if all_selected else "☑️ Все столы",
+        callback_data="admin_block_table:all"
+    ))
+    builder.row(InlineKeyboardButton(text="Далее ▶️", callback_data="admin_block_tables_done"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin_block_back_to_duration"))
+    
+    return builder.as_markup()
+
+
+def get_admin_block_repeat_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура выбора повтора блокировки"""
+    builder = InlineKeyboardBuilder()
+    
+    for weeks in BLOCK_REPEAT_WEEKS:
+        text = "Один раз" if weeks == 1 else f"Каждую неделю, {weeks} нед."
+        builder.button(text=text, callback_data=f"admin_block_repeat:{weeks}")
+    
+    builder.button(text="◀️ Назад", callback_data="admin_block_back_to_tables")
+    builder.adjust(1)
+    
     return builder.as_markup()
 
 
@@ -319,23 +425,43 @@ def get_tournament_confirmation_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_tournament_type_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура выбора турнира"""
+def get_tournament_type_keyboard(tournament: Tournament) -> InlineKeyboardMarkup:
+    """Клавиатура выбора дисциплины турнира"""
     builder = InlineKeyboardBuilder()
     
-    builder.button(text="🏆 Турнир по русскому", callback_data="tournament_select:russian")
-    builder.button(text="🏆 Турнир по пулу", callback_data="tournament_select:pool")
+    for division in tournament.divisions:
+        builder.button(
+            text=f"🏆 {division.name}",
+            callback_data=f"tournament_select:{tournament.id}:{division.code}"
+        )
     builder.button(text="🏠 Главное меню", callback_data="main_menu")
     builder.adjust(1)
     
     return builder.as_markup()
 
 
-def get_tournament_registered_keyboard(tournament_type: str) -> InlineKeyboardMarkup:
+def get_tournament_registered_keyboard(tournament_id: int, tournament_type: str) -> InlineKeyboardMarkup:
     """Клавиатура для зарегистрированного участника"""
     builder = InlineKeyboardBuilder()
     
-    builder.button(text="🗑 Отменить регистрацию", callback_data=f"tournament_user_cancel:{tournament_type}")
+    builder.button(
+        text="🗑 Отменить регистрацию",
+        callback_data=f"tournament_user_cancel:{tournament_id}:{tournament_type}"
+    )
+    builder.button(text="🏠 Главное меню", callback_data="main_menu")
+    builder.adjust(1)
+    
+    return builder.as_markup()
+
+
+def get_tournament_waitlisted_keyboard(tournament_id: int, tournament_type: str) -> InlineKeyboardMarkup:
+    """Клавиатура для ожидающего в листе ожидания"""
+    builder = InlineKeyboardBuilder()
+    
+    builder.button(
+        text="🚪 Покинуть лист ожидания",
+        callback_data=f"tournament_waitlist_leave:{tournament_id}:{tournament_type}"
+    )
     builder.button(text="🏠 Главное меню", callback_data="main_menu")
     builder.adjust(1)
     
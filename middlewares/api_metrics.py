@@ -0,0 +1,55 @@
+"""
+Middleware сессии бота для сбора метрик вызовов Bot API
+"""
+import time
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from utils.metrics import metrics
+
+api_latency = metrics.histogram(
+    'bot_api_request_seconds', 'Длительность вызовов Bot API', ['method']
+)
+api_errors = metrics.counter(
+    'bot_api_errors_total', 'Ошибки вызовов Bot API', ['method', 'error']
+)
+api_retry_after = metrics.counter(
+    'bot_api_retry_after_total', 'Ответы 429 (RetryAfter) от Bot API', ['method']
+)
+api_in_flight = metrics.gauge(
+    'bot_api_in_flight', 'Вызовы Bot API в процессе выполнения', ['method']
+)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Замеряет время каждого вызова Bot API по методам, считает ошибки
+    и ответы RetryAfter, ведёт gauge запросов в процессе.
+
+    Подключение: bot.session.middleware(ApiMetricsMiddleware())
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        api_in_flight.inc(method=name)
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            api_retry_after.inc(method=name)
+            raise
+        except Exception as e:
+            api_errors.inc(method=name, error=type(e).__name__)
+            raise
+        finally:
+            api_latency.observe(time.perf_counter() - started, method=name)
+            api_in_flight.dec(method=name)
@@ -0,0 +1,89 @@
+"""
+Middleware для подавления повторных нажатий inline-кнопок
+"""
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Awaitable, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery
+
+from utils.metrics import metrics
+
+callback_duplicates = metrics.counter(
+    'callback_duplicates_suppressed_total', 'Подавленные повторные нажатия кнопок'
+)
+
+CallbackKey = Tuple[int, str, Optional[int]]
+
+
+class CallbackDedupMiddleware(BaseMiddleware):
+    """
+    Отбрасывает повторы callback'а (пользователь, data, id сообщения), пока
+    первый ещё обрабатывается и в течение ttl секунд после его завершения.
+
+    Подключается как outer middleware на callback_query — повтор отсекается
+    до HoldCleanupMiddleware и хендлера, то есть до любых запросов к БД.
+    Таблица ключей ограничена max_keys: при переполнении вытесняются самые
+    старые записи. Если хендлер упал, ключ снимается, чтобы можно было
+    повторить нажатие.
+    """
+
+    def __init__(self, ttl: float, max_keys: int):
+        self._ttl = ttl
+        self._max_keys = max_keys
+        # Ключ -> момент истечения (None — ещё обрабатывается)
+        self._keys: "OrderedDict[CallbackKey, Optional[float]]" = OrderedDict()
+
+    def _is_duplicate(self, key: CallbackKey, now: float) -> bool:
+        if key not in self._keys:
+            return False
+        expires_at = self._keys[key]
+        if expires_at is None or expires_at > now:
+            return True
+        del self._keys[key]
+        return False
+
+    def _evict(self, now: float):
+        """Удаление истёкших ключей в начале таблицы и вытеснение лишних"""
+        while self._keys:
+            key, expires_at = next(iter(self._keys.items()))
+            if expires_at is not None and expires_at <= now:
+                self._keys.popitem(last=False)
+            elif len(self._keys) > self._max_keys:
+                self._keys.popitem(last=False)
+            else:
+                break
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, CallbackQuery) or event.data is None:
+            return await handler(event, data)
+
+        message_id = event.message.message_id if event.message else None
+        key = (event.from_user.id, event.data, message_id)
+        now = time.monotonic()
+
+        if self._is_duplicate(key, now):
+            callback_duplicates.inc()
+            # Снимаем «часики» с кнопки, но ничего не делаем
+            await event.answer()
+            return None
+
+        self._keys[key] = None
+        self._evict(now)
+
+        try:
+            result = await handler(event, data)
+        except Exception:
+            self._keys.pop(key, None)
+            raise
+
+        # Переносим ключ в конец: срок жизни отсчитывается от завершения
+        self._keys.pop(key, None)
+        self._keys[key] = time.monotonic() + self._ttl
+        return result
@@ -0,0 +1,30 @@
+"""
+Middleware для ограничения числа одновременно обрабатываемых апдейтов
+"""
+import asyncio
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Ограничивает количество хендлеров, выполняющихся одновременно.
+
+    В webhook-режиме aiogram запускает обработку каждого апдейта отдельной
+    задачей, поэтому при всплеске нагрузки без ограничения все они разом
+    пойдут в SQLite. Лишние апдейты ждут своей очереди на семафоре.
+    """
+
+    def __init__(self, limit: int):
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with self._semaphore:
+            return await handler(event, data)
@@ -1,31 +1,54 @@
 """
-Middleware для незаметного обновления клавиатуры после перезапуска бота.
+Middleware для незаметного обновления клавиатуры после деплоя.
 
-При первом сообщении от пользователя после рестарта добавляет актуальную
-клавиатуру к ответу хендлера — пользователь ничего не замечает.
+Каждому пользователю сохраняется версия (epoch) клавиатуры, которую он
+последней получил. Если она меньше settings.KEYBOARD_EPOCH, при первом
+сообщении из главного меню к ответу хендлера добавляется актуальная
+клавиатура — пользователь ничего не замечает.
 """
-from typing import Callable, Dict, Any, Awaitable, Set
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Awaitable
 
 from aiogram import BaseMiddleware
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
-from config import settings
+from database.repository import KeyboardEpochRepository, VenueRepository
 from keyboards.keyboards import get_main_menu_keyboard
 
-
-# Множество user_id, которые уже получили обновлённую клавиатуру.
-# Хранится в памяти процесса — при перезапуске Docker-контейнера
-# сбрасывается автоматически, что нам и нужно.
-_refreshed_users: Set[int] = set()
+# Версия, которой ещё нет ни у одного пользователя
+_UNKNOWN_EPOCH = 0
 
 
 class KeyboardRefreshMiddleware(BaseMiddleware):
     """
-    После перезапуска бота незаметно обновляет Reply-клавиатуру
-    при первом же сообщении от пользователя.
+    Обновляет Reply-клавиатуру пользователям, у которых она устарела.
+
+    Версии пользователей хранятся в таблице keyboard_epochs, недавние —
+    в LRU-кэше на cache_size записей, так что для активных пользователей
+    проверка — один поиск в словаре, а память не растёт с их числом.
     """
 
+    def __init__(self, epoch: int, cache_size: int):
+        self._epoch = epoch
+        self._cache_size = cache_size
+        self._epochs: "OrderedDict[int, int]" = OrderedDict()
+
+    def _user_epoch(self, user_id: int) -> int:
+        epoch = self._epochs.get(user_id)
+        if epoch is None:
+            epoch = KeyboardEpochRepository.get_epoch(user_id) or _UNKNOWN_EPOCH
+            self._remember(user_id, epoch)
+        else:
+            self._epochs.move_to_end(user_id)
+        return epoch
+
+    def _remember(self, user_id: int, epoch: int):
+        self._epochs[user_id] = epoch
+        self._epochs.move_to_end(user_id)
+        if len(self._epochs) > self._cache_size:
+            self._epochs.popitem(last=False)
+
     async def __call__(
         self,
         handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
@@ -33,29 +56,31 @@ class KeyboardRefreshMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         # Работаем только с обычными сообщениями
-        if not isinstance(event, Message):
+        if not isinstance(event, Message) or event.from_user is None:
             return await handler(event, data)
 
         user_id = event.from_user.id
 
-        # Если пользователь уже получил свежую клавиатуру — пропускаем
-        if user_id in _refreshed_users:
+        # Клавиатура актуальна — пропускаем
+        if self._user_epoch(user_id) >= self._epoch:
             return await handler(event, data)
 
-        # Помечаем пользователя как обновлённого до вызова хендлера,
-        # чтобы избежать повторной отправки при параллельных запросах
-        _refreshed_users.add(user_id)
-
         # Проверяем FSM-состояние: если пользователь в середине какого-то
-        # флоу (бронирование, турнир и т.д.) — не вмешиваемся, иначе сломаем UX
+        # флоу (бронирование, турнир и т.д.) — не вмешиваемся, иначе сломаем UX.
+        # Клавиатура обновится, когда он вернётся в главное меню
         state: FSMContext = data.get("state")
         if state:
             current_state = await state.get_state()
             if current_state is not None:
                 return await handler(event, data)
 
+        # Запоминаем версию до отправки — апдейты пользователя обрабатываются
+        # последовательно, так что повторной отправки не будет
+        KeyboardEpochRepository.set_epoch(user_id, self._epoch)
+        self._remember(user_id, self._epoch)
+
         # Пользователь в главном меню — тихо шлём клавиатуру
-        is_admin = settings.is_admin(user_id)
+        is_admin = VenueRepository.is_admin(user_id)
         await event.answer(
             "Выберите действие:",
             reply_markup=get_main_menu_keyboard(is_admin)
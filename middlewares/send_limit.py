@@ -0,0 +1,39 @@
+"""
+Middleware сессии бота: общий лимит отправки сообщений
+"""
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from utils.token_bucket import TokenBucket
+
+# Методы, которые Telegram считает в лимите ~30 сообщений/с на бота
+SEND_METHODS = frozenset({
+    'sendMessage', 'sendPhoto', 'sendDocument', 'sendMediaGroup', 'sendVideo',
+    'sendAnimation', 'sendAudio', 'sendVoice', 'sendSticker', 'sendLocation',
+    'sendContact', 'copyMessage', 'forwardMessage',
+})
+
+
+class SendLimitMiddleware(BaseRequestMiddleware):
+    """
+    Перед каждой отправкой сообщения ждёт токен из bucket — ответы
+    хендлеров и уведомления outbox делят один лимит бота. При нескольких
+    процессах им передаётся один SharedTokenBucket.
+
+    Подключение: bot.session.middleware(SendLimitMiddleware(bucket))
+    """
+
+    def __init__(self, bucket: TokenBucket):
+        self._bucket = bucket
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if method.__api_method__ in SEND_METHODS:
+            await self._bucket.acquire()
+        return await make_request(bot, method)
@@ -0,0 +1,98 @@
+"""
+Middleware для ограничения частоты запросов по группам хендлеров
+"""
+from typing import Callable, Dict, Any, Awaitable, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject, Message, CallbackQuery
+
+from utils.metrics import metrics
+from utils.token_bucket import TokenBucket
+
+throttled_updates = metrics.counter(
+    'throttled_updates_total', 'Апдейты, отклонённые ограничением частоты', ['group', 'scope']
+)
+
+THROTTLED_TEXT = "⏳ Слишком много запросов, подождите немного"
+
+# (запросов/с на пользователя, запас, запросов/с на всех, запас)
+ThrottleLimit = Tuple[float, float, float, float]
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Token bucket на пользователя и общий bucket для каждой группы хендлеров.
+
+    Группа задаётся флагом хендлера: @flags.throttling("booking"); хендлеры
+    без флага попадают в группу "default". Middleware подключается раньше
+    HoldCleanupMiddleware, поэтому отклонённый апдейт не доходит до БД:
+    на callback отвечаем всплывающей подсказкой, на сообщение — одним
+    предупреждением на серию отклонённых сообщений.
+    """
+
+    DEFAULT_GROUP = 'default'
+    MAX_USER_BUCKETS = 10000
+
+    def __init__(self, limits: Dict[str, ThrottleLimit]):
+        self._limits = limits
+        self._global_buckets = {
+            group: TokenBucket(global_rate, global_burst)
+            for group, (_, _, global_rate, global_burst) in limits.items()
+        }
+        self._user_buckets: Dict[Tuple[str, int], TokenBucket] = {}
+        self._warned: Set[Tuple[str, int]] = set()
+
+    def _user_bucket(self, group: str, user_id: int) -> TokenBucket:
+        """Bucket пользователя в группе (полные периодически выбрасываются)"""
+        key = (group, user_id)
+        bucket = self._user_buckets.get(key)
+        if bucket is None:
+            if len(self._user_buckets) >= self.MAX_USER_BUCKETS:
+                self._user_buckets = {
+                    key: value for key, value in self._user_buckets.items() if not value.is_full
+                }
+                self._warned.intersection_update(self._user_buckets)
+            rate, burst, _, _ = self._limits[group]
+            bucket = self._user_buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    async def _reject(self, event: TelegramObject, key: Tuple[str, int]):
+        """Дешёвый отказ — без обращений к БД"""
+        if isinstance(event, CallbackQuery):
+            await event.answer(THROTTLED_TEXT)
+        elif isinstance(event, Message) and key not in self._warned:
+            self._warned.add(key)
+            await event.answer(THROTTLED_TEXT)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get('event_from_user')
+        if user is None:
+            return await handler(event, data)
+
+        group = get_flag(data, 'throttling', default=self.DEFAULT_GROUP)
+        if group not in self._limits:
+            group = self.DEFAULT_GROUP
+        key = (group, user.id)
+
+        # Токен пользователя тратится, только если пропускает и общий лимит:
+        # отказ по общему лимиту не должен съедать запас пользователя
+        user_bucket = self._user_bucket(group, user.id)
+        if user_bucket.delay() > 0:
+            throttled_updates.inc(group=group, scope='user')
+            await self._reject(event, key)
+            return None
+
+        if not self._global_buckets[group].try_acquire():
+            throttled_updates.inc(group=group, scope='global')
+            await self._reject(event, key)
+            return None
+
+        user_bucket.try_acquire()
+        self._warned.discard(key)
+        return await handler(event, data)
@@ -0,0 +1,79 @@
+"""
+Middleware для последовательной обработки апдейтов одного пользователя
+"""
+import asyncio
+import time
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from utils.metrics import metrics
+
+user_lock_wait = metrics.histogram(
+    'user_lock_wait_seconds', 'Ожидание блокировки пользователя перед обработкой апдейта',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+user_lock_contended = metrics.counter(
+    'user_lock_contended_total', 'Апдейты, ожидавшие завершения предыдущего апдейта пользователя'
+)
+user_locks_active = metrics.gauge(
+    'user_locks_active', 'Пользователи с апдейтами в обработке'
+)
+
+
+class _UserLock:
+    """Блокировка пользователя и число апдейтов, которые её держат или ждут"""
+    __slots__ = ('lock', 'users')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class UserLockMiddleware(BaseMiddleware):
+    """
+    Апдейты одного пользователя обрабатываются строго по очереди.
+
+    Без этого два быстрых нажатия могут перемешать state.get_data() и
+    state.update_data() в соседних шагах FSM, и следующий хендлер прочитает
+    устаревшие selected_time/end_time. Разные пользователи по-прежнему
+    обрабатываются параллельно. Блокировка удаляется, как только у
+    пользователя не остаётся апдейтов в обработке, так что память
+    не растёт с числом пользователей.
+
+    Подключается outer middleware на update раньше ConcurrencyLimitMiddleware,
+    чтобы ожидающие апдейты не занимали общие слоты обработки.
+    """
+
+    def __init__(self):
+        self._locks: Dict[int, _UserLock] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user: User = data.get('event_from_user')
+        if user is None:
+            return await handler(event, data)
+
+        entry = self._locks.get(user.id)
+        if entry is None:
+            entry = self._locks[user.id] = _UserLock()
+            user_locks_active.inc()
+        entry.users += 1
+
+        try:
+            if entry.lock.locked():
+                user_lock_contended.inc()
+            started = time.perf_counter()
+            async with entry.lock:
+                user_lock_wait.observe(time.perf_counter() - started)
+                return await handler(event, data)
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._locks[user.id]
+                user_locks_active.dec()
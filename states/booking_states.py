@@ -6,6 +6,7 @@ from aiogram.fsm.state import State, StatesGroup
 
 class BookingStates(StatesGroup):
     """Состояния процесса бронирования"""
+    choosing_venue = State()  # только если заведений несколько
     choosing_date = State()
     choosing_time = State()
     choosing_duration = State()
@@ -16,10 +17,12 @@ class BookingStates(StatesGroup):
 
 class AdminBlockStates(StatesGroup):
     """Состояния процесса блокировки администратором"""
+    choosing_venue = State()  # только если у администратора несколько заведений
     choosing_date = State()
     choosing_time = State()
     choosing_duration = State()
-    choosing_table = State()
+    choosing_table = State()   # несколько столов
+    choosing_repeat = State()  # один раз или каждую неделю
 
 
 class TournamentStates(StatesGroup):
@@ -0,0 +1,544 @@
+"""
+Проверка, что хранилища SQLiteBackend и MemoryBackend ведут себя одинаково.
+
+Прогоняет одни и те же сценарии (брони и конфликты, holds с истечением и
+исключением пользователя, отмена и продление, порядок выборок, фильтр по
+заведениям, турниры с дисциплинами, регистрации и лист ожидания, сводка
+для админ-панели, потоковые выгрузки, пакетные блокировки и матчи сетки,
+агрегат занятости, поиск, регулярные брони, откат транзакции) и случайные
+последовательности операций (брони и holds, очередь листа ожидания) на
+обоих хранилищах и сравнивает каждый результат.
+Печатает время прогона на каждом хранилище; при расхождении завершается
+с кодом 1.
+
+Запустите:
+    python storage_conformance.py              # 3000 случайных операций
+    python storage_conformance.py -n 20000 -s 7
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import asdict, replace
+from datetime import datetime, timedelta
+
+# Окружение должно быть настроено до импорта config
+os.environ.setdefault("BOT_TOKEN", "123456:CONFORMANCE")
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "conformance.db")
+
+from database.database import init_db  # noqa: E402
+from database.memory_backend import MemoryBackend  # noqa: E402
+from database.models import (  # noqa: E402
+    Venue, Booking, BookingSeries, Hold, Occupancy, SearchQuery, Tournament, TournamentDivision,
+    TournamentMatch, TournamentRegistration, WaitlistEntry
+)
+from database.sqlite_backend import SQLiteBackend  # noqa: E402
+
+BASE = datetime(2030, 3, 1)
+
+
+def normalize(value):
+    """Результат в виде, пригодном для сравнения (dataclass → dict)"""
+    if isinstance(value, list):
+        return [normalize(item) for item in value]
+    if hasattr(value, '__dataclass_fields__'):
+        return asdict(value)
+    return value
+
+
+def booking(user_id, table_id, start_hour, hours, venue_id=1, status='active'):
+    start = BASE + timedelta(hours=start_hour)
+    return Booking(
+        id=None, user_id=user_id, username=f"user{user_id}", table_id=table_id,
+        start_time=start, end_time=start + timedelta(hours=hours), phone="+70000000000",
+        created_at=BASE, status=status, venue_id=venue_id
+    )
+
+
+def hold(user_id, table_id, start_hour, hours, expires_minutes, venue_id=1):
+    start = BASE + timedelta(hours=start_hour)
+    return Hold(
+        id=None, user_id=user_id, table_id=table_id,
+        start_time=start, end_time=start + timedelta(hours=hours),
+        created_at=BASE, expires_at=BASE + timedelta(minutes=expires_minutes), venue_id=venue_id
+    )
+
+
+def series(user_id, table_id, start_hour, hours, next_weeks=1, venue_id=1):
+    start = BASE + timedelta(hours=start_hour)
+    return BookingSeries(
+        id=None, user_id=user_id, username=f"user{user_id}", table_id=table_id,
+        start_time=start, end_time=start + timedelta(hours=hours), phone="+70000000000",
+        created_at=BASE, next_start=start + timedelta(weeks=next_weeks), venue_id=venue_id
+    )
+
+
+def registration(user_id, tournament_type, minute, tournament_id):
+    return TournamentRegistration(
+        id=None, user_id=user_id, username=None, full_name=f"Игрок {user_id}",
+        phone="+70000000000", created_at=BASE + timedelta(minutes=minute),
+        tournament_type=tournament_type, tournament_event=f"event-{tournament_id}",
+        tournament_id=tournament_id
+    )
+
+
+def waitlist_entry(user_id, position, tournament_id, tournament_type='pool'):
+    return WaitlistEntry(
+        id=None, tournament_id=tournament_id, tournament_type=tournament_type,
+        position=position, user_id=user_id, username=None, full_name=f"Игрок {user_id}",
+        phone="+70000000000", created_at=BASE
+    )
+
+
+def match(round_number, number, tournament_id, status='scheduled', table_id=None, start_hour=None,
+          booking_id=None):
+    start = BASE + timedelta(hours=start_hour) if start_hour is not None else None
+    return TournamentMatch(
+        id=None, tournament_id=tournament_id, tournament_type='pool', round=round_number,
+        number=number, player1_id=round_number, player2_id=None, status=status,
+        table_id=table_id, start_time=start,
+        end_time=start + timedelta(hours=1) if start else None, booking_id=booking_id
+    )
+
+
+def scenarios(backend, record):
+    """Фиксированные сценарии; record(name, value) сохраняет результат"""
+    venue_id = backend.create_venue(Venue(
+        id=None, name="Второй клуб",
+        **{key: (BASE + timedelta(hours=12 if key.endswith('open') else 23)).time()
+           for key in ('weekday_open', 'weekday_close', 'friday_open', 'friday_close',
+                       'weekend_open', 'weekend_close', 'sunday_open', 'sunday_close')},
+        admin_ids=[5, 6]
+    ))
+    record("create_venue", venue_id)
+    record("get_venues", backend.get_venues())
+    record("create_tables", backend.create_tables(venue_id, ["A", "B"]))
+    record("get_tables(1)", backend.get_tables(1))
+    record("get_tables(2)", backend.get_tables(venue_id))
+    record("get_tables(нет)", backend.get_tables(99))
+
+    # Брони и пересечения: границы интервала не пересекаются
+    ids = [
+        backend.create_booking(booking(10, 1, 18, 2)),
+        backend.create_booking(booking(11, 2, 18, 1)),
+        backend.create_booking(booking(12, 1, 14, 1)),
+        backend.create_booking(booking(13, 1, 18, 3, venue_id=venue_id)),
+        backend.create_booking(booking(10, 3, 10, 12)),  # длинная бронь
+        backend.create_booking(booking(14, 2, 18, 1, status='cancelled')),
+    ]
+    record("booking ids", ids)
+    for table_id in (1, 2, 3, None):
+        for start_hour, length in ((17, 1), (17, 2), (19, 1), (20, 1), (15, 1), (21, 2), (0, 48)):
+            start = BASE + timedelta(hours=start_hour)
+            record(
+                f"booking_conflict t={table_id} {start_hour}+{length}",
+                backend.has_booking_conflict(1, table_id, start, start + timedelta(hours=length))
+            )
+    record("get_booking", backend.get_booking(ids[0]))
+    record("get_booking(нет)", backend.get_booking(9999))
+    record("get_bookings_by_ids", backend.get_bookings_by_ids([ids[2], 9999, ids[0], ids[2]]))
+    record("get_bookings_by_ids(пусто)", backend.get_bookings_by_ids([]))
+    record("get_user_bookings", backend.get_user_bookings(10, BASE))
+    record("get_user_bookings(позже)", backend.get_user_bookings(10, BASE + timedelta(hours=21)))
+
+    day = (BASE, BASE + timedelta(days=1))
+    for venue_ids in (None, [1], [venue_id], [1, venue_id], []):
+        for active_only in (True, False):
+            record(f"get_bookings {venue_ids} {active_only}",
+                   backend.get_bookings(venue_ids, *day, active_only))
+
+    record("cancel_booking", backend.cancel_booking(ids[1]))
+    record("cancel_booking(повторно)", backend.cancel_booking(ids[1]))
+    record("conflict после отмены",
+           backend.has_booking_conflict(1, 2, BASE + timedelta(hours=18), BASE + timedelta(hours=19)))
+    record("update_booking_end", backend.update_booking_end(ids[2], BASE + timedelta(hours=17)))
+    record("update_booking_end(отменена)", backend.update_booking_end(ids[1], BASE))
+    record("conflict после продления",
+           backend.has_booking_conflict(1, 1, BASE + timedelta(hours=16), BASE + timedelta(hours=17)))
+    record("get_bookings после изменений", backend.get_bookings(None, *day, False))
+    for table_id, status, batch_size in ((None, None, 1), (1, None, 2), (None, 'cancelled', 500), (2, 'active', 3)):
+        record(f"iter_bookings {table_id} {status} {batch_size}",
+               list(backend.iter_bookings([1], *day, table_id, status, batch_size)))
+
+    # Holds: истечение, исключение пользователя, удаление
+    backend.create_hold(hold(20, 1, 22, 1, expires_minutes=10))
+    backend.create_hold(hold(21, 2, 22, 2, expires_minutes=30))
+    backend.create_hold(hold(22, 1, 22, 1, expires_minutes=10, venue_id=venue_id))
+    slot = (BASE + timedelta(hours=22), BASE + timedelta(hours=23))
+    for now_minutes in (0, 15, 45):
+        now = BASE + timedelta(minutes=now_minutes)
+        for table_id in (1, 2, None):
+            for exclude_user in (None, 20, 21):
+                record(
+                    f"hold_conflict t={table_id} now+{now_minutes} excl={exclude_user}",
+                    backend.has_hold_conflict(1, table_id, *slot, now, exclude_user)
+                )
+    record("delete_expired_holds", backend.delete_expired_holds(BASE + timedelta(minutes=15)))
+    record("hold_conflict после очистки", backend.has_hold_conflict(1, None, *slot, BASE, None))
+    record("delete_holds", backend.delete_holds([21, 21, 99]))
+    record("hold_conflict после удаления", backend.has_hold_conflict(1, None, *slot, BASE, None))
+
+    # Турниры и дисциплины
+    tournament_ids = [
+        backend.create_tournament(Tournament(
+            id=None, title=f"Турнир {number}", starts_at=BASE + timedelta(days=days),
+            event_key=f"event-{number}", blocks_bookings=number != 3
+        ))
+        for number, days in ((1, 5), (2, 2), (3, 5))
+    ]
+    record("tournament ids", tournament_ids)
+    first, second = tournament_ids[0], tournament_ids[1]
+    record("division ids", [
+        backend.create_division(TournamentDivision(
+            id=None, tournament_id=tournament_id, code=code, name=f"{code} {tournament_id}",
+            max_participants=places
+        ))
+        for tournament_id, code, places in ((first, 'russian', 8), (first, 'pool', 16), (second, 'pool', 4))
+    ])
+    try:
+        backend.create_division(TournamentDivision(
+            id=None, tournament_id=first, code='pool', name="Дубль", max_participants=2
+        ))
+        record("дубль дисциплины", "вставлен")
+    except sqlite3.IntegrityError:
+        record("дубль дисциплины", "IntegrityError")
+    record("set_tournament_active", backend.set_tournament_active(tournament_ids[2], False))
+    record("set_tournament_active(нет такого)", backend.set_tournament_active(999, False))
+    record("tournaments", backend.get_tournaments())
+
+    # Регистрации на турнир
+    registration_ids = [
+        backend.create_registration(registration(1, 'pool', 5, first)),
+        backend.create_registration(registration(2, 'russian', 1, first)),
+        backend.create_registration(registration(3, 'pool', 1, first)),
+        backend.create_registration(registration(1, 'russian', 3, first)),
+        backend.create_registration(registration(4, 'pool', 1, second)),
+    ]
+    record("registration ids", registration_ids)
+    for tournament_type in (None, 'pool', 'russian', 'legacy'):
+        record(f"count {tournament_type}", backend.count_active_registrations(first, tournament_type))
+        for active_only in (True, False):
+            record(f"registrations {tournament_type} {active_only}",
+                   backend.get_registrations(first, tournament_type, active_only))
+        record(f"user_registration {tournament_type}",
+               backend.get_user_registration(1, first, tournament_type))
+    record("user_registration(чужой турнир)", backend.get_user_registration(4, first, None))
+    record("get_registration", backend.get_registration(registration_ids[0]))
+    record("get_registration(нет такой)", backend.get_registration(999))
+    record("cancel_registration", backend.cancel_registration(registration_ids[0]))
+    record("cancel_registration(повторно)", backend.cancel_registration(registration_ids[0]))
+    record("count после отмены", backend.count_active_registrations(first, None))
+    record("count другого турнира", backend.count_active_registrations(second, 'pool'))
+    record("registrations после отмены", backend.get_registrations(first, None, False))
+    for tournament_type, status in ((None, None), ('pool', None), (None, 'cancelled'), ('russian', 'active')):
+        record(f"iter_registrations {tournament_type} {status}",
+               list(backend.iter_registrations(first, tournament_type, status, 2)))
+
+    # Лист ожидания
+    entry_ids = [
+        backend.create_waitlist_entry(waitlist_entry(5, 1, first)),
+        backend.create_waitlist_entry(waitlist_entry(6, 2, first)),
+        backend.create_waitlist_entry(waitlist_entry(7, 1, first, 'russian')),
+        backend.create_waitlist_entry(waitlist_entry(8, 3, first)),
+        backend.create_waitlist_entry(waitlist_entry(5, 1, second)),
+    ]
+    record("waitlist ids", entry_ids)
+    try:
+        backend.create_waitlist_entry(waitlist_entry(9, 2, first))
+        record("дубль позиции", "вставлен")
+    except sqlite3.IntegrityError:
+        record("дубль позиции", "IntegrityError")
+    for tournament_type in ('pool', 'russian', 'legacy'):
+        record(f"last_position {tournament_type}", backend.get_last_waitlist_position(first, tournament_type))
+        record(f"next_waitlist {tournament_type}", backend.get_next_waitlist_entry(first, tournament_type))
+    for tournament_type in (None, 'pool'):
+        for before_position in (None, 1, 3, 10):
+            record(f"count_waitlist {tournament_type} {before_position}",
+                   backend.count_waitlist(first, tournament_type, before_position))
+        record(f"waitlist {tournament_type}", backend.get_waitlist(first, tournament_type))
+        record(f"user_waitlist {tournament_type}", backend.get_user_waitlist_entry(5, first, tournament_type))
+    record("set_waitlist_status", backend.set_waitlist_status(entry_ids[0], 'promoted', registration_ids[1]))
+    record("set_waitlist_status(повторно)", backend.set_waitlist_status(entry_ids[0], 'cancelled'))
+    record("set_waitlist_status(нет такой)", backend.set_waitlist_status(999, 'cancelled'))
+    record("next после перевода", backend.get_next_waitlist_entry(first, 'pool'))
+    record("user_waitlist после перевода", backend.get_user_waitlist_entry(5, first, None))
+    record("last_position после перевода", backend.get_last_waitlist_position(first, 'pool'))
+    record("count после перевода", backend.count_waitlist(first, 'pool', None))
+    record("tournament_overview", backend.get_tournament_overview([second, first, 999]))
+    record("tournament_overview(пусто)", backend.get_tournament_overview([]))
+
+    # Пакетные блокировки и матчи сетки
+    block_ids = backend.create_bookings([booking(0, 1, 50, 1), booking(0, 2, 50, 1), booking(0, 1, 51, 1)])
+    record("create_bookings", block_ids)
+    record("create_bookings(пусто)", backend.create_bookings([]))
+    record("cancel_bookings", backend.cancel_bookings([block_ids[0], block_ids[1], block_ids[0], 9999]))
+    record("cancel_bookings(пусто)", backend.cancel_bookings([]))
+    record("брони после пакета", backend.get_bookings([1], BASE + timedelta(hours=50),
+                                                      BASE + timedelta(hours=52), False))
+    backend.create_hold(hold(23, 2, 60, 2, expires_minutes=30))
+    backend.create_hold(hold(24, 1, 61, 1, expires_minutes=5))
+    block_slots = [
+        (table_id, BASE + timedelta(hours=start_hour), BASE + timedelta(hours=start_hour + length))
+        for table_id, start_hour, length in (
+            (1, 19, 1), (2, 18, 1), (1, 16, 3), (3, 0, 48), (1, 50, 2),
+            (2, 61, 1), (1, 61, 1), (2, 62, 1), (1, 51, 1)
+        )
+    ]
+    for now_minutes in (0, 15):
+        record(f"find_block_conflicts now+{now_minutes}",
+               backend.find_block_conflicts(1, block_slots, BASE + timedelta(minutes=now_minutes)))
+    record("find_block_conflicts(заведение)", backend.find_block_conflicts(venue_id, block_slots, BASE))
+    record("find_block_conflicts(пусто)", backend.find_block_conflicts(1, [], BASE))
+
+    # Регулярные брони: занятия — брони с series_id
+    series_ids = [
+        backend.create_series(series(40, 1, 70, 2)),
+        backend.create_series(series(40, 2, 80, 1, next_weeks=2)),
+        backend.create_series(series(41, 1, 70, 2, venue_id=venue_id)),
+    ]
+    record("create_series", series_ids)
+    occurrence_ids = backend.create_bookings([
+        replace(booking(40, 1, 70 + week * 168, 2), series_id=series_ids[0]) for week in range(3)
+    ])
+    record("занятия серии", occurrence_ids)
+    record("get_series", backend.get_series(series_ids[1]))
+    record("get_series(нет)", backend.get_series(9999))
+    record("get_user_series", backend.get_user_series(40))
+    for weeks, after_id, limit in ((1, 0, 10), (2, 0, 10), (3, 0, 1), (3, series_ids[0], 10), (0, 0, 10)):
+        record(f"get_due_series +{weeks}w после {after_id} limit {limit}",
+               backend.get_due_series(BASE + timedelta(weeks=weeks, hours=75), after_id, limit))
+    record("set_series_next_start", backend.set_series_next_start([
+        (series_ids[0], BASE + timedelta(weeks=3, hours=70)), (9999, BASE)
+    ]))
+    record("set_series_next_start(пусто)", backend.set_series_next_start([]))
+    record("get_due_series после сдвига", backend.get_due_series(BASE + timedelta(weeks=3), 0, 10))
+    record("cancel_booking(занятие)", backend.cancel_booking(occurrence_ids[1]))
+    for hour in (0, 70, 71, 200):
+        record(f"get_series_bookings с {hour}",
+               backend.get_series_bookings(series_ids[0], BASE + timedelta(hours=hour)))
+    record("get_series_bookings(без занятий)", backend.get_series_bookings(series_ids[1], BASE))
+    record("cancel_series", backend.cancel_series(series_ids[1]))
+    record("cancel_series(повторно)", backend.cancel_series(series_ids[1]))
+    record("cancel_series(нет)", backend.cancel_series(9999))
+    record("get_user_series после отмены", backend.get_user_series(40))
+    record("get_due_series после отмены", backend.get_due_series(BASE + timedelta(weeks=9), 0, 10))
+    record("save_matches", backend.save_matches([
+        match(2, 0, first, 'empty'), match(1, 1, first, 'bye'),
+        match(1, 0, first, table_id=1, start_hour=51, booking_id=block_ids[2])
+    ]))
+    record("save_matches(обновление)", backend.save_matches([
+        match(1, 1, first, table_id=2, start_hour=52), match(1, 2, first)
+    ]))
+    record("save_matches(пусто)", backend.save_matches([]))
+    record("get_matches", backend.get_matches(first, 'pool'))
+    record("get_matches(другая дисциплина)", backend.get_matches(first, 'russian'))
+
+    # Агрегат занятости
+    work_day = BASE.date()
+    backend.add_occupancy([
+        Occupancy(work_day, 1, 1, 18, booked_minutes=60, bookings=1),
+        Occupancy(work_day, 1, 1, 19, booked_minutes=30),
+        Occupancy(work_day + timedelta(days=7), 1, 1, 18, booked_minutes=45, bookings=1),
+        Occupancy(work_day, 1, 2, 1, blocked_minutes=60),
+        Occupancy(work_day + timedelta(days=1), venue_id, 3, 18, booked_minutes=60, bookings=1),
+    ])
+    backend.add_occupancy([
+        Occupancy(work_day, 1, 1, 18, booked_minutes=-60, cancellations=1),
+        Occupancy(work_day, 1, 1, 19, booked_minutes=-30),
+    ])
+    backend.add_occupancy([])
+    record("get_occupancy", backend.get_occupancy())
+    for venue_ids, days in ((None, 7), ([1], 7), ([1], 6), ([venue_id, 99], 30), ([], 30)):
+        record(f"occupancy_summary {venue_ids} {days}",
+               backend.get_occupancy_summary(venue_ids, work_day, work_day + timedelta(days=days)))
+
+    # Поиск: конец телефона (без "+()- "), подстрока username или имени, ID брони
+    found_ids = backend.create_bookings([
+        replace(booking(40, 1, 70, 1), phone="+7 (912) 345-67-89", username="Search_Fan"),
+        replace(booking(41, 3, 71, 1, venue_id=venue_id), phone="8-912-345-67-89"),
+        replace(booking(42, 2, 70, 1, status='cancelled'), phone="+7 912 000 67 89", username=None),
+    ])
+    record("search ids", found_ids)
+    backend.create_registration(replace(
+        registration(43, 'pool', 9, first), username="kiy_master", full_name='Сергей "Кий" Иванов',
+        phone="+79123456789"
+    ))
+    queries = [
+        SearchQuery(phone_suffix="6789"), SearchQuery(phone_suffix="9123456789"),
+        SearchQuery(phone_suffix="00000"), SearchQuery(text="search_f"), SearchQuery(text="SEARCH"),
+        SearchQuery(text="иванов"), SearchQuery(text='"кий"'), SearchQuery(text="user4"),
+        SearchQuery(booking_id=found_ids[0], phone_suffix="6789"), SearchQuery(booking_id=9999),
+        SearchQuery(),
+    ]
+    for query in queries:
+        for venue_ids, include_registrations in ((None, True), ([1], False), ([venue_id], True), ([], False)):
+            record(f"search {query} {venue_ids} {include_registrations}",
+                   backend.search(query, venue_ids, include_registrations, 100, 0))
+    for offset in (0, 3, 6, 40):
+        record(f"search страница {offset}", backend.search(SearchQuery(text="user"), None, True, 3, offset))
+
+    # Откат транзакции
+    try:
+        with backend.transaction(immediate=True):
+            backend.create_booking(booking(30, 1, 30, 1))
+            backend.cancel_booking(ids[0])
+            backend.create_hold(hold(30, 1, 30, 1, expires_minutes=60))
+            backend.delete_holds([20])
+            backend.cancel_registration(registration_ids[1])
+            backend.set_tournament_active(first, False)
+            backend.set_waitlist_status(entry_ids[1], 'cancelled')
+            backend.create_waitlist_entry(waitlist_entry(10, 4, first))
+            backend.create_bookings([booking(32, 1, 60, 1), booking(32, 2, 60, 1)])
+            backend.cancel_bookings([block_ids[2]])
+            backend.save_matches([match(1, 0, first, 'bye'), match(3, 0, first)])
+            backend.add_occupancy([Occupancy(work_day, 1, 1, 18, booked_minutes=60, bookings=1),
+                                   Occupancy(work_day, 1, 4, 20, booked_minutes=60)])
+            backend.clear_occupancy()
+            backend.create_series(series(42, 3, 90, 1))
+            backend.set_series_next_start([(series_ids[0], BASE)])
+            backend.cancel_series(series_ids[0])
+            backend.create_bookings([replace(booking(42, 3, 90, 1), series_id=series_ids[0])])
+            raise RuntimeError("откат")
+    except RuntimeError:
+        pass
+    record("после отката: брони", backend.get_bookings(None, BASE, BASE + timedelta(days=3), False))
+    record("после отката: hold", backend.has_hold_conflict(1, 1, BASE + timedelta(hours=30),
+                                                            BASE + timedelta(hours=31), BASE, None))
+    record("после отката: регистрации", backend.count_active_registrations(first, None))
+    record("после отката: турниры", backend.get_tournaments())
+    record("после отката: лист ожидания", backend.get_waitlist(first, None))
+    record("после отката: last_position", backend.get_last_waitlist_position(first, 'pool'))
+    record("после отката: сводка", backend.get_tournament_overview([first]))
+    record("после отката: матчи", backend.get_matches(first, 'pool'))
+    record("после отката: поиск", backend.search(SearchQuery(text="user30"), None, True, 10, 0))
+    record("после отката: серии", backend.get_user_series(40) + backend.get_user_series(42))
+    record("после отката: занятия серии", backend.get_series_bookings(series_ids[0], BASE))
+    record("после отката: новая серия", backend.create_series(series(42, 3, 90, 1)))
+    record("после отката: занятость", backend.get_occupancy_summary(None, work_day, work_day + timedelta(days=30)))
+    record("clear_occupancy", backend.clear_occupancy())
+    record("после очистки: занятость", backend.get_occupancy_summary(None, work_day, work_day + timedelta(days=30)))
+    record("после очистки: get_occupancy", backend.get_occupancy())
+    record("после отката: новый матч", backend.save_matches([match(3, 0, first)]))
+    record("после отката: матчи с новым", backend.get_matches(first, 'pool'))
+    with backend.transaction():
+        with backend.transaction():
+            record("вложенная транзакция", backend.create_booking(booking(31, 1, 40, 1)))
+    record("после фиксации", backend.get_user_bookings(31, BASE))
+
+
+def random_workload(backend, record, operations: int, seed: int):
+    """Случайные операции с бронями и holds (одинаковые для обоих хранилищ)"""
+    rng = random.Random(seed)
+    booking_ids = []
+    for step in range(operations):
+        action = rng.random()
+        table_id = rng.choice([1, 2, 3, None])
+        start = BASE + timedelta(days=2, minutes=30 * rng.randrange(96))
+        end = start + timedelta(minutes=30 * rng.randint(1, 8))
+        now = BASE + timedelta(minutes=rng.randrange(60))
+        if action < 0.3 and table_id is not None:
+            booking_ids.append(backend.create_booking(Booking(
+                id=None, user_id=rng.randrange(50), username=None, table_id=table_id,
+                start_time=start, end_time=end, phone="+7", created_at=BASE
+            )))
+        elif action < 0.4 and table_id is not None:
+            backend.create_hold(Hold(
+                id=None, user_id=rng.randrange(50), table_id=table_id, start_time=start,
+                end_time=end, created_at=BASE, expires_at=BASE + timedelta(minutes=rng.randrange(60))
+            ))
+        elif action < 0.45 and booking_ids:
+            record(f"{step} cancel", backend.cancel_booking(rng.choice(booking_ids)))
+        elif action < 0.5 and booking_ids:
+            booking_id = rng.choice(booking_ids)
+            record(f"{step} update", backend.update_booking_end(booking_id, end))
+        elif action < 0.52:
+            record(f"{step} delete_holds", backend.delete_holds([rng.randrange(50)]))
+        elif action < 0.8:
+            record(f"{step} booking_conflict", backend.has_booking_conflict(1, table_id, start, end))
+        elif action < 0.95:
+            record(f"{step} hold_conflict", backend.has_hold_conflict(
+                1, table_id, start, end, now, rng.choice([None, rng.randrange(50)])
+            ))
+        else:
+            record(f"{step} bookings", len(backend.get_bookings(
+                [1], start, end, rng.random() < 0.5
+            )))
+    record("итог", backend.get_bookings(None, BASE, BASE + timedelta(days=5), False))
+
+
+def waitlist_workload(backend, record, operations: int, seed: int):
+    """Случайная очередь одной дисциплины: запись, перевод первого, выход, место в очереди"""
+    rng = random.Random(seed)
+    tournament_id = backend.create_tournament(Tournament(
+        id=None, title="Большой турнир", starts_at=BASE + timedelta(days=9), event_key="big"
+    ))
+    entry_ids = []
+    for step in range(operations):
+        action = rng.random()
+        if action < 0.45:
+            position = backend.get_last_waitlist_position(tournament_id, 'pool') + 1
+            entry_ids.append(backend.create_waitlist_entry(
+                waitlist_entry(rng.randrange(1000), position, tournament_id)
+            ))
+        elif action < 0.65:
+            entry = backend.get_next_waitlist_entry(tournament_id, 'pool')
+            record(f"{step} next", entry)
+            if entry:
+                record(f"{step} promote", backend.set_waitlist_status(entry.id, 'promoted', step))
+        elif action < 0.75 and entry_ids:
+            record(f"{step} leave", backend.set_waitlist_status(rng.choice(entry_ids), 'cancelled'))
+        elif action < 0.95:
+            position = rng.randint(0, backend.get_last_waitlist_position(tournament_id, 'pool') + 1)
+            record(f"{step} place", backend.count_waitlist(tournament_id, 'pool', position))
+        else:
+            record(f"{step} user", backend.get_user_waitlist_entry(rng.randrange(1000), tournament_id, None))
+    record("итог листа ожидания", backend.get_waitlist(tournament_id, 'pool'))
+
+
+def run(backend, operations: int, seed: int):
+    results = []
+
+    def record(name, value):
+        results.append((name, normalize(value)))
+
+    started = time.perf_counter()
+    scenarios(backend, record)
+    random_workload(backend, record, operations, seed)
+    waitlist_workload(backend, record, operations // 3, seed)
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--operations", type=int, default=3000, help="случайных операций")
+    parser.add_argument("-s", "--seed", type=int, default=1, help="зерно генератора")
+    args = parser.parse_args()
+
+    init_db()
+    sqlite_results, sqlite_elapsed = run(SQLiteBackend(), args.operations, args.seed)
+    memory_results, memory_elapsed = run(MemoryBackend(), args.operations, args.seed)
+
+    mismatches = [
+        (name, expected, actual)
+        for (name, expected), (_, actual) in zip(sqlite_results, memory_results)
+        if expected != actual
+    ]
+    if len(sqlite_results) != len(memory_results):
+        mismatches.append(("число результатов", len(sqlite_results), len(memory_results)))
+
+    print(f"Проверок: {len(sqlite_results)}")
+    print(f"SQLiteBackend: {sqlite_elapsed:.2f} с")
+    print(f"MemoryBackend: {memory_elapsed:.2f} с")
+    for name, expected, actual in mismatches[:20]:
+        print(f"\n❌ {name}\n   SQLite: {expected}\n   Memory: {actual}")
+    if mismatches:
+        print(f"\nРасхождений: {len(mismatches)}")
+        sys.exit(1)
+    print("✅ Поведение хранилищ совпадает")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Турнирная сетка (олимпийская система) и расписание матчей по столам
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from database.database import transaction
+from database.models import Tournament, TournamentDivision, TournamentMatch
+from database.repository import (
+    BookingRepository, BracketRepository, TableRepository, TournamentRepository, VenueRepository
+)
+from utils.time_utils import format_time, get_closing_time
+
+logger = logging.getLogger(__name__)
+
+# Занятость стола: отсортированные по началу интервалы [начало, конец)
+_Intervals = List[Tuple[datetime, datetime]]
+
+
+@dataclass
+class BracketUpdate:
+    """Итог (пере)генерации сетки"""
+    matches: List[TournamentMatch]
+    created: int = 0    # новых блокировок столов
+    released: int = 0   # снятых блокировок
+    kept: int = 0       # матчей, оставшихся на своём столе и времени
+    unscheduled: List[TournamentMatch] = field(default_factory=list)  # не хватило столов
+
+
+def bracket_size(max_participants: int) -> int:
+    """Размер сетки — ближайшая степень двойки не меньше лимита мест"""
+    return max(2, 1 << (max_participants - 1).bit_length())
+
+
+def seed_order(size: int) -> List[int]:
+    """
+    Номера посева по позициям сетки: для 8 — [1, 8, 4, 5, 2, 7, 3, 6].
+
+    Первый и второй посев встречаются только в финале, свободные позиции
+    (проходы без игры) достаются сильнейшим посевам.
+    """
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for top in order for seed in (top, total - top)]
+    return order
+
+
+def place_players(size: int, registration_ids: List[int],
+                  current: Optional[List[Optional[int]]] = None) -> List[Optional[int]]:
+    """
+    Игроки по позициям первого круга.
+
+    registration_ids — активные регистрации в порядке посева. Без current
+    посев с нуля; с current игроки остаются на своих позициях, позиции
+    снявшихся освобождаются, а новые игроки (например, из листа ожидания)
+    занимают свободные позиции в порядке посева.
+    """
+    order = seed_order(size)
+    active = set(registration_ids)
+    slots = [player if player in active else None for player in (current or [None] * size)]
+    placed = set(slots)
+    newcomers = [player for player in registration_ids if player not in placed]
+    free = sorted((position for position in range(size) if slots[position] is None),
+                  key=lambda position: order[position])
+    for position, player in zip(free, newcomers):
+        slots[position] = player
+    return slots
+
+
+def _statuses(slots: List[Optional[int]]) -> Dict[Tuple[int, int], str]:
+    """Статус каждого матча сетки по заполненным позициям первого круга"""
+    statuses: Dict[Tuple[int, int], str] = {}
+    has_players = [player is not None for player in slots]
+    round_number = 1
+    while len(has_players) > 1:
+        next_round = []
+        for number in range(len(has_players) // 2):
+            count = has_players[2 * number] + has_players[2 * number + 1]
+            statuses[(round_number, number)] = ('empty', 'bye', 'scheduled')[count]
+            next_round.append(count > 0)
+        has_players = next_round
+        round_number += 1
+    return statuses
+
+
+def _find_slot(occupancy: Dict[int, _Intervals], table_ids: List[int], earliest: datetime,
+               duration: timedelta, close: datetime) -> Optional[Tuple[int, datetime]]:
+    """Самый ранний слот длиной duration не раньше earliest на любом столе (стол, начало)"""
+    best = None
+    for table_id in table_ids:
+        candidate = earliest
+        for busy_start, busy_end in occupancy[table_id]:
+            if busy_end <= candidate:
+                continue
+            if busy_start >= candidate + duration:
+                break
+            candidate = busy_end
+        if candidate + duration <= close and (best is None or candidate < best[1]):
+            best = (table_id, candidate)
+    return best
+
+
+def generate_bracket(tournament: Tournament, division: TournamentDivision,
+                     admin_username: str) -> BracketUpdate:
+    """
+    Генерация сетки дисциплины и блокировка столов под матчи.
+
+    Посев — активные регистрации в порядке записи. Если сетка уже есть,
+    пересчёт инкрементальный: игроки остаются на позициях, снявшиеся
+    освобождают их (соперник проходит без игры), новые занимают свободные.
+    Матчи, которым по-прежнему нужен стол и чьё время не раньше конца
+    предыдущих матчей, сохраняют блокировку; остальные блокировки
+    снимаются, а новые матчи ставятся на самый ранний свободный стол.
+
+    Всё идёт одной транзакцией с BEGIN IMMEDIATE: занятость столов на день
+    читается одним запросом, слоты подбираются по ней в памяти, затем
+    снятие и создание блокировок и сохранение матчей — по одному
+    executemany.
+    """
+    tournament_id, tournament_type = tournament.id, division.code
+    venue_id = settings.TOURNAMENT_VENUE_ID
+    size = bracket_size(division.max_participants)
+    duration = timedelta(minutes=settings.TOURNAMENT_MATCH_MINUTES)
+    close = get_closing_time(tournament.starts_at, VenueRepository.get_venue(venue_id))
+    table_ids = sorted(table.id for table in TableRepository.get_all_tables(venue_id))
+    registration_ids = [
+        registration.id
+        for registration in TournamentRepository.get_active_registrations(tournament_id, tournament_type)
+    ]
+
+    with transaction(immediate=True):
+        existing = {
+            (match.round, match.number): match
+            for match in BracketRepository.get_matches(tournament_id, tournament_type)
+        }
+        current = None
+        if existing:
+            current = [None] * size
+            for number in range(size // 2):
+                match = existing.get((1, number))
+                if match:
+                    current[2 * number], current[2 * number + 1] = match.player1_id, match.player2_id
+        slots = place_players(size, registration_ids, current)
+        statuses = _statuses(slots)
+
+        # Занятость столов: все активные брони дня одним запросом. Свои
+        # блокировки, которые могут остаться, сразу занимают свои слоты
+        bookings = BookingRepository.get_active_bookings_between(
+            tournament.starts_at - timedelta(days=1), close, venue_id
+        )
+        active_booking_ids = {booking.id for booking in bookings}
+        own_booking_ids = {match.booking_id for match in existing.values() if match.booking_id}
+        occupancy: Dict[int, _Intervals] = {table_id: [] for table_id in table_ids}
+        for booking in bookings:
+            if booking.id not in own_booking_ids and booking.table_id in occupancy:
+                occupancy[booking.table_id].append((booking.start_time, booking.end_time))
+        for match in existing.values():
+            if (match.booking_id in active_booking_ids and match.table_id in occupancy
+                    and statuses.get((match.round, match.number)) == 'scheduled'):
+                occupancy[match.table_id].append((match.start_time, match.end_time))
+        for intervals in occupancy.values():
+            intervals.sort()
+
+        update = BracketUpdate(matches=[])
+        released: List[int] = []
+        to_block: List[TournamentMatch] = []
+        for (round_number, number), status in sorted(statuses.items()):
+            match = TournamentMatch(
+                id=None, tournament_id=tournament_id, tournament_type=tournament_type,
+                round=round_number, number=number, status=status
+            )
+            if round_number == 1:
+                match.player1_id, match.player2_id = slots[2 * number], slots[2 * number + 1]
+            previous = existing.get((round_number, number))
+            update.matches.append(match)
+            # Матч начинается не раньше турнира и конца обоих предыдущих матчей
+            feeders = [
+                feeder for feeder in update.matches
+                if feeder.round == round_number - 1 and feeder.number // 2 == number
+                and feeder.status == 'scheduled'
+            ]
+            blocked = previous is not None and previous.booking_id in active_booking_ids
+
+            if status == 'scheduled' and all(feeder.end_time for feeder in feeders):
+                earliest = max([tournament.starts_at] + [feeder.end_time for feeder in feeders])
+                if blocked and previous.table_id in occupancy and previous.start_time >= earliest:
+                    match.table_id, match.start_time, match.end_time, match.booking_id = (
+                        previous.table_id, previous.start_time, previous.end_time, previous.booking_id
+                    )
+                    update.kept += 1
+                    continue
+            else:
+                earliest = None
+            if blocked:
+                released.append(previous.booking_id)
+                busy = (previous.start_time, previous.end_time)
+                if busy in occupancy.get(previous.table_id, []):
+                    occupancy[previous.table_id].remove(busy)
+            if status != 'scheduled':
+                continue
+            if earliest is None:
+                # Предыдущему матчу не нашлось стола — этот тоже ждёт
+                update.unscheduled.append(match)
+                continue
+
+            slot = _find_slot(occupancy, table_ids, earliest, duration, close)
+            if slot is None:
+                update.unscheduled.append(match)
+                continue
+            match.table_id, match.start_time = slot
+            match.end_time = match.start_time + duration
+            occupancy[match.table_id].append((match.start_time, match.end_time))
+            occupancy[match.table_id].sort()
+            to_block.append(match)
+
+        update.released = BookingRepository.cancel_bookings(released)
+        booking_ids = BookingRepository.create_blocked_bookings(
+            [(match.table_id, match.start_time, match.end_time) for match in to_block],
+            admin_username,
+            venue_id=venue_id,
+            note=f"Турнир #{tournament_id}: {division.name}"
+        )
+        for match, booking_id in zip(to_block, booking_ids):
+            match.booking_id = booking_id
+        update.created = len(booking_ids)
+        BracketRepository.save_matches(update.matches)
+
+    logger.info(
+        f"Сетка турнира #{tournament_id} ({tournament_type}): блокировок создано "
+        f"{update.created}, снято {update.released}, без изменений {update.kept}"
+    )
+    return update
+
+
+def round_title(round_number: int, rounds: int) -> str:
+    """Название круга: финал, полуфинал, 1/4 финала…"""
+    remaining = rounds - round_number
+    if remaining == 0:
+        return "Финал"
+    if remaining == 1:
+        return "Полуфинал"
+    return f"1/{2 ** remaining} финала"
+
+
+def render_bracket(matches: List[TournamentMatch], player_names: Dict[int, str],
+                   table_names: Dict[int, str]) -> List[str]:
+    """Сетка по кругам — по строке на матч (без пустых матчей)"""
+    by_position = {(match.round, match.number): match for match in matches}
+    rounds = max((match.round for match in matches), default=0)
+
+    def entrant(round_number: int, number: int) -> Optional[str]:
+        """Кто выходит из матча: победитель, прошедший без игры или никто"""
+        match = by_position[(round_number, number)]
+        if match.status == 'scheduled':
+            return f"победитель {match.label}"
+        if match.status == 'empty':
+            return None
+        if round_number == 1:
+            player = match.player1_id or match.player2_id
+            return player_names.get(player, f"#{player}")
+        return entrant(round_number - 1, 2 * number) or entrant(round_number - 1, 2 * number + 1)
+
+    lines = []
+    for round_number in range(1, rounds + 1):
+        lines.append(f"\n{round_title(round_number, rounds)}:")
+        for match in (m for m in matches if m.round == round_number and m.status != 'empty'):
+            if round_number == 1:
+                sides = [player_names.get(player, f"#{player}") if player else None
+                         for player in (match.player1_id, match.player2_id)]
+            else:
+                sides = [entrant(round_number - 1, 2 * match.number),
+                         entrant(round_number - 1, 2 * match.number + 1)]
+            if match.status == 'bye':
+                lines.append(f"{match.label} {next(side for side in sides if side)} — проход без игры")
+            elif match.table_id is None:
+                lines.append(f"{match.label} {sides[0]} — {sides[1]} · ⚠️ нет свободного стола")
+            else:
+                lines.append(
+                    f"{match.label} {sides[0]} — {sides[1]} · "
+                    f"{table_names.get(match.table_id, f'стол #{match.table_id}')}, "
+                    f"{format_time(match.start_time)}–{format_time(match.end_time)}"
+                )
+    return lines
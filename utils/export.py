@@ -0,0 +1,159 @@
+"""
+Выгрузка броней и регистраций на турнир в CSV для администраторов
+"""
+import asyncio
+import codecs
+import csv
+import io
+import logging
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import IO, AsyncGenerator, Dict, Iterable, Iterator, Optional, Sequence
+
+from aiogram import Bot
+from aiogram.types.input_file import DEFAULT_CHUNK_SIZE, InputFile
+
+from config import settings
+from database.models import Booking, TournamentRegistration
+from database.repository import BookingRepository, TournamentRepository
+
+logger = logging.getLogger(__name__)
+
+# Bot API не принимает документы больше 50 МБ
+DOCUMENT_LIMIT_BYTES = 50 * 1024 * 1024
+# Сколько текста CSV копится в памяти перед записью в файл
+_FLUSH_CHARS = 64 * 1024
+
+BOOKING_HEADER = (
+    "ID", "Заведение", "Стол", "Начало", "Конец", "Часов", "Статус",
+    "ID пользователя", "Username", "Телефон", "Создана",
+)
+REGISTRATION_HEADER = (
+    "ID", "Дисциплина", "Имя", "Телефон", "Username", "ID пользователя", "Статус", "Зарегистрирован",
+)
+STATUS_NAMES = {'active': "активна", 'cancelled': "отменена"}
+
+
+@dataclass
+class Export:
+    """Готовая выгрузка: CSV во временном файле (в памяти, пока он небольшой)"""
+    file: IO[bytes]
+    filename: str
+    rows: int
+    size: int
+
+
+class SpooledInputFile(InputFile):
+    """Отправка временного файла в Bot API кусками, не загружая его в память целиком"""
+
+    def __init__(self, file: IO[bytes], filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        # Файл мог уйти на диск — читаем в потоке, чтобы не блокировать цикл событий
+        await asyncio.to_thread(self.file.seek, 0)
+        while True:
+            chunk = await asyncio.to_thread(self.file.read, self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _format(dt: datetime) -> str:
+    return dt.strftime("%d.%m.%Y %H:%M")
+
+
+def write_csv(header: Sequence[str], rows: Iterable[Sequence], filename: str) -> Export:
+    """
+    Запись строк в CSV во временный файл.
+
+    Файл держится в памяти до EXPORT_SPOOL_MAX_BYTES, дальше переносится на
+    диск; строки пишутся пачками, поэтому память не растёт с размером
+    выгрузки. Формат — UTF-8 с BOM и ";" между колонками: так файл сразу
+    открывается в Excel с русскими буквами.
+    """
+    file = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_BYTES, mode='w+b')
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow(header)
+    file.write(codecs.BOM_UTF8)
+    count = 0
+    try:
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+            if buffer.tell() >= _FLUSH_CHARS:
+                file.write(buffer.getvalue().encode('utf-8'))
+                buffer.seek(0)
+                buffer.truncate()
+        file.write(buffer.getvalue().encode('utf-8'))
+    except Exception:
+        file.close()
+        raise
+    return Export(file=file, filename=filename, rows=count, size=file.tell())
+
+
+def booking_rows(bookings: Iterator[Booking], venue_names: Dict[int, str],
+                 table_names: Dict[int, str]) -> Iterator[Sequence]:
+    """Строки CSV для броней"""
+    for booking in bookings:
+        yield (
+            booking.id,
+            venue_names.get(booking.venue_id, booking.venue_id),
+            table_names.get(booking.table_id, booking.table_id),
+            _format(booking.start_time),
+            _format(booking.end_time),
+            booking.duration_hours,
+            STATUS_NAMES.get(booking.status, booking.status),
+            booking.user_id,
+            booking.username or "",
+            booking.phone,
+            _format(booking.created_at),
+        )
+
+
+def registration_rows(registrations: Iterator[TournamentRegistration],
+                      division_names: Dict[str, str]) -> Iterator[Sequence]:
+    """Строки CSV для регистраций на турнир"""
+    for registration in registrations:
+        yield (
+            registration.id,
+            division_names.get(registration.tournament_type, registration.tournament_type),
+            registration.full_name,
+            registration.phone,
+            registration.username or "",
+            registration.user_id,
+            STATUS_NAMES.get(registration.status, registration.status),
+            _format(registration.created_at),
+        )
+
+
+async def export_bookings(start_from: datetime, start_to: datetime, venue_ids: Iterable[int],
+                          venue_names: Dict[int, str], table_names: Dict[int, str],
+                          table_id: Optional[int] = None, status: Optional[str] = None) -> Export:
+    """
+    Выгрузка броней, начинающихся в [start_from, start_to), в CSV — чтение
+    из БД и запись файла идут в отдельном потоке
+    """
+    bookings = BookingRepository.iter_bookings(start_from, start_to, venue_ids, table_id, status)
+    filename = f"bookings_{start_from:%Y%m%d}_{start_to - timedelta(days=1):%Y%m%d}.csv"
+    export = await asyncio.to_thread(
+        write_csv, BOOKING_HEADER, booking_rows(bookings, venue_names, table_names), filename
+    )
+    logger.info(f"Выгрузка {filename}: {export.rows} строк, {export.size} байт")
+    return export
+
+
+async def export_registrations(tournament_id: int, division_names: Dict[str, str],
+                               tournament_type: Optional[str] = None,
+                               status: Optional[str] = None) -> Export:
+    """Выгрузка регистраций на турнир в CSV — в отдельном потоке"""
+    registrations = TournamentRepository.iter_registrations(tournament_id, tournament_type, status)
+    filename = f"tournament_{tournament_id}{'_' + tournament_type if tournament_type else ''}.csv"
+    export = await asyncio.to_thread(
+        write_csv, REGISTRATION_HEADER, registration_rows(registrations, division_names), filename
+    )
+    logger.info(f"Выгрузка {filename}: {export.rows} строк, {export.size} байт")
+    return export
@@ -0,0 +1,282 @@
+"""
+Рассылка уведомлений через durable outbox с учётом лимитов Telegram
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+)
+
+from config import settings
+from database.models import OutboxMessage
+from database.repository import OutboxRepository, VenueRepository
+from utils.token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = "\n\n➖➖➖\n\n"
+
+
+def render_digest(messages: List[OutboxMessage]) -> List[Tuple[str, List[OutboxMessage]]]:
+    """
+    Сборка сводки из накопленных уведомлений.
+
+    Возвращает список (текст сообщения, вошедшие в него уведомления) —
+    если всё не помещается в лимит Telegram, сводка режется на части.
+    """
+    if len(messages) == 1:
+        return [(messages[0].text, messages)]
+
+    header = f"📬 Сводка событий: {len(messages)}"
+    chunks: List[Tuple[str, List[OutboxMessage]]] = []
+    text, included = header, []
+
+    for message in messages:
+        body = message.text[:MESSAGE_LIMIT - len(header) - len(DIGEST_SEPARATOR)]
+        if included and len(text) + len(DIGEST_SEPARATOR) + len(body) > MESSAGE_LIMIT:
+            chunks.append((text, included))
+            text, included = header + " (продолжение)", []
+        text += DIGEST_SEPARATOR + body
+        included.append(message)
+
+    chunks.append((text, included))
+    return chunks
+
+
+class Notifier:
+    """
+    Уведомления пишутся в таблицу outbox, фоновый воркер доставляет их.
+
+    notify() только добавляет строки в outbox — если вызвать его внутри
+    transaction(), уведомления фиксируются тем же коммитом, что и бронь,
+    и переживают перезапуск процесса. Воркер забирает сообщения пачками
+    (не больше одного на получателя за раз — порядок внутри чата
+    сохраняется), отправляет их параллельно через общий token bucket
+    (~30 сообщений/с на бота) и bucket на каждый чат (~1 сообщение/с).
+    Неудачные попытки повторяются с экспоненциальной задержкой, RetryAfter
+    откладывает сообщение на указанное Telegram время.
+
+    В режиме сводок (DIGEST_ENABLED) несрочные уведомления администраторам
+    откладываются на DIGEST_WINDOW_SECONDS, после чего всё накопленное для
+    администратора уходит одним сообщением. Срочные (notify_support,
+    urgent=True) идут отдельной очередью без задержки.
+
+    При нескольких процессах воркер доставки работает только в приёмнике
+    апдейтов. Процессы-воркеры будят его через общий multiprocessing.Event
+    (set_remote()), приёмник ждёт его в отдельном потоке (start(wakeups=...)).
+    """
+
+    MAX_CHAT_BUCKETS = 1000
+
+    def __init__(self, global_rate: float, chat_rate: float):
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._wakeup = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._remote = None    # Event приёмника (в процессах-воркерах)
+        self._wakeups = None   # Event, которым будят этот процесс
+        self._watcher: Optional[threading.Thread] = None
+
+    def notify(self, recipients: Iterable[int], text: str, exclude: Optional[int] = None):
+        """Поставить уведомление в outbox для каждого получателя (кроме exclude)"""
+        if OutboxRepository.enqueue(recipients, text, exclude=exclude):
+            # Воркер проснётся только на ближайшем await — уже после коммита
+            self.wake()
+
+    def notify_many(self, messages: Iterable[Tuple[int, str]]):
+        """Поставить в outbox персональные уведомления (получатель, текст) одной пачкой"""
+        if OutboxRepository.enqueue_batch(messages):
+            self.wake()
+
+    def notify_admins(self, text: str, exclude: Optional[int] = None, urgent: bool = False,
+                      venue_id: Optional[int] = None):
+        """
+        Уведомление администраторов (несрочные могут попасть в сводку).
+
+        С venue_id — глобальным администраторам и администраторам заведения,
+        без него — только глобальным.
+        """
+        recipients = (
+            VenueRepository.get_admin_ids(venue_id) if venue_id is not None
+            else settings.ADMIN_IDS
+        )
+        if urgent or not settings.DIGEST_ENABLED:
+            self.notify(recipients, text, exclude=exclude)
+            return
+
+        OutboxRepository.enqueue(
+            recipients, text, exclude=exclude,
+            delay_seconds=settings.DIGEST_WINDOW_SECONDS, digest=True
+        )
+
+    def notify_support(self, text: str):
+        """Уведомление администраторов поддержки (всегда срочное)"""
+        self.notify(settings.SUPPORT_ADMIN_IDS, text)
+
+    def wake(self):
+        """
+        Разбудить воркер доставки. Из другого потока (asyncio.to_thread)
+        событие ставится через event loop воркера.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if self._remote is not None:
+            # Приёмник должен прочитать outbox после коммита — будим его
+            # на ближайшем await, когда транзакция уже завершена
+            if loop is not None:
+                loop.call_soon(self._remote.set)
+            else:
+                self._remote.set()
+        elif self._loop is None or loop is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def set_remote(self, event):
+        """Процесс-воркер: уведомления доставляет приёмник, будить его через event"""
+        self._remote = event
+
+    def start(self, bot: Bot, wakeups=None):
+        """Запуск фонового воркера доставки (wakeups — Event от процессов-воркеров)"""
+        if self._worker is None:
+            self._loop = asyncio.get_running_loop()
+            self._worker = asyncio.create_task(self._run(bot))
+            if wakeups is not None:
+                self._wakeups = wakeups
+                self._watcher = threading.Thread(
+                    target=self._watch, args=(wakeups, self._loop),
+                    name="outbox-wakeups", daemon=True
+                )
+                self._watcher.start()
+            logger.info("Воркер outbox запущен")
+
+    def _watch(self, wakeups, loop: asyncio.AbstractEventLoop):
+        """Поток приёмника: пробуждения от процессов-воркеров"""
+        while True:
+            wakeups.wait()
+            if self._watcher is None:
+                return
+            wakeups.clear()
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def close(self):
+        """Остановка воркера (недоставленное останется в outbox)"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            self._loop = None
+        if self._watcher is not None:
+            watcher, self._watcher = self._watcher, None
+            self._wakeups.set()
+            await asyncio.to_thread(watcher.join)
+            self._wakeups = None
+
+    async def _run(self, bot: Bot):
+        """Основной цикл воркера"""
+        while True:
+            try:
+                batch = OutboxRepository.get_due_messages(settings.OUTBOX_BATCH_SIZE)
+            except Exception as e:
+                logger.error(f"Ошибка чтения outbox: {e}", exc_info=True)
+                batch = []
+
+            if batch:
+                # Ошибка одного сообщения (например, "database is locked" при
+                # отметке в outbox) не должна останавливать воркер: строка
+                # остаётся pending и обрабатывается повторно после паузы
+                results = await asyncio.gather(
+                    *(self._process(bot, message) for message in batch), return_exceptions=True
+                )
+                errors = 0
+                for message, result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        errors += 1
+                        logger.error(
+                            f"Ошибка обработки уведомления {message.id}: {result}", exc_info=result
+                        )
+                if not errors:
+                    continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        """Bucket конкретного чата (простаивающие периодически выбрасываются)"""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.is_full
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self._chat_rate, 1)
+        return bucket
+
+    async def _process(self, bot: Bot, head: OutboxMessage):
+        """Обработка головы очереди получателя: одиночное сообщение или сводка"""
+        if not head.digest:
+            await self._deliver(bot, head.recipient_id, head.text, [head])
+            return
+
+        messages = OutboxRepository.get_pending_digest(head.recipient_id)
+        for text, included in render_digest(messages):
+            if not await self._deliver(bot, head.recipient_id, text, included):
+                return
+
+    async def _deliver(self, bot: Bot, chat_id: int, text: str,
+                       messages: List[OutboxMessage]) -> bool:
+        """Попытка доставки; True, если сообщение отправлено"""
+        ids = [message.id for message in messages]
+        await self._chat_bucket(chat_id).acquire()
+        await self._global_bucket.acquire()
+        try:
+            await bot.send_message(chat_id, text)
+        except TelegramRetryAfter as e:
+            logger.warning(f"Flood control для {chat_id}: повтор через {e.retry_after} с")
+            OutboxRepository.mark_retry(
+                ids, str(e), datetime.now() + timedelta(seconds=e.retry_after)
+            )
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            logger.error(f"Не удалось отправить уведомление {chat_id}: {e}")
+            OutboxRepository.mark_failed(ids, str(e))
+        except Exception as e:
+            attempt = max(message.attempts for message in messages) + 1
+            if attempt >= settings.OUTBOX_MAX_ATTEMPTS:
+                logger.error(
+                    f"Уведомление {ids} для {chat_id} "
+                    f"не доставлено после {attempt} попыток: {e}"
+                )
+                OutboxRepository.mark_failed(ids, str(e))
+            else:
+                delay = min(settings.OUTBOX_MAX_BACKOFF_SECONDS, 2 ** attempt)
+                logger.warning(
+                    f"Ошибка отправки уведомления {ids} (попытка {attempt}), "
+                    f"повтор через {delay} с: {e}"
+                )
+                OutboxRepository.mark_retry(
+                    ids, str(e), datetime.now() + timedelta(seconds=delay)
+                )
+        else:
+            OutboxRepository.mark_sent(ids)
+            return True
+        return False
+
+
+# Глобальный экземпляр
+notifier = Notifier(settings.NOTIFY_GLOBAL_RATE, settings.NOTIFY_CHAT_RATE)
@@ -0,0 +1,120 @@
+"""
+Отчёт о загрузке столов по дням недели и часам (по агрегату daily_occupancy)
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Tuple
+
+from database.models import Venue
+from database.repository import OccupancyRepository, TableRepository
+from utils.time_utils import get_working_hours
+
+WEEKDAYS = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+# Сколько самых незагруженных сочетаний (стол, день недели, час) показывать
+UNDERUSED_LIMIT = 5
+
+
+def opening_minutes(venue: Venue, day_from: date, day_to: date) -> Dict[Tuple[int, int], int]:
+    """
+    Минуты работы заведения по (день недели, час) за рабочие дни
+    [day_from, day_to] — ёмкость одного стола для расчёта загрузки
+    """
+    minutes: Dict[Tuple[int, int], int] = defaultdict(int)
+    day = day_from
+    while day <= day_to:
+        work_day = datetime.combine(day, datetime.min.time())
+        open_time, close_time = get_working_hours(work_day, venue)
+        opens = datetime.combine(day, open_time)
+        closes = datetime.combine(day, close_time)
+        if close_time <= open_time:
+            closes += timedelta(days=1)
+        hour_start = opens.replace(minute=0)
+        while hour_start < closes:
+            hour_end = hour_start + timedelta(hours=1)
+            overlap = (min(hour_end, closes) - max(hour_start, opens)).total_seconds() // 60
+            minutes[(day.weekday(), hour_start.hour)] += int(overlap)
+            hour_start = hour_end
+        day += timedelta(days=1)
+    return minutes
+
+
+def _percent(part: int, whole: int) -> str:
+    return f"{round(100 * part / whole)}%" if whole > 0 else "—"
+
+
+def build_occupancy_report(venue: Venue, day_from: date, day_to: date) -> str:
+    """
+    Загрузка столов заведения за рабочие дни [day_from, day_to]: по дням
+    недели и часам (доля занятого бронями клиентов времени из доступного —
+    без блокировок администратора), доля отмен и самые незагруженные
+    сочетания стол/день/час. Читает только агрегат daily_occupancy.
+    """
+    tables = {table.id: table.name for table in TableRepository.get_all_tables(venue.id)}
+    capacity = opening_minutes(venue, day_from, day_to)
+    summary = [
+        row for row in OccupancyRepository.get_summary([venue.id], day_from, day_to)
+        if row.table_id in tables
+    ]
+
+    # [занято клиентами, заблокировано, броней, отмен]
+    by_cell: Dict[Tuple[int, int, int], Tuple[int, int, int, int]] = {
+        (row.table_id, row.weekday, row.hour):
+            (row.booked_minutes, row.blocked_minutes, row.bookings, row.cancellations)
+        for row in summary
+    }
+
+    def totals(cells) -> Tuple[int, int, int, int]:
+        """(занято, доступно, броней, отмен) по сочетаниям (стол, день недели, час)"""
+        booked = available = bookings = cancellations = 0
+        for table_id, weekday, hour in cells:
+            cell = by_cell.get((table_id, weekday, hour), (0, 0, 0, 0))
+            booked += cell[0]
+            available += capacity.get((weekday, hour), 0) - cell[1]
+            bookings += cell[2]
+            cancellations += cell[3]
+        return booked, available, bookings, cancellations
+
+    hours = sorted({hour for _, hour in capacity}, key=lambda hour: (hour < 6, hour))
+    lines = [
+        f"📈 Загрузка столов: {venue.name}",
+        f"📅 {day_from.strftime('%d.%m.%Y')} – {day_to.strftime('%d.%m.%Y')}",
+        "",
+        "По дням недели (загрузка · отмены):",
+    ]
+    for weekday, name in enumerate(WEEKDAYS):
+        booked, available, bookings, cancellations = totals(
+            (table_id, weekday, hour) for table_id in tables for hour in hours
+        )
+        lines.append(
+            f"{name}: {_percent(booked, available)} · {_percent(cancellations, bookings)} "
+            f"({cancellations} из {bookings})"
+        )
+
+    lines += ["", "По часам:"]
+    for hour in hours:
+        booked, available, _, _ = totals(
+            (table_id, weekday, hour) for table_id in tables for weekday in range(7)
+        )
+        lines.append(f"{hour:02d}:00 {_percent(booked, available)}")
+
+    underused = []
+    for table_id in tables:
+        for weekday, hour in capacity:
+            booked, available, _, _ = totals([(table_id, weekday, hour)])
+            if available > 0:
+                underused.append((booked / available, table_id, weekday, hour))
+    underused.sort(key=lambda item: (item[0], item[2], (item[3] < 6, item[3]), item[1]))
+    if underused:
+        lines += ["", "Меньше всего загружены:"]
+        for share, table_id, weekday, hour in underused[:UNDERUSED_LIMIT]:
+            lines.append(f"{tables[table_id]} · {WEEKDAYS[weekday]} {hour:02d}:00 — {round(100 * share)}%")
+
+    booked, available, bookings, cancellations = totals(
+        (table_id, weekday, hour) for table_id in tables for weekday, hour in capacity
+    )
+    lines += [
+        "",
+        f"Итого: загрузка {_percent(booked, available)}, "
+        f"отмены {_percent(cancellations, bookings)} ({cancellations} из {bookings})",
+    ]
+    return "\n".join(lines)
@@ -1,11 +1,18 @@
 """
 Планировщик периодических задач
 """
+import asyncio
 import logging
+from datetime import datetime, timedelta
+from typing import Optional
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
-from database.repository import HoldRepository
+from config import settings
+from database.fsm_storage import SQLiteStorage
+from database.repository import HoldRepository, OutboxRepository, TournamentRepository
+from utils.notifier import notifier
+from utils.series import expand_due_series
 
 logger = logging.getLogger(__name__)
 
@@ -20,19 +27,119 @@ async def cleanup_holds_job():
         logger.error(f"Ошибка при очистке holds: {e}", exc_info=True)
 
 
-async def start_scheduler() -> AsyncIOScheduler:
-    """Запуск планировщика задач"""
+async def cleanup_outbox_job():
+    """Задача удаления давно доставленных уведомлений"""
+    try:
+        older_than = datetime.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+        deleted_count = OutboxRepository.cleanup_sent(older_than)
+        if deleted_count > 0:
+            logger.info(f"Удалено {deleted_count} доставленных уведомлений из outbox")
+    except Exception as e:
+        logger.error(f"Ошибка при очистке outbox: {e}", exc_info=True)
+
+
+async def reconcile_tournament_counts_job():
+    """Задача сверки счётчиков мест на турнирах с БД"""
+    try:
+        fixed = TournamentRepository.reconcile_counts()
+        if fixed > 0:
+            logger.info(f"Исправлено счётчиков мест на турнирах: {fixed}")
+    except Exception as e:
+        logger.error(f"Ошибка при сверке счётчиков турниров: {e}", exc_info=True)
+
+
+async def expand_booking_series_job():
+    """Задача создания занятий регулярных броней на MAX_BOOKING_DAYS вперёд"""
+    try:
+        # Пачки серий идут синхронными транзакциями — не на event loop
+        result = await asyncio.to_thread(expand_due_series)
+        if result.skipped > 0:
+            # Уведомления о пропусках закоммичены в потоке — забрать их сразу
+            notifier.wake()
+        if result.created > 0 or result.skipped > 0:
+            logger.info(
+                f"Регулярные брони: создано занятий {result.created}, "
+                f"пропущено {result.skipped} (серий: {result.series})"
+            )
+    except Exception as e:
+        logger.error(f"Ошибка при создании занятий регулярных броней: {e}", exc_info=True)
+
+
+async def cleanup_fsm_sessions_job(storage: SQLiteStorage):
+    """Задача удаления брошенных сессий FSM и их holds"""
+    try:
+        removed, freed = storage.evict_idle(settings.FSM_SESSION_TTL_MINUTES * 60)
+        if removed > 0:
+            logger.info(
+                f"Удалено {removed} брошенных сессий FSM, "
+                f"освобождено ~{freed / 1024:.1f} КБ памяти"
+            )
+    except Exception as e:
+        logger.error(f"Ошибка при очистке сессий FSM: {e}", exc_info=True)
+
+
+async def start_scheduler(fsm_storage: Optional[SQLiteStorage] = None,
+                          maintenance: bool = True) -> AsyncIOScheduler:
+    """
+    Запуск планировщика задач.
+    
+    maintenance=False — без общих задач обслуживания БД (holds, outbox,
+    регулярные брони): при нескольких процессах их выполняет только
+    приёмник апдейтов.
+    """
     scheduler = AsyncIOScheduler()
     
     # Очистка holds каждые 2 минуты
+    if maintenance:
+        scheduler.add_job(
+            cleanup_holds_job,
+            trigger=IntervalTrigger(minutes=2),
+            id='cleanup_holds',
+            name='Очистка истёкших holds',
+            replace_existing=True
+        )
+    
+    # Занятия регулярных броней — сразу после запуска и дальше периодически
+    if maintenance:
+        scheduler.add_job(
+            expand_booking_series_job,
+            trigger=IntervalTrigger(minutes=settings.SERIES_EXPAND_MINUTES),
+            next_run_time=datetime.now(),
+            id='expand_booking_series',
+            name='Занятия регулярных броней',
+            replace_existing=True
+        )
+    
+    # Удаление брошенных сессий FSM
+    if fsm_storage is not None:
+        scheduler.add_job(
+            cleanup_fsm_sessions_job,
+            trigger=IntervalTrigger(minutes=2),
+            args=[fsm_storage],
+            id='cleanup_fsm_sessions',
+            name='Очистка брошенных сессий FSM',
+            replace_existing=True
+        )
+    
+    # Сверка счётчиков мест на турнирах — в каждом процессе, у каждого свои
     scheduler.add_job(
-        cleanup_holds_job,
-        trigger=IntervalTrigger(minutes=2),
-        id='cleanup_holds',
-        name='Очистка истёкших holds',
+        reconcile_tournament_counts_job,
+        trigger=IntervalTrigger(seconds=settings.TOURNAMENT_COUNTS_RECONCILE_SECONDS),
+        id='reconcile_tournament_counts',
+        name='Сверка счётчиков мест на турнирах',
         replace_existing=True
     )
     
+    # Очистка outbox раз в сутки
+    if maintenance:
+        scheduler.add_job(
+            cleanup_outbox_job,
+            trigger=IntervalTrigger(hours=24),
+            id='cleanup_outbox',
+            name='Очистка доставленных уведомлений',
+            replace_existing=True
+        )
+    
     scheduler.start()
     logger.info("Планировщик задач запущен")
     
@@ -0,0 +1,66 @@
+"""
+Поиск броней и регистраций для администраторов (/find): разбор запроса и вывод
+"""
+from typing import List, Optional, Union
+
+from database.database import SEARCH_PHONE_STRIP
+from database.models import Booking, SearchQuery, TournamentRegistration
+from database.repository import TableRepository, TournamentRepository
+from utils.time_utils import format_datetime
+
+# Минимальная длина подстроки (триграммный индекс) и суффикса телефона
+MIN_TEXT_LENGTH = 3
+MIN_PHONE_DIGITS = 4
+# По телефону сравниваются последние 10 цифр: +7 999… и 8 999… — один номер
+PHONE_SUFFIX_DIGITS = 10
+
+
+def parse_search_query(raw: str) -> Optional[SearchQuery]:
+    """
+    Разбор запроса /find (None — если искать не по чему):
+    "#123" — бронь по ID; число — ID брони или конец телефона (от 4 цифр);
+    номер со знаками "+()-. " — конец телефона; остальное — подстрока
+    username или имени (от 3 символов, "@" в начале отбрасывается)
+    """
+    raw = raw.strip()
+    if raw.startswith("#") and raw[1:].isdigit():
+        return SearchQuery(booking_id=int(raw[1:]))
+
+    digits = "".join(char for char in raw if char not in SEARCH_PHONE_STRIP)
+    if digits.isdigit():
+        query = SearchQuery(booking_id=int(digits) if raw.isdigit() else None)
+        if len(digits) >= MIN_PHONE_DIGITS:
+            query.phone_suffix = digits[-PHONE_SUFFIX_DIGITS:]
+        return query if query.booking_id is not None or query.phone_suffix else None
+
+    text = raw.lstrip("@").strip()
+    if len(text) < MIN_TEXT_LENGTH:
+        return None
+    return SearchQuery(text=text)
+
+
+def format_hit(hit: Union[Booking, TournamentRegistration]) -> str:
+    """Строка результата поиска"""
+    status = "✅" if hit.status == 'active' else "❌"
+    if isinstance(hit, Booking):
+        table = TableRepository.get_table_by_id(hit.table_id, hit.venue_id)
+        table_name = table.name if table else f"Стол #{hit.table_id}"
+        return (
+            f"{status} Бронь #{hit.id} · {format_datetime(hit.start_time)}, {hit.duration_hours} ч\n"
+            f"   🎱 {table_name} · 👤 @{hit.username or 'без username'} · 📱 {hit.phone}"
+        )
+    tournament_name = TournamentRepository.get_tournament_name(hit.tournament_id, hit.tournament_type)
+    return (
+        f"{status} Регистрация #{hit.id} · {tournament_name}\n"
+        f"   👤 {hit.full_name} (@{hit.username or 'без username'}) · 📱 {hit.phone}"
+    )
+
+
+def render_search_results(raw: str, hits: List[Union[Booking, TournamentRegistration]],
+                          page: int) -> str:
+    """Текст страницы результатов поиска"""
+    if not hits:
+        return f"🔍 По запросу «{raw}» ничего не найдено"
+    lines = [f"🔍 Результаты по запросу «{raw}» (стр. {page + 1}):", ""]
+    lines += [format_hit(hit) for hit in hits]
+    return "\n".join(lines)
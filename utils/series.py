@@ -0,0 +1,149 @@
+"""
+Регулярные брони: создание занятий серий на MAX_BOOKING_DAYS вперёд
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from database.database import transaction
+from database.models import Booking, BookingSeries
+from database.repository import (
+    BookingRepository, BookingSeriesRepository, TableRepository, TournamentRepository,
+    VenueRepository
+)
+from utils.notifier import notifier
+from utils.time_utils import (
+    format_datetime, format_time, get_work_day_for_time, is_valid_booking_time
+)
+
+WEEKDAYS = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+
+# Занятие серии, которое ещё предстоит проверить на пересечения
+_Occurrence = Tuple[BookingSeries, datetime, datetime]
+
+
+@dataclass
+class SeriesExpansion:
+    """Итог создания занятий"""
+    series: int = 0   # обработано серий
+    created: int = 0  # создано занятий
+    skipped: int = 0  # пропущено: стол занят, день турнира, вне часов работы
+
+
+def booking_horizon(now: datetime) -> datetime:
+    """
+    Граница, раньше которой создаются занятия: те же MAX_BOOKING_DAYS дней,
+    что доступны в мастере бронирования (ночные слоты до 06:00 относятся
+    к предыдущему рабочему дню)
+    """
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return today + timedelta(days=settings.MAX_BOOKING_DAYS, hours=6)
+
+
+def describe_series(series: BookingSeries) -> str:
+    """Правило повторения: "Пн 19:00–21:00, каждую неделю" """
+    period = (
+        "каждую неделю" if series.interval_weeks == 1
+        else f"раз в {series.interval_weeks} нед."
+    )
+    return (
+        f"{WEEKDAYS[series.start_time.weekday()]} "
+        f"{format_time(series.start_time)}–{format_time(series.end_time)}, {period}"
+    )
+
+
+def expand_due_series(now: Optional[datetime] = None) -> SeriesExpansion:
+    """
+    Создание занятий серий, начинающихся раньше booking_horizon().
+
+    Серии обрабатываются пачками по SERIES_EXPAND_BATCH_SIZE, каждая пачка —
+    в своей транзакции с BEGIN IMMEDIATE: пересечения всех занятий пачки с
+    бронями и holds ищутся одним запросом на заведение, свободные занятия
+    создаются одним executemany вместе со сдвигом next_start. Занятые слоты,
+    дни турниров и слоты вне часов работы пропускаются (клиент получает
+    уведомление), серия продолжается со следующего занятия.
+    """
+    now = now or datetime.now()
+    horizon = booking_horizon(now)
+    result = SeriesExpansion()
+    after_id = 0
+
+    while True:
+        with transaction(immediate=True):
+            batch = BookingSeriesRepository.get_due_series(horizon, after_id)
+            if not batch:
+                return result
+            created, skipped = _expand_batch(batch, now, horizon)
+        result.series += len(batch)
+        result.created += created
+        result.skipped += skipped
+        after_id = batch[-1].id
+
+
+def _expand_batch(batch: List[BookingSeries], now: datetime,
+                  horizon: datetime) -> Tuple[int, int]:
+    """Создание занятий пачки серий (внутри транзакции); (создано, пропущено)"""
+    blocked_dates = TournamentRepository.get_blocked_dates()
+    candidates: Dict[int, List[_Occurrence]] = defaultdict(list)
+    skipped: List[Tuple[BookingSeries, datetime, str]] = []
+    next_starts: List[Tuple[int, datetime]] = []
+
+    for series in batch:
+        venue = VenueRepository.get_venue(series.venue_id)
+        table = TableRepository.get_table_by_id(series.table_id, series.venue_id)
+        duration = series.end_time - series.start_time
+        start = series.next_start
+        while start < horizon:
+            # Прошедшие занятия (задача долго не запускалась) не создаются
+            if start > now:
+                if venue is None or not venue.is_active or table is None or not table.is_active:
+                    skipped.append((series, start, "стол недоступен"))
+                elif get_work_day_for_time(start, venue).date() in blocked_dates:
+                    skipped.append((series, start, "в этот день турнир"))
+                elif not is_valid_booking_time(start, series.duration_hours, venue):
+                    skipped.append((series, start, "время вне часов работы"))
+                else:
+                    candidates[series.venue_id].append((series, start, start + duration))
+            start += timedelta(weeks=series.interval_weeks)
+        next_starts.append((series.id, start))
+
+    bookings: List[Booking] = []
+    for venue_id, occurrences in candidates.items():
+        conflicts = BookingRepository.find_conflicts(
+            [(series.table_id, start, end) for series, start, end in occurrences], venue_id
+        )
+        busy = {(conflict.table_id, conflict.start_time) for conflict in conflicts}
+        # Серии одной пачки могут претендовать на один стол и время
+        taken: Dict[int, List[Tuple[datetime, datetime]]] = defaultdict(list)
+        for series, start, end in occurrences:
+            if (series.table_id, start) in busy or any(
+                taken_start < end and taken_end > start
+                for taken_start, taken_end in taken[series.table_id]
+            ):
+                skipped.append((series, start, "стол уже занят"))
+                continue
+            taken[series.table_id].append((start, end))
+            bookings.append(Booking(
+                id=None,
+                user_id=series.user_id,
+                username=series.username,
+                table_id=series.table_id,
+                start_time=start,
+                end_time=end,
+                phone=series.phone,
+                created_at=now,
+                venue_id=venue_id,
+                series_id=series.id
+            ))
+
+    BookingSeriesRepository.create_occurrences(bookings, next_starts)
+    if skipped:
+        notifier.notify_many(
+            (series.user_id,
+             f"⚠️ Регулярная бронь: на {format_datetime(start)} бронь не создана — {reason}.\n"
+             f"Следующие занятия серии бронируются как обычно.")
+            for series, start, reason in skipped
+        )
+    return len(bookings), len(skipped)
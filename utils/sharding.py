@@ -0,0 +1,97 @@
+"""
+Распределение апдейтов по процессам-воркерам по user_id
+"""
+import logging
+import multiprocessing
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """ID пользователя (или чата), от которого пришёл апдейт"""
+    for key, event in update.items():
+        if key == 'update_id' or not isinstance(event, dict):
+            continue
+        for field in ('from', 'user'):
+            if isinstance(event.get(field), dict) and 'id' in event[field]:
+                return event[field]['id']
+        if isinstance(event.get('chat'), dict):
+            return event['chat'].get('id')
+    return None
+
+
+def shard_for_update(update: Dict[str, Any], shards: int) -> int:
+    """
+    Номер воркера для апдейта.
+
+    Все апдейты одного пользователя попадают в один процесс — его FSM-кэш,
+    блокировка и лимиты частоты остаются локальными для этого процесса.
+    """
+    user_id = update_user_id(update)
+    if user_id is None:
+        return 0
+    return user_id % shards
+
+
+class ShardPool:
+    """
+    Пул процессов-воркеров, у каждого своя очередь апдейтов.
+
+    Приёмник апдейтов (webhook или polling) вызывает dispatch() с сырым
+    апдейтом (dict из JSON Bot API); target(index, count, queue, ready, *args)
+    выполняется в дочернем процессе, выставляет ready после запуска и
+    обрабатывает апдейты из queue до получения None. Апдейты, пришедшие
+    до готовности воркера, ждут в его очереди. args — общие для всех
+    воркеров объекты multiprocessing (созданные в контексте spawn).
+    """
+
+    def __init__(self, count: int, target: Callable[..., None], args: Sequence[Any] = ()):
+        self.count = count
+        self._target = target
+        self._args = tuple(args)
+        self._context = multiprocessing.get_context('spawn')
+        self._queues: List[multiprocessing.Queue] = []
+        self._ready: List[Any] = []
+        self._processes: List[multiprocessing.Process] = []
+
+    def start(self):
+        for index in range(self.count):
+            queue = self._context.Queue()
+            ready = self._context.Event()
+            process = self._context.Process(
+                target=self._target, args=(index, self.count, queue, ready, *self._args),
+                name=f"bot-worker-{index}", daemon=True
+            )
+            process.start()
+            self._queues.append(queue)
+            self._ready.append(ready)
+            self._processes.append(process)
+        logger.info(f"Запущено воркеров: {self.count}")
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание запуска всех воркеров (блокирующее)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for ready in self._ready:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not ready.wait(remaining):
+                return False
+        return True
+
+    def dispatch(self, update: Dict[str, Any]):
+        """Передача апдейта воркеру его пользователя"""
+        self._queues[shard_for_update(update, self.count)].put(update)
+
+    def stop(self, timeout: float = 10):
+        """Остановка воркеров после обработки уже принятых апдейтов"""
+        for queue in self._queues:
+            queue.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"Воркер {process.name} не завершился, останавливаем принудительно")
+                process.terminate()
+        self._queues.clear()
+        self._ready.clear()
+        self._processes.clear()
@@ -2,15 +2,19 @@
 Утилиты для работы со временем и расписанием
 """
 from datetime import datetime, time, timedelta
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from config import settings
+from database.models import Venue
+from database.repository import TournamentRepository
 
 
-def get_working_hours(date: datetime) -> Tuple[time, time]:
+def get_working_hours(date: datetime, venue: Optional[Venue] = None) -> Tuple[time, time]:
     """
     Получение часов работы для конкретной даты
     Возвращает (время открытия, время закрытия)
 
+    Расписание берётся из заведения venue, без него — из настроек (по умолчанию):
+
     Пн-Чт: 14:00 - 02:00
     Пт:    14:00 - 03:00
     Сб:    13:00 - 03:00
@@ -31,6 +35,9 @@ def get_working_hours(date: datetime) -> Tuple[time, time]:
 
     weekday = check_date.weekday()  # 0=Пн, 4=Пт, 5=Сб, 6=Вс
 
+    if venue is not None:
+        return venue.working_hours(weekday)
+
     if weekday == 4:    # Пятница
         return settings.FRIDAY_OPEN, settings.FRIDAY_CLOSE
     elif weekday == 5:  # Суббота
@@ -41,7 +48,7 @@ def get_working_hours(date: datetime) -> Tuple[time, time]:
         return settings.WEEKDAY_OPEN, settings.WEEKDAY_CLOSE
 
 
-def get_work_day_for_time(dt: datetime) -> datetime:
+def get_work_day_for_time(dt: datetime, venue: Optional[Venue] = None) -> datetime:
     """
     Определяет, к какому рабочему дню относится данное время.
     Если время после полуночи (00:00-05:59), это может быть продолжение предыдущего дня.
@@ -50,7 +57,7 @@ def get_work_day_for_time(dt: datetime) -> datetime:
     if dt.hour < 6:
         # Получаем часы работы для предыдущего дня
         prev_day = dt - timedelta(days=1)
-        prev_open, prev_close = get_working_hours(prev_day)
+        prev_open, prev_close = get_working_hours(prev_day, venue)
         
         # Если предыдущий день работал после полуночи и текущее время в пределах работы
         if prev_close.hour < prev_open.hour and dt.hour < prev_close.hour:
@@ -59,27 +66,37 @@ def get_work_day_for_time(dt: datetime) -> datetime:
     return dt
 
 
+def get_closing_time(dt: datetime, venue: Optional[Venue] = None) -> datetime:
+    """Время закрытия заведения в рабочий день, к которому относится dt"""
+    work_day = get_work_day_for_time(dt, venue)
+    open_time, close_time = get_working_hours(work_day.replace(hour=0, minute=0), venue)
+    close = datetime.combine(work_day.date(), close_time)
+    if close_time <= open_time:
+        close += timedelta(days=1)
+    return close
+
+
 def get_available_dates() -> List[datetime]:
     """Получение списка доступных дат для бронирования"""
     dates = []
     today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    tournament_date = datetime(2026, 7, 5).date()  # Дата турниров
+    tournament_dates = TournamentRepository.get_blocked_dates()  # из кэша турниров
     
     for i in range(settings.MAX_BOOKING_DAYS):
         date = today + timedelta(days=i)
-        # Пропускаем дату турнира
-        if date.date() != tournament_date:
+        # Пропускаем даты турниров
+        if date.date() not in tournament_dates:
             dates.append(date)
     
     return dates
 
 
-def get_available_times(date: datetime) -> List[datetime]:
+def get_available_times(date: datetime, venue: Optional[Venue] = None) -> List[datetime]:
     """
     Получение списка доступных временных слотов для даты
     """
     # Определяем режим работы по дню открытия
-    open_time, close_time = get_working_hours(date)
+    open_time, close_time = get_working_hours(date, venue)
     times = []
     now = datetime.now()
     
@@ -137,7 +154,8 @@ def get_available_times(date: datetime) -> List[datetime]:
     return times
 
 
-def is_valid_booking_time(start_time: datetime, duration_hours: int) -> bool:
+def is_valid_booking_time(start_time: datetime, duration_hours: int,
+                          venue: Optional[Venue] = None) -> bool:
     """
     Проверка, что бронирование не выходит за часы работы
     """
@@ -145,7 +163,7 @@ def is_valid_booking_time(start_time: datetime, duration_hours: int) -> bool:
     
     # Определяем день работы (тот, в который открылись)
     # Если текущее время после полуночи и до времени открытия - это продолжение предыдущего дня
-    open_time, close_time = get_working_hours(start_time)
+    open_time, close_time = get_working_hours(start_time, venue)
     
     # Если слот после полуночи (00:00-06:00) и закрытие тоже после полуночи
     if start_time.hour < 6 and close_time.hour < open_time.hour:
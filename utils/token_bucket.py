@@ -0,0 +1,97 @@
+"""
+Token bucket для ограничения частоты операций
+"""
+import asyncio
+import multiprocessing
+import time
+
+
+class TokenBucket:
+    """
+    Классический token bucket: ёмкость capacity, пополнение rate токенов в секунду.
+
+    Не потокобезопасен — рассчитан на работу внутри одного event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        """Пополнение токенов за прошедшее время"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Забрать токены без ожидания; False, если их недостаточно"""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens: float = 1) -> float:
+        """Через сколько секунд станет доступно нужное количество токенов"""
+        self._refill()
+        if self._tokens >= tokens:
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    @property
+    def is_full(self) -> bool:
+        """Ведро полное — состояние можно безопасно забыть"""
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self, tokens: float = 1):
+        """Дождаться и забрать токены"""
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.delay(tokens))
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket, общий для нескольких процессов: токены и время пополнения
+    лежат в разделяемой памяти под её блокировкой.
+
+    Создаётся в основном процессе и передаётся воркерам через аргументы
+    процесса (контекст spawn, как у ShardPool). time.monotonic() — общие
+    для всех процессов системные часы.
+    """
+
+    def __init__(self, rate: float, capacity: float, context=None):
+        context = context or multiprocessing.get_context('spawn')
+        self._state = context.Array('d', 2)
+        super().__init__(rate, capacity)
+
+    @property
+    def _tokens(self) -> float:
+        return self._state[0]
+
+    @_tokens.setter
+    def _tokens(self, value: float):
+        self._state[0] = value
+
+    @property
+    def _updated(self) -> float:
+        return self._state[1]
+
+    @_updated.setter
+    def _updated(self, value: float):
+        self._state[1] = value
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self._state.get_lock():
+            return super().try_acquire(tokens)
+
+    def delay(self, tokens: float = 1) -> float:
+        with self._state.get_lock():
+            return super().delay(tokens)
+
+    @property
+    def is_full(self) -> bool:
+        with self._state.get_lock():
+            return super().is_full
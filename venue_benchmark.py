@@ -0,0 +1,181 @@
+"""
+Замер запросов бронирования при нескольких заведениях.
+
+Создаёт временную БД с N заведениями по M столов (по умолчанию 20 x 10),
+заполняет её бронями и holds на несколько дней вперёд и замеряет основные
+запросы в пределах одного заведения: проверку свободного слота, брони на
+дату, брони на сегодня и столы из кэша. Печатает планы запросов — все они
+должны идти по индексам, начинающимся с venue_id.
+
+Запустите:
+    python venue_benchmark.py                 # 20 заведений x 10 столов
+    python venue_benchmark.py -v 50 -t 12 -d 14 -n 5000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Окружение должно быть настроено до импорта config
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "venues.db")
+
+from config import settings  # noqa: E402
+from database.database import get_db, init_db  # noqa: E402
+from database.repository import BookingRepository, TableRepository, VenueRepository  # noqa: E402
+
+HOURS = {
+    key: getattr(settings, key.upper()) for key in VenueRepository.HOURS_FIELDS
+}
+
+
+def populate(venues: int, tables: int, days: int) -> int:
+    """Заведения, столы и брони (каждый стол занят примерно половину вечера)"""
+    for index in range(2, venues + 1):
+        VenueRepository.create_venue(f"Клуб #{index}", HOURS, admin_ids=[1000 + index])
+    for venue in VenueRepository.get_all_venues():
+        missing = tables - len(TableRepository.get_all_tables(venue.id))
+        TableRepository.create_tables(venue.id, [f"Стол {n}" for n in range(missing)])
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    now = datetime.now()
+    bookings, holds = [], []
+    for venue in VenueRepository.get_all_venues():
+        for table in TableRepository.get_all_tables(venue.id):
+            for day in range(days):
+                start = today + timedelta(days=day, hours=14)
+                while start < today + timedelta(days=day + 1, hours=2):
+                    duration = random.randint(1, 3)
+                    if random.random() < 0.5:
+                        bookings.append((
+                            venue.id, random.randint(1, 10 ** 6), "bench", table.id,
+                            start, start + timedelta(hours=duration), "+70000000000", now
+                        ))
+                    elif random.random() < 0.05:
+                        holds.append((
+                            venue.id, random.randint(1, 10 ** 6), table.id,
+                            start, start + timedelta(hours=duration), now,
+                            now + timedelta(minutes=settings.HOLD_TIMEOUT_MINUTES)
+                        ))
+                    start += timedelta(hours=duration)
+
+    with get_db() as conn:
+        conn.executemany("""
+            INSERT INTO bookings
+            (venue_id, user_id, username, table_id, start_time, end_time, phone, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, bookings)
+        conn.executemany("""
+            INSERT INTO holds
+            (venue_id, user_id, table_id, start_time, end_time, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, holds)
+        conn.execute("ANALYZE")
+    return len(bookings)
+
+
+def measure(name: str, func, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    print(
+        f"{name:<32} сред. {statistics.mean(samples) * 1e6:8.0f} мкс   "
+        f"p95 {samples[int(len(samples) * 0.95) - 1] * 1e6:8.0f} мкс"
+    )
+
+
+def explain(name: str, query: str, params):
+    with get_db() as conn:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    print(f"{name}:")
+    for row in plan:
+        print(f"    {row['detail']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-v", "--venues", type=int, default=20, help="число заведений")
+    parser.add_argument("-t", "--tables", type=int, default=10, help="столов в заведении")
+    parser.add_argument("-d", "--days", type=int, default=7, help="дней с бронями")
+    parser.add_argument("-n", "--repeat", type=int, default=2000, help="повторов каждого запроса")
+    args = parser.parse_args()
+
+    random.seed(1)
+    init_db()
+    started = time.perf_counter()
+    total = populate(args.venues, args.tables, args.days)
+    print(
+        f"Заведений: {args.venues}, столов: {args.venues * args.tables}, "
+        f"броней: {total} (заполнение {time.perf_counter() - started:.1f} с)\n"
+    )
+
+    venues = VenueRepository.get_all_venues()
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def random_slot():
+        venue = random.choice(venues)
+        table = random.choice(TableRepository.get_all_tables(venue.id))
+        start = today + timedelta(days=random.randrange(args.days), hours=random.randint(14, 24))
+        return venue, table, start, start + timedelta(hours=2)
+
+    def check_slot():
+        venue, table, start, end = random_slot()
+        BookingRepository.check_availability(table.id, start, end, venue_id=venue.id)
+
+    def check_any_table():
+        venue, _, start, end = random_slot()
+        BookingRepository.check_availability(None, start, end, venue_id=venue.id)
+
+    def bookings_by_date():
+        venue = random.choice(venues)
+        day = today + timedelta(days=random.randrange(args.days))
+        BookingRepository.get_bookings_by_date(day, [venue.id])
+
+    def today_bookings():
+        BookingRepository.get_today_bookings([random.choice(venues).id])
+
+    def cached_tables():
+        TableRepository.get_all_tables(random.choice(venues).id)
+
+    measure("check_availability (стол)", check_slot, args.repeat)
+    measure("check_availability (любой)", check_any_table, args.repeat)
+    measure("get_bookings_by_date", bookings_by_date, args.repeat)
+    measure("get_today_bookings", today_bookings, args.repeat)
+    measure("get_all_tables (кэш)", cached_tables, args.repeat)
+
+    TableRepository.invalidate_cache()
+    TableRepository.get_all_tables(venues[0].id)
+    print(
+        f"\nПосле сброса кэша загружено разделов: {len(TableRepository._cache)} "
+        f"(остальные заведения подгружаются по первому обращению)\n"
+    )
+
+    start, end = today + timedelta(hours=18), today + timedelta(hours=20)
+    explain(
+        "Проверка стола (bookings)",
+        "SELECT 1 FROM bookings WHERE venue_id = ? AND status = 'active' "
+        "AND start_time < ? AND end_time > ? AND table_id = ? LIMIT 1",
+        (1, end, start, 1)
+    )
+    explain(
+        "Проверка стола (holds)",
+        "SELECT 1 FROM holds WHERE venue_id = ? AND expires_at > ? "
+        "AND start_time < ? AND end_time > ? AND table_id = ? LIMIT 1",
+        (1, datetime.now(), end, start, 1)
+    )
+    explain(
+        "Брони на дату",
+        "SELECT * FROM bookings WHERE venue_id IN (?) AND start_time >= ? AND start_time < ? "
+        "ORDER BY start_time, status DESC, id",
+        (1, today, today + timedelta(days=1))
+    )
+
+
+if __name__ == "__main__":
+    main()
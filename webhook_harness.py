@@ -0,0 +1,244 @@
+"""
+Локальный стенд для замера задержки "апдейт -> ответ" в webhook-режиме.
+
+Поднимает бота в webhook-режиме и поддельный Bot API сервер на localhost,
+отправляет записанные апдейты POST-запросами на webhook и замеряет время
+до первого вызова Bot API, адресованного тому же чату (или ответа на тот же
+callback). В Telegram ничего не уходит.
+
+Запустите:
+    python webhook_harness.py                     # встроенный набор апдейтов
+    python webhook_harness.py updates.jsonl -r 5  # свои апдейты, 5 повторов
+    python webhook_harness.py -r 20 -w 4          # 4 процесса-воркера (WORKERS=4)
+
+Файл апдейтов — JSON-массив или JSONL, по одному объекту Update на строку
+(например, сохранённые из getUpdates).
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+API_PORT = 18081
+WEBHOOK_PORT = 18080
+SECRET = "harness-secret"
+
+# Окружение должно быть настроено до импорта config
+os.environ.setdefault("BOT_TOKEN", "123456:HARNESS")
+os.environ["USE_WEBHOOK"] = "1"
+os.environ["WEBHOOK_URL"] = f"http://127.0.0.1:{WEBHOOK_PORT}"
+os.environ["WEBHOOK_SECRET"] = SECRET
+os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{API_PORT}"
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "harness.db"))
+# Повторы набора упираются в лимиты частоты — для замера они выключены
+os.environ.setdefault("THROTTLE_ENABLED", "0")
+os.environ.setdefault("BOT_SEND_RATE", "1000000")
+
+from aiohttp import ClientSession, web  # noqa: E402
+
+from bot import (  # noqa: E402
+    create_bot, create_dispatcher, create_webhook_app, create_sharded_webhook_app,
+    worker_process
+)
+from config import settings  # noqa: E402
+from database.database import init_db  # noqa: E402
+from utils.sharding import ShardPool  # noqa: E402
+from utils.token_bucket import SharedTokenBucket  # noqa: E402
+
+# Методы Bot API, которые возвращают True вместо Message
+BOOL_METHODS = {
+    "answerCallbackQuery", "setWebhook", "deleteWebhook", "deleteMessage",
+    "sendChatAction", "setMyCommands",
+}
+
+
+class FakeBotAPI:
+    """Поддельный Bot API: отвечает успехом и фиксирует время вызовов"""
+
+    def __init__(self):
+        self.waiters: Dict[str, asyncio.Future] = {}
+        self.calls: Dict[str, int] = defaultdict(int)
+        self._message_id = 0
+
+    def expect(self, key: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[key] = future
+        return future
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        params = dict(await request.post())
+
+        for key in (params.get("chat_id"), params.get("callback_query_id")):
+            future = self.waiters.pop(f"{key}", None) if key else None
+            if future and not future.done():
+                future.set_result(time.perf_counter())
+
+        if method in BOOL_METHODS:
+            result: Any = True
+        elif method == "getMe":
+            result = {"id": 123456, "is_bot": True, "first_name": "Harness"}
+        else:
+            self._message_id += 1
+            result = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return web.json_response({"ok": True, "result": result})
+
+
+def sample_updates(users: int = 20) -> List[Dict[str, Any]]:
+    """Встроенный набор апдейтов: /start и основные кнопки меню"""
+    updates = []
+    update_id = 1
+    for texts in (["/start"], ["📋 Мои бронирования"], ["📅 Забронировать стол"]):
+        for user_id in range(1000, 1000 + users):
+            for text in texts:
+                updates.append({
+                    "update_id": update_id,
+                    "message": {
+                        "message_id": update_id,
+                        "date": int(time.time()),
+                        "chat": {"id": user_id, "type": "private"},
+                        "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+                        "text": text,
+                    },
+                })
+                update_id += 1
+    return updates
+
+
+def load_updates(path: str) -> List[Dict[str, Any]]:
+    """Загрузка апдейтов из JSON-массива или JSONL"""
+    with open(path, encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def reply_key(update: Dict[str, Any]) -> Optional[str]:
+    """Ключ, по которому ответ бота сопоставляется с апдейтом"""
+    if "callback_query" in update:
+        return str(update["callback_query"]["id"])
+    for kind in ("message", "edited_message"):
+        if kind in update:
+            return str(update[kind]["chat"]["id"])
+    return None
+
+
+async def replay(updates: List[Dict[str, Any]], api: FakeBotAPI, timeout: float) -> List[float]:
+    """Отправка апдейтов: разные чаты параллельно, один чат — последовательно"""
+    by_chat: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for update in updates:
+        by_chat[reply_key(update) or "-"].append(update)
+
+    latencies: List[float] = []
+    url = f"http://127.0.0.1:{WEBHOOK_PORT}{settings.WEBHOOK_PATH}"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+    async with ClientSession() as http:
+        async def send_chat(chat_updates: List[Dict[str, Any]]):
+            for update in chat_updates:
+                key = reply_key(update)
+                future = api.expect(key) if key else None
+                started = time.perf_counter()
+                async with http.post(url, json=update, headers=headers) as response:
+                    response.raise_for_status()
+                if future is None:
+                    continue
+                try:
+                    replied = await asyncio.wait_for(future, timeout)
+                    latencies.append(replied - started)
+                except asyncio.TimeoutError:
+                    api.waiters.pop(key, None)
+
+        await asyncio.gather(*(send_chat(chat_updates) for chat_updates in by_chat.values()))
+
+    return latencies
+
+
+async def drain(api: FakeBotAPI, quiet: float = 0.3):
+    """Ожидание, пока бот закончит фоновую обработку (вызовы API прекратятся)"""
+    previous = -1
+    while previous != sum(api.calls.values()):
+        previous = sum(api.calls.values())
+        await asyncio.sleep(quiet)
+
+
+def print_report(latencies: List[float], total: int, elapsed: float, api: FakeBotAPI):
+    """Вывод статистики задержек"""
+    print("=" * 60)
+    print(f"Апдейтов отправлено: {total}, с ответом: {len(latencies)}")
+    print(f"Общее время: {elapsed:.2f} с ({total / elapsed:.1f} апдейтов/с)")
+    if latencies:
+        ms = sorted(x * 1000 for x in latencies)
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+        print(
+            f"Задержка, мс: min={ms[0]:.1f} p50={statistics.median(ms):.1f} "
+            f"p95={p95:.1f} max={ms[-1]:.1f}"
+        )
+    print("Вызовы Bot API: " + ", ".join(f"{m}={c}" for m, c in sorted(api.calls.items())))
+    print("=" * 60)
+
+
+async def main(args):
+    init_db()
+
+    api = FakeBotAPI()
+    api_app = web.Application()
+    api_app.router.add_post("/bot{token}/{method}", api.handle)
+    api_runner = web.AppRunner(api_app)
+    await api_runner.setup()
+    await web.TCPSite(api_runner, "127.0.0.1", API_PORT).start()
+
+    # Как в bot.main(): при нескольких процессах лимит отправки общий
+    pool = send_bucket = None
+    if args.workers > 1:
+        send_bucket = SharedTokenBucket(settings.BOT_SEND_RATE, settings.BOT_SEND_RATE)
+    bot = create_bot(send_bucket)
+    dp = create_dispatcher()
+    if args.workers > 1:
+        pool = ShardPool(args.workers, worker_process, args=(None, send_bucket))
+        pool.start()
+        await asyncio.get_running_loop().run_in_executor(None, pool.wait_ready, 120)
+        app = create_sharded_webhook_app(pool)
+    else:
+        app = create_webhook_app(bot, dp)
+    bot_runner = web.AppRunner(app)
+    await bot_runner.setup()
+    await web.TCPSite(bot_runner, "127.0.0.1", WEBHOOK_PORT).start()
+
+    updates = load_updates(args.updates) if args.updates else sample_updates()
+    updates = updates * args.repeat
+
+    try:
+        started = time.perf_counter()
+        latencies = await replay(updates, api, args.timeout)
+        elapsed = time.perf_counter() - started
+        await drain(api)
+        print_report(latencies, len(updates), elapsed, api)
+    finally:
+        await bot_runner.cleanup()
+        if pool:
+            pool.stop()
+        await api_runner.cleanup()
+        await dp.storage.close()
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замер задержки webhook-обработки")
+    parser.add_argument("updates", nargs="?", help="JSON/JSONL файл с апдейтами")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="количество повторов набора")
+    parser.add_argument("-t", "--timeout", type=float, default=5.0, help="ожидание ответа, с")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="количество процессов-воркеров")
+    asyncio.run(main(parser.parse_args()))